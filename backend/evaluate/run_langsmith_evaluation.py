@@ -22,6 +22,7 @@ from evaluate.langsmith_evaluators import (
 )
 from evaluate.results_display import ScenarioResult, print_consistency_stats
 from tenantfirstaid.constants import LANGSMITH_API_KEY, SINGLETON
+from tenantfirstaid.graph import prepare_system_prompt
 from tenantfirstaid.langchain_chat_manager import LangChainChatManager
 from tenantfirstaid.location import OregonCity, UsaState
 from tenantfirstaid.logger import configure_logging
@@ -43,6 +44,7 @@ def agent_wrapper(inputs) -> Dict[str, str]:
     context_state = UsaState.from_maybe_str(inputs["state"])
     context_city = OregonCity.from_maybe_str(inputs["city"])
     tid: Optional[str] = None
+    system_prompt = prepare_system_prompt(context_city, context_state)
 
     responses = list(
         chat_manager.generate_streaming_response(
@@ -66,9 +68,9 @@ def agent_wrapper(inputs) -> Dict[str, str]:
             ]
         )
         or "N/A - Set env var `SHOW_MODEL_THINKING=true` to capture reasoning",
-        "Model-Under-Test System Prompt": chat_manager.system_prompt.content
-        if chat_manager.system_prompt is not None
-        and isinstance(chat_manager.system_prompt.content, str)
+        # The shared graph builds this same prompt per run from city/state.
+        "Model-Under-Test System Prompt": system_prompt.content
+        if isinstance(system_prompt.content, str)
         else "",
         # TODO: figure out how to return ToolMessage content blocks for evaluation of tool calls and outputs
         #       since these are not currently included in the output stream from generate_streaming_response()
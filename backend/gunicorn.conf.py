@@ -0,0 +1,19 @@
+"""Gunicorn settings shared by every deployment of ``tenantfirstaid.app:app``.
+
+Command-line flags (workers, bind address, timeout) still come from the systemd
+unit and the Dockerfile; this file only adds the worker hooks.
+"""
+
+from gunicorn.workers.base import Worker
+
+
+def post_worker_init(worker: Worker) -> None:
+    """Warm a new worker up after it loads the app, before it accepts a request.
+
+    Runs for every worker, including each one gunicorn starts to replace a worker
+    it killed. Does nothing unless ``WARMUP`` is set.
+    """
+    # Imported here so the arbiter process never loads the app.
+    from tenantfirstaid.warmup import warm_up
+
+    warm_up()
@@ -0,0 +1,1411 @@
+"""Local performance benchmarks for the chat backend.
+
+Every benchmark runs against in-process fakes (a canned chat model, no Vertex AI
+Search, no GCP credentials), so results are repeatable and safe to run anywhere.
+Numbers are wall-clock on the current machine: compare before/after on the same
+host rather than across hosts.
+
+Usage:
+    uv run python -m scripts.benchmark graph-setup
+    uv run python -m scripts.benchmark graph-setup --iterations 200
+    uv run python -m scripts.benchmark stream-capacity --streams 200 --latency 2
+    uv run python -m scripts.benchmark conversation-payload
+    uv run python -m scripts.benchmark history-compaction --budget 32000
+    uv run python -m scripts.benchmark rag-setup
+    uv run python -m scripts.benchmark tool-fanout --calls 4 --latency 0.3
+    uv run python -m scripts.benchmark statute-index --vertex-latency 0.4
+    uv run python -m scripts.benchmark citation-fallback
+    uv run python -m scripts.benchmark first-token --tokens 100 --token-delay 0.02
+    uv run python -m scripts.benchmark rag-prefetch --model-latency 1.5 --latency 0.4
+    uv run python -m scripts.benchmark rag-hedging --searches 2000 --tail-rate 0.03
+    uv run python -m scripts.benchmark request-timing --spans 100000
+    uv run python -m scripts.benchmark admission --rate 8 --capacity 4
+    uv run python -m scripts.benchmark chunk-stream --tokens 300 --token-delay 0.002
+    uv run python -m scripts.benchmark stream-compression --levels 1 6 9
+    uv run python -m scripts.benchmark import-time --runs 5 --budget-ms 3000
+    uv run python -m scripts.benchmark credential-refresh --latency 0.15
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import generate_from_stream
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, AnyMessage, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+_PLACEHOLDER_ENV = {
+    "MODEL_NAME": "gemini-2.5-pro",
+    "GOOGLE_CLOUD_PROJECT": "benchmark-project",
+    "GOOGLE_CLOUD_LOCATION": "global",
+    "GOOGLE_APPLICATION_CREDENTIALS": "/nonexistent/benchmark-credentials.json",
+    "VERTEX_AI_DATASTORE_LAWS": "benchmark-laws",
+    "CONVERSATION_TOKEN_SECRET": "benchmark-secret",
+}
+"""Settings that let tenantfirstaid.constants import without a .env file.
+
+Benchmarks never reach GCP; real values from the environment or .env still win.
+"""
+
+
+class FakeToolChatModel(GenericFakeChatModel):
+    """Canned chat model that accepts ``bind_tools`` so it can drive the agent graph."""
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeToolChatModel":
+        return self
+
+
+def fake_llm(reply: str = "You have rights.") -> FakeToolChatModel:
+    """Return a fake model that answers every call with ``reply`` and no tool calls."""
+    return FakeToolChatModel(messages=iter(lambda: AIMessage(content=reply), None))
+
+
+class SlowFakeChatModel(FakeToolChatModel):
+    """Fake model that waits ``delay`` seconds per call, like a slow LLM round trip.
+
+    The sync path blocks its thread in ``time.sleep``; the async path yields to the
+    event loop in ``asyncio.sleep``, which is exactly the difference the async
+    serving path exploits.
+    """
+
+    delay: float = 1.0
+
+    def _generate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        time.sleep(self.delay)
+        return super()._generate(messages, *args, **kwargs)
+
+    async def _agenerate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        await asyncio.sleep(self.delay)
+        return super()._generate(messages, *args, **kwargs)
+
+
+class StreamingFakeChatModel(FakeToolChatModel):
+    """Fake model that streams its reply word by word, ``token_delay`` seconds apart.
+
+    Unlike GenericFakeChatModel it also streams tool calls, as tool-call chunks,
+    so it can drive the agent graph through a tool round. A non-streaming call
+    waits for the whole reply, as a real model's does.
+    """
+
+    token_delay: float = 0.0
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        reply = next(self.messages)
+        assert isinstance(reply, AIMessage)
+        for token in re.split(r"(\s)", reply.text) if reply.text else []:
+            time.sleep(self.token_delay)
+            chunk = ChatGenerationChunk(
+                message=AIMessageChunk(content=token, id=reply.id)
+            )
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        if reply.tool_calls:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    id=reply.id,
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"]),
+                            "id": call["id"],
+                            "index": i,
+                        }
+                        for i, call in enumerate(reply.tool_calls)
+                    ],
+                )
+            )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop, run_manager, **kwargs))
+
+
+def time_calls(fn: Callable[[], object], iterations: int) -> list[float]:
+    """Call ``fn`` ``iterations`` times and return each call's duration in milliseconds."""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label: str, samples: list[float], unit: str = "ms") -> None:
+    """Print mean/p50/p99/max for a list of samples."""
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{label:<40} n={len(samples):<5} mean={statistics.fmean(samples):9.3f}{unit}"
+        f"  p50={statistics.median(samples):9.3f}{unit}  p99={p99:9.3f}{unit}"
+        f"  max={ordered[-1]:9.3f}{unit}"
+    )
+
+
+def bench_graph_setup(args: argparse.Namespace) -> None:
+    """Per-request agent setup: compile a graph per request vs. the shared graph."""
+    from tenantfirstaid import graph
+    from tenantfirstaid.location import OregonCity, UsaState
+
+    graph._llm = fake_llm()  # ty: ignore[invalid-assignment]
+
+    def per_request_compile() -> None:
+        prompt = graph.prepare_system_prompt(OregonCity.PORTLAND, UsaState.OREGON)
+        graph.create_graph(system_prompt=prompt)
+
+    before = time_calls(per_request_compile, args.iterations)
+    graph._agent_graph = None
+    first = time_calls(graph.get_agent_graph, 1)
+    after = time_calls(graph.get_agent_graph, args.iterations)
+
+    report("before: compile per request", before)
+    report("after: first request (compiles once)", first)
+    report("after: later requests (shared graph)", after)
+    print(
+        f"setup saved per request: {statistics.fmean(before) - statistics.fmean(after):.3f}ms"
+    )
+
+
+class _OpenStreams:
+    """Thread-safe counter of in-flight streams that remembers its peak."""
+
+    def __init__(self) -> None:
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def opened(self) -> None:
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def closed(self) -> None:
+        with self._lock:
+            self.current -= 1
+
+
+def bench_stream_capacity(args: argparse.Namespace) -> None:
+    """Concurrent streams one worker holds open: thread-per-stream vs. asyncio."""
+    from tenantfirstaid import graph
+    from tenantfirstaid.langchain_chat_manager import LangChainChatManager
+    from tenantfirstaid.location import UsaState
+
+    graph._llm = SlowFakeChatModel(  # ty: ignore[invalid-assignment]
+        messages=iter(lambda: AIMessage(content="You have rights."), None),
+        delay=args.latency,
+    )
+    graph._agent_graph = None
+    graph.get_agent_graph()
+
+    def query() -> list[AnyMessage | dict[str, Any]]:
+        return [{"role": "human", "content": "Can my landlord raise my rent?"}]
+
+    sync_open = _OpenStreams()
+
+    # Latency is measured from submission, so time spent queued for a free thread
+    # counts, as it would for a client waiting on a busy worker.
+    def sync_stream(submitted: float) -> float:
+        sync_open.opened()
+        try:
+            for _ in LangChainChatManager().generate_streaming_response(
+                query(), None, UsaState.OREGON, None
+            ):
+                pass
+        finally:
+            sync_open.closed()
+        return time.perf_counter() - submitted
+
+    # gunicorn --workers 2 --threads 4: each worker serves `--threads` streams at once.
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        futures = [
+            pool.submit(sync_stream, time.perf_counter()) for _ in range(args.streams)
+        ]
+        sync_latencies = [f.result() for f in futures]
+    sync_wall = time.perf_counter() - start
+
+    async_open = _OpenStreams()
+
+    async def async_stream(submitted: float) -> float:
+        async_open.opened()
+        try:
+            async for _ in LangChainChatManager().agenerate_streaming_response(
+                query(), None, UsaState.OREGON, None
+            ):
+                pass
+        finally:
+            async_open.closed()
+        return time.perf_counter() - submitted
+
+    async def run_async() -> list[float]:
+        return list(
+            await asyncio.gather(
+                *(async_stream(time.perf_counter()) for _ in range(args.streams))
+            )
+        )
+
+    start = time.perf_counter()
+    async_latencies = asyncio.run(run_async())
+    async_wall = time.perf_counter() - start
+
+    print(
+        f"{args.streams} streams, {args.latency:.2f}s model latency, "
+        f"{args.threads} threads for the sync worker"
+    )
+    report(f"sync ({args.threads} threads) latency", sync_latencies, unit="s")
+    report("async (one event loop) latency", async_latencies, unit="s")
+    print(
+        f"sync:  peak open streams={sync_open.peak:<5} wall={sync_wall:8.2f}s"
+        f"  throughput={args.streams / sync_wall:8.2f} streams/s"
+    )
+    print(
+        f"async: peak open streams={async_open.peak:<5} wall={async_wall:8.2f}s"
+        f"  throughput={args.streams / async_wall:8.2f} streams/s"
+    )
+
+
+def bench_conversation_payload(args: argparse.Namespace) -> None:
+    """Request size and JSON parse cost per turn: full history vs. a thread token."""
+    from tenantfirstaid.conversations import issue_thread_token
+
+    question = {"role": "human", "content": "Can my landlord do this? " * 12}
+    answer = {"role": "ai", "content": "Under ORS 90.427, your landlord must... " * 50}
+    token = issue_thread_token("0" * 32)
+
+    for turns in args.turns:
+        history = [question, answer] * (turns - 1) + [question]
+        stateless = json.dumps(
+            {"messages": history, "city": "portland", "state": "or"}
+        ).encode()
+        threaded = json.dumps(
+            {
+                "messages": [question],
+                "city": "portland",
+                "state": "or",
+                "thread_token": token,
+            }
+        ).encode()
+        for label, body in (("full history", stateless), ("thread token", threaded)):
+            samples = time_calls(lambda: json.loads(body), args.iterations)
+            report(f"turn {turns:>3} {label} ({len(body):>7} B) parse", samples)
+
+
+def bench_history_compaction(args: argparse.Namespace) -> None:
+    """Prompt tokens per model call as a conversation grows, with and without compaction."""
+    from langchain_core.messages import HumanMessage, ToolMessage
+    from langchain_core.messages.utils import count_tokens_approximately
+
+    from tenantfirstaid.graph import _HistoryCompaction
+
+    middleware = _HistoryCompaction(args.budget)
+    history: list[Any] = []
+    for turn in range(1, args.turns + 1):
+        history.append(HumanMessage(f"Question {turn}: can my landlord do this? " * 8))
+        tool = "generate_letter" if turn % 3 == 0 else "retrieve_city_state_laws"
+        tool_args = {"letter": "Dear Landlord, " * 400} if turn % 3 == 0 else {}
+        history.append(
+            AIMessage(
+                "", tool_calls=[{"name": tool, "args": tool_args, "id": f"c{turn}"}]
+            )
+        )
+        history.append(ToolMessage("ORS 90.427 ... " * 600, tool_call_id=f"c{turn}"))
+        history.append(AIMessage("Under Oregon law, you have rights. " * 30))
+        if turn not in args.report_turns:
+            continue
+        before = count_tokens_approximately(history)
+        samples = time_calls(lambda: middleware._compact(history), 20)
+        result = middleware._compact(history)
+        after = before
+        if result is not None:
+            messages, summary = result
+            after = count_tokens_approximately(messages) + (
+                count_tokens_approximately([HumanMessage(summary)]) if summary else 0
+            )
+        print(
+            f"turn {turn:>3}: prompt history {before:>7} -> {after:>7} tokens"
+            f"  (saved {before - after:>7})"
+        )
+        report(f"turn {turn:>3} compaction overhead", samples)
+
+
+def bench_tool_fanout(args: argparse.Namespace) -> None:
+    """Wall time of a model turn that emits several retrievals, by concurrency cap."""
+    from unittest.mock import patch
+
+    from langchain_core.messages import HumanMessage
+    from langchain_core.tools import tool
+
+    from tenantfirstaid import graph
+    from tenantfirstaid.location import UsaState
+
+    @tool
+    def retrieve_city_state_laws(query: str) -> str:
+        """Fake retrieval with a fixed round-trip delay."""
+        time.sleep(args.latency)
+        return f"passages for {query}"
+
+    calls = [
+        {"name": "retrieve_city_state_laws", "args": {"query": f"q{i}"}, "id": f"c{i}"}
+        for i in range(args.calls)
+    ]
+
+    def turn(cap: int) -> None:
+        model = FakeToolChatModel(
+            messages=iter([AIMessage("", tool_calls=calls), AIMessage("Done.")])
+        )
+        with (
+            patch.object(graph, "_get_llm", return_value=model),
+            patch.object(graph, "tools", [retrieve_city_state_laws]),
+        ):
+            agent = graph.create_graph()
+        agent.invoke(
+            {"messages": [HumanMessage("Q")], "state": UsaState.OREGON},
+            config={"max_concurrency": cap},
+        )
+
+    print(f"{args.calls} tool calls of {args.latency * 1000:.0f}ms each in one turn")
+    for cap in args.caps:
+        report(f"max_concurrency={cap}", time_calls(lambda: turn(cap), args.iterations))
+
+
+def _throwaway_service_account(directory: str) -> str:
+    """Write a service-account key file with a freshly generated RSA key.
+
+    The key is never registered with GCP; it only lets credentials and clients be
+    built locally, exactly as they are for a real key.
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    path = os.path.join(directory, "benchmark-service-account.json")
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "type": "service_account",
+                "project_id": "benchmark-project",
+                "private_key_id": "benchmark",
+                "private_key": pem,
+                "client_email": "benchmark@benchmark-project.iam.gserviceaccount.com",
+                "client_id": "0",
+                "token_uri": "https://oauth2.googleapis.com/token",
+            },
+            f,
+        )
+    return path
+
+
+def bench_rag_setup(args: argparse.Namespace) -> None:
+    """Per-call retrieval setup: a new retriever per tool call vs. the pooled one."""
+    import tempfile
+
+    from langchain_google_community import VertexAISearchRetriever
+
+    from tenantfirstaid import langchain_tools
+    from tenantfirstaid.google_auth import load_gcp_credentials
+
+    query_filter = 'city: ANY("portland", "null") AND state: ANY("or")'
+    with tempfile.TemporaryDirectory() as tmp:
+        key_file = _throwaway_service_account(tmp)
+        # Share credentials parsed from the generated key, as the server does.
+        shared = load_gcp_credentials(key_file)
+        langchain_tools.get_gcp_credentials = lambda: shared  # ty: ignore[invalid-assignment]
+
+        def per_call_retriever() -> None:
+            VertexAISearchRetriever(
+                beta=True,
+                credentials=load_gcp_credentials(key_file),
+                project_id="benchmark-project",
+                location_id="global",
+                data_store_id="benchmark-laws",
+                engine_data_type=0,
+                get_extractive_answers=False,
+                max_extractive_segment_count=3,
+                spell_correction_mode=1,
+                max_documents=3,
+                filter=query_filter,
+            )
+
+        def pooled_builder() -> None:
+            langchain_tools.RagBuilder(
+                data_store_id="benchmark-laws", filter=query_filter
+            )
+
+        before = time_calls(per_call_retriever, args.iterations)
+        langchain_tools._retriever_pool.clear()
+        first = time_calls(pooled_builder, 1)
+        after = time_calls(pooled_builder, args.iterations)
+
+    report("before: new credentials + retriever per call", before)
+    report("after: first call (fills the pool)", first)
+    report("after: later calls (pooled client)", after)
+    print(
+        f"setup saved per call: {statistics.fmean(before) - statistics.fmean(after):.3f}ms"
+    )
+
+
+class _FakeTokenEndpoint:
+    """google-auth HTTP transport that answers token requests after ``latency`` seconds.
+
+    Other requests (google-auth's background access-boundary lookups) are
+    answered at once and not counted.
+    """
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, url: str, method: str = "GET", **kwargs: Any) -> Any:
+        from types import SimpleNamespace
+
+        if url.endswith("/token"):
+            time.sleep(self.latency)
+            self.calls += 1
+            body = {"access_token": f"token-{self.calls}", "expires_in": 3600}
+        else:
+            body = {"encodedLocations": "0x0"}
+        return SimpleNamespace(status=200, headers={}, data=json.dumps(body).encode())
+
+
+def bench_credential_refresh(args: argparse.Namespace) -> None:
+    """Auth time per request: new credentials per call vs. the shared, pre-refreshed ones."""
+    import tempfile
+
+    from tenantfirstaid.google_auth import SharedCredentials, load_gcp_credentials
+
+    endpoint = _FakeTokenEndpoint(args.latency)
+    url = "https://discoveryengine.googleapis.com/v1/search"
+    with tempfile.TemporaryDirectory() as tmp:
+        key_file = _throwaway_service_account(tmp)
+
+        def fresh_credentials() -> None:
+            # What each retriever or model client used to do on its first call.
+            load_gcp_credentials(key_file).before_request(endpoint, "POST", url, {})
+
+        shared = SharedCredentials(
+            load_gcp_credentials(key_file),
+            request=lambda: endpoint,  # ty: ignore[invalid-argument-type]
+        )
+        shared.refresh()  # done by the refresher thread before any request
+
+        def shared_credentials() -> None:
+            shared.credentials.before_request(endpoint, "POST", url, {})
+
+        start = endpoint.calls
+        before = time_calls(fresh_credentials, args.iterations)
+        middle = endpoint.calls
+        after = time_calls(shared_credentials, args.iterations)
+
+    report("before: new credentials per client", before)
+    report("after: shared, refreshed in background", after)
+    print(
+        f"token exchanges on the request path: {middle - start} before, "
+        f"{endpoint.calls - middle} after"
+    )
+
+
+def _rss_kib() -> int:
+    """Current resident set size of this process in KiB (Linux), else the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+_STATUTE_QUERIES = [
+    "security deposit interest",
+    "landlord entry notice 24 hours",
+    "nonpayment of rent week-to-week tenancy",
+    "ORS 90.427 termination without tenant cause",
+    "retaliation by landlord",
+    "smoke alarm carbon monoxide",
+    "late rent fee",
+    "abandoned personal property",
+]
+"""Lexical statute lookups of the kind the agent issues."""
+
+
+def bench_statute_index(args: argparse.Namespace) -> None:
+    """Local statute index: build, resident memory and query latency vs. Vertex."""
+    import tempfile
+    from pathlib import Path
+
+    from tenantfirstaid.statute_index import StatuteIndex, write_statute_index
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build = time_calls(lambda: write_statute_index(Path(tmp) / "sections.idx"), 1)
+        path = Path(tmp) / "sections.idx"
+        rss_before = _rss_kib()
+        index = StatuteIndex.open(path)
+        queries = iter(_STATUTE_QUERIES * args.iterations)
+        samples = time_calls(lambda: index.search(next(queries)), args.iterations)
+        rss_after = _rss_kib()
+        size = path.stat().st_size
+
+    print(
+        f"index: {size / 1024:.0f} KiB on disk, {index.section_count} sections,"
+        f" {index.term_count} terms"
+    )
+    report("build (image build step)", build)
+    report("search, memory-mapped", samples)
+    print(
+        f"resident memory added by opening and querying: {rss_after - rss_before} KiB"
+        " (file pages are shared between workers)"
+    )
+    vertex_ms = args.vertex_latency * 1000
+    print(
+        f"vs. a {vertex_ms:.0f}ms Vertex AI Search round trip:"
+        f" {vertex_ms / statistics.fmean(samples):,.0f}x faster per lookup"
+    )
+
+
+def bench_citation_fallback(args: argparse.Namespace) -> None:
+    """Vertex AI Search calls the citation fallback removes on the eval dataset.
+
+    The dataset records reference answers, not the agent's tool calls, so each
+    ORS section an example's facts and reference answer cite is counted as two
+    ``retrieve_city_state_laws`` queries: one asking for the section alone
+    ("ORS 90.394") and one pairing it with the example's question, as the tool
+    schema asks the model to write topical searches. Only a query that is
+    citations and nothing else skips the search; a resolvable citation in a
+    topical query has its text prepended to the search results instead.
+    Examples with a city are always searched.
+    """
+    from pathlib import Path
+
+    from tenantfirstaid.citations import (
+        cites_only,
+        parse_citations,
+        resolve_query_citations,
+    )
+    from tenantfirstaid.statute_index import get_statute_index
+
+    get_statute_index()  # load outside the timed lookups
+    removed = enriched = total = 0
+    local_seconds = 0.0
+    with Path(args.dataset).open(encoding="utf-8") as f:
+        examples = [json.loads(line) for line in f if line.strip()]
+    for example in examples:
+        outputs = example["outputs"]
+        cited_text = " ".join(
+            [
+                *outputs.get("facts", []),
+                *(
+                    m["content"]
+                    for m in outputs.get("reference_conversation", [])
+                    if m.get("type") == "ai"
+                ),
+            ]
+        )
+        sections = list(dict.fromkeys(c.section for c in parse_citations(cited_text)))
+        queries = [
+            q
+            for s in sections
+            for q in (f"ORS {s}", f"{example['inputs']['query']} ORS {s}")
+        ]
+        start = time.perf_counter()
+        resolved = [q for q in queries if resolve_query_citations(q) is not None]
+        local_seconds += time.perf_counter() - start
+        skipped = [
+            q for q in resolved if not example["inputs"].get("city") and cites_only(q)
+        ]
+        removed += len(skipped)
+        enriched += len(resolved) - len(skipped)
+        total += len(queries)
+        print(
+            f"scenario {example['metadata'].get('scenario_id', '?'):>3}:"
+            f" {len(skipped)}/{len(queries)} retrievals answered locally,"
+            f" {len(resolved) - len(skipped)} with statute text added"
+            f" ({', '.join(sections) or 'no citations'})"
+        )
+    print(
+        f"{len(examples)} examples: {removed} of {total} Vertex AI Search calls removed"
+        f" ({removed / total if total else 0:.0%}); {enriched} searched with the"
+        f" cited text prepended; local lookups took {local_seconds * 1000:.2f}ms"
+        " in total"
+    )
+
+
+def bench_first_token(args: argparse.Namespace) -> None:
+    """Time to the first visible answer text: per completed message vs. per token."""
+    from tenantfirstaid import graph
+    from tenantfirstaid.langchain_chat_manager import LangChainChatManager
+    from tenantfirstaid.location import UsaState
+
+    answer = " ".join(["word"] * args.tokens)
+
+    def first_and_last(stream_tokens: bool) -> tuple[float, float]:
+        graph._llm = StreamingFakeChatModel(  # ty: ignore[invalid-assignment]
+            messages=iter(lambda: AIMessage(content=answer), None),
+            token_delay=args.token_delay,
+        )
+        graph._agent_graph = None
+        graph.get_agent_graph()
+        start = time.perf_counter()
+        first = None
+        for block in LangChainChatManager(
+            stream_tokens=stream_tokens
+        ).generate_streaming_response(
+            [{"role": "human", "content": "Can my landlord raise my rent?"}],
+            None,
+            UsaState.OREGON,
+            None,
+        ):
+            if first is None and block["type"] == "text":
+                first = time.perf_counter() - start
+        total = time.perf_counter() - start
+        return (first if first is not None else total) * 1000, total * 1000
+
+    print(f"{args.tokens}-word answer, {args.token_delay * 1000:.0f}ms between tokens")
+    for stream_tokens, label in ((False, "per message"), (True, "per token")):
+        runs = [first_and_last(stream_tokens) for _ in range(args.iterations)]
+        report(f"{label}: first visible text", [first for first, _ in runs])
+        report(f"{label}: complete answer", [total for _, total in runs])
+
+
+_PREFETCH_TURNS = [
+    (
+        "My landlord won't give back my security deposit after I moved out",
+        "landlord required to return security deposit after tenancy ends ORS 90.300",
+    ),
+    (
+        "Can my landlord raise my rent twice in one year?",
+        "landlord rent increase limit frequency once per year",
+    ),
+    (
+        "I got a 72 hour notice for not paying rent, what happens now?",
+        "72-hour notice nonpayment of rent termination ORS 90.394",
+    ),
+    (
+        "The heat has been broken for two weeks and nobody will fix it",
+        "landlord duty to repair heating habitability",
+    ),
+    (
+        "Can they keep my pet deposit?",
+        "landlord required to return security deposit deductions pet damage",
+    ),
+    (
+        "Is it legal for my landlord to come in without telling me?",
+        "landlord entry notice 24 hours tenant consent ORS 90.322",
+    ),
+]
+"""(first message, the model's first retrieval query) pairs in the style the
+retrieval tool's schema asks the model to write. Queries citing a chapter 90
+section are answered from local statute text, so their prefetch is wasted."""
+
+
+def bench_rag_prefetch(args: argparse.Namespace) -> None:
+    """First-turn latency and prefetch hit rate with speculative retrieval."""
+    from unittest.mock import patch
+
+    from tenantfirstaid import graph, langchain_tools, rag_prefetch
+    from tenantfirstaid.langchain_chat_manager import LangChainChatManager
+    from tenantfirstaid.location import UsaState
+
+    class TimedRag:
+        def __init__(self, **_kwargs: Any) -> None:
+            pass
+
+        def search(self, query: str) -> str:
+            time.sleep(args.latency)
+            return f"passages for {query}"
+
+    def turn(question: str, query: str, prefetch: bool) -> float:
+        call = {
+            "name": "retrieve_city_state_laws",
+            "args": {"query": query, "state": "or"},
+            "id": "c1",
+        }
+        graph._llm = SlowFakeChatModel(  # ty: ignore[invalid-assignment]
+            messages=iter([AIMessage("", tool_calls=[call]), AIMessage("Answer.")]),
+            delay=args.model_latency,
+        )
+        graph._agent_graph = None
+        with (
+            patch.object(langchain_tools, "RagBuilder", TimedRag),
+            patch("tenantfirstaid.langchain_chat_manager.RAG_PREFETCH", prefetch),
+        ):
+            start = time.perf_counter()
+            for _ in LangChainChatManager().generate_streaming_response(
+                [{"role": "human", "content": question}], None, UsaState.OREGON, None
+            ):
+                pass
+            return time.perf_counter() - start
+
+    print(
+        f"{len(_PREFETCH_TURNS)} first turns, {args.model_latency:.2f}s per model call,"
+        f" {args.latency:.2f}s per retrieval"
+    )
+    for prefetch, label in ((False, "without prefetch"), (True, "with prefetch")):
+        samples = [turn(q, m, prefetch) for q, m in _PREFETCH_TURNS]
+        report(f"{label}: first-turn latency", samples, unit="s")
+    stats = rag_prefetch.prefetch_stats()
+    print(
+        f"prefetch: {stats['hits']}/{stats['issued']} used"
+        f" (hit rate {stats['hit_rate']:.0%}), {stats['wasted']} wasted,"
+        f" {stats['saved_seconds']:.2f}s of retrieval taken off the critical path"
+    )
+
+
+def bench_rag_hedging(args: argparse.Namespace) -> None:
+    """Search latency percentiles with and without hedging, against a long tail."""
+    from unittest.mock import patch
+
+    from tenantfirstaid import rag_hedging
+
+    def run(percentile: float) -> tuple[list[float], dict[str, float]]:
+        rng = random.Random(0)
+        rng_lock = threading.Lock()
+
+        def search() -> str:
+            with rng_lock:
+                tail = rng.random() < args.tail_rate
+                jitter = rng.uniform(0.8, 1.2)
+            time.sleep((args.tail_latency if tail else args.latency) * jitter)
+            return "passages"
+
+        with (
+            patch.object(rag_hedging, "RAG_HEDGE_PERCENTILE", percentile),
+            patch.object(rag_hedging, "_windows", {}),
+            patch.object(rag_hedging, "_budget", rag_hedging.HedgeBudget(args.budget)),
+            patch.object(rag_hedging, "_stats", rag_hedging._HedgeStats()),
+        ):
+
+            def timed(_: int) -> float:
+                start = time.perf_counter()
+                rag_hedging.hedged_call("benchmark", search)
+                return (time.perf_counter() - start) * 1000
+
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                samples = list(pool.map(timed, range(args.searches)))
+            return samples, rag_hedging.hedge_stats()
+
+    print(
+        f"{args.searches} searches, {args.concurrency} at once: "
+        f"{args.latency * 1000:.0f}ms typical, {args.tail_rate:.0%} take "
+        f"{args.tail_latency * 1000:.0f}ms; budget {args.budget:.0%}"
+    )
+    unhedged, _ = run(0)
+    report("unhedged", unhedged)
+    hedged, stats = run(args.percentile)
+    report(f"hedged at p{args.percentile:g}", hedged)
+    print(
+        f"hedges sent: {stats['hedges']:.0f} ({stats['extra_load']:.1%} extra load),"
+        f" won: {stats['hedge_wins']:.0f}, denied by budget: {stats['over_budget']:.0f}"
+    )
+
+
+def bench_request_timing(args: argparse.Namespace) -> None:
+    """Overhead of request timing: cost per span, and per turn through the manager."""
+    from contextlib import nullcontext
+
+    from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+    from tenantfirstaid import graph
+    from tenantfirstaid.langchain_chat_manager import LangChainChatManager
+    from tenantfirstaid.location import UsaState
+    from tenantfirstaid.request_timing import TIMING_CONFIG_KEY, RequestTiming, span
+
+    def per_span_us(instrumented: bool) -> float:
+        def body(_: object) -> float:
+            start = time.perf_counter()
+            for _ in range(args.spans):
+                with span("tool", "benchmark") if instrumented else nullcontext():
+                    pass
+            return (time.perf_counter() - start) / args.spans * 1e6
+
+        config: RunnableConfig = {
+            "configurable": {TIMING_CONFIG_KEY: RequestTiming("/benchmark")}
+        }
+        return RunnableLambda(body).invoke(None, config=config)
+
+    # One local statute search between two model calls: the cheapest real turn,
+    # so the timing overhead is as large a share of it as it can be.
+    call = {
+        "name": "search_oregon_statutes",
+        "args": {"query": "security deposit"},
+        "id": "c1",
+    }
+    turns: Iterator[AIMessage] = iter([])
+    graph._llm = FakeToolChatModel(  # ty: ignore[invalid-assignment]
+        messages=iter(lambda: next(turns), None)
+    )
+
+    def turn(timing: RequestTiming | None) -> None:
+        nonlocal turns
+        turns = iter([AIMessage("", tool_calls=[call]), AIMessage("Done.")])
+        for _ in LangChainChatManager().generate_streaming_response(
+            [{"role": "human", "content": "Can they keep my deposit?"}],
+            None,
+            UsaState.OREGON,
+            None,
+            timing=timing,
+        ):
+            pass
+        if timing is not None:
+            timing.finish()
+
+    graph._agent_graph = None
+    graph.get_agent_graph()
+    bare, timed = per_span_us(False), per_span_us(True)
+    print(f"span overhead: {timed - bare:.2f}us ({bare:.2f}us for an empty block)")
+    # Alternate the two so drift on the host affects both equally.
+    without, with_timing = [], []
+    for _ in range(args.turns):
+        without += time_calls(lambda: turn(None), 1)
+        with_timing += time_calls(lambda: turn(RequestTiming("/benchmark")), 1)
+    report("turn without request timing", without)
+    report("turn with request timing", with_timing)
+
+
+class _SharedBackend:
+    """Processor-sharing stand-in for the model: ``capacity`` streams at full speed.
+
+    Each stream needs ``work`` seconds of service; with more than ``capacity``
+    streams open, every one of them slows down in proportion, as when a worker's
+    CPU, connection pool or the model quota is saturated.
+    """
+
+    def __init__(self, capacity: int, tick: float = 0.01) -> None:
+        self.capacity = capacity
+        self.tick = tick
+        self._remaining: dict[asyncio.Future[None], float] = {}
+
+    async def serve(self, work: float) -> None:
+        done = asyncio.get_running_loop().create_future()
+        self._remaining[done] = work
+        try:
+            await done
+        finally:
+            self._remaining.pop(done, None)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            if not self._remaining:
+                continue
+            progress = self.tick * min(1.0, self.capacity / len(self._remaining))
+            for done, left in list(self._remaining.items()):
+                if left <= progress:
+                    del self._remaining[done]
+                    if not done.done():
+                        done.set_result(None)
+                else:
+                    self._remaining[done] = left - progress
+
+
+def bench_admission(args: argparse.Namespace) -> None:
+    """Goodput of an overloaded worker with and without admission control."""
+    from tenantfirstaid.admission import AdmissionController
+
+    async def run(controller: AdmissionController) -> dict[str, Any]:
+        backend = _SharedBackend(args.capacity)
+        ticker = asyncio.create_task(backend.run())
+        outcomes: dict[str, list[float]] = {"ok": [], "timeout": [], "rejected": []}
+
+        async def handle() -> str:
+            slot = await controller.aacquire()
+            if slot is None:
+                return "rejected"
+            try:
+                await backend.serve(args.work)
+            finally:
+                slot.release()
+            return "ok"
+
+        async def client() -> None:
+            start = time.perf_counter()
+            try:
+                outcome = await asyncio.wait_for(handle(), args.client_timeout)
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+            outcomes[outcome].append(time.perf_counter() - start)
+
+        rng = random.Random(0)
+        clients = []
+        deadline = time.perf_counter() + args.duration
+        while time.perf_counter() < deadline:
+            clients.append(asyncio.create_task(client()))
+            await asyncio.sleep(rng.expovariate(args.rate))
+        await asyncio.gather(*clients)
+        ticker.cancel()
+        return outcomes
+
+    print(
+        f"{args.rate:g} requests/s for {args.duration:g}s; each needs {args.work:g}s "
+        f"of model time, {args.capacity} at full speed; clients give up after "
+        f"{args.client_timeout:g}s"
+    )
+    limits = [
+        ("no admission control", AdmissionController(0, 0, 0)),
+        (
+            f"admission ({args.capacity} in flight, queue {args.queue}, "
+            f"{args.queue_timeout:g}s wait)",
+            AdmissionController(args.capacity, args.queue, args.queue_timeout),
+        ),
+    ]
+    for label, controller in limits:
+        outcomes = asyncio.run(run(controller))
+        ok = outcomes["ok"]
+        print(
+            f"{label}: goodput {len(ok) / args.duration:.2f}/s, "
+            f"completed {len(ok)}, timed out {len(outcomes['timeout'])}, "
+            f"rejected with 503 {len(outcomes['rejected'])}"
+        )
+        if ok:
+            report("  completed latency", ok, unit="s")
+        if outcomes["rejected"]:
+            report("  time to 503", outcomes["rejected"], unit="s")
+
+
+def bench_chunk_stream(args: argparse.Namespace) -> None:
+    """Chunk serialization throughput, and writes per response with coalescing."""
+    from unittest.mock import patch
+
+    from tenantfirstaid import chat
+    from tenantfirstaid.app import app
+    from tenantfirstaid.request_timing import RequestTiming
+    from tenantfirstaid.schema import TextChunk
+
+    chunk = TextChunk(content="Under ORS 90.427, a landlord must give ")
+
+    def previous_send(chunk: TextChunk, timing: RequestTiming) -> str:
+        # ChatView's serialization before the precompiled encoder.
+        chat.logger.debug(f"Sending content_block: {chunk}")
+        timing.mark_first_byte()
+        timing.mark_first_text()
+        line = chunk.model_dump_json() + "\n"
+        chat._chunks_sent.inc(type=chunk.type)
+        chat._bytes_sent.inc(len(line.encode()), type=chunk.type)
+        return line
+
+    timing = RequestTiming("/benchmark")
+    for label, send in [
+        ("model_dump_json + f-string log", lambda: previous_send(chunk, timing)),
+        ("precompiled encoder, lazy log", lambda: chat._send([chunk], timing)),
+    ]:
+        start = time.perf_counter()
+        for _ in range(args.chunks):
+            send()
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {args.chunks / elapsed:,.0f} chunks/s")
+
+    def answer(**kwargs: Any) -> Iterator[dict[str, str]]:
+        for i in range(args.tokens):
+            time.sleep(args.token_delay)
+            yield {"type": "text", "text": f"word{i} "}
+
+    print(
+        f"\n{args.tokens} text tokens {args.token_delay * 1000:g}ms apart; a write is "
+        "one send() under gunicorn"
+    )
+    query = {"messages": [], "city": None, "state": "or"}
+    with patch("tenantfirstaid.chat.LangChainChatManager") as manager:
+        manager.return_value.generate_streaming_response.side_effect = answer
+        for window_ms in args.windows:
+            chat._COALESCE_WINDOW = window_ms / 1000
+            with app.test_client() as client:
+                start = time.perf_counter()
+                resp = client.post("/api/query", json=query, buffered=False)
+                writes = [w for w in resp.iter_encoded() if w]
+                elapsed = time.perf_counter() - start
+            lines = sum(w.count(b"\n") for w in writes)
+            print(
+                f"coalesce window {window_ms:g}ms: {len(writes)} writes for "
+                f"{lines} chunks, response took {elapsed * 1000:.0f}ms"
+            )
+
+
+def bench_stream_compression(args: argparse.Namespace) -> None:
+    """Bytes on the wire and CPU per stream with gzip, over the eval transcripts."""
+    import gzip
+    from pathlib import Path
+
+    from tenantfirstaid.chat import _to_ndjson
+    from tenantfirstaid.compression import StreamCompressor
+    from tenantfirstaid.schema import EndOfStreamChunk, TextChunk
+
+    dataset = Path(__file__).parent.parent / "evaluate" / args.dataset
+    answers = [
+        [
+            message["content"]
+            for message in json.loads(line)["outputs"]["reference_conversation"]
+            if message["type"] == "ai"
+        ]
+        for line in dataset.read_text().splitlines()
+        if line.strip()
+    ]
+
+    def writes(messages: list[str], per_token: bool) -> list[bytes]:
+        # One write per completed message, or per word as with STREAM_TOKENS.
+        texts = [
+            piece
+            for message in messages
+            for piece in (re.findall(r"\S+\s*", message) if per_token else [message])
+        ]
+        return [_to_ndjson(TextChunk(content=t)) for t in texts] + [
+            _to_ndjson(EndOfStreamChunk())
+        ]
+
+    print(f"{len(answers)} recorded conversations from {dataset.name}")
+    for per_token in (False, True):
+        streams = [writes(messages, per_token) for messages in answers]
+        raw = sum(len(w) for stream in streams for w in stream)
+        whole = sum(len(gzip.compress(b"".join(stream))) for stream in streams)
+        print(
+            f"\n{'per token' if per_token else 'per message'}: "
+            f"{sum(len(s) for s in streams)} writes, {raw:,} bytes uncompressed, "
+            f"{whole:,} gzipped whole (no flushes, the lower bound)"
+        )
+        for level in args.levels:
+            wire = 0
+            start = time.process_time()
+            for _ in range(args.repeat):
+                wire = 0
+                for stream in streams:
+                    compressor = StreamCompressor(level)
+                    wire += sum(len(compressor.write(w)) for w in stream)
+                    wire += len(compressor.close())
+            cpu = (time.process_time() - start) / (args.repeat * len(streams))
+            print(
+                f"  level {level}, flushed per write: {wire:,} bytes "
+                f"({wire / raw:.0%} of uncompressed), {cpu * 1e6:.0f}us CPU per stream"
+            )
+
+
+_IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+\d+ \| *(\S+)$")
+"""A ``-X importtime`` line: self time in microseconds and the module name."""
+
+_TIMED_IMPORT = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+"""Program that imports a module and prints how long the import took."""
+
+
+def bench_import_time(args: argparse.Namespace) -> None:
+    """Cold import time of the app in fresh interpreters, and where it goes.
+
+    Each run imports ``--module`` in a new interpreter with ``-X importtime``.
+    The run with the median time is broken down by top-level package, counting
+    each module's own (self) time. Exits with status 1 if the median exceeds
+    ``--budget-ms`` or a ``--forbid`` package was imported, so it can gate CI.
+    """
+    import subprocess
+    import sys
+    from collections import Counter
+    from pathlib import Path
+
+    runs = []
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c"]
+            + [_TIMED_IMPORT.format(module=args.module)],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent.parent,
+        )
+        by_package: Counter[str] = Counter()
+        for line in result.stderr.splitlines():
+            match = _IMPORT_TIME_LINE.match(line)
+            if match is not None:
+                by_package[match[2].split(".")[0]] += int(match[1])
+        runs.append((float(result.stdout.split()[-1]) * 1000, by_package))
+
+    samples = [elapsed for elapsed, _ in runs]
+    report(f"import {args.module}", samples)
+    median, profile = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+    print(f"\nSelf time by top-level package, median run ({median:.0f}ms):")
+    for package, us in profile.most_common(args.top):
+        ms = us / 1000
+        print(f"  {package:<32} {ms:8.1f}ms  {ms / median:6.1%}")
+
+    failures = [
+        f"{package} is imported at startup"
+        for package in args.forbid
+        if any(package in profile for _, profile in runs)
+    ]
+    if args.budget_ms and statistics.median(samples) > args.budget_ms:
+        failures.append(
+            f"median import time {statistics.median(samples):.0f}ms "
+            f"exceeds the {args.budget_ms:.0f}ms budget"
+        )
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        raise SystemExit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run local performance benchmarks against in-process fakes",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    graph_setup = subparsers.add_parser(
+        "graph-setup", help="Per-request agent setup cost before/after graph sharing"
+    )
+    graph_setup.add_argument("--iterations", type=int, default=50)
+    graph_setup.set_defaults(func=bench_graph_setup)
+
+    stream_capacity = subparsers.add_parser(
+        "stream-capacity",
+        help="Concurrent streams per worker: sync thread pool vs. asyncio path",
+    )
+    stream_capacity.add_argument("--streams", type=int, default=100)
+    stream_capacity.add_argument(
+        "--latency", type=float, default=1.0, help="Seconds per fake model call"
+    )
+    stream_capacity.add_argument(
+        "--threads", type=int, default=4, help="Threads in the sync worker"
+    )
+    stream_capacity.set_defaults(func=bench_stream_capacity)
+
+    conversation_payload = subparsers.add_parser(
+        "conversation-payload",
+        help="Request body size and parse time per turn, with and without threads",
+    )
+    conversation_payload.add_argument(
+        "--turns", type=int, nargs="+", default=[1, 5, 10, 20, 40]
+    )
+    conversation_payload.add_argument("--iterations", type=int, default=200)
+    conversation_payload.set_defaults(func=bench_conversation_payload)
+
+    history_compaction = subparsers.add_parser(
+        "history-compaction",
+        help="Prompt tokens per call as a conversation grows, with compaction",
+    )
+    history_compaction.add_argument("--budget", type=int, default=32000)
+    history_compaction.add_argument("--turns", type=int, default=30)
+    history_compaction.add_argument(
+        "--report-turns", type=int, nargs="+", default=[1, 5, 10, 20, 30]
+    )
+    history_compaction.set_defaults(func=bench_history_compaction)
+
+    tool_fanout = subparsers.add_parser(
+        "tool-fanout",
+        help="Wall time of one turn with several tool calls, by concurrency cap",
+    )
+    tool_fanout.add_argument("--calls", type=int, default=4)
+    tool_fanout.add_argument(
+        "--latency", type=float, default=0.3, help="Seconds per fake retrieval"
+    )
+    tool_fanout.add_argument("--caps", type=int, nargs="+", default=[1, 2, 4])
+    tool_fanout.add_argument("--iterations", type=int, default=5)
+    tool_fanout.set_defaults(func=bench_tool_fanout)
+
+    rag_setup = subparsers.add_parser(
+        "rag-setup",
+        help="Per-call retrieval setup cost before/after retriever pooling",
+    )
+    rag_setup.add_argument("--iterations", type=int, default=50)
+    rag_setup.set_defaults(func=bench_rag_setup)
+
+    statute_index = subparsers.add_parser(
+        "statute-index",
+        help="Local statute index query latency and memory vs. a Vertex round trip",
+    )
+    statute_index.add_argument("--iterations", type=int, default=1000)
+    statute_index.add_argument(
+        "--vertex-latency",
+        type=float,
+        default=0.4,
+        help="Seconds per Vertex AI Search retrieval to compare against",
+    )
+    statute_index.set_defaults(func=bench_statute_index)
+
+    citation_fallback = subparsers.add_parser(
+        "citation-fallback",
+        help="Vertex calls answered from local statute text on the eval dataset",
+    )
+    citation_fallback.add_argument(
+        "--dataset",
+        default="evaluate/dataset-tenant-legal-qa-examples.jsonl",
+        help="LangSmith example JSONL",
+    )
+    citation_fallback.set_defaults(func=bench_citation_fallback)
+
+    first_token = subparsers.add_parser(
+        "first-token",
+        help="Time to first visible answer text with and without token streaming",
+    )
+    first_token.add_argument(
+        "--tokens", type=int, default=100, help="Words in the fake answer"
+    )
+    first_token.add_argument(
+        "--token-delay", type=float, default=0.02, help="Seconds between tokens"
+    )
+    first_token.add_argument("--iterations", type=int, default=3)
+    first_token.set_defaults(func=bench_first_token)
+
+    prefetch = subparsers.add_parser(
+        "rag-prefetch",
+        help="First-turn latency and hit rate of speculative retrieval",
+    )
+    prefetch.add_argument(
+        "--model-latency", type=float, default=1.5, help="Seconds per fake model call"
+    )
+    prefetch.add_argument(
+        "--latency", type=float, default=0.4, help="Seconds per fake retrieval"
+    )
+    prefetch.set_defaults(func=bench_rag_prefetch)
+
+    hedging = subparsers.add_parser(
+        "rag-hedging",
+        help="Search latency percentiles with and without hedging",
+    )
+    hedging.add_argument("--searches", type=int, default=2000)
+    hedging.add_argument("--concurrency", type=int, default=16)
+    hedging.add_argument(
+        "--latency", type=float, default=0.1, help="Typical seconds per search"
+    )
+    hedging.add_argument(
+        "--tail-latency", type=float, default=1.5, help="Seconds per slow search"
+    )
+    hedging.add_argument(
+        "--tail-rate", type=float, default=0.03, help="Fraction of slow searches"
+    )
+    hedging.add_argument("--percentile", type=float, default=95)
+    hedging.add_argument(
+        "--budget", type=float, default=0.05, help="Hedges per search allowed"
+    )
+    hedging.set_defaults(func=bench_rag_hedging)
+
+    request_timing = subparsers.add_parser(
+        "request-timing",
+        help="Overhead of per-request latency spans, per span and per turn",
+    )
+    request_timing.add_argument("--spans", type=int, default=100_000)
+    request_timing.add_argument("--turns", type=int, default=200)
+    request_timing.set_defaults(func=bench_request_timing)
+
+    admission = subparsers.add_parser(
+        "admission",
+        help="Goodput under overload with and without admission control",
+    )
+    admission.add_argument("--rate", type=float, default=8, help="Requests/s")
+    admission.add_argument("--duration", type=float, default=15)
+    admission.add_argument(
+        "--work", type=float, default=1.0, help="Model seconds per request"
+    )
+    admission.add_argument(
+        "--capacity", type=int, default=4, help="Streams served at full speed"
+    )
+    admission.add_argument("--client-timeout", type=float, default=5.0)
+    admission.add_argument("--queue", type=int, default=8)
+    admission.add_argument("--queue-timeout", type=float, default=2.0)
+    admission.set_defaults(func=bench_admission)
+
+    chunk_stream = subparsers.add_parser(
+        "chunk-stream",
+        help="Chunks serialized per second, and writes per response when coalescing",
+    )
+    chunk_stream.add_argument("--chunks", type=int, default=100_000)
+    chunk_stream.add_argument("--tokens", type=int, default=300)
+    chunk_stream.add_argument(
+        "--token-delay", type=float, default=0.002, help="Seconds between tokens"
+    )
+    chunk_stream.add_argument(
+        "--windows", type=float, nargs="+", default=[0, 5, 20], help="Windows in ms"
+    )
+    chunk_stream.set_defaults(func=bench_chunk_stream)
+
+    stream_compression = subparsers.add_parser(
+        "stream-compression",
+        help="Bytes on the wire and CPU per stream with sync-flushed gzip",
+    )
+    stream_compression.add_argument(
+        "--dataset",
+        default="dataset-tenant-legal-qa-examples.jsonl",
+        help="Transcript file under evaluate/",
+    )
+    stream_compression.add_argument("--levels", type=int, nargs="+", default=[1, 6, 9])
+    stream_compression.add_argument("--repeat", type=int, default=50)
+    stream_compression.set_defaults(func=bench_stream_compression)
+
+    credential_refresh = subparsers.add_parser(
+        "credential-refresh",
+        help="Auth time per request with per-client vs. shared credentials",
+    )
+    credential_refresh.add_argument("--iterations", type=int, default=20)
+    credential_refresh.add_argument(
+        "--latency", type=float, default=0.15, help="Seconds per token exchange"
+    )
+    credential_refresh.set_defaults(func=bench_credential_refresh)
+
+    import_time = subparsers.add_parser(
+        "import-time",
+        help="Cold import time of the app per package, checked against a budget",
+    )
+    import_time.add_argument("--module", default="tenantfirstaid.app")
+    import_time.add_argument("--runs", type=int, default=5)
+    import_time.add_argument(
+        "--top", type=int, default=15, help="Packages listed in the breakdown"
+    )
+    import_time.add_argument(
+        "--budget-ms",
+        type=float,
+        # About 2.4s on a one-core dev VM, with headroom for slower CI runners.
+        default=4000,
+        help="Fail if the median import takes longer (0: no budget)",
+    )
+    import_time.add_argument(
+        "--forbid",
+        nargs="*",
+        default=["xhtml2pdf", "reportlab"],
+        help="Packages that must not be imported at startup",
+    )
+    import_time.set_defaults(func=bench_import_time)
+
+    args = parser.parse_args()
+
+    if args.command is None:
+        parser.print_help()
+        raise SystemExit(1)
+
+    for name, value in _PLACEHOLDER_ENV.items():
+        os.environ.setdefault(name, value)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Compile ``tenantfirstaid/sections.json`` into the memory-mapped statute index.
+
+The image build runs this so workers map a ready index at startup; without it
+each worker builds the index in memory on first use. Rerun after editing
+``sections.json`` (a stale index is detected and ignored). Run via
+`mise run build-statute-index`.
+"""
+
+import argparse
+from pathlib import Path
+
+from tenantfirstaid.statute_index import (
+    DEFAULT_INDEX_PATH,
+    SECTIONS_PATH,
+    StatuteIndex,
+    write_statute_index,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=DEFAULT_INDEX_PATH,
+        help="Index file to write (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--source",
+        type=Path,
+        default=SECTIONS_PATH,
+        help="Section texts as JSON (default: %(default)s).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    path = write_statute_index(args.output, args.source)
+    index = StatuteIndex.open(path)
+    print(
+        f"Wrote {path} ({path.stat().st_size:,} bytes): "
+        f"{index.section_count} sections, {index.term_count} terms."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Clear the shared first-turn answer cache after a corpus reindex.
+
+Only meaningful with ``ANSWER_CACHE=sqlite``: the node's cache file is shared by
+every worker, so clearing it here takes effect for all of them. A ``memory``
+cache lives inside each server process and is cleared by restarting it. A new
+system prompt, model or datastore ID needs no clearing, since old entries no
+longer match. Run via `mise run clear-answer-cache`.
+"""
+
+import argparse
+
+from tenantfirstaid.answer_cache import invalidate_answer_cache
+from tenantfirstaid.constants import ANSWER_CACHE
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    parse_args()
+    if ANSWER_CACHE != "sqlite":
+        print(
+            f"ANSWER_CACHE is {ANSWER_CACHE!r}; there is no shared cache file to clear."
+        )
+        return
+    removed = invalidate_answer_cache()
+    print(f"Removed {removed} cached answer(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Clear the shared retrieval result cache after a corpus reindex.
+
+Only meaningful with ``RAG_CACHE=sqlite``: the node's cache file is shared by
+every worker, so clearing it here takes effect for all of them. A ``memory``
+cache lives inside each server process and is cleared by restarting it. Run via
+`mise run clear-rag-cache`.
+"""
+
+import argparse
+
+from tenantfirstaid.constants import RAG_CACHE
+from tenantfirstaid.rag_cache import invalidate_rag_cache
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--datastore-id",
+        default=None,
+        help="Only clear results from this datastore (default: clear everything).",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if RAG_CACHE != "sqlite":
+        print(f"RAG_CACHE is {RAG_CACHE!r}; there is no shared cache file to clear.")
+        return
+    removed = invalidate_rag_cache(args.datastore_id)
+    print(f"Removed {removed} cached retrieval result(s).")
+
+
+if __name__ == "__main__":
+    main()
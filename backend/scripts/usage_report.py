@@ -0,0 +1,180 @@
+"""Report model token cost per day and per location from the usage ledger.
+
+Reads the daily files written when ``USAGE_LEDGER_DIR`` is set (see
+``tenantfirstaid/usage_ledger.py``), prices each request's tokens and prints cost
+per day, cost per location, and the conversations whose cost is an outlier.
+Requests on a server-side thread are grouped into their conversation; stateless
+requests each count as their own.
+
+Outliers are flagged by modified z-score (0.6745 x distance from the median cost
+/ median absolute deviation), which a handful of expensive conversations cannot
+drag the way they drag a mean. Run via `mise run usage-report`.
+
+Default prices are list prices for Gemini 2.5 Pro prompts under 200k tokens, in
+USD per million tokens; pass the current ones for the deployed model. Thinking
+tokens are billed as output and are already part of ``output``.
+"""
+
+import argparse
+import statistics
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple
+
+from tenantfirstaid.constants import USAGE_LEDGER_DIR
+from tenantfirstaid.usage_ledger import UsageLedger
+
+
+class Prices(NamedTuple):
+    """USD per million tokens."""
+
+    input: float
+    cached: float
+    output: float
+
+
+COLUMNS = ("requests", "input", "cached", "output", "thinking", "cost")
+"""Totals kept per day, location and conversation."""
+
+
+def request_cost(record: Dict[str, Any], prices: Prices) -> float:
+    """Return the USD cost of one ledger record."""
+    uncached = record["input"] - record["cached"]
+    return (
+        uncached * prices.input
+        + record["cached"] * prices.cached
+        + record["output"] * prices.output
+    ) / 1_000_000
+
+
+def location(record: Dict[str, Any]) -> str:
+    """Return ``state`` or ``state/city`` for a record."""
+    return f"{record['state']}/{record['city']}" if record["city"] else record["state"]
+
+
+def _add(totals: Dict[str, float], record: Dict[str, Any], cost: float) -> None:
+    totals["requests"] += 1
+    for kind in ("input", "cached", "output", "thinking"):
+        totals[kind] += record[kind]
+    totals["cost"] += cost
+
+
+def summarize(
+    records: Iterable[Dict[str, Any]], prices: Prices
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Total the records by day, by location and by conversation.
+
+    Returns:
+        ``{"day": ..., "location": ..., "conversation": ...}``, each mapping a key
+        to its :data:`COLUMNS` totals. Conversation totals also keep the ``day``
+        and ``location`` of the conversation's first request.
+    """
+    groups: Dict[str, Dict[str, Dict[str, Any]]] = {
+        "day": defaultdict(lambda: dict.fromkeys(COLUMNS, 0)),
+        "location": defaultdict(lambda: dict.fromkeys(COLUMNS, 0)),
+        "conversation": {},
+    }
+    for n, record in enumerate(records):
+        cost = request_cost(record, prices)
+        day = record["ts"][:10]
+        _add(groups["day"][day], record, cost)
+        _add(groups["location"][location(record)], record, cost)
+        key = record["thread"] or f"request-{n}@{record['ts']}"
+        conversation = groups["conversation"].setdefault(
+            key, {**dict.fromkeys(COLUMNS, 0), "day": day, "location": location(record)}
+        )
+        _add(conversation, record, cost)
+    return groups
+
+
+def find_outliers(
+    conversations: Dict[str, Dict[str, Any]], threshold: float = 3.5
+) -> List[str]:
+    """Return the conversations whose cost is an upper outlier, costliest first.
+
+    Args:
+        conversations: Conversation totals from :func:`summarize`.
+        threshold: Modified z-score above which a cost is an outlier.
+    """
+    costs = [c["cost"] for c in conversations.values()]
+    if len(costs) < 3:
+        return []
+    median = statistics.median(costs)
+    mad = statistics.median(abs(cost - median) for cost in costs)
+    if mad == 0:
+        # Most conversations cost the same; flag those over twice that.
+        flagged = [k for k, c in conversations.items() if c["cost"] > 2 * median]
+    else:
+        flagged = [
+            k
+            for k, c in conversations.items()
+            if 0.6745 * (c["cost"] - median) / mad > threshold
+        ]
+    return sorted(flagged, key=lambda k: -conversations[k]["cost"])
+
+
+def _table(title: str, rows: Dict[str, Dict[str, float]]) -> str:
+    header = f"{title:<24}" + "".join(f"{c:>12}" for c in COLUMNS)
+    lines = [header, "-" * len(header)]
+    for key in sorted(rows):
+        row = rows[key]
+        cells = "".join(f"{int(row[c]):>12,}" for c in COLUMNS[:-1])
+        lines.append(f"{key:<24}{cells}{row['cost']:>12.4f}")
+    return "\n".join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--ledger-dir",
+        type=Path,
+        default=Path(USAGE_LEDGER_DIR) if USAGE_LEDGER_DIR else None,
+        help="Ledger directory (default: USAGE_LEDGER_DIR).",
+    )
+    parser.add_argument(
+        "--days", type=int, default=30, help="Days reported, ending today (UTC)."
+    )
+    parser.add_argument("--input-price", type=float, default=1.25)
+    parser.add_argument("--cached-price", type=float, default=0.31)
+    parser.add_argument("--output-price", type=float, default=10.0)
+    parser.add_argument(
+        "--outlier-threshold",
+        type=float,
+        default=3.5,
+        help="Modified z-score above which a conversation is flagged.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.ledger_dir is None:
+        print("USAGE_LEDGER_DIR is not set and no --ledger-dir was given.")
+        return
+    since = datetime.now(timezone.utc).date() - timedelta(days=args.days - 1)
+    prices = Prices(args.input_price, args.cached_price, args.output_price)
+    records = UsageLedger(args.ledger_dir).records(since=since)
+    groups = summarize(records, prices)
+    if not groups["day"]:
+        print(f"No usage recorded in {args.ledger_dir} since {since}.")
+        return
+
+    print(_table("Day (UTC)", groups["day"]))
+    print()
+    print(_table("Location", groups["location"]))
+    conversations = groups["conversation"]
+    outliers = find_outliers(conversations, args.outlier_threshold)
+    print(f"\n{len(outliers)} outlier conversation(s) of {len(conversations)}:")
+    for key in outliers:
+        c = conversations[key]
+        print(
+            f"  {key}  {c['day']}  {c['location']}  {int(c['requests'])} request(s)"
+            f"  {int(c['thinking']):,} thinking tokens  ${c['cost']:.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -26,7 +26,7 @@ from google.cloud import discoveryengine_v1beta as discoveryengine
 from tenantfirstaid.constants import SINGLETON, DatastoreKey
 from tenantfirstaid.google_auth import (
     discoveryengine_client_options,
-    load_gcp_credentials,
+    get_gcp_credentials,
 )
 from tenantfirstaid.langchain_tools import filter_builder, repair_mojibake
 from tenantfirstaid.location import OregonCity, UsaState
@@ -150,7 +150,7 @@ def search(
     datastore_override: str | None = None,
 ) -> SearchResults:
     """Run a search against the Vertex AI Search datastore and return results."""
-    credentials = load_gcp_credentials(SINGLETON.GOOGLE_APPLICATION_CREDENTIALS)
+    credentials = get_gcp_credentials()
 
     location = SINGLETON.GOOGLE_CLOUD_LOCATION
     client = discoveryengine.SearchServiceClient(
@@ -0,0 +1,212 @@
+"""Admission control for ``/api/query``.
+
+A chat stream holds a worker thread (or, under ASGI, a coroutine and a model
+connection) for many seconds. Without a limit, a burst of requests all start at
+once, every stream slows down, and requests time out in the client after the
+model has already been paid for. Each worker process instead serves at most
+``QUERY_MAX_IN_FLIGHT`` streams at once. Up to ``QUERY_QUEUE_SIZE`` more wait
+first-come, first-served for a slot, each for at most
+``QUERY_QUEUE_TIMEOUT_SECONDS``. Anything beyond that is turned away at once
+with a 503 and ``Retry-After``, so the streams already admitted finish at full
+speed. ``QUERY_MAX_IN_FLIGHT=0`` admits every request.
+
+The chat views take a :class:`Slot` with :meth:`AdmissionController.acquire` (or
+:meth:`~AdmissionController.aacquire` under ASGI) before starting a stream and
+release it when the stream ends. Decisions, queue waits and the queue length are
+exported through :mod:`~tenantfirstaid.metrics`.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+from .constants import (
+    QUERY_MAX_IN_FLIGHT,
+    QUERY_QUEUE_SIZE,
+    QUERY_QUEUE_TIMEOUT_SECONDS,
+)
+from .metrics import counter, gauge, histogram
+
+_decisions = counter(
+    "query_admission",
+    "Admission decisions for /api/query: admitted, queued (admitted after "
+    "waiting), rejected_queue_full or rejected_timeout.",
+    ("result",),
+)
+_queue_length = gauge("query_queue_length", "Requests waiting for a stream slot.")
+_queue_wait = histogram(
+    "query_queue_wait_seconds",
+    "Time requests waited for a stream slot, admitted or not.",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0),
+)
+
+
+class Slot:
+    """Permission to serve one stream; release it exactly once when done."""
+
+    def __init__(self, controller: "AdmissionController") -> None:
+        self._controller = controller
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        """Give the slot to the next waiting request; later calls do nothing."""
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._controller._release()
+
+
+class _Waiter:
+    """A queued request, woken when a released slot is handed to it."""
+
+    def __init__(self, wake: Callable[[], None]) -> None:
+        self.granted = False
+        self.wake = wake
+
+
+class AdmissionController:
+    """Thread-safe in-flight limit with a bounded, deadline-limited FIFO queue.
+
+    One controller may be shared by threads (the Flask view) and an event loop
+    (the ASGI view): a released slot is handed straight to the oldest waiter,
+    whichever kind it is.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = QUERY_MAX_IN_FLIGHT,
+        max_queue: int = QUERY_QUEUE_SIZE,
+        queue_timeout: float = QUERY_QUEUE_TIMEOUT_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize an idle controller.
+
+        Args:
+            max_in_flight: Most slots held at once; ``0`` admits every request.
+            max_queue: Most requests waiting for a slot.
+            queue_timeout: Seconds a request waits before it is rejected.
+            clock: Monotonic time source for the queue-wait metric.
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._clock = clock
+        self._in_flight = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Slots currently held."""
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        """Requests currently waiting for a slot."""
+        return len(self._waiters)
+
+    def _try_acquire(self, wake: Callable[[], None]) -> "Slot | _Waiter | None":
+        """Take a free slot, join the queue, or return None if the queue is full."""
+        with self._lock:
+            unlimited = self.max_in_flight <= 0
+            if unlimited or (
+                self._in_flight < self.max_in_flight and not self._waiters
+            ):
+                self._in_flight += 1
+                _decisions.inc(result="admitted")
+                return Slot(self)
+            if len(self._waiters) >= self.max_queue:
+                _decisions.inc(result="rejected_queue_full")
+                return None
+            waiter = _Waiter(wake)
+            self._waiters.append(waiter)
+            _queue_length.inc()
+            return waiter
+
+    def _settle(self, waiter: _Waiter, started: float) -> Optional[Slot]:
+        """Finish waiting: return the slot handed over, or leave the queue."""
+        _queue_wait.observe(self._clock() - started)
+        with self._lock:
+            if waiter.granted:
+                _decisions.inc(result="queued")
+                return Slot(self)
+            self._waiters.remove(waiter)
+            _queue_length.inc(-1)
+        _decisions.inc(result="rejected_timeout")
+        return None
+
+    def _release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                # Hand the slot over directly, so a newcomer cannot take it
+                # ahead of the queue.
+                waiter = self._waiters.popleft()
+                _queue_length.inc(-1)
+                waiter.granted = True
+                waiter.wake()
+            else:
+                self._in_flight -= 1
+
+    def acquire(self) -> Optional[Slot]:
+        """Take a slot, blocking up to ``queue_timeout`` if none is free.
+
+        Returns:
+            The slot, or None if the request should be rejected.
+        """
+        event = threading.Event()
+        started = self._clock()
+        outcome = self._try_acquire(event.set)
+        if not isinstance(outcome, _Waiter):
+            return outcome
+        event.wait(self.queue_timeout)
+        return self._settle(outcome, started)
+
+    async def aacquire(self) -> Optional[Slot]:
+        """Take a slot, awaiting up to ``queue_timeout`` if none is free.
+
+        Returns:
+            The slot, or None if the request should be rejected.
+        """
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(
+                lambda: granted.done() or granted.set_result(None)
+            )
+
+        started = self._clock()
+        outcome = self._try_acquire(wake)
+        if not isinstance(outcome, _Waiter):
+            return outcome
+        try:
+            await asyncio.wait_for(granted, self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # The client went away while waiting; give back a slot handed over
+            # in the meantime.
+            slot = self._settle(outcome, started)
+            if slot is not None:
+                slot.release()
+            raise
+        return self._settle(outcome, started)
+
+
+_admission: Optional[AdmissionController] = None
+"""Lazily-created process-wide controller for ``/api/query``."""
+_admission_lock = threading.Lock()
+"""Lock for thread-safe controller creation."""
+
+
+def get_admission() -> AdmissionController:
+    """Return the process-wide controller for ``/api/query``."""
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            _admission = AdmissionController()
+        return _admission
@@ -0,0 +1,475 @@
+"""Opt-in cache of first-turn answers, replayed instead of calling the model.
+
+Many tenants open with nearly the same question, and with a low temperature,
+low top-p and a fixed seed the model answers it almost the same way each time.
+When ``ANSWER_CACHE`` is enabled, the chat views look up a stateless request
+whose history is a single question, keyed by :func:`answer_cache_key` on the
+normalized question text and the user's city and state. On a hit, the recorded
+[`ResponseChunk`](`~schema.ResponseChunk`) sequence is replayed with
+:func:`replay_answer`, waiting ``ANSWER_CACHE_PACING`` of each recorded gap
+between chunks, and the model is not called. On a miss, :func:`record_answer`
+records the answer as it streams. It is stored only if the stream completed,
+the model was called and no circuit-breaker fallback answered any part of it
+(the request's timing is then marked degraded), so error messages, "service
+busy" replies and statute-fallback answers are never cached. Reasoning chunks
+are not recorded.
+
+Every key also covers :func:`answer_cache_version`: a hash of the system prompt,
+the model name and the corpus (the datastore IDs and the bundled statute
+text). Changing any of them makes every older entry unreachable. The SQLite
+store also deletes such entries when it is opened. After a reindex into the
+same datastore, call :func:`invalidate_answer_cache` (or run ``mise run
+clear-answer-cache``).
+
+Two backends are provided, both bounded by an LRU entry cap and a TTL:
+
+- :class:`InMemoryAnswerCache` — per-process.
+- :class:`SqliteAnswerCache` — a file shared by every worker on one node.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import cache
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from langchain_core.messages import AnyMessage, HumanMessage
+from pydantic import TypeAdapter
+
+from .constants import (
+    ANSWER_CACHE,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_PACING,
+    ANSWER_CACHE_SQLITE_PATH,
+    ANSWER_CACHE_TTL_SECONDS,
+    DEFAULT_INSTRUCTIONS,
+    SINGLETON,
+)
+from .location import OregonCity, UsaState
+from .metrics import counter
+from .rag_cache import normalize_query
+from .request_timing import RequestTiming
+from .schema import ReasoningChunk, ResponseChunk
+from .sqlite_store import open_shared_sqlite
+from .statute_index import SECTIONS_PATH
+
+_lookups = counter(
+    "answer_cache_lookups",
+    "First-turn answer cache lookups, by result: hit or miss.",
+    ("result",),
+)
+
+Recording = List[Tuple[float, ResponseChunk]]
+"""A recorded answer: each chunk with the seconds since the chunk before it."""
+
+_RECORDING_JSON: TypeAdapter[Recording] = TypeAdapter(Recording)
+"""Serializer for stored recordings."""
+
+
+def corpus_version() -> str:
+    """Return a hash of the corpus answers are grounded in.
+
+    Covers the configured Vertex AI Search datastore IDs (a new corpus version
+    is a new datastore) and the bundled ``sections.json`` statute text.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(sorted(SINGLETON.VERTEX_AI_DATASTORES.items())).encode())
+    digest.update(SECTIONS_PATH.read_bytes())
+    return digest.hexdigest()
+
+
+@cache
+def answer_cache_version() -> str:
+    """Return the hash of everything besides the question that shapes an answer.
+
+    Covers the system prompt, the model name and :func:`corpus_version`;
+    computed once per process.
+    """
+    payload = json.dumps(
+        {
+            "prompt": hashlib.sha256(DEFAULT_INSTRUCTIONS.encode()).hexdigest(),
+            "model": SINGLETON.MODEL_NAME,
+            "corpus": corpus_version(),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def answer_cache_key(question: str, city: Optional[OregonCity], state: UsaState) -> str:
+    """Return the cache key for a first question asked from a location.
+
+    Args:
+        question: The tenant's question; case and spacing are normalized.
+        city: The user's city, if recognized.
+        state: The user's state.
+
+    Returns:
+        Hex SHA-256 digest of the question, location and
+        :func:`answer_cache_version`.
+    """
+    payload = json.dumps(
+        [
+            normalize_query(question),
+            city.value if city is not None else None,
+            state.value,
+            answer_cache_version(),
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def first_question(messages: List[AnyMessage | Dict[str, Any]]) -> Optional[str]:
+    """Return the text of a history that is a single human question, else None."""
+    if len(messages) != 1:
+        return None
+    [message] = messages
+    if isinstance(message, HumanMessage):
+        content = message.content
+    elif isinstance(message, dict) and message.get("role") in ("human", "user"):
+        content = message.get("content")
+    else:
+        return None
+    return content if isinstance(content, str) and content.strip() else None
+
+
+class AnswerCache(ABC):
+    """Base class for bounded, thread-safe caches of recorded answers.
+
+    Subclasses implement ``_get``, ``_put`` and ``_invalidate``. Every lookup
+    is counted in the ``answer_cache_lookups`` metric.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            max_entries: Entries kept before the least recently used is evicted.
+            ttl_seconds: Seconds after which an entry expires.
+            clock: Wall clock, injectable for tests.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Recording]:
+        """Return the recorded answer for ``key``, or None if absent or expired."""
+        with self._lock:
+            value = self._get(key, self._clock())
+        _lookups.inc(result="miss" if value is None else "hit")
+        return None if value is None else _RECORDING_JSON.validate_json(value)
+
+    def put(self, key: str, recording: Recording) -> None:
+        """Store an answer under ``key``, evicting the oldest entries if full."""
+        value = _RECORDING_JSON.dump_json(recording).decode()
+        with self._lock:
+            self._put(key, value, self._clock())
+
+    def invalidate(self) -> int:
+        """Drop every cached answer.
+
+        Returns:
+            Number of entries removed.
+        """
+        with self._lock:
+            return self._invalidate()
+
+    @abstractmethod
+    def _get(self, key: str, now: float) -> Optional[str]:
+        """Return the live value for ``key``, marking it recently used."""
+
+    @abstractmethod
+    def _put(self, key: str, value: str, now: float) -> None:
+        """Store ``value``, then evict expired and least recently used entries."""
+
+    @abstractmethod
+    def _invalidate(self) -> int:
+        """Drop every entry; return the count."""
+
+
+class InMemoryAnswerCache(AnswerCache):
+    """Per-process answer cache bounded by an LRU entry cap and a TTL."""
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            max_entries: Entries kept before the least recently used is evicted.
+            ttl_seconds: Seconds after which an entry expires.
+            clock: Wall clock, injectable for tests.
+        """
+        super().__init__(max_entries=max_entries, ttl_seconds=ttl_seconds, clock=clock)
+        # key -> (value, expires_at), least recently used first
+        self._entries: OrderedDict[str, Tuple[str, float]] = OrderedDict()
+
+    def _get(self, key: str, now: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _put(self, key: str, value: str, now: float) -> None:
+        self._entries[key] = (value, now + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _invalidate(self) -> int:
+        removed = len(self._entries)
+        self._entries.clear()
+        return removed
+
+
+class SqliteAnswerCache(AnswerCache):
+    """SQLite-file answer cache bounded by an LRU entry cap and a TTL.
+
+    The file is opened with :func:`~tenantfirstaid.sqlite_store.open_shared_sqlite`,
+    so every worker process on a node shares its entries. Each entry records the
+    :func:`answer_cache_version` it was made under, and entries from any other
+    version are deleted when the file is opened.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS answers (
+            key TEXT PRIMARY KEY,
+            version TEXT NOT NULL,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used);
+    """
+    """Table of recorded answers with their version, expiry and recency."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        version: str,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Open (creating if needed) the SQLite file at ``path``.
+
+        Args:
+            path: Database file location.
+            version: Current :func:`answer_cache_version`.
+            max_entries: Entries kept before the least recently used is evicted.
+            ttl_seconds: Seconds after which an entry expires.
+            clock: Wall clock, injectable for tests.
+        """
+        super().__init__(max_entries=max_entries, ttl_seconds=ttl_seconds, clock=clock)
+        self.version = version
+        self._conn = open_shared_sqlite(path, self._SCHEMA)
+        self._conn.execute("DELETE FROM answers WHERE version != ?", (version,))
+
+    def _get(self, key: str, now: float) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT value FROM answers WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def _put(self, key: str, value: str, now: float) -> None:
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                (key, self.version, value, now + self.ttl_seconds, now),
+            )
+            self._conn.execute("DELETE FROM answers WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN (SELECT key FROM answers"
+                " ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def _invalidate(self) -> int:
+        return self._conn.execute("DELETE FROM answers").rowcount
+
+
+_answer_cache: Optional[AnswerCache] = None
+"""Lazily-created process-wide answer cache for ``ANSWER_CACHE``."""
+_answer_cache_lock = threading.Lock()
+"""Lock for thread-safe cache creation."""
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Return the process-wide answer cache, or None if ``ANSWER_CACHE`` is ``none``."""
+    global _answer_cache
+    if ANSWER_CACHE == "none":
+        return None
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            if ANSWER_CACHE == "sqlite":
+                _answer_cache = SqliteAnswerCache(
+                    ANSWER_CACHE_SQLITE_PATH,
+                    version=answer_cache_version(),
+                    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                )
+            else:
+                _answer_cache = InMemoryAnswerCache(
+                    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                    ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                )
+        return _answer_cache
+
+
+def invalidate_answer_cache() -> int:
+    """Drop every cached answer, e.g. after a reindex into the same datastore.
+
+    With the ``sqlite`` backend this clears the entries of every worker on the
+    node; with ``memory`` it clears only the calling process.
+
+    Returns:
+        Number of entries removed (0 if the cache is disabled).
+    """
+    answer_cache = get_answer_cache()
+    return 0 if answer_cache is None else answer_cache.invalidate()
+
+
+def answer_key(
+    messages: List[AnyMessage | Dict[str, Any]],
+    city: Optional[OregonCity],
+    state: UsaState,
+    thread_id: Optional[str],
+) -> Optional[str]:
+    """Return the cache key for a request, or None if it cannot use the cache.
+
+    Only stateless requests whose history is a single question qualify: a
+    replayed answer would leave a server-side thread without its first turn.
+    """
+    if get_answer_cache() is None or thread_id is not None:
+        return None
+    question = first_question(messages)
+    return None if question is None else answer_cache_key(question, city, state)
+
+
+def lookup_answer(key: Optional[str]) -> Optional[Recording]:
+    """Return the recorded answer for ``key`` from :func:`answer_key`, if cached."""
+    answer_cache = get_answer_cache()
+    if key is None or answer_cache is None:
+        return None
+    return answer_cache.get(key)
+
+
+def _store(key: str, recording: Recording, timing: RequestTiming) -> None:
+    """Cache a completed answer if the model produced it without any fallback."""
+    answer_cache = get_answer_cache()
+    if (
+        answer_cache is not None
+        and not timing.degraded
+        and timing.summary()["spans"].get("model")
+    ):
+        answer_cache.put(key, recording)
+
+
+def record_answer(
+    chunks: Iterator[ResponseChunk],
+    key: str,
+    timing: RequestTiming,
+    clock: Callable[[], float] = time.monotonic,
+) -> Generator[ResponseChunk, None, None]:
+    """Pass an answer's chunks through, caching them once the answer completes.
+
+    Args:
+        chunks: The answer's chunks, without the closing ``EndOfStreamChunk``.
+        key: Key from :func:`answer_key`.
+        timing: The request's timing, which shows whether the model was called.
+        clock: Monotonic time source, injectable for tests.
+
+    Yields:
+        The chunks of ``chunks``, unchanged.
+    """
+    recording: Recording = []
+    last = clock()
+    for chunk in chunks:
+        now = clock()
+        if not isinstance(chunk, ReasoningChunk):
+            recording.append((now - last if recording else 0.0, chunk))
+            last = now
+        yield chunk
+    _store(key, recording, timing)
+
+
+async def arecord_answer(
+    chunks: AsyncIterator[ResponseChunk],
+    key: str,
+    timing: RequestTiming,
+    clock: Callable[[], float] = time.monotonic,
+) -> AsyncGenerator[ResponseChunk, None]:
+    """Asynchronous twin of :func:`record_answer`."""
+    recording: Recording = []
+    last = clock()
+    async for chunk in chunks:
+        now = clock()
+        if not isinstance(chunk, ReasoningChunk):
+            recording.append((now - last if recording else 0.0, chunk))
+            last = now
+        yield chunk
+    # The cache may be SQLite, so store the answer off the event loop.
+    await asyncio.to_thread(_store, key, recording, timing)
+
+
+def replay_answer(
+    recording: Recording,
+    pacing: float = ANSWER_CACHE_PACING,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Generator[ResponseChunk, None, None]:
+    """Replay a recorded answer, waiting ``pacing`` of each recorded gap.
+
+    Yields:
+        The recorded chunks, in order.
+    """
+    for gap, chunk in recording:
+        if gap * pacing > 0:
+            sleep(gap * pacing)
+        yield chunk
+
+
+async def areplay_answer(
+    recording: Recording, pacing: float = ANSWER_CACHE_PACING
+) -> AsyncGenerator[ResponseChunk, None]:
+    """Asynchronous twin of :func:`replay_answer`."""
+    for gap, chunk in recording:
+        if gap * pacing > 0:
+            await asyncio.sleep(gap * pacing)
+        yield chunk
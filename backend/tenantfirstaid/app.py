@@ -1,28 +1,41 @@
 """Flask application entry point: builds the app, CORS, rate limiting, mail, and routes.
 
-Registers :class:`~tenantfirstaid.chat.ChatView` at ``/api/query`` and the feedback
-route at ``/api/feedback``. Run locally with ``mise run serve``.
+Registers :class:`~tenantfirstaid.chat.ChatView` at ``/api/query``, the feedback
+route at ``/api/feedback``, the Prometheus scrape endpoint at ``/metrics`` and the
+worker readiness probe at ``/healthz/ready``. Run locally with ``mise run serve``.
 """
 
+import hmac
 import os
+from pathlib import Path
 from typing import Tuple
 
-from flask import Flask
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_mailman import Mail
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # .chat → constants loads .env via an absolute path; do not re-load here.
 from .chat import ChatView
+from .constants import METRICS_DIR, METRICS_TOKEN, TRUSTED_PROXY_COUNT
+from .conversations import THREAD_TOKEN_HEADER
 from .feedback import send_feedback
 from .logger import configure_logging
+from .metrics import counter, render, share_across_processes
+from .warmup import readiness, warm_up
 
 # Configure logging after .chat (→ constants → .env load) so ENV from .env is honored.
 configure_logging()
 
 app = Flask(__name__)
 
+if TRUSTED_PROXY_COUNT:
+    # Take the client address from X-Forwarded-For, so rate limits and token
+    # budgets are per client rather than shared through the proxy's address.
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT)  # ty: ignore[invalid-assignment]
+
 limiter = Limiter(
     get_remote_address,
     app=app,
@@ -46,7 +59,14 @@ if os.getenv("ENV", "dev") == "dev":
         ]
     )
 
-CORS(app, origins=ALLOWED_ORIGINS, supports_credentials=True)
+# Only the browser-facing API gets CORS headers; /metrics stays same-origin.
+CORS(
+    app,
+    resources={r"/api/*": {}},
+    origins=ALLOWED_ORIGINS,
+    supports_credentials=True,
+    expose_headers=[THREAD_TOKEN_HEADER],
+)
 
 app.config["MAIL_SERVER"] = os.getenv("MAIL_SERVER")
 app.config["MAIL_PORT"] = os.getenv("MAIL_PORT")
@@ -59,7 +79,52 @@ mail = Mail(app)
 """Flask-Mail extension for sending user feedback emails."""
 
 
+http_requests = counter(
+    "http_requests", "HTTP requests served, by route and status.", ("route", "status")
+)
+"""Requests served, labelled by route pattern (``unmatched`` for 404s) and status."""
+
+if METRICS_DIR:
+    share_across_processes(Path(METRICS_DIR))
+
+
+@app.after_request
+def count_request(response: Response) -> Response:
+    """Count each response in :data:`http_requests`."""
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    http_requests.inc(route=route, status=str(response.status_code))
+    return response
+
+
+def metrics_route() -> Response:
+    """Serve every metric in the Prometheus text format for GET /metrics.
+
+    Requires ``Authorization: Bearer <METRICS_TOKEN>`` when ``METRICS_TOKEN`` is set.
+
+    Returns:
+        The exposition text, or 401 if the token is missing or wrong.
+    """
+    if METRICS_TOKEN is not None:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+            return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def ready_route() -> Tuple[Response, int]:
+    """Report for GET /healthz/ready whether the worker serving it has warmed up.
+
+    Returns:
+        The :func:`~tenantfirstaid.warmup.readiness` report, with status 200 if
+        the worker is ready, otherwise 503.
+    """
+    report = readiness()
+    return jsonify(report), 200 if report["ready"] else 503
+
+
 app.add_url_rule("/api/query", view_func=ChatView.as_view("chat"), methods=["POST"])
+app.add_url_rule("/metrics", view_func=metrics_route, methods=["GET"])
+app.add_url_rule("/healthz/ready", view_func=ready_route, methods=["GET"])
 
 
 @limiter.limit("3 per minute")
@@ -83,4 +148,5 @@ app.add_url_rule(
 )
 
 if __name__ == "__main__":
+    warm_up()
     app.run(host="0.0.0.0", port=5001)
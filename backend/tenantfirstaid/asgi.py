@@ -0,0 +1,232 @@
+"""ASGI application entry point: asyncio streaming for ``/api/query``.
+
+Serves :class:`AsyncChatView` at ``POST /api/query`` natively on the event loop,
+so a request waiting on the model holds a coroutine instead of a worker thread and
+one worker can keep hundreds of streams open. Every other route (e.g.
+``/api/feedback`` and ``/metrics``) is forwarded to the existing Flask app through a
+WSGI bridge, so rate limiting, mail and CORS behave exactly as under gunicorn. Run
+locally with ``mise run serve-async``; in production, ``uvicorn
+tenantfirstaid.asgi:app --workers N``. The sync Flask app in :mod:`tenantfirstaid.app` remains available.
+Each worker runs :func:`~tenantfirstaid.warmup.warm_up` at startup, before it
+accepts a connection.
+"""
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Dict
+
+import anyio
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.endpoints import HTTPEndpoint
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from .admission import get_admission
+from .answer_cache import (
+    answer_key,
+    arecord_answer,
+    areplay_answer,
+    lookup_answer,
+)
+from .app import ALLOWED_ORIGINS, http_requests
+from .app import app as flask_app
+from .chat import (
+    _BUDGET_EXCEEDED_BODY,
+    _COALESCE_WINDOW,
+    _OVERLOADED_BODY,
+    _OVERLOADED_HEADERS,
+    _THREAD_EXPIRED_BODY,
+    _acoalesce,
+    _budget_wait,
+    _classify_block,
+    _finish,
+    _open_thread,
+    _read_query,
+    _send,
+    _streams_in_flight,
+)
+from .compression import agzip_stream, compress_stream_for, encoding_headers
+from .constants import TRUSTED_PROXY_COUNT
+from .conversations import THREAD_TOKEN_HEADER, ThreadExpiredError
+from .langchain_chat_manager import LangChainChatManager
+from .request_timing import RequestTiming
+from .schema import EndOfStreamChunk, ResponseChunk
+from .warmup import warm_up
+
+_ROUTE = "/api/query"
+"""Route label of :class:`AsyncChatView` requests in the ``http_requests`` metric."""
+
+
+def _client_address(request: Request) -> str:
+    """Return the address a request's token budget is charged to.
+
+    Reads ``X-Forwarded-For`` as the Flask app's ``ProxyFix`` does: with
+    ``TRUSTED_PROXY_COUNT`` set, the client is the entry that many hops from the
+    right, as recorded by the outermost trusted proxy. Otherwise, or if the
+    header has too few entries, it is the connecting peer.
+    """
+    if TRUSTED_PROXY_COUNT:
+        forwarded = ",".join(request.headers.getlist("x-forwarded-for")).split(",")
+        if len(forwarded) >= TRUSTED_PROXY_COUNT:
+            address = forwarded[-TRUSTED_PROXY_COUNT].strip()
+            if address:
+                return address
+    return request.client.host if request.client else "127.0.0.1"
+
+
+class AsyncChatView(HTTPEndpoint):
+    """Asyncio counterpart of :class:`~tenantfirstaid.chat.ChatView`.
+
+    Accepts the same request body and streams the same newline-delimited JSON
+    chunks, closing with an ``EndOfStreamChunk``, but drives
+    [`agenerate_streaming_response`](`~langchain_chat_manager.LangChainChatManager.agenerate_streaming_response`)
+    so the model call awaits instead of blocking a thread.
+    """
+
+    async def post(self, request: Request) -> Response:
+        """Handle client POST request.
+
+        Args:
+            request: Incoming Starlette request with a JSON body containing
+                ``messages``, ``city`` and ``state``.
+
+        Returns:
+            StreamingResponse streaming newline-delimited JSON chunks, a 410
+            JSONResponse if the client's thread token can no longer be resumed,
+            a 429 if the client has used up its token budget, or a 503 if
+            admission control turns the request away.
+
+        Raises:
+            KeyError: If required fields (messages, city, state) are missing.
+        """
+        timing = RequestTiming(request.url.path)
+        client = _client_address(request)
+        # The bucket lookup may touch SQLite, so keep it off the event loop.
+        wait = await run_in_threadpool(_budget_wait, client)
+        if wait:
+            http_requests.inc(route=_ROUTE, status="429")
+            return Response(
+                _BUDGET_EXCEEDED_BODY,
+                status_code=429,
+                media_type="text/plain",
+                headers={"Retry-After": str(wait)},
+            )
+        # Read the body before taking a slot, so a malformed request fails
+        # without holding one.
+        data: Dict[str, Any] = await request.json()
+        messages, city, state = _read_query(data)
+        slot = await get_admission().aacquire()
+        if slot is None:
+            http_requests.inc(route=_ROUTE, status="503")
+            return Response(
+                _OVERLOADED_BODY,
+                status_code=503,
+                media_type="text/plain",
+                headers=_OVERLOADED_HEADERS,
+            )
+        try:
+            # The store lookup may touch SQLite, so keep it off the event loop.
+            tid, thread_token = await run_in_threadpool(_open_thread, data)
+        except ThreadExpiredError:
+            slot.release()
+            http_requests.inc(route=_ROUTE, status="410")
+            return JSONResponse(_THREAD_EXPIRED_BODY, status_code=410)
+        except BaseException:
+            # The request fails before its stream exists to free the slot.
+            slot.release()
+            raise
+        http_requests.inc(route=_ROUTE, status="200")
+        chat_manager = LangChainChatManager()
+
+        async def model_answer() -> AsyncGenerator[ResponseChunk, None]:
+            """Classify the model's content blocks."""
+            async for content_block in chat_manager.agenerate_streaming_response(
+                messages=messages,
+                city=city,
+                state=state,
+                thread_id=tid,
+                timing=timing,
+            ):
+                chunk = _classify_block(content_block)
+                if chunk is not None:
+                    yield chunk
+
+        async def chunks() -> AsyncGenerator[ResponseChunk, None]:
+            """Replay a cached answer or stream the model's, then end the stream."""
+            key = answer_key(messages, city, state, tid)
+            # The cache lookup may touch SQLite, so keep it off the event loop.
+            recording = await run_in_threadpool(lookup_answer, key)
+            answer: AsyncIterator[ResponseChunk]
+            if recording is not None:
+                answer = areplay_answer(recording)
+            else:
+                answer = model_answer()
+                if key is not None:
+                    answer = arecord_answer(answer, key, timing)
+            async for chunk in answer:
+                yield chunk
+            yield EndOfStreamChunk()
+
+        async def generate() -> AsyncGenerator[bytes, None]:
+            """Stream the response chunks as newline-delimited JSON."""
+            _streams_in_flight.inc(route=timing.route)
+            try:
+                async for batch in _acoalesce(chunks(), _COALESCE_WINDOW):
+                    yield _send(batch, timing)
+            finally:
+                # Recording usage appends to the ledger file and debiting the
+                # budget may write SQLite, so run them off the event loop,
+                # shielded so a client that disconnects mid-stream is still
+                # accounted for.
+                with anyio.CancelScope(shield=True):
+                    await run_in_threadpool(
+                        _finish, timing, slot, client, city, state, tid
+                    )
+
+        compressed = compress_stream_for(request.headers.get("accept-encoding"))
+        headers = encoding_headers(compressed)
+        if thread_token:
+            headers[THREAD_TOKEN_HEADER] = thread_token
+        # text/plain rather than application/x-ndjson: client only reads raw bytes
+        # The stream's own cleanup never runs if the client leaves before it starts.
+        return StreamingResponse(
+            agzip_stream(generate()) if compressed else generate(),
+            media_type="text/plain",
+            headers=headers,
+            background=BackgroundTask(slot.release),
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette) -> AsyncGenerator[None, None]:
+    """Warm the worker up before it serves, off the event loop."""
+    await run_in_threadpool(warm_up)
+    yield
+
+
+app = Starlette(
+    lifespan=lifespan,
+    routes=[
+        Route(
+            _ROUTE,
+            AsyncChatView,
+            middleware=[
+                Middleware(
+                    CORSMiddleware,
+                    allow_origins=ALLOWED_ORIGINS,
+                    allow_credentials=True,
+                    allow_methods=["POST"],
+                    allow_headers=["*"],
+                    expose_headers=[THREAD_TOKEN_HEADER],
+                )
+            ],
+        ),
+        Mount("/", app=WSGIMiddleware(flask_app)),  # ty: ignore[invalid-argument-type]
+    ],
+)
+"""ASGI app: async ``/api/query``, everything else delegated to the Flask app."""
@@ -2,17 +2,57 @@
 
 Provides :class:`ChatView`, a Flask view that backs the ``POST /api/query`` endpoint.
 Processes incoming chat messages and user location, drives the LangChain agent,
-and streams the response as newline-delimited JSON chunks.
+and streams the response as newline-delimited JSON chunks. The request parsing,
+thread resolution, block classification and serialization helpers here are shared
+with the asyncio variant in :mod:`tenantfirstaid.asgi`.
 """
 
-from typing import Any, Dict, Generator, List
+import asyncio
+import contextvars
+import itertools
+import logging
+import queue
+import threading
+import time
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    cast,
+)
 
-from flask import Response, current_app, request, stream_with_context
+from flask import Response, jsonify, request, stream_with_context
 from flask.views import View
+from flask_limiter.util import get_remote_address
 from langchain_core.messages import AnyMessage, ContentBlock
+from pydantic import TypeAdapter
 
+from .admission import Slot, get_admission
+from .answer_cache import answer_key, lookup_answer, record_answer, replay_answer
+from .compression import compress_stream_for, encoding_headers, gzip_stream
+from .constants import (
+    QUERY_RETRY_AFTER_SECONDS,
+    SERVER_OVERLOADED_MESSAGE,
+    STREAM_COALESCE_MS,
+    TOKEN_BUDGET_EXCEEDED_MESSAGE,
+)
+from .conversations import (
+    THREAD_TOKEN_HEADER,
+    ThreadExpiredError,
+    open_thread,
+    threads_enabled,
+)
 from .langchain_chat_manager import LangChainChatManager
 from .location import OregonCity, UsaState
+from .metrics import counter, gauge
+from .request_timing import RequestTiming
 from .schema import (
     EndOfStreamChunk,
     LetterChunk,
@@ -20,6 +60,48 @@ from .schema import (
     ResponseChunk,
     TextChunk,
 )
+from .token_buckets import billed_tokens, get_token_buckets
+from .usage_ledger import record_usage
+
+logger = logging.getLogger(__name__)
+
+_streams_in_flight = gauge(
+    "streams_in_flight", "Response streams currently open.", ("route",)
+)
+"""Open ``/api/query`` response streams, raised and lowered by both chat views."""
+_chunks_sent = counter("response_chunks", "Response chunks sent, by type.", ("type",))
+_bytes_sent = counter(
+    "response_bytes", "Response body bytes sent, by chunk type.", ("type",)
+)
+
+
+def _classify_block(content_block: ContentBlock) -> Optional[ResponseChunk]:
+    """Convert one raw LangChain content block into a typed [`ResponseChunk`](`~schema.ResponseChunk`).
+
+    Returns:
+        The typed chunk, or None for block types the frontend does not render.
+    """
+    match content_block["type"]:
+        case "reasoning":
+            return ReasoningChunk(content=content_block["reasoning"])
+        case "text":
+            return TextChunk(content=content_block["text"])
+        case "non_standard":
+            # Tool-emitted chunks are wrapped in NonStandardContentBlock.
+            # Add a case here for each tool chunk type (e.g. letter, citation).
+            inner: Dict[str, Any] = content_block["value"]
+            match inner.get("type"):
+                case "letter":
+                    logger.debug("Routing non_standard block to letter.")
+                    return LetterChunk(content=inner["content"])
+                case _:
+                    logger.warning(
+                        f"Unhandled non_standard block type: {inner.get('type')}"
+                    )
+        case _:
+            # Unknown LLM block types are intentionally dropped.
+            logger.warning(f"Unhandled block type: {content_block['type']}")
+    return None
 
 
 def _classify_blocks(
@@ -27,30 +109,289 @@ def _classify_blocks(
 ) -> Generator[ResponseChunk, Any, None]:
     """Convert raw LangChain content blocks into typed [`ResponseChunk`](`~schema.ResponseChunk`) objects."""
     for content_block in stream:
-        match content_block["type"]:
-            case "reasoning":
-                yield ReasoningChunk(content=content_block["reasoning"])
-            case "text":
-                yield TextChunk(content=content_block["text"])
-            case "non_standard":
-                # Tool-emitted chunks are wrapped in NonStandardContentBlock.
-                # Add a case here for each tool chunk type (e.g. letter, citation).
-                inner: Dict[str, Any] = content_block["value"]
-                match inner.get("type"):
-                    case "letter":
-                        current_app.logger.debug(
-                            "Routing non_standard block to letter."
-                        )
-                        yield LetterChunk(content=inner["content"])
-                    case _:
-                        current_app.logger.warning(
-                            f"Unhandled non_standard block type: {inner.get('type')}"
-                        )
-            case _:
-                # Unknown LLM block types are intentionally dropped.
-                current_app.logger.warning(
-                    f"Unhandled block type: {content_block['type']}"
+        chunk = _classify_block(content_block)
+        if chunk is not None:
+            yield chunk
+
+
+_CHUNK_JSON: TypeAdapter[ResponseChunk] = TypeAdapter(ResponseChunk)
+"""Serializer for the [`ResponseChunk`](`~schema.ResponseChunk`) union, built once
+so each chunk is encoded straight to UTF-8 bytes."""
+
+
+def _to_ndjson(chunk: ResponseChunk) -> bytes:
+    """Serialize a chunk as one line of the newline-delimited JSON response body."""
+    return _CHUNK_JSON.dump_json(chunk) + b"\n"
+
+
+def _send(chunks: List[ResponseChunk], timing: RequestTiming) -> bytes:
+    """Serialize chunks about to be sent as one write, recording them in the request's metrics.
+
+    Marks the request's first byte and first text, and counts each chunk and its
+    bytes by chunk type.
+
+    Returns:
+        The chunks' newline-delimited JSON lines.
+    """
+    timing.mark_first_byte()
+    lines = []
+    for chunk in chunks:
+        logger.debug("Sending chunk: %s", chunk)
+        if isinstance(chunk, TextChunk):
+            timing.mark_first_text()
+        line = _to_ndjson(chunk)
+        _chunks_sent.inc(type=chunk.type)
+        _bytes_sent.inc(len(line), type=chunk.type)
+        lines.append(line)
+    return b"".join(lines)
+
+
+_COALESCE_WINDOW: float = STREAM_COALESCE_MS / 1000
+"""Seconds for which adjacent text chunks are held to share a write."""
+
+_END = object()
+"""Marks the end of a chunk stream passed between :func:`_coalesce`'s threads."""
+
+
+def _coalesce(
+    chunks: Iterator[ResponseChunk],
+    window: float,
+    clock: Callable[[], float] = time.monotonic,
+) -> Generator[List[ResponseChunk], None, None]:
+    """Group adjacent text chunks produced within ``window`` seconds into one write.
+
+    A group is written as soon as its window has passed, or at once with any
+    chunk that is not a ``TextChunk`` (a letter, reasoning or the end of the
+    stream), so order is kept and nothing waits longer than ``window``. To wait
+    for the next chunk with a deadline, ``chunks`` is read on a helper thread
+    that runs in a copy of the caller's context. Closing this generator stops
+    the helper, and closes ``chunks``, after the next chunk arrives, and waits
+    for that: the caller's cleanup then accounts for all the model work done.
+
+    Args:
+        chunks: The response chunks, in order.
+        window: Longest a text chunk is held; ``0`` writes every chunk alone,
+            without a helper thread.
+        clock: Monotonic time source, injectable for tests.
+
+    Yields:
+        Lists of chunks to send in one write.
+    """
+    if window <= 0:
+        for chunk in chunks:
+            yield [chunk]
+        return
+
+    inbox: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+    stop = threading.Event()
+
+    def pump() -> None:
+        try:
+            for chunk in chunks:
+                inbox.put(chunk)
+                if stop.is_set():
+                    break
+            inbox.put(_END)
+        except BaseException as e:
+            inbox.put(e)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    context = contextvars.copy_context()
+    pumping = threading.Thread(target=context.run, args=(pump,), daemon=True)
+    pumping.start()
+    pending: List[ResponseChunk] = []
+    deadline = 0.0
+    try:
+        while True:
+            try:
+                item = inbox.get(
+                    timeout=max(0.0, deadline - clock()) if pending else None
                 )
+            except queue.Empty:
+                item = None
+            if item is None:
+                yield pending
+                pending = []
+                continue
+            if item is _END or isinstance(item, BaseException):
+                if pending:
+                    yield pending
+                if item is _END:
+                    return
+                raise item
+            if not pending:
+                deadline = clock() + window
+            pending.append(item)
+            if not isinstance(item, TextChunk) or clock() >= deadline:
+                yield pending
+                pending = []
+    finally:
+        stop.set()
+        # A client that disconnects leaves the model running until its next
+        # chunk; wait, so the slot is held and the tokens billed until it stops.
+        pumping.join()
+
+
+async def _next_or_end(chunks: AsyncIterator[ResponseChunk]) -> Any:
+    """Return the next chunk, or :data:`_END` once ``chunks`` is exhausted."""
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return _END
+
+
+async def _acoalesce(
+    chunks: AsyncIterator[ResponseChunk],
+    window: float,
+) -> AsyncGenerator[List[ResponseChunk], None]:
+    """Asyncio twin of :func:`_coalesce`, waiting on the event loop instead of a thread.
+
+    Every read of ``chunks`` runs as a task in one shared copy of the caller's
+    context, as if ``chunks`` were iterated directly.
+    """
+    if window <= 0:
+        async for chunk in chunks:
+            yield [chunk]
+        return
+
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    pending: List[ResponseChunk] = []
+    deadline = 0.0
+    reading: Optional[asyncio.Task[Any]] = None
+    try:
+        while True:
+            if reading is None:
+                reading = loop.create_task(_next_or_end(chunks), context=context)
+            done, _ = await asyncio.wait(
+                {reading}, timeout=max(0.0, deadline - loop.time()) if pending else None
+            )
+            if not done:
+                yield pending
+                pending = []
+                continue
+            task, reading = reading, None
+            error = task.exception()
+            item = task.result() if error is None else _END
+            if item is _END:
+                if pending:
+                    yield pending
+                if error is not None:
+                    raise error
+                return
+            if not pending:
+                deadline = loop.time() + window
+            pending.append(cast(ResponseChunk, item))
+            if not isinstance(item, TextChunk) or loop.time() >= deadline:
+                yield pending
+                pending = []
+    finally:
+        if reading is not None:
+            reading.cancel()
+
+
+def _budget_wait(client: str) -> int:
+    """Return the seconds ``client`` must wait for its token budget to refill.
+
+    Returns:
+        0 if the client may be served now or ``TOKEN_BUCKETS`` is ``none``.
+    """
+    buckets = get_token_buckets()
+    return 0 if buckets is None else buckets.retry_after(client)
+
+
+def _finish(
+    timing: RequestTiming,
+    slot: Slot,
+    client: str,
+    city: Optional[OregonCity],
+    state: UsaState,
+    thread_id: Optional[str],
+) -> None:
+    """End a response stream and account for it.
+
+    Frees its slot, logs its breakdown, records its usage and debits its tokens
+    from the client's budget.
+    """
+    slot.release()
+    _streams_in_flight.inc(-1, route=timing.route)
+    summary = timing.finish()
+    record_usage(summary, city=city, state=state, thread_id=thread_id)
+    buckets = get_token_buckets()
+    if buckets is not None:
+        buckets.debit(client, billed_tokens(summary["tokens"]))
+
+
+def _read_query(
+    data: Dict[str, Any],
+) -> Tuple[List[AnyMessage | Dict[str, Any]], Optional[OregonCity], UsaState]:
+    """Extract the message history and user location from a ``/api/query`` body.
+
+    Uses [`OregonCity.from_maybe_str`](`~location.OregonCity.from_maybe_str`) and
+    [`UsaState.from_maybe_str`](`~location.UsaState.from_maybe_str`) to convert the
+    city and state strings into their respective enum types.
+
+    Args:
+        data: Parsed JSON request body.
+
+    Returns:
+        Tuple of (messages, city, state).
+
+    Raises:
+        KeyError: If required fields (messages, city, state) are missing.
+    """
+    messages: List[AnyMessage | Dict[str, Any]] = data["messages"]
+    city = OregonCity.from_maybe_str(data["city"])
+    state = UsaState.from_maybe_str(data["state"])
+    return messages, city, state
+
+
+def _open_thread(data: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """Resolve the request's server-side thread, if the client opted in.
+
+    A client opts in by including a ``thread_token`` key: null starts a new thread
+    (send the full history once), and the token from the previous response's
+    ``X-Thread-Token`` header resumes one (send only the new messages). Without the
+    key, or when ``CONVERSATION_STORE`` is ``none``, the request is stateless.
+
+    Args:
+        data: Parsed JSON request body.
+
+    Returns:
+        Tuple of (thread_id, token to return to the client), or (None, None) for a
+        stateless request.
+
+    Raises:
+        ThreadExpiredError: If the token no longer refers to a stored thread.
+    """
+    if not threads_enabled() or "thread_token" not in data:
+        return None, None
+    return open_thread(data["thread_token"])
+
+
+_THREAD_EXPIRED_BODY: Dict[str, str] = {
+    "error": "thread_expired",
+    "detail": "Start a new thread by re-sending the full history with a null thread_token.",
+}
+"""JSON body of the 410 response sent when a thread token can no longer be resumed."""
+
+_OVERLOADED_BODY: bytes = _to_ndjson(
+    TextChunk(content=SERVER_OVERLOADED_MESSAGE)
+) + _to_ndjson(EndOfStreamChunk())
+"""Body of the 503 sent when admission control turns a request away: a complete
+stream, so the chat shows the message."""
+
+_OVERLOADED_HEADERS: Dict[str, str] = {"Retry-After": str(QUERY_RETRY_AFTER_SECONDS)}
+"""Headers of the 503 sent when admission control turns a request away."""
+
+_BUDGET_EXCEEDED_BODY: bytes = _to_ndjson(
+    TextChunk(content=TOKEN_BUDGET_EXCEEDED_MESSAGE)
+) + _to_ndjson(EndOfStreamChunk())
+"""Body of the 429 sent when a client has used up its token budget (see
+:mod:`~tenantfirstaid.token_buckets`)."""
 
 
 class ChatView(View):
@@ -59,7 +400,12 @@ class ChatView(View):
     Reads the message history and ``city``/``state`` from the request body, drives
     :class:`~tenantfirstaid.langchain_chat_manager.LangChainChatManager`, and
     streams the classified :data:`~tenantfirstaid.schema.ResponseChunk` objects
-    back as newline-delimited JSON, closing with an ``EndOfStreamChunk``.
+    back as newline-delimited JSON, closing with an ``EndOfStreamChunk``. Clients
+    that opt in to server-side threads get their token back in ``X-Thread-Token``.
+    Each streamed request's latency breakdown and token usage are logged when its
+    stream ends (see :mod:`~tenantfirstaid.request_timing`), appended to the
+    :mod:`~tenantfirstaid.usage_ledger` if one is configured, and debited from the
+    client's :mod:`~tenantfirstaid.token_buckets` budget if one is enabled.
     """
 
     def __init__(self) -> None:
@@ -78,7 +424,10 @@ class ChatView(View):
             **kwargs: Keyword arguments from Flask routing (unused).
 
         Returns:
-            Response: Flask response streaming newline-delimited JSON chunks.
+            Response: Flask response streaming newline-delimited JSON chunks, a
+            410 JSON error if the client's thread token can no longer be resumed,
+            a 429 if the client has used up its token budget, or a 503 if the
+            worker is at its stream limit (see :mod:`~tenantfirstaid.admission`).
 
         Raises:
             KeyError: If required fields (messages, state) are missing from request body.
@@ -87,47 +436,93 @@ class ChatView(View):
             Expected JSON body uses [`OregonCity`](`~location.OregonCity`) and [`UsaState`](`~location.UsaState`) for location context.
         """
 
+        timing = RequestTiming(request.path)
+        """Latency breakdown of this request, logged when the stream ends."""
+
+        client = get_remote_address()
+        """Address whose token budget this request is charged to."""
+        wait = _budget_wait(client)
+        if wait:
+            return Response(
+                _BUDGET_EXCEEDED_BODY,
+                status=429,
+                mimetype="text/plain",
+                headers={"Retry-After": str(wait)},
+            )
+
+        # Read the body before taking a slot, so a malformed request fails
+        # without holding one.
         data: Dict[str, Any] = request.json
-        """Extracts messages, city, and state from the request JSON.
-        Uses [`OregonCity.from_maybe_str`](`~location.OregonCity.from_maybe_str`) and [`UsaState.from_maybe_str`](`~location.UsaState.from_maybe_str`) to convert the city and state strings into their respective enum types.
-        """
+        """Request JSON containing messages, city, and state."""
 
-        messages: List[AnyMessage | Dict[str, Any]] = data["messages"]
-        """List of messages from the frontend, each message is either an AnyMessage or a dictionary with keys "role", "content", and "id".
-        This list is passed to the LangChainChatManager to generate a response.
-        """
-        city: OregonCity | None = OregonCity.from_maybe_str(data["city"])
-        """User's [`city`](`~location.OregonCity`), if in Oregon and recognized by the backend. None if not recognized or not provided."""
-        state: UsaState = UsaState.from_maybe_str(data["state"])
-        """User's [`state`](`~location.UsaState`), if recognized by the backend. Defaults to [`UsaState.OTHER`](`~location.UsaState`) if not recognized or not provided."""
-
-        # Create a stable & unique thread ID based on client IP and endpoint
-        # TODO: consider using randomly-generated token stored client-side in
-        #       a secure-cookie
-        tid: str | None = None
-        """Thread ID for the chat session, generated based on client IP and endpoint.
-        This ID is used to maintain context across multiple messages in the same chat session.
+        messages, city, state = _read_query(data)
+        """List of messages from the frontend (each either an AnyMessage or a dictionary
+        with keys "role", "content", and "id"), the user's [`city`](`~location.OregonCity`)
+        (None if not in Oregon or not recognized), and [`state`](`~location.UsaState`)
+        ([`UsaState.OTHER`](`~location.UsaState`) if not recognized).
         """
 
-        def generate() -> Generator[str, Any, None]:
-            """Generator function that streams the response chunks as newline-delimited JSON."""
-            response_stream: Generator[ContentBlock, Any, None] = (
-                self.chat_manager.generate_streaming_response(
-                    messages=messages,
-                    city=city,
-                    state=state,
-                    thread_id=tid,
-                )
+        slot = get_admission().acquire()
+        """This request's share of the worker's stream limit, held until it ends."""
+        if slot is None:
+            return Response(
+                _OVERLOADED_BODY,
+                status=503,
+                mimetype="text/plain",
+                headers=_OVERLOADED_HEADERS,
             )
-            for content_block in _classify_blocks(response_stream):
-                current_app.logger.debug(f"Sending content_block: {content_block}")
-                yield content_block.model_dump_json() + "\n"
-            done_chunk = EndOfStreamChunk()
-            current_app.logger.debug(f"Sending done chunk: {done_chunk}")
-            yield done_chunk.model_dump_json() + "\n"
 
+        # Server-side thread ID (None for stateless requests) and the signed token
+        # the client sends back to resume it.
+        try:
+            tid, thread_token = _open_thread(data)
+        except ThreadExpiredError:
+            slot.release()
+            expired = jsonify(_THREAD_EXPIRED_BODY)
+            expired.status_code = 410
+            return expired
+        except BaseException:
+            # The request fails before its stream exists to free the slot.
+            slot.release()
+            raise
+
+        def generate() -> Generator[bytes, Any, None]:
+            """Generator function that streams the response chunks as newline-delimited JSON."""
+            _streams_in_flight.inc(route=timing.route)
+            try:
+                key = answer_key(messages, city, state, tid)
+                recording = lookup_answer(key)
+                answer: Iterator[ResponseChunk]
+                if recording is not None:
+                    answer = replay_answer(recording)
+                else:
+                    response_stream: Generator[ContentBlock, Any, None] = (
+                        self.chat_manager.generate_streaming_response(
+                            messages=messages,
+                            city=city,
+                            state=state,
+                            thread_id=tid,
+                            timing=timing,
+                        )
+                    )
+                    answer = _classify_blocks(response_stream)
+                    if key is not None:
+                        answer = record_answer(answer, key, timing)
+                chunks = itertools.chain(answer, [EndOfStreamChunk()])
+                for batch in _coalesce(chunks, _COALESCE_WINDOW):
+                    yield _send(batch, timing)
+            finally:
+                _finish(timing, slot, client, city, state, tid)
+
+        compressed = compress_stream_for(request.headers.get("Accept-Encoding"))
         # text/plain rather than application/x-ndjson: client only reads raw bytes
-        return Response(
-            stream_with_context(generate()),
+        response = Response(
+            stream_with_context(gzip_stream(generate()) if compressed else generate()),
             mimetype="text/plain",
+            headers=encoding_headers(compressed),
         )
+        # The stream's own cleanup never runs if the client leaves before it starts.
+        response.call_on_close(slot.release)
+        if thread_token is not None:
+            response.headers[THREAD_TOKEN_HEADER] = thread_token
+        return response
@@ -0,0 +1,288 @@
+"""Circuit breakers around the backend's remote dependencies.
+
+When Vertex AI Search or Gemini degrades, every request would otherwise wait
+out its own timeouts and retries, tying up a worker each, so healthy requests
+queue behind them. A :class:`CircuitBreaker` counts consecutive failed calls to
+one dependency. After ``CIRCUIT_BREAKER_FAILURES`` of them it opens, and calls
+fail at once with :class:`CircuitOpenError` for ``CIRCUIT_BREAKER_RESET_SECONDS``.
+Then a single probe call is let through (half-open). If the probe succeeds the
+breaker closes again; if it fails the breaker stays open for another period.
+
+Only transient upstream failures count (see :func:`is_transient_failure`):
+server errors, rate limiting, timeouts and connection errors. Any other
+exception, such as a request the API rejects as invalid or a bug in our own
+code, is re-raised without being counted, so a few bad requests cannot open a
+breaker that every tenant shares.
+
+The breakers are shared process-wide through :func:`get_breaker`. Callers fall
+back rather than fail: retrieval tools answer from the local statute text (see
+:mod:`~tenantfirstaid.langchain_tools`), and
+:class:`~tenantfirstaid.langchain_chat_manager.LangChainChatManager` answers with
+a short "try again, or call for help" message. Each breaker's state is exported
+through :mod:`~tenantfirstaid.metrics`.
+"""
+
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Final, Literal, Tuple, Type, TypeVar
+
+import httpx
+import requests
+from google.api_core import exceptions as api_exceptions
+from google.auth import exceptions as auth_exceptions
+from google.genai import errors as genai_errors
+from langchain_core.exceptions import ModelError
+
+from .constants import CIRCUIT_BREAKER_FAILURES, CIRCUIT_BREAKER_RESET_SECONDS
+from .metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+BreakerState = Literal["closed", "open", "half_open"]
+
+VERTEX_SEARCH: Final = "vertex_search"
+"""Breaker name for Vertex AI Search, shared by every retrieval tool."""
+
+GEMINI: Final = "gemini"
+"""Breaker name for the Gemini model behind ``graph._get_llm``."""
+
+_STATE_VALUES: Final[Dict[BreakerState, int]] = {
+    "closed": 0,
+    "half_open": 1,
+    "open": 2,
+}
+"""Numeric value exported for each state."""
+
+_state_gauge = gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state per dependency: 0 closed, 1 half-open, 2 open.",
+    ("dependency",),
+    mode="max",
+)
+_rejected = counter(
+    "circuit_breaker_rejected_calls",
+    "Calls failed fast because the dependency's breaker was open.",
+    ("dependency",),
+)
+_opened = counter(
+    "circuit_breaker_opened",
+    "Times the dependency's breaker opened.",
+    ("dependency",),
+)
+
+
+_TRANSIENT_ERRORS: Final[Tuple[Type[BaseException], ...]] = (
+    # 5xx: InternalServerError, ServiceUnavailable, DeadlineExceeded, ...
+    api_exceptions.ServerError,
+    # 429, including ResourceExhausted.
+    api_exceptions.TooManyRequests,
+    api_exceptions.RetryError,
+    genai_errors.ServerError,
+    auth_exceptions.TransportError,
+    httpx.TransportError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    ConnectionError,
+    TimeoutError,
+)
+"""Exception types that mean the dependency, not the request, failed."""
+
+_TRANSIENT_STATUS_CODES: Final = frozenset({408, 429})
+"""4xx codes of Gemini client errors that are worth retrying."""
+
+
+def is_transient_failure(error: BaseException) -> bool:
+    """Return whether ``error`` is a transient upstream failure a breaker counts.
+
+    LangChain's classified model errors say so themselves (``is_retryable``);
+    otherwise server errors, rate limiting, timeouts and connection errors
+    count, and everything else (invalid arguments, validation errors, bugs in
+    the calling code) does not.
+    """
+    if isinstance(error, ModelError):
+        return error.is_retryable
+    if isinstance(error, genai_errors.ClientError):
+        return error.code in _TRANSIENT_STATUS_CODES
+    return isinstance(error, _TRANSIENT_ERRORS)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, dependency: str) -> None:
+        super().__init__(f"{dependency} circuit breaker is open")
+        self.dependency = dependency
+        """Name of the breaker that rejected the call."""
+
+
+class CircuitBreaker:
+    """Thread-safe consecutive-failure breaker with half-open probing."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_BREAKER_FAILURES,
+        reset_seconds: float = CIRCUIT_BREAKER_RESET_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        counts: Callable[[BaseException], bool] = is_transient_failure,
+    ) -> None:
+        """Initialize a closed breaker.
+
+        Args:
+            name: Dependency name, used in errors, logs and metrics.
+            failure_threshold: Consecutive failures that open the breaker;
+                ``0`` never opens it.
+            reset_seconds: How long the breaker stays open before a probe, and
+                how long a probe may run before another is let through.
+            clock: Monotonic time source.
+            counts: Whether an exception raised by a call is a failure of the
+                dependency; others are re-raised without being recorded.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.counts = counts
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started: float | None = None
+        self._open = False
+        self._lock = threading.Lock()
+        _state_gauge.set(_STATE_VALUES["closed"], dependency=name)
+
+    @property
+    def state(self) -> BreakerState:
+        """The current state, without claiming the half-open probe."""
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> BreakerState:
+        if not self._open:
+            return "closed"
+        if self._clock() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """Return whether a call may go ahead, claiming the probe if half-open.
+
+        While half-open only one probe runs at a time; a probe that never
+        reports back (e.g. its request was abandoned) is replaced after
+        ``reset_seconds``.
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open":
+                now = self._clock()
+                if (
+                    self._probe_started is None
+                    or now - self._probe_started >= self.reset_seconds
+                ):
+                    self._probe_started = now
+                    _state_gauge.set(_STATE_VALUES["half_open"], dependency=self.name)
+                    return True
+        _rejected.inc(dependency=self.name)
+        return False
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the breaker."""
+        with self._lock:
+            was_open = self._open
+            self._failures = 0
+            self._open = False
+            self._probe_started = None
+        if was_open:
+            logger.warning("%s circuit breaker closed", self.name)
+            _state_gauge.set(_STATE_VALUES["closed"], dependency=self.name)
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the breaker at the threshold or on a failed probe."""
+        with self._lock:
+            self._failures += 1
+            if self._open:
+                # A failed probe (or a call let through before the breaker opened).
+                opened = self._probe_started is not None
+            else:
+                opened = 0 < self.failure_threshold <= self._failures
+            if opened:
+                self._open = True
+                self._opened_at = self._clock()
+                self._probe_started = None
+        if opened:
+            logger.warning(
+                "%s circuit breaker opened after %d consecutive failures",
+                self.name,
+                self._failures,
+            )
+            _state_gauge.set(_STATE_VALUES["open"], dependency=self.name)
+            _opened.inc(dependency=self.name)
+
+    def release_probe(self) -> None:
+        """Let another probe through at once; the last one proved nothing either way."""
+        with self._lock:
+            self._probe_started = None
+
+    def _record_error(self, error: Exception) -> None:
+        if self.counts(error):
+            self.record_failure()
+        else:
+            self.release_probe()
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Call ``fn`` through the breaker, recording its outcome.
+
+        Raises:
+            CircuitOpenError: If the breaker is open; ``fn`` is not called.
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            result = fn()
+        except Exception as e:
+            self._record_error(e)
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Asynchronous twin of :meth:`call`, awaiting ``fn()``.
+
+        Raises:
+            CircuitOpenError: If the breaker is open; ``fn`` is not called.
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            result = await fn()
+        except Exception as e:
+            self._record_error(e)
+            raise
+        self.record_success()
+        return result
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+"""Breaker per dependency name."""
+_breakers_lock = threading.Lock()
+"""Lock for thread-safe breaker creation."""
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Return the process-wide breaker for a dependency, creating it on first use."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def breaker_states() -> Dict[str, BreakerState]:
+    """Return the state of every breaker created in this process."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.state for b in breakers}
@@ -0,0 +1,240 @@
+"""Parse ORS citations and resolve them to exact statute text.
+
+The system prompt has the agent cite sections such as ``ORS 90.394`` or
+``ORS 90.302(2)(e)``. :func:`parse_citations` extracts those citations, with
+their subsection paths, from free text, and :func:`resolve_citation` returns the
+cited section or subsection verbatim from the
+[local statute index](`~statute_index.get_statute_index`) with no semantic
+search.
+
+ORS sections nest subsections ``(1)``, paragraphs ``(a)``, subparagraphs
+``(A)``, then roman sub-subparagraphs ``(i)`` and ``(I)``. Each line of a section
+in ``sections.json`` opens with the labels it starts, e.g. ``(3)(a) A landlord
+...``, so a section is split once into a table from every label path to its
+lines, and later lookups are a dict access.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Final, List, Optional, Tuple
+
+from .statute_index import StatuteIndex, get_statute_index, tokenize
+
+_SECTION: Final = r"\d+[A-Z]?\.\d+"
+"""A section number such as ``90.394`` or ``646A.600``."""
+
+_PATH: Final = r"(?:\s?\([0-9A-Za-z]{1,6}\))*"
+"""Zero or more subsection labels, e.g. ``(2)(e)`` or `` (5)``."""
+
+_CITATION_RE: Final = re.compile(
+    rf"\bORS\s+{_SECTION}{_PATH}(?:(?:\s*,\s*|\s+(?:and|or|to)\s+){_SECTION}{_PATH})*",
+    re.IGNORECASE,
+)
+"""``ORS`` followed by one or more sections, e.g. ``ORS 90.453 (2), 90.472 or 90.475``."""
+
+_SECTION_RE: Final = re.compile(rf"({_SECTION})({_PATH})", re.IGNORECASE)
+"""One section and its subsection path within a matched citation."""
+
+_LABEL_RE: Final = re.compile(r"\(([0-9A-Za-z]{1,6})\)")
+"""A single subsection label."""
+
+_LEADING_LABELS_RE: Final = re.compile(r"^(?:\([0-9A-Za-z]{1,6}\))+")
+"""The labels a line of statute text opens with."""
+
+_WRAPPER_TERMS: Final = frozenset(
+    "does doe exact full quote read say section statute subsection text what "
+    "wording".split()
+)
+"""Terms (as :func:`~tenantfirstaid.statute_index.tokenize` returns them) that only
+ask for the cited text, as in "what does ORS 90.394 say"."""
+
+_ROMAN_RE: Final = re.compile(r"^(?=[ivx]+$)x{0,3}(?:ix|iv|v?i{0,3})$", re.IGNORECASE)
+"""A roman numeral up to 39, the depth ORS sub-subparagraphs reach."""
+
+
+@dataclass(frozen=True)
+class OrsCitation:
+    """A citation of an ORS section, optionally narrowed to a subsection."""
+
+    section: str
+    """Section number, e.g. ``"90.302"``."""
+    path: Tuple[str, ...] = ()
+    """Subsection labels from outermost in, e.g. ``("2", "e")``."""
+
+    def __str__(self) -> str:
+        return f"ORS {self.section}" + "".join(f"({label})" for label in self.path)
+
+
+def parse_citations(text: str) -> List[OrsCitation]:
+    """Return the ORS citations in ``text``, in order and without duplicates.
+
+    Lists sharing one ``ORS`` prefix (``ORS 90.394 and 90.160``) yield a
+    citation per section. A space before a subsection, as in the statutes' own
+    cross-references (``ORS 30.701 (5)``), is accepted.
+
+    Args:
+        text: Free text, such as a retrieval query or a model answer.
+
+    Returns:
+        The citations found.
+    """
+    citations: Dict[OrsCitation, None] = {}
+    for match in _CITATION_RE.finditer(text):
+        for section, path in _SECTION_RE.findall(match.group(0)):
+            citations[OrsCitation(section.upper(), tuple(_LABEL_RE.findall(path)))] = (
+                None
+            )
+    return list(citations)
+
+
+def _is_successor(label: str, previous: Optional[str]) -> bool:
+    """Return whether ``label`` is the letter after ``previous``."""
+    if previous is None or len(previous) != 1 or len(label) != 1:
+        return False
+    return ord(label) == ord(previous) + 1
+
+
+def _label_level(label: str, path: List[Tuple[int, str]]) -> int:
+    """Return the nesting level (1–5) of ``label`` given the labels open above it.
+
+    ``(i)`` and ``(I)`` are ambiguous between a letter and a roman numeral; they
+    are read as the letter only when they follow ``(h)``/``(H)`` at that level.
+    ORS writes paragraph "l" as ``(L)`` so it is not misread as ``(1)``.
+    """
+    if label.isdigit():
+        return 1
+    open_labels = dict(path)
+    if label.islower():
+        if (
+            _ROMAN_RE.match(label)
+            and open_labels.keys() & {3, 4}
+            and not _is_successor(label, open_labels.get(2))
+        ):
+            return 4
+        return 2
+    if label == "L" and _is_successor("l", open_labels.get(2)):
+        return 2
+    if (
+        _ROMAN_RE.match(label)
+        and open_labels.keys() & {4, 5}
+        and not _is_successor(label, open_labels.get(3))
+    ):
+        return 5
+    return 3
+
+
+@dataclass(frozen=True)
+class _SplitSection:
+    """A section's lines indexed by subsection label path."""
+
+    title: str
+    """Section catchline."""
+    lines: Dict[Tuple[str, ...], List[str]]
+    """Every label path to all lines under it; ``()`` is the whole section."""
+    lead_ins: Dict[Tuple[str, ...], str]
+    """Label path to the line that opens it, e.g. "(2) A landlord may charge a
+    tenant a fee for each occurrence of the following:"."""
+
+
+@lru_cache(maxsize=None)
+def _split_section(index: StatuteIndex, section: str) -> Optional[_SplitSection]:
+    """Split a section into its subsections, once per section.
+
+    Returns:
+        The split section, or None if it is not indexed.
+    """
+    text = index.section(section)
+    if text is None:
+        return None
+    title = index.title(section) or ""
+    body = text[len(title) + 2 :] if title else text
+    lines: Dict[Tuple[str, ...], List[str]] = {}
+    lead_ins: Dict[Tuple[str, ...], str] = {}
+    path: List[Tuple[int, str]] = []
+    for line in (raw.strip() for raw in body.split("\n")):
+        if not line:
+            continue
+        leading = _LEADING_LABELS_RE.match(line)
+        if leading is not None:
+            for label in _LABEL_RE.findall(leading.group(0)):
+                level = _label_level(label, path)
+                path = [(lvl, lbl) for lvl, lbl in path if lvl < level]
+                path.append((level, label))
+        labels = tuple(label for _, label in path)
+        lead_ins.setdefault(labels, line)
+        for depth in range(len(labels) + 1):
+            lines.setdefault(labels[:depth], []).append(line)
+    return _SplitSection(title, lines, lead_ins)
+
+
+def resolve_citation(
+    citation: OrsCitation, index: Optional[StatuteIndex] = None
+) -> Optional[str]:
+    """Return the exact text of a cited section or subsection.
+
+    A subsection is preceded by the lead-in lines of the subsections enclosing
+    it (e.g. "A landlord may charge a tenant a fee for each occurrence of the
+    following:"), which its text often only completes.
+
+    Args:
+        citation: Parsed citation.
+        index: Statute index to read from (the process-wide one by default).
+
+    Returns:
+        The citation and the section's catchline on the first line, then the
+        cited text; None if the section or subsection is not in the index.
+    """
+    split = _split_section(index or get_statute_index(), citation.section)
+    if split is None:
+        return None
+    path = citation.path
+    if path not in split.lines:
+        # Paragraph "l" is printed "(L)" but often cited "(l)".
+        path = tuple("L" if label == "l" else label for label in path)
+        if path not in split.lines:
+            return None
+    cited = split.lines[path]
+    context = []
+    for depth in range(len(path)):
+        lead_in = split.lead_ins.get(path[:depth])
+        if lead_in is not None and lead_in not in cited and lead_in not in context:
+            context.append(lead_in)
+    heading = f"{citation} — {split.title}" if split.title else str(citation)
+    return "\n".join([heading, *context, *cited])
+
+
+def cites_only(query: str) -> bool:
+    """Return whether ``query`` is ORS citations and nothing else of substance.
+
+    A query such as "ORS 90.394(1)" or "what does ORS 90.394 say" only asks for
+    the cited text. One with content terms besides its citations, such as
+    "ORS 90.427 termination notice month-to-month", also asks a topical question
+    that the citations alone may not answer.
+    """
+    if not parse_citations(query):
+        return False
+    rest = _CITATION_RE.sub(" ", query)
+    return not set(tokenize(rest)) - _WRAPPER_TERMS
+
+
+def resolve_query_citations(
+    query: str, index: Optional[StatuteIndex] = None
+) -> Optional[str]:
+    """Answer a retrieval query from local statute text when it cites ORS explicitly.
+
+    Args:
+        query: Retrieval query as issued by the model.
+        index: Statute index to read from (the process-wide one by default).
+
+    Returns:
+        The text of every cited section or subsection, or None if the query
+        cites nothing or any citation is not in the local index.
+    """
+    citations = parse_citations(query)
+    if not citations:
+        return None
+    resolved = [resolve_citation(c, index) for c in citations]
+    if any(text is None for text in resolved):
+        return None
+    return "\n\n".join(text for text in resolved if text is not None)
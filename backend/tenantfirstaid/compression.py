@@ -0,0 +1,138 @@
+"""Opt-in gzip compression of ``/api/query`` response streams.
+
+Answers repeat the same markdown links to ``oregon.public.law`` for every
+citation, and a letter may be sent in full more than once, so the stream
+compresses well. Most tenants are on mobile connections. When
+``STREAM_COMPRESSION`` is enabled and the request's ``Accept-Encoding`` allows
+gzip, the chat views pass their writes through :func:`gzip_stream` (or
+:func:`agzip_stream` under ASGI). Each write is compressed and then sync-flushed
+(``Z_SYNC_FLUSH``), so the browser can decode every chunk as soon as it arrives
+and streaming stays incremental. The compression window is shared across the
+whole response, so later chunks that repeat earlier links cost only a few
+bytes.
+"""
+
+import zlib
+from typing import AsyncGenerator, AsyncIterator, Dict, Generator, Iterator, Optional
+
+from .constants import STREAM_COMPRESSION, STREAM_COMPRESSION_LEVEL
+from .metrics import counter
+
+_compressed_bytes = counter(
+    "response_compressed_bytes",
+    "Gzip-compressed response body bytes sent, for comparison with response_bytes.",
+)
+
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+"""``wbits`` that make zlib write a gzip header and trailer."""
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Return whether an ``Accept-Encoding`` header value allows gzip.
+
+    ``gzip`` or ``*`` with a non-zero quality allows it; an explicit ``gzip;q=0``
+    refuses it even if ``*`` is accepted.
+    """
+    wildcard = False
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        name, _, value = params.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        match coding.strip().lower():
+            case "gzip" | "x-gzip":
+                return quality > 0
+            case "*":
+                wildcard = quality > 0
+    return wildcard
+
+
+def compress_stream_for(accept_encoding: Optional[str]) -> bool:
+    """Return whether to gzip a response to a request with this ``Accept-Encoding``."""
+    return STREAM_COMPRESSION and accepts_gzip(accept_encoding)
+
+
+def encoding_headers(compressed: bool) -> Dict[str, str]:
+    """Return the headers describing a response's encoding.
+
+    Args:
+        compressed: Whether the body is gzipped.
+
+    Returns:
+        ``Content-Encoding`` for a gzipped body, plus ``Vary: Accept-Encoding``
+        whenever ``STREAM_COMPRESSION`` is on, so shared caches keep the two
+        encodings apart.
+    """
+    headers = {"Vary": "Accept-Encoding"} if STREAM_COMPRESSION else {}
+    if compressed:
+        headers["Content-Encoding"] = "gzip"
+    return headers
+
+
+class StreamCompressor:
+    """Gzip compressor that makes every write decodable as soon as it arrives."""
+
+    def __init__(self, level: int = STREAM_COMPRESSION_LEVEL) -> None:
+        """Start a gzip member.
+
+        Args:
+            level: zlib compression level, 1 (fastest) to 9 (smallest).
+        """
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+
+    def write(self, data: bytes) -> bytes:
+        """Compress ``data`` and sync-flush, returning the bytes to send now."""
+        out = self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+        _compressed_bytes.inc(len(out))
+        return out
+
+    def close(self) -> bytes:
+        """Return the final block and gzip trailer."""
+        out = self._zlib.flush(zlib.Z_FINISH)
+        _compressed_bytes.inc(len(out))
+        return out
+
+
+def gzip_stream(
+    writes: Iterator[bytes], level: int = STREAM_COMPRESSION_LEVEL
+) -> Generator[bytes, None, None]:
+    """Gzip a response body one write at a time.
+
+    Closing the returned generator closes ``writes``, so the stream's own
+    cleanup still runs when the client disconnects.
+
+    Args:
+        writes: The uncompressed response body, one write per item.
+        level: zlib compression level.
+
+    Yields:
+        Compressed bytes for each write, then the gzip trailer.
+    """
+    compressor = StreamCompressor(level)
+    try:
+        for data in writes:
+            yield compressor.write(data)
+        yield compressor.close()
+    finally:
+        close = getattr(writes, "close", None)
+        if close is not None:
+            close()
+
+
+async def agzip_stream(
+    writes: AsyncIterator[bytes], level: int = STREAM_COMPRESSION_LEVEL
+) -> AsyncGenerator[bytes, None]:
+    """Asynchronous twin of :func:`gzip_stream`."""
+    compressor = StreamCompressor(level)
+    try:
+        async for data in writes:
+            yield compressor.write(data)
+        yield compressor.close()
+    finally:
+        aclose = getattr(writes, "aclose", None)
+        if aclose is not None:
+            await aclose()
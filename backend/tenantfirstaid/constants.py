@@ -235,6 +235,37 @@ with temporary_formatted_handler(logger):
 LANGSMITH_API_KEY: Final = os.getenv("LANGSMITH_API_KEY")
 """Optional LangSmith API key for tracing (env ``LANGSMITH_API_KEY``)."""
 
+CONVERSATION_STORE: Final = os.getenv("CONVERSATION_STORE", "none").strip().lower()
+"""Server-side conversation store (env ``CONVERSATION_STORE``): ``none`` (clients send
+the full history every turn), ``memory`` (per-process, for development) or ``sqlite``
+(one file shared by every worker on a node)."""
+if CONVERSATION_STORE not in ("none", "memory", "sqlite"):
+    raise ValueError(
+        f"[CONVERSATION_STORE] must be one of none, memory, sqlite; got {CONVERSATION_STORE!r}"
+    )
+
+CONVERSATION_SQLITE_PATH: Final = Path(
+    os.getenv(
+        "CONVERSATION_SQLITE_PATH",
+        str(Path(__file__).parent.parent / "conversations.sqlite3"),
+    )
+)
+"""SQLite file backing ``CONVERSATION_STORE=sqlite`` (env ``CONVERSATION_SQLITE_PATH``)."""
+
+CONVERSATION_MAX_THREADS: Final = int(os.getenv("CONVERSATION_MAX_THREADS", "1000"))
+"""Threads kept before the least recently used is evicted (env ``CONVERSATION_MAX_THREADS``)."""
+
+CONVERSATION_TTL_SECONDS: Final = int(os.getenv("CONVERSATION_TTL_SECONDS", "86400"))
+"""Idle seconds before a thread and its token expire (env ``CONVERSATION_TTL_SECONDS``)."""
+
+CONVERSATION_TOKEN_SECRET: Final = os.getenv("CONVERSATION_TOKEN_SECRET")
+"""Key used to sign thread tokens (env ``CONVERSATION_TOKEN_SECRET``); required when
+``CONVERSATION_STORE`` is not ``none``."""
+if CONVERSATION_STORE != "none" and not CONVERSATION_TOKEN_SECRET:
+    raise ValueError(
+        "[CONVERSATION_TOKEN_SECRET] must be set when CONVERSATION_STORE is enabled."
+    )
+
 # Sourced from the "laso" entry in referrals_data.json — the single source of
 # truth shared with the agent and the Referrals page, so the phone number can't
 # drift between the system prompt and the referral catalog.
@@ -243,9 +274,265 @@ if _laso_phone is None:
     raise ValueError("referrals_data.json 'laso' entry has no phone number")
 OREGON_LAW_CENTER_PHONE_NUMBER: Final[str] = _laso_phone
 
+SERVICE_BUSY_MESSAGE: Final = (
+    "Tenant First Aid can't reach its AI service right now. Please try again in a "
+    "few minutes. If you need help sooner, call Oregon Law Center at "
+    f"{OREGON_LAW_CENTER_PHONE_NUMBER}."
+)
+"""Answer sent at once instead of waiting on the model while its circuit breaker
+is open."""
+
+SERVER_OVERLOADED_MESSAGE: Final = (
+    "Tenant First Aid is helping a lot of people right now. Please try again in a "
+    "minute. If you need help sooner, call Oregon Law Center at "
+    f"{OREGON_LAW_CENTER_PHONE_NUMBER}."
+)
+"""Answer sent with a 503 when ``/api/query`` is turned away by admission control."""
+
+TOKEN_BUDGET_EXCEEDED_MESSAGE: Final = (
+    "You have asked Tenant First Aid a lot of questions in a short time. Please "
+    "try again in a few minutes. If you need help sooner, call Oregon Law Center "
+    f"at {OREGON_LAW_CENTER_PHONE_NUMBER}."
+)
+"""Answer sent with a 429 when a client has used up its ``/api/query`` token budget."""
+
 RESPONSE_WORD_LIMIT: Final = 350
 """Target word limit for model responses."""
 
+TOOL_CALL_CONCURRENCY: Final = int(os.getenv("TOOL_CALL_CONCURRENCY", "4"))
+"""Most tool calls from one model turn run at once per request (env
+``TOOL_CALL_CONCURRENCY``); further calls wait for a free slot."""
+
+STREAM_TOKENS: Final = _strtobool(os.getenv("STREAM_TOKENS"))
+"""Stream answer and reasoning text token by token as the model produces it (env
+``STREAM_TOKENS``, default false); otherwise each model message is sent once it is
+complete."""
+
+STREAM_COALESCE_MS: Final = float(os.getenv("STREAM_COALESCE_MS", "0"))
+"""Milliseconds for which text chunks sent in quick succession are held and merged
+into one write (env ``STREAM_COALESCE_MS``). Useful with ``STREAM_TOKENS``, where
+each token would otherwise be its own write. ``0`` (the default) writes every
+chunk at once."""
+if STREAM_COALESCE_MS < 0:
+    raise ValueError(f"[STREAM_COALESCE_MS] must be >= 0; got {STREAM_COALESCE_MS}")
+
+STREAM_COMPRESSION: Final = _strtobool(os.getenv("STREAM_COMPRESSION"))
+"""Gzip ``/api/query`` response streams for clients that accept it (env
+``STREAM_COMPRESSION``, default false). Each write is flushed, so chunks still
+arrive one by one."""
+
+STREAM_COMPRESSION_LEVEL: Final = int(os.getenv("STREAM_COMPRESSION_LEVEL", "6"))
+"""zlib compression level for ``STREAM_COMPRESSION``, 1 (fastest) to 9 (smallest)
+(env ``STREAM_COMPRESSION_LEVEL``)."""
+if not 1 <= STREAM_COMPRESSION_LEVEL <= 9:
+    raise ValueError(
+        f"[STREAM_COMPRESSION_LEVEL] must be 1-9; got {STREAM_COMPRESSION_LEVEL}"
+    )
+
+HISTORY_TOKEN_BUDGET: Final = int(os.getenv("HISTORY_TOKEN_BUDGET", "32000"))
+"""Approximate token budget for the conversation history sent to the model on each
+call (env ``HISTORY_TOKEN_BUDGET``); older turns are compacted beyond it. ``0``
+disables compaction."""
+
+PROMPT_CACHE_TTL_SECONDS: Final = int(os.getenv("PROMPT_CACHE_TTL_SECONDS", "0"))
+"""Lifetime of the Gemini context cache holding the system prompt and tool schemas
+(env ``PROMPT_CACHE_TTL_SECONDS``); the cache is extended before it expires. ``0``
+(the default) sends the full prompt on every call."""
+
+RAG_CACHE: Final = os.getenv("RAG_CACHE", "none").strip().lower()
+"""Retrieval result cache (env ``RAG_CACHE``): ``none``, ``memory`` (per process) or
+``sqlite`` (one file shared by every worker on a node)."""
+if RAG_CACHE not in ("none", "memory", "sqlite"):
+    raise ValueError(
+        f"[RAG_CACHE] must be one of none, memory, sqlite; got {RAG_CACHE!r}"
+    )
+
+RAG_CACHE_SQLITE_PATH: Final = Path(
+    os.getenv(
+        "RAG_CACHE_SQLITE_PATH", str(Path(__file__).parent.parent / "rag_cache.sqlite3")
+    )
+)
+"""SQLite file backing ``RAG_CACHE=sqlite`` (env ``RAG_CACHE_SQLITE_PATH``)."""
+
+RAG_CACHE_MAX_ENTRIES: Final = int(os.getenv("RAG_CACHE_MAX_ENTRIES", "2000"))
+"""Cached retrievals kept before the least recently used is evicted (env ``RAG_CACHE_MAX_ENTRIES``)."""
+
+RAG_CACHE_TTL_SECONDS: Final = int(os.getenv("RAG_CACHE_TTL_SECONDS", "86400"))
+"""Seconds a cached retrieval is served before it expires (env ``RAG_CACHE_TTL_SECONDS``)."""
+
+ANSWER_CACHE: Final = os.getenv("ANSWER_CACHE", "none").strip().lower()
+"""First-turn answer cache (env ``ANSWER_CACHE``): ``none``, ``memory`` (per
+process) or ``sqlite`` (one file shared by every worker on a node)."""
+if ANSWER_CACHE not in ("none", "memory", "sqlite"):
+    raise ValueError(
+        f"[ANSWER_CACHE] must be one of none, memory, sqlite; got {ANSWER_CACHE!r}"
+    )
+
+ANSWER_CACHE_SQLITE_PATH: Final = Path(
+    os.getenv(
+        "ANSWER_CACHE_SQLITE_PATH",
+        str(Path(__file__).parent.parent / "answer_cache.sqlite3"),
+    )
+)
+"""SQLite file backing ``ANSWER_CACHE=sqlite`` (env ``ANSWER_CACHE_SQLITE_PATH``)."""
+
+ANSWER_CACHE_MAX_ENTRIES: Final = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+"""Cached answers kept before the least recently used is evicted (env ``ANSWER_CACHE_MAX_ENTRIES``)."""
+
+ANSWER_CACHE_TTL_SECONDS: Final = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "604800"))
+"""Seconds a cached answer is served before it expires (env ``ANSWER_CACHE_TTL_SECONDS``)."""
+
+ANSWER_CACHE_PACING: Final = float(os.getenv("ANSWER_CACHE_PACING", "0.25"))
+"""Fraction of each recorded gap between chunks waited when a cached answer is
+replayed (env ``ANSWER_CACHE_PACING``): ``1`` replays at the original speed, ``0``
+sends the whole answer at once."""
+if not 0 <= ANSWER_CACHE_PACING <= 1:
+    raise ValueError(f"[ANSWER_CACHE_PACING] must be 0-1; got {ANSWER_CACHE_PACING}")
+
+RAG_HEDGE_PERCENTILE: Final = float(os.getenv("RAG_HEDGE_PERCENTILE", "0"))
+"""Latency percentile of a datastore's recent searches after which a duplicate
+search is sent and the first result used (env ``RAG_HEDGE_PERCENTILE``, e.g.
+``95``). ``0`` (the default) never hedges."""
+if not 0 <= RAG_HEDGE_PERCENTILE < 100:
+    raise ValueError(
+        f"[RAG_HEDGE_PERCENTILE] must be in [0, 100); got {RAG_HEDGE_PERCENTILE!r}"
+    )
+
+RAG_HEDGE_BUDGET: Final = float(os.getenv("RAG_HEDGE_BUDGET", "0.05"))
+"""Most extra searches hedging may add, as a fraction of all searches per process
+(env ``RAG_HEDGE_BUDGET``)."""
+
+RAG_RETRY_DEADLINE_SECONDS: Final = float(os.getenv("RAG_RETRY_DEADLINE_SECONDS", "4"))
+"""Longest a search keeps retrying transient errors, counting backoff (env
+``RAG_RETRY_DEADLINE_SECONDS``); no retry starts that would end past it."""
+
+RAG_PREFETCH: Final = _strtobool(os.getenv("RAG_PREFETCH"))
+"""Start a retrieval for the raw question of a first turn while the model is still
+choosing its own query (env ``RAG_PREFETCH``, default false)."""
+
+RAG_PREFETCH_MIN_SIMILARITY: Final = float(
+    os.getenv("RAG_PREFETCH_MIN_SIMILARITY", "0.4")
+)
+"""Least term similarity (0–1) between the model's retrieval query and the raw
+question for the prefetched passages to answer it (env
+``RAG_PREFETCH_MIN_SIMILARITY``)."""
+
+RAG_PREFETCH_MAX_WASTED_PER_MINUTE: Final = int(
+    os.getenv("RAG_PREFETCH_MAX_WASTED_PER_MINUTE", "30")
+)
+"""Unused prefetches per process per minute beyond which no new prefetch is started
+(env ``RAG_PREFETCH_MAX_WASTED_PER_MINUTE``)."""
+
+CIRCUIT_BREAKER_FAILURES: Final = int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5"))
+"""Consecutive failed calls to Vertex AI Search or Gemini after which calls to it
+fail fast (env ``CIRCUIT_BREAKER_FAILURES``). ``0`` disables the breakers."""
+
+CIRCUIT_BREAKER_RESET_SECONDS: Final = float(
+    os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30")
+)
+"""Seconds an open circuit breaker fails calls fast before letting one probe call
+through (env ``CIRCUIT_BREAKER_RESET_SECONDS``)."""
+
+QUERY_MAX_IN_FLIGHT: Final = int(os.getenv("QUERY_MAX_IN_FLIGHT", "4"))
+"""Most ``/api/query`` streams one worker process serves at once (env
+``QUERY_MAX_IN_FLIGHT``); further requests wait in a short queue. ``0`` disables
+admission control."""
+
+QUERY_QUEUE_SIZE: Final = int(os.getenv("QUERY_QUEUE_SIZE", "8"))
+"""Most ``/api/query`` requests one worker holds waiting for a stream slot (env
+``QUERY_QUEUE_SIZE``); beyond it requests are rejected at once."""
+
+QUERY_QUEUE_TIMEOUT_SECONDS: Final = float(
+    os.getenv("QUERY_QUEUE_TIMEOUT_SECONDS", "2")
+)
+"""Longest an ``/api/query`` request waits for a stream slot before it is rejected
+(env ``QUERY_QUEUE_TIMEOUT_SECONDS``)."""
+
+QUERY_RETRY_AFTER_SECONDS: Final = int(os.getenv("QUERY_RETRY_AFTER_SECONDS", "10"))
+"""``Retry-After`` sent with a rejected ``/api/query`` request (env
+``QUERY_RETRY_AFTER_SECONDS``)."""
+
+TOKEN_BUCKETS: Final = os.getenv("TOKEN_BUCKETS", "none").strip().lower()
+"""Per-client token budget for ``/api/query`` (env ``TOKEN_BUCKETS``): ``none``,
+``memory`` (per process) or ``sqlite`` (one file shared by every worker on a node)."""
+if TOKEN_BUCKETS not in ("none", "memory", "sqlite"):
+    raise ValueError(
+        f"[TOKEN_BUCKETS] must be one of none, memory, sqlite; got {TOKEN_BUCKETS!r}"
+    )
+
+TOKEN_BUCKETS_SQLITE_PATH: Final = Path(
+    os.getenv(
+        "TOKEN_BUCKETS_SQLITE_PATH",
+        str(Path(__file__).parent.parent / "token_buckets.sqlite3"),
+    )
+)
+"""SQLite file backing ``TOKEN_BUCKETS=sqlite`` (env ``TOKEN_BUCKETS_SQLITE_PATH``)."""
+
+TOKEN_BUCKET_CAPACITY: Final = int(os.getenv("TOKEN_BUCKET_CAPACITY", "400000"))
+"""Model tokens a client may use in a burst before it must wait for its budget to
+refill (env ``TOKEN_BUCKET_CAPACITY``)."""
+
+TOKEN_BUCKET_REFILL_PER_MINUTE: Final = int(
+    os.getenv("TOKEN_BUCKET_REFILL_PER_MINUTE", "20000")
+)
+"""Model tokens added back to each client's budget per minute, up to
+``TOKEN_BUCKET_CAPACITY`` (env ``TOKEN_BUCKET_REFILL_PER_MINUTE``)."""
+if TOKEN_BUCKET_CAPACITY <= 0 or TOKEN_BUCKET_REFILL_PER_MINUTE <= 0:
+    raise ValueError(
+        "[TOKEN_BUCKET_CAPACITY] and [TOKEN_BUCKET_REFILL_PER_MINUTE] must be positive"
+    )
+
+TRUSTED_PROXY_COUNT: Final = int(os.getenv("TRUSTED_PROXY_COUNT", "0"))
+"""Reverse proxies in front of the app whose ``X-Forwarded-For`` entry is trusted
+as the client address (env ``TRUSTED_PROXY_COUNT``). Set it to ``1`` behind the
+production nginx, or every client shares the proxy's address and one budget."""
+
+WARMUP: Final = _strtobool(os.getenv("WARMUP"))
+"""Build the LLM, retrievers, statute index and agent graphs when a worker starts,
+before it serves its first request (env ``WARMUP``, default false). Runs from the
+gunicorn ``post_worker_init`` hook in ``gunicorn.conf.py`` and the ASGI app's
+startup."""
+
+WARMUP_PRIME: Final = _strtobool(os.getenv("WARMUP_PRIME"))
+"""Also make one free token-count call to Gemini during warm-up, so the worker's
+access token and connection are ready too (env ``WARMUP_PRIME``, default false)."""
+
+CREDENTIAL_REFRESH_MARGIN_SECONDS: Final = int(
+    os.getenv("CREDENTIAL_REFRESH_MARGIN_SECONDS", "600")
+)
+"""Seconds before the shared GCP access token expires that it is refreshed in the
+background (env ``CREDENTIAL_REFRESH_MARGIN_SECONDS``). Must exceed google-auth's
+own 225-second threshold, or requests refresh a stale token themselves."""
+if not 225 < CREDENTIAL_REFRESH_MARGIN_SECONDS < 3600:
+    raise ValueError(
+        "[CREDENTIAL_REFRESH_MARGIN_SECONDS] must be between 225 and 3600; "
+        f"got {CREDENTIAL_REFRESH_MARGIN_SECONDS}"
+    )
+
+METRICS_DIR: Final = os.getenv("METRICS_DIR")
+"""Directory where each worker process writes a snapshot of its metrics, so a
+``/metrics`` scrape served by any worker reports all of them (env ``METRICS_DIR``).
+Unset, each worker reports only its own. Use a directory that is emptied when the
+server is restarted, e.g. under ``/tmp``."""
+
+METRICS_TOKEN: Final = os.getenv("METRICS_TOKEN")
+"""Bearer token required to scrape ``/metrics`` (env ``METRICS_TOKEN``); unset, the
+endpoint is open, so keep it unreachable from the internet."""
+
+USAGE_LEDGER_DIR: Final = os.getenv("USAGE_LEDGER_DIR")
+"""Directory of the append-only token usage ledger, one JSONL file per UTC day (env
+``USAGE_LEDGER_DIR``); unset, no ledger is written."""
+
+USAGE_LEDGER_RETENTION_DAYS: Final = int(os.getenv("USAGE_LEDGER_RETENTION_DAYS", "90"))
+"""Days of usage ledger files kept; older files are deleted when a new day's file
+is started (env ``USAGE_LEDGER_RETENTION_DAYS``). ``0`` keeps every file."""
+
+STATUTE_INDEX_PATH: Final = Path(
+    os.getenv("STATUTE_INDEX_PATH", str(Path(__file__).parent / "sections.idx"))
+)
+"""Compiled lexical index over ``sections.json`` (env ``STATUTE_INDEX_PATH``); built
+in memory at startup if missing or stale."""
+
 _SYSTEM_PROMPT_PATH: Final = Path(__file__).parent / "system_prompt.md"
 """File path to the system prompt template."""
 
@@ -0,0 +1,590 @@
+"""Opt-in server-side conversation threads.
+
+When ``CONVERSATION_STORE`` is enabled, the agent graph is compiled with a
+LangGraph checkpointer, so a thread's history (including earlier tool results)
+lives on the server and the client only sends each new message. Clients refer to
+their thread with a signed, expiring token rather than a raw ID, so thread IDs
+cannot be guessed or forged.
+
+Two stores are provided, both bounded by an LRU cap and an idle TTL:
+
+- :class:`EvictingInMemorySaver` — per-process, for development.
+- :class:`SqliteCheckpointSaver` — a file shared by every worker on one node.
+
+Both keep only the latest checkpoint of each thread, since the web app always
+resumes from it, so storage grows with the conversation rather than with every
+agent step.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from pathlib import Path
+from typing import Any, Final, List, Optional, Tuple
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from .constants import (
+    CONVERSATION_MAX_THREADS,
+    CONVERSATION_SQLITE_PATH,
+    CONVERSATION_STORE,
+    CONVERSATION_TOKEN_SECRET,
+    CONVERSATION_TTL_SECONDS,
+)
+from .sqlite_store import open_shared_sqlite
+
+THREAD_TOKEN_HEADER: Final = "X-Thread-Token"
+"""Response header carrying the (refreshed) thread token after each turn."""
+
+_TOKEN_SALT: Final = "tenantfirstaid.thread"
+"""Salt namespacing thread-token signatures away from other uses of the secret."""
+
+
+class ThreadExpiredError(Exception):
+    """The client's thread token is invalid, expired, or its thread was evicted.
+
+    The client should start over by re-sending its full message history with a
+    null ``thread_token``.
+    """
+
+
+class EvictingInMemorySaver(InMemorySaver):
+    """In-memory checkpointer bounded by an LRU thread cap and an idle TTL.
+
+    Each ``put`` refreshes the thread's position and drops its superseded
+    checkpoints, writes and channel blobs; threads idle for longer than
+    ``ttl_seconds``, or beyond ``max_threads``, are deleted. State is per process,
+    so with several workers a thread is only visible to the worker that created it.
+    """
+
+    def __init__(self, *, max_threads: int, ttl_seconds: float) -> None:
+        """Initialize an empty store.
+
+        Args:
+            max_threads: Threads kept before the least recently used is evicted.
+            ttl_seconds: Idle seconds after which a thread is evicted.
+        """
+        super().__init__()
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self._last_used: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def has_thread(self, thread_id: str) -> bool:
+        """Return whether ``thread_id`` has a live (unexpired) checkpoint."""
+        with self._lock:
+            self._evict_expired()
+            return thread_id in self._last_used
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Return the requested checkpoint, or None if its thread is unknown or expired."""
+        with self._lock:
+            self._evict_expired()
+            # Unknown threads short-circuit: the parent's defaultdicts would
+            # otherwise grow an empty entry for every lookup.
+            if config["configurable"]["thread_id"] not in self._last_used:
+                return None
+            return super().get_tuple(config)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint, drop the ones it supersedes, and evict stale threads."""
+        with self._lock:
+            saved = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = config["configurable"]["thread_id"]
+            self._prune(thread_id, config["configurable"]["checkpoint_ns"], checkpoint)
+            self._last_used[thread_id] = time.monotonic()
+            self._last_used.move_to_end(thread_id)
+            self._evict_expired()
+            while len(self._last_used) > self.max_threads:
+                self.delete_thread(next(iter(self._last_used)))
+            return saved
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Save pending writes for a checkpoint."""
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete all checkpoints, writes and blobs of a thread."""
+        with self._lock:
+            super().delete_thread(thread_id)
+            self._last_used.pop(thread_id, None)
+
+    def _prune(self, thread_id: str, checkpoint_ns: str, latest: Checkpoint) -> None:
+        """Drop everything in a thread namespace that ``latest`` no longer references."""
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        for checkpoint_id in [c for c in checkpoints if c != latest["id"]]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        versions = latest["channel_versions"]
+        for key in [
+            k
+            for k in self.blobs
+            if k[0] == thread_id
+            and k[1] == checkpoint_ns
+            and versions.get(k[2]) != k[3]
+        ]:
+            del self.blobs[key]
+
+    def _evict_expired(self) -> None:
+        """Delete threads idle for longer than the TTL (oldest first)."""
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._last_used:
+            thread_id, last_used = next(iter(self._last_used.items()))
+            if last_used >= cutoff:
+                break
+            self.delete_thread(thread_id)
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """SQLite-file checkpointer bounded by an LRU thread cap and an idle TTL.
+
+    Checkpoints are stored whole (channel values included) via the saver's
+    serializer, and only the latest checkpoint of each thread namespace is kept.
+    The file is opened with :func:`~tenantfirstaid.sqlite_store.open_shared_sqlite`,
+    so every worker process on a node can share it. Async methods run the sync
+    ones in a thread.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS threads (
+            thread_id TEXT PRIMARY KEY,
+            last_used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS threads_last_used ON threads (last_used);
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            thread_id TEXT NOT NULL,
+            checkpoint_ns TEXT NOT NULL,
+            checkpoint_id TEXT NOT NULL,
+            parent_checkpoint_id TEXT,
+            type TEXT NOT NULL,
+            checkpoint BLOB NOT NULL,
+            metadata_type TEXT NOT NULL,
+            metadata BLOB NOT NULL,
+            PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+        );
+        CREATE TABLE IF NOT EXISTS writes (
+            thread_id TEXT NOT NULL,
+            checkpoint_ns TEXT NOT NULL,
+            checkpoint_id TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            channel TEXT NOT NULL,
+            type TEXT NOT NULL,
+            value BLOB NOT NULL,
+            task_path TEXT NOT NULL,
+            PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+        );
+    """
+    """Tables for thread recency, checkpoints and pending writes."""
+
+    def __init__(self, path: Path, *, max_threads: int, ttl_seconds: float) -> None:
+        """Open (creating if needed) the SQLite file at ``path``.
+
+        Args:
+            path: Database file location.
+            max_threads: Threads kept before the least recently used is evicted.
+            ttl_seconds: Idle seconds after which a thread is evicted.
+        """
+        super().__init__()
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = open_shared_sqlite(path, self._SCHEMA)
+
+    def has_thread(self, thread_id: str) -> bool:
+        """Return whether ``thread_id`` has a live (unexpired) checkpoint."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_used FROM threads WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+        return row is not None and row[0] >= time.time() - self.ttl_seconds
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Return the requested (or latest) checkpoint of a live thread, if any."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        if not self.has_thread(thread_id):
+            return None
+        query = (
+            "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint,"
+            " metadata_type, metadata FROM checkpoints"
+            " WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params: Tuple[str, ...] = (thread_id, checkpoint_ns)
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params += (checkpoint_id,)
+        query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+            if row is None:
+                return None
+            writes = self._conn.execute(
+                "SELECT task_id, channel, type, value FROM writes"
+                " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+                " ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, row[0]),
+            ).fetchall()
+        return self._to_tuple(thread_id, checkpoint_ns, row, writes)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List stored checkpoints, newest first, matching the given criteria."""
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,"
+            " type, checkpoint, metadata_type, metadata FROM checkpoints WHERE 1 = 1"
+        )
+        params: List[Any] = []
+        if config is not None:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (
+                checkpoint_ns := config["configurable"].get("checkpoint_ns")
+            ) is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                return
+            if filter:
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            with self._lock:
+                writes = self._conn.execute(
+                    "SELECT task_id, channel, type, value FROM writes"
+                    " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+                    " ORDER BY task_id, idx",
+                    (thread_id, checkpoint_ns, row[0]),
+                ).fetchall()
+            yield self._to_tuple(thread_id, checkpoint_ns, tuple(row), writes)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint, drop the ones it supersedes, and evict stale threads."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        type_, blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    blob,
+                    metadata_type,
+                    metadata_blob,
+                ),
+            )
+            for table in ("checkpoints", "writes"):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ?"
+                    " AND checkpoint_id != ?",
+                    (thread_id, checkpoint_ns, checkpoint["id"]),
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, now)
+            )
+            self._evict(now)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Save pending writes for a checkpoint."""
+        configurable = config["configurable"]
+        # Special channels (errors, interrupts) overwrite; regular writes are idempotent.
+        verb = (
+            "INSERT OR REPLACE"
+            if all(channel in WRITES_IDX_MAP for channel, _ in writes)
+            else "INSERT OR IGNORE"
+        )
+        rows = [
+            (
+                configurable["thread_id"],
+                configurable.get("checkpoint_ns", ""),
+                configurable["checkpoint_id"],
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self.serde.dumps_typed(value),
+                task_path,
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete all checkpoints and writes of a thread."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._delete_threads([thread_id])
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        """Return a channel version that sorts after ``current``.
+
+        Uses the same ``<counter>.<random>`` string format as InMemorySaver.
+        """
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Async variant of ``get_tuple``."""
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """Async variant of ``list``."""
+        tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Async variant of ``put``."""
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Async variant of ``put_writes``."""
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Async variant of ``delete_thread``."""
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def _evict(self, now: float) -> None:
+        """Delete expired threads and any beyond ``max_threads``, oldest first."""
+        stale = self._conn.execute(
+            "SELECT thread_id FROM threads WHERE last_used < ?"
+            " UNION SELECT thread_id FROM"
+            " (SELECT thread_id FROM threads ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (now - self.ttl_seconds, self.max_threads),
+        ).fetchall()
+        self._delete_threads([thread_id for (thread_id,) in stale])
+
+    def _delete_threads(self, thread_ids: List[str]) -> None:
+        """Delete the given threads from every table (caller holds the lock)."""
+        for table in ("threads", "checkpoints", "writes"):
+            self._conn.executemany(
+                f"DELETE FROM {table} WHERE thread_id = ?",
+                [(thread_id,) for thread_id in thread_ids],
+            )
+
+    def _to_tuple(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        row: Tuple[Any, ...],
+        writes: List[Tuple[Any, ...]],
+    ) -> CheckpointTuple:
+        """Deserialize a checkpoints row and its pending writes."""
+        checkpoint_id, parent_id, type_, blob, metadata_type, metadata_blob = row
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, blob)),
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+
+ThreadCheckpointer = EvictingInMemorySaver | SqliteCheckpointSaver
+"""Checkpointer types backing server-side threads."""
+
+_checkpointer: Optional[ThreadCheckpointer] = None
+"""Lazily-created process-wide checkpointer for ``CONVERSATION_STORE``."""
+_checkpointer_lock = threading.Lock()
+"""Lock for thread-safe checkpointer creation."""
+
+
+def threads_enabled() -> bool:
+    """Return whether server-side threads are enabled (``CONVERSATION_STORE``)."""
+    return CONVERSATION_STORE != "none"
+
+
+def get_checkpointer() -> ThreadCheckpointer:
+    """Return the process-wide checkpointer for ``CONVERSATION_STORE``.
+
+    Returns:
+        The configured in-memory or SQLite checkpointer.
+
+    Raises:
+        RuntimeError: If server-side threads are disabled.
+    """
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            match CONVERSATION_STORE:
+                case "memory":
+                    _checkpointer = EvictingInMemorySaver(
+                        max_threads=CONVERSATION_MAX_THREADS,
+                        ttl_seconds=CONVERSATION_TTL_SECONDS,
+                    )
+                case "sqlite":
+                    _checkpointer = SqliteCheckpointSaver(
+                        CONVERSATION_SQLITE_PATH,
+                        max_threads=CONVERSATION_MAX_THREADS,
+                        ttl_seconds=CONVERSATION_TTL_SECONDS,
+                    )
+                case _:
+                    raise RuntimeError("Server-side threads are disabled")
+        return _checkpointer
+
+
+def _serializer() -> URLSafeTimedSerializer:
+    """Return the thread-token signer."""
+    assert CONVERSATION_TOKEN_SECRET is not None, "CONVERSATION_TOKEN_SECRET is not set"
+    return URLSafeTimedSerializer(CONVERSATION_TOKEN_SECRET, salt=_TOKEN_SALT)
+
+
+def issue_thread_token(thread_id: str) -> str:
+    """Sign ``thread_id`` into an opaque, expiring token for the client."""
+    return _serializer().dumps(thread_id)
+
+
+def open_thread(token: Optional[str]) -> Tuple[str, str]:
+    """Resolve a client's thread token, or start a new thread.
+
+    Args:
+        token: The token from the client's previous turn, or None to start a
+            new thread.
+
+    Returns:
+        Tuple of (thread_id, token), where the token is freshly signed so its
+        expiry slides forward with each turn.
+
+    Raises:
+        ThreadExpiredError: If the token is not a string, is forged or expired,
+            or its thread has been evicted from the store.
+    """
+    if token is None:
+        thread_id = uuid.uuid4().hex
+        return thread_id, issue_thread_token(thread_id)
+    # The token comes straight from the request body, so it may be any JSON value.
+    if not isinstance(token, str):
+        raise ThreadExpiredError("Thread token is not a string")
+    try:
+        thread_id = _serializer().loads(token, max_age=CONVERSATION_TTL_SECONDS)
+    except BadSignature as e:  # includes SignatureExpired
+        raise ThreadExpiredError("Thread token is invalid or expired") from e
+    if not get_checkpointer().has_thread(thread_id):
+        raise ThreadExpiredError("Thread has expired or been evicted")
+    return thread_id, issue_thread_token(thread_id)
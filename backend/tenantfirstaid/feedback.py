@@ -1,6 +1,9 @@
 """User feedback handling: render the chat transcript to PDF and email it.
 
-Backs the ``POST /api/feedback`` endpoint — see :func:`send_feedback`.
+Backs the ``POST /api/feedback`` endpoint — see :func:`send_feedback`. The PDF
+stack (xhtml2pdf and reportlab) is imported on the first transcript rather than
+with the app: it adds about half a second to every worker's start, and only this
+route uses it.
 """
 
 import os
@@ -9,8 +12,6 @@ from typing import Optional, Tuple
 
 from flask import request
 from flask_mailman import EmailMessage
-from xhtml2pdf import pisa
-from xhtml2pdf.context import pisaContext
 
 MAX_ATTACHMENT_SIZE: int = 2 * 1024 * 1024
 """Maximum size in bytes for PDF attachments (2 MB)."""
@@ -25,6 +26,9 @@ def convert_html_to_pdf(html_content: str) -> Optional[bytes]:
     Returns:
         PDF content as bytes, or None if conversion failed.
     """
+    from xhtml2pdf import pisa
+    from xhtml2pdf.context import pisaContext
+
     pdf_buffer = BytesIO()
 
     pisa_status = pisa.CreatePDF(html_content, dest=pdf_buffer)
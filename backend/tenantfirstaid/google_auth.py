@@ -1,16 +1,57 @@
-"""GCP credential loading.
+"""GCP credential loading, and the process-wide credentials the server shares.
 
 Supports both file-path credentials (local development) and inline JSON
 (LangSmith Cloud, where secrets are injected as environment variable values).
+
+:func:`load_gcp_credentials` returns a new credentials object on each call, which
+must fetch its own OAuth access token on first use. The server instead shares one
+object per process through :func:`get_gcp_credentials`: the Gemini client and
+every Vertex AI Search client authenticate with it. A :class:`SharedCredentials`
+thread fetches its access token at once and refreshes it
+``CREDENTIAL_REFRESH_MARGIN_SECONDS`` before it expires. google-auth only
+refreshes a token within 225 seconds of expiry, so requests always find a valid
+one and never wait for the token exchange. A failed refresh is retried after
+``_RETRY_SECONDS``, doubling the wait after each further failure up to
+``_MAX_RETRY_SECONDS``; only the first failure in a row is logged with its
+traceback. Refresh latency and failures are exported through
+:mod:`~tenantfirstaid.metrics`.
 """
 
 import json
+import logging
+import os
+import threading
+import time
+from datetime import timezone
 from pathlib import Path
+from typing import Callable, Optional
 
 from google.api_core.client_options import ClientOptions
+from google.auth.transport.requests import Request
 from google.oauth2 import service_account
 from google.oauth2.credentials import Credentials
 
+from .constants import CREDENTIAL_REFRESH_MARGIN_SECONDS, SINGLETON
+from .metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+_refreshes = counter(
+    "credential_refreshes",
+    "Background refreshes of the shared GCP access token: success or failure.",
+    ("result",),
+)
+_refresh_seconds = histogram(
+    "credential_refresh_seconds",
+    "Time taken by background refreshes of the shared GCP access token.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+_RETRY_SECONDS = 30.0
+"""Wait before retrying a failed refresh, and the least time between refreshes."""
+_MAX_RETRY_SECONDS = 600.0
+"""Longest wait between retries while refreshes keep failing."""
+
 
 def discoveryengine_client_options(location: str) -> ClientOptions | None:
     """Return ClientOptions for the Discovery Engine API endpoint.
@@ -103,3 +144,154 @@ def load_gcp_credentials(
     # Unreachable: the wildcard case above is exhaustive and always raises.
     # The assertion silences CodeQL py/mixed-returns (implicit None return warning).
     raise AssertionError("unreachable")  # pragma: no cover
+
+
+class SharedCredentials:
+    """One credentials object for the whole process, kept fresh by a daemon thread."""
+
+    def __init__(
+        self,
+        credentials: Credentials | service_account.Credentials,
+        *,
+        refresh_margin: float = CREDENTIAL_REFRESH_MARGIN_SECONDS,
+        request: Callable[[], Request] = Request,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Wrap ``credentials``; call :meth:`start` to begin refreshing them.
+
+        Args:
+            credentials: Credentials from :func:`load_gcp_credentials`.
+            refresh_margin: Seconds before expiry to refresh the access token.
+            request: Factory for the HTTP transport used to refresh.
+            clock: Wall clock, injectable for tests.
+        """
+        self.credentials = credentials
+        self.refresh_margin = refresh_margin
+        self._request = request
+        self._clock = clock
+        self._failures = 0
+        self._stop = threading.Event()
+
+    def refresh(self) -> bool:
+        """Fetch a new access token now, recording how long it took.
+
+        Returns:
+            Whether the refresh succeeded. A failure is logged, with its traceback
+            only if the previous refresh succeeded, and the current token stays
+            in use until it expires.
+        """
+        started = time.perf_counter()
+        try:
+            self.credentials.refresh(self._request())
+        except Exception as e:
+            self._failures += 1
+            if self._failures == 1:
+                logger.exception("Refreshing the shared GCP access token failed")
+            else:
+                logger.warning(
+                    "Refreshing the shared GCP access token failed again "
+                    "(%d in a row): %s",
+                    self._failures,
+                    e,
+                )
+            _refreshes.inc(result="failure")
+            return False
+        if self._failures:
+            logger.info(
+                "Refreshed the shared GCP access token after %d failures",
+                self._failures,
+            )
+            self._failures = 0
+        _refresh_seconds.observe(time.perf_counter() - started)
+        _refreshes.inc(result="success")
+        return True
+
+    def seconds_until_refresh(self) -> float:
+        """Return the seconds until the access token should be refreshed.
+
+        Returns:
+            0 if there is no token yet, otherwise the time left until
+            ``refresh_margin`` before it expires, but at least ``_RETRY_SECONDS``.
+        """
+        if not self.credentials.token:
+            return 0.0
+        expiry = self.credentials.expiry
+        if expiry is None:
+            # A token without an expiry never needs refreshing; check back later.
+            return 60 * _RETRY_SECONDS
+        # google-auth keeps expiry as a naive UTC datetime.
+        expires_at = expiry.replace(tzinfo=timezone.utc).timestamp()
+        return max(_RETRY_SECONDS, expires_at - self.refresh_margin - self._clock())
+
+    def seconds_until_retry(self) -> float:
+        """Return the seconds to wait before retrying after failed refreshes.
+
+        Returns:
+            ``_RETRY_SECONDS``, doubled for each failure in a row after the first,
+            but at most ``_MAX_RETRY_SECONDS``.
+        """
+        backoff = _RETRY_SECONDS * 2 ** max(0, self._failures - 1)
+        return min(_MAX_RETRY_SECONDS, backoff)
+
+    def _refresh_loop(self, stop: threading.Event) -> None:
+        """Refresh the token whenever it is due until ``stop`` is set."""
+        delay = self.seconds_until_refresh()
+        while not stop.wait(delay):
+            if self.refresh():
+                delay = self.seconds_until_refresh()
+            else:
+                delay = self.seconds_until_retry()
+
+    def start(self) -> None:
+        """Start the refresher thread, which fetches a token at once if there is none."""
+        self._stop = threading.Event()
+        threading.Thread(
+            target=self._refresh_loop,
+            args=(self._stop,),
+            name="credential-refresh",
+            daemon=True,
+        ).start()
+
+    def stop(self) -> None:
+        """Stop the refresher thread."""
+        self._stop.set()
+
+
+_shared: Optional[SharedCredentials] = None
+"""Lazily-loaded process-wide credentials."""
+_shared_lock = threading.Lock()
+"""Lock for thread-safe credential loading."""
+
+
+def get_gcp_credentials() -> Credentials | service_account.Credentials:
+    """Return the process-wide credentials, loading them on first call.
+
+    The first call parses ``GOOGLE_APPLICATION_CREDENTIALS`` and starts the
+    background refresher; later calls return the same object.
+
+    Returns:
+        The shared Credentials or ServiceAccountCredentials object.
+
+    Raises:
+        ValueError: If GOOGLE_APPLICATION_CREDENTIALS is not set or cannot be
+            parsed.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            if SINGLETON.GOOGLE_APPLICATION_CREDENTIALS is None:
+                raise ValueError("GOOGLE_APPLICATION_CREDENTIALS is not set")
+            _shared = SharedCredentials(
+                load_gcp_credentials(SINGLETON.GOOGLE_APPLICATION_CREDENTIALS)
+            )
+            _shared.start()
+        return _shared.credentials
+
+
+def _restart_refresh_after_fork() -> None:
+    """Give a forked child its own refresher; the parent's thread does not exist there."""
+    if _shared is not None:
+        _shared.start()
+
+
+os.register_at_fork(after_in_child=_restart_refresh_after_fork)
@@ -1,13 +1,21 @@
 """Shared agent components and LangGraph entry point.
 
 Provides the LLM, tools, and graph factory used by both LangChainChatManager
-(web app) and `langgraph dev` / LangSmith Cloud deployment.
+(web app) and `langgraph dev` / LangSmith Cloud deployment. The web app runs
+every request through a process-wide compiled graph (:func:`get_agent_graph`);
+the user's city/state reach the system prompt per run via middleware, a second
+middleware keeps the history sent to the model within a token budget, and an
+optional third serves the invariant prompt prefix from Gemini's context cache.
+Every graph's model calls go through the shared Gemini circuit breaker, and its
+model and tool calls are timed as spans of the request being served.
 """
 
+import asyncio
+import logging
 import threading
-from collections.abc import Awaitable
+from collections.abc import Awaitable, Sequence
 from dataclasses import dataclass, field
-from typing import Any, Callable, List, NotRequired, Optional, TypedDict
+from typing import Any, Callable, List, NotRequired, Optional, Tuple, TypedDict
 
 from langchain.agents import create_agent
 from langchain.agents.middleware.types import (
@@ -15,22 +23,40 @@ from langchain.agents.middleware.types import (
     ModelRequest,
     ModelResponse,
 )
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import (
+    AIMessage,
+    AnyMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately
 from langchain_core.tools import BaseTool
 from langchain_google_genai import ChatGoogleGenerativeAI
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import START, StateGraph
 from langgraph.graph.state import CompiledStateGraph
+from langgraph.prebuilt.tool_node import ToolCallRequest
+from langgraph.types import Command
 
-from .constants import DEFAULT_INSTRUCTIONS, SINGLETON
-from .google_auth import load_gcp_credentials
+from .circuit_breaker import GEMINI, CircuitBreaker, get_breaker
+from .constants import DEFAULT_INSTRUCTIONS, HISTORY_TOKEN_BUDGET, SINGLETON
+from .conversations import get_checkpointer
+from .google_auth import get_gcp_credentials
 from .langchain_tools import (
     generate_letter,
     get_active_rag_tools,
     get_legal_aid_referrals,
     get_letter_template,
+    get_statute_section,
+    search_oregon_statutes,
 )
 from .location import OregonCity, TFAAgentStateSchema, UsaState
+from .prompt_cache import PromptPrefixCache, get_prompt_cache
+from .request_timing import count_tokens, span
+
+logger = logging.getLogger(__name__)
 
 # Deferred LLM — built on first use so the module can be imported without
 # valid GCP credentials (e.g. fork CI that only runs unit tests).
@@ -43,8 +69,9 @@ _llm_lock = threading.Lock()
 def _get_llm() -> ChatGoogleGenerativeAI:
     """Return the shared LLM instance, creating it on first call.
 
-    Thread-safe lazy initialization of the LLM using configured GCP credentials
-    and model parameters.
+    Thread-safe lazy initialization of the LLM using the shared GCP credentials
+    (see :func:`~tenantfirstaid.google_auth.get_gcp_credentials`) and model
+    parameters.
 
     Returns:
         ChatGoogleGenerativeAI instance configured with project, model, and safety settings.
@@ -58,11 +85,10 @@ def _get_llm() -> ChatGoogleGenerativeAI:
             assert SINGLETON.GOOGLE_APPLICATION_CREDENTIALS is not None, (
                 "GOOGLE_APPLICATION_CREDENTIALS is not set"
             )
-            creds = load_gcp_credentials(SINGLETON.GOOGLE_APPLICATION_CREDENTIALS)
             _llm = ChatGoogleGenerativeAI(
                 model=SINGLETON.MODEL_NAME,
                 max_tokens=SINGLETON.MAX_TOKENS,
-                credentials=creds,
+                credentials=get_gcp_credentials(),
                 project=SINGLETON.GOOGLE_CLOUD_PROJECT,
                 location=SINGLETON.GOOGLE_CLOUD_LOCATION,
                 safety_settings=SINGLETON.SAFETY_SETTINGS,
@@ -77,11 +103,13 @@ def _get_llm() -> ChatGoogleGenerativeAI:
 
 tools: List[BaseTool] = [
     *get_active_rag_tools(),
+    search_oregon_statutes,
+    get_statute_section,
     get_letter_template,
     generate_letter,
     get_legal_aid_referrals,
 ]
-"""Tools available to the agent: active RAG retrievers, letter generation, and legal aid referrals."""
+"""Tools available to the agent: active RAG retrievers, local statute search and citation lookup, letter generation, and legal aid referrals."""
 
 
 @dataclass
@@ -95,13 +123,33 @@ class TFAContext:
     system_prompt: str = field(default=DEFAULT_INSTRUCTIONS)
 
 
+def _base_prompt(ctx: Any) -> str:
+    """Return the base system prompt for a run's context.
+
+    Args:
+        ctx: The run's context: a TFAContext, a raw dict, or None.
+
+    Returns:
+        The Studio-edited prompt if one was supplied, else the default instructions.
+    """
+    # When the agent runs as a subgraph, LangGraph passes the configurable
+    # as a raw dict rather than a deserialized TFAContext instance. The web
+    # app's shared graph runs without any context at all.
+    if isinstance(ctx, TFAContext):
+        return ctx.system_prompt
+    if ctx is None:
+        return DEFAULT_INSTRUCTIONS
+    return ctx.get("system_prompt", DEFAULT_INSTRUCTIONS)
+
+
 class _SystemPromptFromContext(AgentMiddleware[Any, TFAContext]):
     """Middleware that builds the system prompt from context and agent state.
 
     Reads the base prompt from Studio's configuration panel (exposed as a TFAContext
     field) and appends location context (city/state) from the agent state, mirroring
-    what the web app does via prepare_system_prompt(). This allows lawyers to edit
-    the system prompt directly in LangSmith Studio without redeploying.
+    what prepare_system_prompt() builds. This allows lawyers to edit the system
+    prompt directly in LangSmith Studio without redeploying. When no context is
+    supplied (the web app's shared graph), the default instructions are used.
     """
 
     def _build(self, request: ModelRequest[TFAContext]) -> SystemMessage:
@@ -113,13 +161,7 @@ class _SystemPromptFromContext(AgentMiddleware[Any, TFAContext]):
         Returns:
             SystemMessage with location context from city/state appended.
         """
-        ctx = request.runtime.context
-        # When the agent runs as a subgraph, LangGraph passes the configurable
-        # as a raw dict rather than a deserialized TFAContext instance.
-        if isinstance(ctx, TFAContext):
-            base = ctx.system_prompt
-        else:
-            base = ctx.get("system_prompt", DEFAULT_INSTRUCTIONS)  # type: ignore[union-attr]
+        base = _base_prompt(request.runtime.context)
         state = UsaState.from_maybe_str(request.state.get("state"))
         city = OregonCity.from_maybe_str(request.state.get("city"))
         return _build_system_message(base, city, state)
@@ -157,6 +199,478 @@ class _SystemPromptFromContext(AgentMiddleware[Any, TFAContext]):
         return await handler(request.override(system_message=self._build(request)))
 
 
+_SUPERSEDED_LETTER: str = (
+    "[Superseded draft omitted: a later generate_letter call holds the current letter.]"
+)
+"""Replacement for the ``letter`` argument of superseded generate_letter calls."""
+_SUPERSEDED_TEMPLATE: str = "[Letter template omitted: a later generate_letter call holds the filled-in letter.]"
+"""Replacement for get_letter_template results that a letter has since been built from."""
+_SUMMARY_HEADER: str = (
+    "\nEarlier turns of this conversation, abridged to save space (retrieved passages "
+    "and superseded letter drafts are omitted; retrieve again if you need them):\n"
+)
+"""Heading for the abridged older turns appended to the system message."""
+
+
+def _turn_starts(messages: Sequence[AnyMessage]) -> List[int]:
+    """Return the index of each HumanMessage, i.e. where each turn begins."""
+    return [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+
+
+def _collapse_superseded_letters(
+    messages: Sequence[AnyMessage], before: int
+) -> List[AnyMessage]:
+    """Replace letter drafts and templates that a later letter supersedes.
+
+    Only messages before index ``before`` (the start of the current turn) are
+    touched, so the model's own in-progress tool calls are left exactly as sent.
+    Changed messages are copies; the agent state is not modified.
+
+    Args:
+        messages: Conversation history.
+        before: Index of the first message to leave untouched.
+
+    Returns:
+        The history with superseded letter content replaced by short notes.
+    """
+    letter_calls = [
+        i
+        for i, m in enumerate(messages)
+        if isinstance(m, AIMessage)
+        and any(c["name"] == "generate_letter" for c in m.tool_calls)
+    ]
+    if not letter_calls:
+        return list(messages)
+    latest = letter_calls[-1]
+    compacted: List[AnyMessage] = []
+    for i, m in enumerate(messages):
+        if i < before and i != latest and i in letter_calls:
+            assert isinstance(m, AIMessage)
+            m = m.model_copy(
+                update={
+                    "tool_calls": [
+                        {**c, "args": {"letter": _SUPERSEDED_LETTER}}
+                        if c["name"] == "generate_letter"
+                        else c
+                        for c in m.tool_calls
+                    ]
+                }
+            )
+        elif (
+            i < min(before, latest)
+            and isinstance(m, ToolMessage)
+            and m.name == "get_letter_template"
+        ):
+            m = m.model_copy(update={"content": _SUPERSEDED_TEMPLATE})
+        compacted.append(m)
+    return compacted
+
+
+def _clip(text: str, limit: int) -> str:
+    """Collapse whitespace and truncate ``text`` to ``limit`` characters."""
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def _abridge_turns(messages: Sequence[AnyMessage], token_budget: int) -> str:
+    """Abridge whole turns into one line per exchange, newest kept first.
+
+    Deterministic and model-free: each turn becomes the user's question and the
+    assistant's final text, clipped, noting any letter drafted. Tool results are
+    dropped. Turns that do not fit in ``token_budget`` are omitted, oldest first.
+
+    Args:
+        messages: Complete turns to abridge, starting at a HumanMessage.
+        token_budget: Approximate token budget for the result.
+
+    Returns:
+        Abridged turns, oldest first.
+    """
+    starts = _turn_starts(messages)
+    lines: List[str] = []
+    used = 0
+    for start, end in reversed(list(zip(starts, starts[1:] + [len(messages)]))):
+        turn = messages[start:end]
+        replies = [m.text for m in turn if isinstance(m, AIMessage) and m.text]
+        drafted = any(
+            c["name"] == "generate_letter"
+            for m in turn
+            if isinstance(m, AIMessage)
+            for c in m.tool_calls
+        )
+        line = f"- User: {_clip(turn[0].text, 300)}\n  Assistant: " + (
+            _clip(replies[-1], 600) if replies else "(no text reply)"
+        )
+        if drafted:
+            line += " [drafted a letter]"
+        cost = count_tokens_approximately([HumanMessage(line)])
+        if used + cost > token_budget:
+            lines.append(f"- ({len(starts) - len(lines)} earlier turns omitted)")
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(reversed(lines))
+
+
+class _HistoryCompaction(AgentMiddleware[Any, Any]):
+    """Middleware that keeps the history sent to the model within a token budget.
+
+    Runs after the system prompt is built. Under budget, the request is passed
+    through unchanged. Over budget, it first collapses letter drafts and templates
+    superseded by a later letter, then, if still over, keeps the most recent whole
+    turns verbatim (at least the current one) within three quarters of the budget
+    and abridges older turns into the system message. Cuts fall only on turn
+    boundaries, so tool calls stay paired with their results. Only the model
+    request is compacted; the stored conversation keeps every message. Tokens are
+    approximated with ``count_tokens_approximately``, and the saving is logged.
+    """
+
+    def __init__(self, token_budget: int) -> None:
+        """Initialize the middleware.
+
+        Args:
+            token_budget: Approximate token budget for the history; 0 disables.
+        """
+        super().__init__()
+        self.token_budget = token_budget
+
+    def _compact(
+        self, messages: Sequence[AnyMessage]
+    ) -> Optional[Tuple[List[AnyMessage], str]]:
+        """Compact ``messages`` to fit the budget.
+
+        Args:
+            messages: Conversation history of the model request.
+
+        Returns:
+            None if already within budget, else the (possibly shortened) history
+            and the abridged older turns (empty if none were dropped).
+        """
+        if self.token_budget <= 0:
+            return None
+        before = count_tokens_approximately(messages)
+        if before <= self.token_budget:
+            return None
+
+        starts = _turn_starts(messages)
+        current = starts[-1] if starts else 0
+        compacted = _collapse_superseded_letters(messages, before=current)
+        summary = ""
+        if count_tokens_approximately(compacted) > self.token_budget:
+            cut = current
+            for start in reversed(starts[:-1]):
+                if count_tokens_approximately(compacted[start:]) > (
+                    self.token_budget * 3 // 4
+                ):
+                    break
+                cut = start
+            tail_tokens = count_tokens_approximately(compacted[cut:])
+            summary = _abridge_turns(
+                compacted[:cut], max(self.token_budget - tail_tokens, 0)
+            )
+            compacted = compacted[cut:]
+
+        after = count_tokens_approximately(compacted) + (
+            count_tokens_approximately([HumanMessage(summary)]) if summary else 0
+        )
+        logger.info(
+            f"History compaction saved ~{before - after} tokens "
+            f"({before} -> {after}, budget {self.token_budget})"
+        )
+        return compacted, summary
+
+    def _override(self, request: ModelRequest[Any]) -> ModelRequest[Any]:
+        """Return the request with its history compacted, if over budget."""
+        result = self._compact(request.messages)
+        if result is None:
+            return request
+        messages, summary = result
+        if not summary:
+            return request.override(messages=messages)
+        base = request.system_message.text if request.system_message else ""
+        return request.override(
+            messages=messages,
+            system_message=SystemMessage(base + _SUMMARY_HEADER + summary),
+        )
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest[Any],
+        handler: Callable[[ModelRequest[Any]], ModelResponse],
+    ) -> ModelResponse:
+        """Wrap synchronous model call with a compacted history.
+
+        Args:
+            request: ModelRequest whose history may be compacted.
+            handler: Callable that handles the model request.
+
+        Returns:
+            ModelResponse from the handler.
+        """
+        return handler(self._override(request))
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest[Any],
+        handler: Callable[[ModelRequest[Any]], Awaitable[ModelResponse]],
+    ) -> ModelResponse:
+        """Wrap asynchronous model call with a compacted history.
+
+        Args:
+            request: ModelRequest whose history may be compacted.
+            handler: Async callable that handles the model request.
+
+        Returns:
+            ModelResponse from the handler.
+        """
+        return await handler(self._override(request))
+
+
+class _PromptPrefixCaching(AgentMiddleware[Any, TFAContext]):
+    """Middleware that serves the invariant prompt prefix from Gemini's context cache.
+
+    Runs innermost, after the prompt is built and the history compacted. The
+    system message always starts with the base prompt; everything after it (the
+    location line and any abridged turns) is the per-request suffix. The base
+    prompt and tool schemas are looked up in the
+    :class:`~tenantfirstaid.prompt_cache.PromptPrefixCache`, and on a hit the
+    request is sent with ``cached_content`` instead of a system instruction and
+    tools, the suffix moving to a leading user message. Gemini rejects a system
+    instruction or tools alongside cached content, so nothing is sent twice. On a
+    miss the request is sent unchanged.
+    """
+
+    def __init__(self, cache: PromptPrefixCache) -> None:
+        """Initialize the middleware.
+
+        Args:
+            cache: Registry of context caches to look prefixes up in.
+        """
+        super().__init__()
+        self.cache = cache
+
+    def _split(self, request: ModelRequest[TFAContext]) -> Optional[Tuple[str, str]]:
+        """Split the system message into the base prompt and per-request suffix.
+
+        Returns:
+            ``(prefix, suffix)``, or None if the system message does not start
+            with the run's base prompt (e.g. a fixed prompt) and cannot be cached.
+        """
+        if request.system_message is None:
+            return None
+        base = _base_prompt(request.runtime.context)
+        text = request.system_message.text
+        if not base or not text.startswith(base):
+            return None
+        return base, text[len(base) :]
+
+    @staticmethod
+    def _cached(
+        request: ModelRequest[TFAContext], name: str, suffix: str
+    ) -> ModelRequest[TFAContext]:
+        """Return the request rewritten to reference the cached prefix."""
+        messages: List[AnyMessage] = list(request.messages)
+        if suffix.strip():
+            messages.insert(0, HumanMessage(suffix.strip()))
+        return request.override(
+            messages=messages,
+            system_message=None,
+            tools=[],
+            model_settings={**request.model_settings, "cached_content": name},
+        )
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest[TFAContext],
+        handler: Callable[[ModelRequest[TFAContext]], ModelResponse],
+    ) -> ModelResponse:
+        """Wrap synchronous model call, referencing the cached prefix if available.
+
+        Args:
+            request: ModelRequest whose prefix may be served from the cache.
+            handler: Callable that handles the model request.
+
+        Returns:
+            ModelResponse from the handler.
+        """
+        split = self._split(request)
+        if split is None:
+            return handler(request)
+        prefix, suffix = split
+        name = self.cache.lookup(request.model, prefix, request.tools)
+        if name is None:
+            return handler(request)
+        return handler(self._cached(request, name, suffix))
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest[TFAContext],
+        handler: Callable[[ModelRequest[TFAContext]], Awaitable[ModelResponse]],
+    ) -> ModelResponse:
+        """Wrap asynchronous model call, referencing the cached prefix if available.
+
+        Creating or extending a cache is a blocking API call, so the lookup runs
+        in a worker thread.
+
+        Args:
+            request: ModelRequest whose prefix may be served from the cache.
+            handler: Async callable that handles the model request.
+
+        Returns:
+            ModelResponse from the handler.
+        """
+        split = self._split(request)
+        if split is None:
+            return await handler(request)
+        prefix, suffix = split
+        name = await asyncio.to_thread(
+            self.cache.lookup, request.model, prefix, request.tools
+        )
+        if name is None:
+            return await handler(request)
+        return await handler(self._cached(request, name, suffix))
+
+
+class _CircuitBreaking(AgentMiddleware[Any, Any]):
+    """Middleware that sends every model call through a circuit breaker.
+
+    Runs outermost, so while the breaker is open a run fails at once with
+    :class:`~tenantfirstaid.circuit_breaker.CircuitOpenError` before any prompt
+    is built or cache looked up, and the chat manager can answer with a fallback
+    message instead of waiting out the model's timeouts.
+    """
+
+    def __init__(self, breaker: CircuitBreaker) -> None:
+        """Initialize the middleware.
+
+        Args:
+            breaker: Breaker recording the outcome of each model call.
+        """
+        super().__init__()
+        self.breaker = breaker
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest[Any],
+        handler: Callable[[ModelRequest[Any]], ModelResponse],
+    ) -> ModelResponse:
+        """Wrap synchronous model call, failing fast while the breaker is open.
+
+        Args:
+            request: ModelRequest to pass through.
+            handler: Callable that handles the model request.
+
+        Returns:
+            ModelResponse from the handler.
+
+        Raises:
+            CircuitOpenError: If the breaker is open.
+        """
+        return self.breaker.call(lambda: handler(request))
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest[Any],
+        handler: Callable[[ModelRequest[Any]], Awaitable[ModelResponse]],
+    ) -> ModelResponse:
+        """Wrap asynchronous model call, failing fast while the breaker is open.
+
+        Args:
+            request: ModelRequest to pass through.
+            handler: Async callable that handles the model request.
+
+        Returns:
+            ModelResponse from the handler.
+
+        Raises:
+            CircuitOpenError: If the breaker is open.
+        """
+        return await self.breaker.acall(lambda: handler(request))
+
+
+class _CallTiming(AgentMiddleware[Any, Any]):
+    """Middleware that times every model and tool call as a request span.
+
+    Also counts the tokens each model call reports using. Spans are recorded
+    with :func:`~tenantfirstaid.request_timing.span`, against the request whose
+    :class:`~tenantfirstaid.request_timing.RequestTiming` is in the run's
+    ``configurable``. Runs just inside the circuit breaker, so calls rejected by
+    an open breaker are not counted as model calls.
+    """
+
+    def wrap_model_call(
+        self,
+        request: ModelRequest[Any],
+        handler: Callable[[ModelRequest[Any]], ModelResponse],
+    ) -> ModelResponse:
+        """Wrap synchronous model call, timing it and counting its tokens.
+
+        Args:
+            request: ModelRequest to pass through.
+            handler: Callable that handles the model request.
+
+        Returns:
+            ModelResponse from the handler.
+        """
+        with span("model", "model"):
+            response = handler(request)
+        count_tokens(response.result)
+        return response
+
+    async def awrap_model_call(
+        self,
+        request: ModelRequest[Any],
+        handler: Callable[[ModelRequest[Any]], Awaitable[ModelResponse]],
+    ) -> ModelResponse:
+        """Wrap asynchronous model call, timing it and counting its tokens.
+
+        Args:
+            request: ModelRequest to pass through.
+            handler: Async callable that handles the model request.
+
+        Returns:
+            ModelResponse from the handler.
+        """
+        with span("model", "model"):
+            response = await handler(request)
+        count_tokens(response.result)
+        return response
+
+    def wrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], ToolMessage | Command[Any]],
+    ) -> ToolMessage | Command[Any]:
+        """Wrap synchronous tool call, timing it under the tool's name.
+
+        Args:
+            request: ToolCallRequest to pass through.
+            handler: Callable that executes the tool.
+
+        Returns:
+            The tool's ToolMessage or Command.
+        """
+        with span("tool", request.tool_call["name"]):
+            return handler(request)
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command[Any]]],
+    ) -> ToolMessage | Command[Any]:
+        """Wrap asynchronous tool call, timing it under the tool's name.
+
+        Args:
+            request: ToolCallRequest to pass through.
+            handler: Async callable that executes the tool.
+
+        Returns:
+            The tool's ToolMessage or Command.
+        """
+        with span("tool", request.tool_call["name"]):
+            return await handler(request)
+
+
 def _build_system_message(
     base_prompt: str, city: Optional[OregonCity], state: UsaState
 ) -> SystemMessage:
@@ -164,6 +678,8 @@ def _build_system_message(
 
     Appends a line indicating the user's city (if specified) and state to the base
     prompt, helping the agent tailor responses to local laws and jurisdictions.
+    The base prompt is kept as an unchanged prefix so it can be served from the
+    prompt cache (see ``_PromptPrefixCaching``).
 
     Args:
         base_prompt: Base system prompt text.
@@ -193,15 +709,16 @@ def prepare_system_prompt(city: Optional[OregonCity], state: UsaState) -> System
 
 def create_graph(
     system_prompt: Optional[SystemMessage] = None,
-    checkpointer: Optional[InMemorySaver] = None,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
 ) -> CompiledStateGraph[Any, Any, Any, Any]:
     """Create a Tenant First Aid agent graph.
 
     Args:
-        system_prompt: System prompt to use. When provided (e.g. from the web
-            app with location context), the middleware is skipped. When None
-            (LangGraph deployment), the middleware reads the prompt from Studio
-            context instead.
+        system_prompt: System prompt to use. When provided, the middleware is
+            skipped and the prompt is fixed for the lifetime of the graph. When
+            None (the web app's shared graph and LangGraph deployment), the
+            middleware builds the prompt per run from Studio context, or the
+            default instructions, plus the city/state in the agent state.
         checkpointer: Optional checkpointer for multi-turn conversations.
 
     Returns:
@@ -210,30 +727,81 @@ def create_graph(
     model = _get_llm()
 
     if system_prompt is not None:
-        # Web app path: system prompt has location context baked in.
+        # Fixed-prompt path: system prompt has location context baked in.
         return create_agent(
             model,
             tools,
             system_prompt=system_prompt,
+            middleware=[
+                _CircuitBreaking(get_breaker(GEMINI)),
+                _CallTiming(),
+                _HistoryCompaction(HISTORY_TOKEN_BUDGET),
+            ],
             state_schema=TFAAgentStateSchema,
             checkpointer=checkpointer,
         )
 
-    # LangGraph deployment path: middleware injects the prompt from
-    # Studio's editable configuration panel. context_schema is NOT set here
+    # Middleware path: the prompt comes from Studio's editable configuration
+    # panel (deployment) or DEFAULT_INSTRUCTIONS (web app), with the location
+    # read from the agent state on every run. context_schema is NOT set here
     # because this graph runs as a subgraph inside graph() — the outer graph
     # owns the context and propagates it. Declaring it on both levels causes
     # LangSmith to patch execution_info during __start__ before a run context
-    # exists.
+    # exists. Middleware runs outermost first, so an open breaker fails the call
+    # before any work (or timing), compaction sees the built prompt and prefix
+    # caching sees the final system message.
+    prompt_cache = get_prompt_cache()
     return create_agent(
         model,
         tools,
-        middleware=[_SystemPromptFromContext()],
+        middleware=[
+            _CircuitBreaking(get_breaker(GEMINI)),
+            _CallTiming(),
+            _SystemPromptFromContext(),
+            _HistoryCompaction(HISTORY_TOKEN_BUDGET),
+            *([_PromptPrefixCaching(prompt_cache)] if prompt_cache else []),
+        ],
         state_schema=TFAAgentStateSchema,
         checkpointer=checkpointer,
     )
 
 
+_agent_graph: Optional[CompiledStateGraph[Any, Any, Any, Any]] = None
+"""Lazily-compiled stateless agent graph shared by every web request in this process."""
+_threaded_agent_graph: Optional[CompiledStateGraph[Any, Any, Any, Any]] = None
+"""Lazily-compiled agent graph with the server-side thread checkpointer attached."""
+_agent_graph_lock = threading.Lock()
+"""Lock for thread-safe agent graph compilation."""
+
+
+def get_agent_graph(threaded: bool = False) -> CompiledStateGraph[Any, Any, Any, Any]:
+    """Return a process-wide compiled agent graph, compiling it on first call.
+
+    Compiling the agent (tool-schema conversion, node wiring, validation) is the
+    expensive part of serving a query, so it happens once per worker rather than
+    once per request. The graph holds no per-user state: the location-aware system
+    prompt is built per run by the middleware from the ``city``/``state`` passed
+    in the agent input, so one compiled graph safely serves concurrent requests.
+
+    Args:
+        threaded: Return the graph compiled with the server-side thread
+            checkpointer (see :mod:`tenantfirstaid.conversations`), which must be
+            run with a ``thread_id``. Otherwise return the stateless graph.
+
+    Returns:
+        The shared compiled LangGraph agent.
+    """
+    global _agent_graph, _threaded_agent_graph
+    with _agent_graph_lock:
+        if threaded:
+            if _threaded_agent_graph is None:
+                _threaded_agent_graph = create_graph(checkpointer=get_checkpointer())
+            return _threaded_agent_graph
+        if _agent_graph is None:
+            _agent_graph = create_graph()
+        return _agent_graph
+
+
 class _DeploymentInput(TypedDict):
     """Input schema for the LangGraph deployment wrapper graph.
 
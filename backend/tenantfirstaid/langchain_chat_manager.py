@@ -4,9 +4,11 @@ This module provides the web application's chat interface, wrapping the shared
 agent graph with per-session location context and streaming support.
 """
 
+import asyncio
 import logging
 import time
-from typing import Any, Dict, Generator, List, Optional, cast
+import uuid
+from typing import Any, AsyncGenerator, Dict, Generator, Iterator, List, Optional, cast
 
 import httpcore
 import httpx
@@ -14,65 +16,82 @@ from langchain_core.messages import (
     AIMessage,
     AnyMessage,
     ContentBlock,
+    HumanMessage,
     NonStandardContentBlock,
-    SystemMessage,
+    TextContentBlock,
     ToolMessage,
+    convert_to_messages,
 )
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph.state import CompiledStateGraph
-
-from .graph import create_graph, prepare_system_prompt
+from langgraph.types import StreamMode
+
+from .circuit_breaker import CircuitOpenError
+from .constants import (
+    RAG_PREFETCH,
+    SERVICE_BUSY_MESSAGE,
+    STREAM_TOKENS,
+    TOOL_CALL_CONCURRENCY,
+)
+from .conversations import get_checkpointer
+from .graph import get_agent_graph
+from .langchain_tools import prefetch_city_state_laws
 from .location import OregonCity, UsaState
+from .rag_prefetch import PREFETCH_CONFIG_KEY, RagPrefetch
+from .request_timing import (
+    TIMING_CONFIG_KEY,
+    RequestTiming,
+    count_retry,
+    mark_degraded,
+)
 
 
 class LangChainChatManager:
-    """Per-session wrapper around the shared agent graph, with streaming.
+    """Per-request driver for the shared agent graph, with streaming.
 
-    On first use it builds a location-aware agent via
-    :func:`~tenantfirstaid.graph.create_graph`, baking the user's city/state into
-    the system prompt. ``generate_streaming_response`` then streams the agent in
+    Runs the process-wide compiled agent from
+    :func:`~tenantfirstaid.graph.get_agent_graph`, passing the user's city/state in
+    the agent input so the graph's middleware can build the location-aware system
+    prompt per run. ``generate_streaming_response`` then streams the agent in
     ``["updates", "custom"]`` mode, yielding raw LangChain content blocks that
-    :class:`~tenantfirstaid.chat.ChatView` classifies into typed response chunks.
-    A reset connection is retried up to twice, but never after output has begun,
-    so the client never receives duplicated content.
+    :class:`~tenantfirstaid.chat.ChatView` classifies into typed response chunks;
+    ``agenerate_streaming_response`` is its asyncio twin, used by
+    :mod:`tenantfirstaid.asgi`. With ``stream_tokens``, ``"messages"`` mode is
+    added and text and reasoning are forwarded token by token as the model
+    produces them, instead of once each model message is complete. A reset
+    connection is retried up to twice, but never after output has begun, so the
+    client never receives duplicated content. While the model's circuit breaker
+    is open, the response is ``SERVICE_BUSY_MESSAGE``, sent at once.
+    When a ``thread_id`` is given, the checkpointed graph is used and ``messages``
+    need only hold the new turn. With ``RAG_PREFETCH``, a first turn's question is
+    searched while the model is still choosing its own retrieval query (see
+    :mod:`~tenantfirstaid.rag_prefetch`). A caller's
+    :class:`~tenantfirstaid.request_timing.RequestTiming` is passed to the run,
+    which records its model calls, tool calls and retries.
     """
 
     logger: logging.Logger
     """Logger instance for debugging agent operations."""
     agent: Optional[CompiledStateGraph] = None
-    """Lazily-initialized compiled LangGraph agent."""
+    """The shared compiled LangGraph agent used by the latest call."""
+    stream_tokens: bool
+    """Whether text and reasoning are forwarded token by token."""
 
-    def __init__(self) -> None:
+    def __init__(self, stream_tokens: bool = STREAM_TOKENS) -> None:
         """Initialize the LangChain chat manager.
 
-        Sets up logger and initializes agent/system_prompt to None, which are
-        lazily initialized on first streaming response.
-        """
-
-        self.logger = logging.getLogger(__name__)
-
-        self.agent = None
-        self.system_prompt: Optional[SystemMessage] = None
-
-    def __create_agent_for_session(
-        self, city: Optional[OregonCity], state: UsaState, thread_id: Optional[str]
-    ) -> CompiledStateGraph:
-        """Create an agent instance configured for the user's location.
+        Sets up the logger. The agent is fetched from the process-wide graphs on
+        use, so constructing a manager per request costs nothing.
 
         Args:
-            city: User's [city](`~location.OregonCity`) (optional, e.g., "portland").
-            state: User's [state](`~location.UsaState`) (e.g., "or").
-            thread_id: Optional thread ID for multi-turn conversation persistence.
-
-        Returns:
-            Compiled LangGraph agent configured with tools and location-aware system prompt.
+            stream_tokens: Forward text and reasoning as the model streams them
+                (default ``STREAM_TOKENS``), rather than per completed message.
         """
 
-        self.system_prompt = prepare_system_prompt(city, state)
+        self.logger = logging.getLogger(__name__)
 
-        return create_graph(
-            system_prompt=self.system_prompt,
-        )
+        self.agent = None
+        self.stream_tokens = stream_tokens
 
     def generate_response(
         self,
@@ -95,8 +114,7 @@ class LangChainChatManager:
         Raises:
             NotImplementedError: Always.
         """
-        if self.agent is None:
-            self.agent = self.__create_agent_for_session(city, state, thread_id)
+        self.agent = get_agent_graph(threaded=thread_id is not None)
 
         raise NotImplementedError
 
@@ -111,6 +129,7 @@ class LangChainChatManager:
         city: Optional[OregonCity],
         state: UsaState,
         thread_id: Optional[str],
+        timing: Optional[RequestTiming] = None,
     ) -> Generator[ContentBlock, Any, None]:
         """Generate streaming response using LangChain agent.
 
@@ -120,44 +139,229 @@ class LangChainChatManager:
                       'function', 'tool', 'system', or 'developer'.
             city: User's [city](`~location.OregonCity`).
             state: User's [state](`~location.UsaState`).
-            thread_id: Optional thread ID for conversation persistence.
+            thread_id: Optional thread ID for conversation persistence. When set,
+                the thread's checkpointed history is resumed and ``messages``
+                holds only the new turn.
+            timing: Optional latency breakdown of the request, which records
+                the run's spans and retries.
 
         Yields:
             Response chunks as they are generated.
         """
 
-        if self.agent is None:
-            self.agent = self.__create_agent_for_session(city, state, thread_id)
+        self.agent = get_agent_graph(threaded=thread_id is not None)
+        config = self.__make_config(thread_id, messages, timing)
+        prefetch = self.__start_prefetch(messages, city, state, thread_id, config)
 
-        if thread_id is not None:
-            config: RunnableConfig = RunnableConfig(
-                configurable={"thread_id": thread_id}
-            )
-        else:
-            config = RunnableConfig()
+        # Snapshot so retries start from a clean message state.
+        messages_at_start = list(messages)
+
+        try:
+            for attempt in range(self._MAX_STREAM_RETRIES + 1):
+                if attempt > 0:
+                    self.__prepare_retry(messages, messages_at_start, attempt, timing)
+                    time.sleep(self._RETRY_DELAY_SECONDS)
+                try:
+                    yielded_any = False
+                    for chunk in self.__stream_once(messages, city, state, config):
+                        yielded_any = True
+                        yield chunk
+                    return
+                except CircuitOpenError as e:
+                    mark_degraded(timing)
+                    yield self.__service_busy(e)
+                    return
+                except (httpcore.ReadError, httpx.ReadError, ConnectionError):
+                    # Don't retry after partial output — the client would receive duplicates.
+                    if attempt >= self._MAX_STREAM_RETRIES or yielded_any:
+                        raise
+        finally:
+            if prefetch is not None:
+                prefetch.finish()
+
+    async def agenerate_streaming_response(
+        self,
+        messages: List[AnyMessage | Dict[str, Any]],
+        city: Optional[OregonCity],
+        state: UsaState,
+        thread_id: Optional[str],
+        timing: Optional[RequestTiming] = None,
+    ) -> AsyncGenerator[ContentBlock, None]:
+        """Asynchronous twin of [`generate_streaming_response`](`~langchain_chat_manager.LangChainChatManager.generate_streaming_response`).
+
+        Streams the same content blocks via ``agent.astream``, so a request waiting
+        on the model holds a coroutine rather than a worker thread. Retry behaviour
+        is identical: a reset connection is retried, but never after output,
+        and an open model circuit breaker ends the stream with
+        ``SERVICE_BUSY_MESSAGE``.
+
+        Args:
+            messages: Chat message history (same format as the sync variant).
+            city: User's [city](`~location.OregonCity`).
+            state: User's [state](`~location.UsaState`).
+            thread_id: Optional thread ID for conversation persistence.
+            timing: Optional latency breakdown of the request.
+
+        Yields:
+            Response chunks as they are generated.
+        """
+
+        self.agent = get_agent_graph(threaded=thread_id is not None)
+        config = self.__make_config(thread_id, messages, timing)
+        prefetch = self.__start_prefetch(messages, city, state, thread_id, config)
 
         # Snapshot so retries start from a clean message state.
         messages_at_start = list(messages)
 
-        for attempt in range(self._MAX_STREAM_RETRIES + 1):
-            if attempt > 0:
-                messages.clear()
-                messages.extend(messages_at_start)
-                self.logger.warning(
-                    "Retrying stream after connection reset "
-                    f"(attempt {attempt + 1}/{self._MAX_STREAM_RETRIES + 1})"
-                )
-                time.sleep(self._RETRY_DELAY_SECONDS)
-            try:
-                yielded_any = False
-                for chunk in self.__stream_once(messages, city, state, config):
-                    yielded_any = True
-                    yield chunk
-                return
-            except (httpcore.ReadError, httpx.ReadError, ConnectionError):
-                # Don't retry after partial output — the client would receive duplicates.
-                if attempt >= self._MAX_STREAM_RETRIES or yielded_any:
-                    raise
+        try:
+            for attempt in range(self._MAX_STREAM_RETRIES + 1):
+                if attempt > 0:
+                    self.__prepare_retry(messages, messages_at_start, attempt, timing)
+                    await asyncio.sleep(self._RETRY_DELAY_SECONDS)
+                try:
+                    yielded_any = False
+                    async for chunk in self.__astream_once(
+                        messages, city, state, config
+                    ):
+                        yielded_any = True
+                        yield chunk
+                    return
+                except CircuitOpenError as e:
+                    mark_degraded(timing)
+                    yield self.__service_busy(e)
+                    return
+                except (httpcore.ReadError, httpx.ReadError, ConnectionError):
+                    # Don't retry after partial output — the client would receive duplicates.
+                    if attempt >= self._MAX_STREAM_RETRIES or yielded_any:
+                        raise
+        finally:
+            if prefetch is not None:
+                prefetch.finish()
+
+    @staticmethod
+    def __make_config(
+        thread_id: Optional[str],
+        messages: List[AnyMessage | Dict[str, Any]],
+        timing: Optional[RequestTiming] = None,
+    ) -> RunnableConfig:
+        """Build the LangGraph run configuration for a request.
+
+        The agent dispatches each tool call of a model turn as its own task, and
+        LangGraph runs a step's tasks concurrently (on a thread pool, or as
+        asyncio tasks on the async path), appending results in call order.
+        ``max_concurrency`` caps how many run at once for this request.
+
+        For a checkpointed thread, messages without an ID are given one first: the
+        ``add_messages`` reducer replaces by ID, so a retried attempt cannot append
+        the same new message to the stored history twice.
+
+        The request's timing, if any, is passed in ``configurable``, where the
+        graph's middleware and the retrieval tools look for it.
+
+        Args:
+            thread_id: Optional thread ID for conversation persistence.
+            messages: The request's messages, given IDs in place if threaded.
+            timing: Optional latency breakdown of the request.
+
+        Returns:
+            RunnableConfig carrying the concurrency cap, and the thread ID and
+            timing, if any.
+        """
+        configurable: Dict[str, Any] = {}
+        if timing is not None:
+            configurable[TIMING_CONFIG_KEY] = timing
+        if thread_id is not None:
+            for m in messages:
+                if isinstance(m, dict):
+                    m.setdefault("id", str(uuid.uuid4()))
+                elif m.id is None:
+                    m.id = str(uuid.uuid4())
+            configurable["thread_id"] = thread_id
+        if not configurable:
+            return RunnableConfig(max_concurrency=TOOL_CALL_CONCURRENCY)
+        return RunnableConfig(
+            max_concurrency=TOOL_CALL_CONCURRENCY, configurable=configurable
+        )
+
+    @staticmethod
+    def __start_prefetch(
+        messages: List[AnyMessage | Dict[str, Any]],
+        city: Optional[OregonCity],
+        state: UsaState,
+        thread_id: Optional[str],
+        config: RunnableConfig,
+    ) -> Optional[RagPrefetch]:
+        """Start a retrieval for a first turn's question and pass it to the tools.
+
+        Only a new conversation qualifies: the request holds no model reply and,
+        if threaded, the thread has no stored history. Later turns are mostly
+        follow-ups the model answers without retrieving. The prefetch is added to
+        ``config``'s ``configurable``, where the retrieval tool looks for it.
+
+        Args:
+            messages: The request's messages.
+            city: User's [city](`~location.OregonCity`).
+            state: User's [state](`~location.UsaState`).
+            thread_id: Optional thread ID for conversation persistence.
+            config: The run configuration, updated in place.
+
+        Returns:
+            The started prefetch, or None if none was started.
+        """
+        if not RAG_PREFETCH or not messages:
+            return None
+        if thread_id is not None and get_checkpointer().has_thread(thread_id):
+            return None
+        history = convert_to_messages(messages)
+        question = history[-1]
+        if not isinstance(question, HumanMessage) or any(
+            isinstance(m, AIMessage) for m in history
+        ):
+            return None
+        if not question.text.strip():
+            return None
+        prefetch = prefetch_city_state_laws(question.text, state, city)
+        if prefetch is not None:
+            config["configurable"] = {
+                **config.get("configurable", {}),
+                PREFETCH_CONFIG_KEY: prefetch,
+            }
+        return prefetch
+
+    def __service_busy(self, error: CircuitOpenError) -> TextContentBlock:
+        """Log a run failed fast by an open circuit breaker and return the fallback.
+
+        Args:
+            error: The breaker's rejection.
+
+        Returns:
+            A text block holding ``SERVICE_BUSY_MESSAGE``.
+        """
+        self.logger.warning(f"Answering with the busy message: {error}")
+        return TextContentBlock(type="text", text=SERVICE_BUSY_MESSAGE)
+
+    def __prepare_retry(
+        self,
+        messages: List[AnyMessage | Dict[str, Any]],
+        messages_at_start: List[AnyMessage | Dict[str, Any]],
+        attempt: int,
+        timing: Optional[RequestTiming],
+    ) -> None:
+        """Restore the message list to its pre-attempt snapshot and log the retry.
+
+        Args:
+            messages: Caller's message list, mutated in place.
+            messages_at_start: Snapshot taken before the first attempt.
+            attempt: Zero-based index of the attempt about to start.
+            timing: Optional latency breakdown of the request, counting the retry.
+        """
+        count_retry("stream", timing)
+        messages.clear()
+        messages.extend(messages_at_start)
+        self.logger.warning(
+            "Retrying stream after connection reset "
+            f"(attempt {attempt + 1}/{self._MAX_STREAM_RETRIES + 1})"
+        )
 
     def __stream_once(
         self,
@@ -168,8 +372,9 @@ class LangChainChatManager:
     ) -> Generator[ContentBlock, Any, None]:
         """Stream agent output for a single attempt without retry logic.
 
-        Processes the agent stream in ``["updates", "custom"]`` mode and yields
-        parsed content blocks, converting tool outputs to appropriate response types.
+        Processes the agent stream in ``["updates", "custom"]`` mode (plus
+        ``"messages"`` when streaming tokens) and yields parsed content blocks,
+        converting tool outputs to appropriate response types.
         Internal helper used by generate_streaming_response to handle single-attempt
         streaming with retries handled at the higher level.
 
@@ -193,61 +398,161 @@ class LangChainChatManager:
                 "city": city,
                 "state": state,
             },
-            stream_mode=["updates", "custom"],
+            stream_mode=self.__stream_modes(),
             config=config,
         ):
-            # Custom chunks are emitted directly by tools (e.g. generate_letter).
-            if mode == "custom":
-                self.logger.debug(
-                    f"Received custom chunk from tool: {cast(Dict[str, Any], chunk).get('type')}"
-                )
-                yield NonStandardContentBlock(
-                    type="non_standard", value=cast(Dict[str, Any], chunk)
-                )
-                continue
-
-            # outer dict key changes with internal messages (Model, Tool, ...)
-            chunk = cast(Dict[str, Any], chunk)
-            if not chunk:
-                continue
-            chunk_k = next(iter(chunk))
-
-            # TODO: refactor this match/yield into a function
-            # Specialize handling/printing based on each message class/type
-            for m in chunk[chunk_k]["messages"]:
-                # Extend caller's list so tool messages are included in the agent's running context.
-                messages.append(m)
-
-                match m:
-                    # Messages sent by the Model
-                    case AIMessage():
-                        for b in m.content_blocks:
-                            match b["type"]:
-                                # text responses from the Model
-                                case "text":
-                                    self.logger.debug(b)
+            yield from self.__blocks_from_stream_part(mode, chunk, messages)
+
+    async def __astream_once(
+        self,
+        messages: List[AnyMessage | Dict[str, Any]],
+        city: Optional[OregonCity],
+        state: UsaState,
+        config: RunnableConfig,
+    ) -> AsyncGenerator[ContentBlock, None]:
+        """Asynchronous twin of ``__stream_once``, driving ``agent.astream``.
+
+        Args:
+            messages: Chat message history.
+            city: User's [city](`~location.OregonCity`).
+            state: User's [state](`~location.UsaState`).
+            config: LangGraph runtime configuration (e.g., thread_id).
+
+        Yields:
+            Parsed content blocks (text, reasoning, tool calls, etc.).
+
+        Raises:
+            Connection errors (not caught; retry logic is in the caller).
+        """
+        assert self.agent is not None
+        async for mode, chunk in self.agent.astream(
+            input={
+                "messages": messages,
+                "city": city,
+                "state": state,
+            },
+            stream_mode=self.__stream_modes(),
+            config=config,
+        ):
+            for block in self.__blocks_from_stream_part(mode, chunk, messages):
+                yield block
+
+    def __stream_modes(self) -> List[StreamMode]:
+        """Return the LangGraph stream modes for this manager's streaming style."""
+        if self.stream_tokens:
+            return ["updates", "custom", "messages"]
+        return ["updates", "custom"]
+
+    def __blocks_from_token_chunk(self, chunk: Any) -> Iterator[ContentBlock]:
+        """Yield the text and reasoning deltas of one ``messages`` stream part.
+
+        Only messages from the agent's ``model`` node are forwarded: token chunks
+        as the model streams them, or the whole AIMessage if the model did not
+        stream. Tool-call fragments are dropped, exactly as whole tool calls are
+        in ``updates`` mode, and so are the messages of other nodes (e.g.
+        ToolMessages).
+
+        Args:
+            chunk: ``(message, metadata)`` pair from ``messages`` mode.
+
+        Yields:
+            Text and reasoning content blocks.
+        """
+        message, metadata = chunk
+        if not isinstance(message, AIMessage):
+            return
+        if metadata.get("langgraph_node") != "model":
+            return
+        for b in message.content_blocks:
+            match b["type"]:
+                case "text":
+                    if b["text"]:
+                        yield b
+                case "reasoning":
+                    if b.get("reasoning"):
+                        yield b
+
+    def __blocks_from_stream_part(
+        self,
+        mode: str,
+        chunk: Any,
+        messages: List[AnyMessage | Dict[str, Any]],
+    ) -> Iterator[ContentBlock]:
+        """Turn one ``(mode, chunk)`` stream part into the content blocks to forward.
+
+        Shared by the sync and async streaming paths. Messages from ``updates``
+        parts are appended to ``messages`` so tool results stay in the running
+        context; ``custom`` parts (tool-emitted chunks) are wrapped as
+        NonStandardContentBlock. When streaming tokens, text and reasoning come
+        from ``messages`` parts, and the completed AIMessages in ``updates``
+        parts only extend the history, so nothing is sent twice.
+
+        Args:
+            mode: Stream mode that produced the part (``updates``, ``custom`` or
+                ``messages``).
+            chunk: The stream part payload.
+            messages: Chat message history, extended in place.
+
+        Yields:
+            Content blocks to forward to the client.
+        """
+        if mode == "messages":
+            yield from self.__blocks_from_token_chunk(chunk)
+            return
+
+        # Custom chunks are emitted directly by tools (e.g. generate_letter).
+        if mode == "custom":
+            self.logger.debug(
+                f"Received custom chunk from tool: {cast(Dict[str, Any], chunk).get('type')}"
+            )
+            yield NonStandardContentBlock(
+                type="non_standard", value=cast(Dict[str, Any], chunk)
+            )
+            return
+
+        # outer dict key changes with internal messages (Model, Tool, ...)
+        chunk = cast(Dict[str, Any], chunk)
+        if not chunk:
+            return
+        chunk_k = next(iter(chunk))
+
+        # Specialize handling/printing based on each message class/type
+        for m in chunk[chunk_k]["messages"]:
+            # Extend caller's list so tool messages are included in the agent's running context.
+            messages.append(m)
+
+            match m:
+                # Messages sent by the Model
+                case AIMessage():
+                    for b in m.content_blocks:
+                        match b["type"]:
+                            # text responses from the Model
+                            case "text":
+                                self.logger.debug(b)
+                                if not self.stream_tokens:
                                     yield b
-                                # reasoning steps (aka "thoughts") from the Model
-                                case "reasoning":
-                                    if "reasoning" in b:
-                                        self.logger.debug(b)
+                            # reasoning steps (aka "thoughts") from the Model
+                            case "reasoning":
+                                if "reasoning" in b:
+                                    self.logger.debug(b)
+                                    if not self.stream_tokens:
                                         yield b
-                                case "tool_call":
-                                    self.logger.info(b)
-                                case "server_tool_call":
-                                    self.logger.info(b)
-
-                    # Messages sent back by a tool
-                    case ToolMessage():
-                        for b in m.content_blocks:
-                            match b["type"]:
-                                case "text":
-                                    self.logger.info(b["text"])
-                                case "invalid_tool_call":
-                                    self.logger.error(b)
-                                case _:
-                                    self.logger.debug(f"ToolMessage: {m}")
-
-                    # Fall-through case
-                    case _:
-                        self.logger.debug(f"{type(m)}: {m}")
+                            case "tool_call":
+                                self.logger.info(b)
+                            case "server_tool_call":
+                                self.logger.info(b)
+
+                # Messages sent back by a tool
+                case ToolMessage():
+                    for b in m.content_blocks:
+                        match b["type"]:
+                            case "text":
+                                self.logger.info(b["text"])
+                            case "invalid_tool_call":
+                                self.logger.error(b)
+                            case _:
+                                self.logger.debug(f"ToolMessage: {m}")
+
+                # Fall-through case
+                case _:
+                    self.logger.debug(f"{type(m)}: {m}")
@@ -4,31 +4,47 @@ This module defines Tools for an Agent to call
 
 import json
 import logging
-from typing import Callable, Optional, Type, cast
+import threading
+from functools import partial
+from typing import Any, Callable, Dict, NotRequired, Optional, Type, TypedDict, cast
 
 import httpx
 from google.api_core import exceptions as google_exceptions
-from google.oauth2 import service_account
-from google.oauth2.credentials import Credentials
+from langchain_core.runnables import ensure_config
 from langchain_core.tools import BaseTool, tool
 from langchain_google_community import VertexAISearchRetriever
 from langgraph.config import get_stream_writer
 from pydantic import BaseModel, Field
 from tenacity import (
+    RetryCallState,
     retry,
     retry_if_exception_type,
     stop_after_attempt,
+    stop_before_delay,
     wait_exponential,
 )
 
+from .circuit_breaker import VERTEX_SEARCH, CircuitOpenError, get_breaker
+from .citations import (
+    cites_only,
+    parse_citations,
+    resolve_citation,
+    resolve_query_citations,
+)
 from .constants import (
     LETTER_TEMPLATE,
+    RAG_RETRY_DEADLINE_SECONDS,
     SINGLETON,
     DatastoreKey,
 )
-from .google_auth import load_gcp_credentials
+from .google_auth import get_gcp_credentials
 from .location import OregonCity, UsaState
+from .rag_cache import get_rag_cache, rag_cache_key
+from .rag_hedging import hedged_call
+from .rag_prefetch import PREFETCH_CONFIG_KEY, RagPrefetch, start_prefetch
 from .referrals import REFERRALS
+from .request_timing import count_retry, mark_degraded, span
+from .statute_index import get_statute_index, tokenize
 
 _LEGAL_AID_REFERRALS_JSON: str = json.dumps(
     [r.model_dump(mode="json", exclude_none=True) for r in REFERRALS]
@@ -76,18 +92,79 @@ def repair_mojibake(text: str) -> str:
     return repaired
 
 
+_retriever_pool: Dict[str, VertexAISearchRetriever] = {}
+"""Process-wide Vertex AI Search retrievers, one per datastore ID."""
+_retriever_pool_lock = threading.Lock()
+"""Lock for thread-safe retriever creation."""
+
+
+def _pooled_retriever(data_store_id: str) -> VertexAISearchRetriever:
+    """Return the process-wide retriever for a datastore, creating it on first call.
+
+    Building a retriever (which opens its own ``SearchServiceClient`` channel) is
+    the expensive part of a retrieval's setup, so it happens once per datastore
+    per worker. Every retriever authenticates with the process-wide
+    credentials from :func:`~tenantfirstaid.google_auth.get_gcp_credentials`.
+    Only the settings that never vary between calls are set here; callers take
+    a ``model_copy`` with their per-call filter and counts, which shares the
+    client.
+
+    Args:
+        data_store_id: Vertex AI Search datastore ID.
+
+    Returns:
+        The shared retriever for ``data_store_id``.
+
+    Raises:
+        ValueError: If GOOGLE_APPLICATION_CREDENTIALS is not set.
+    """
+    with _retriever_pool_lock:
+        retriever = _retriever_pool.get(data_store_id)
+        if retriever is None:
+            retriever = VertexAISearchRetriever(
+                beta=True,  # required for this implementation
+                credentials=get_gcp_credentials(),
+                project_id=SINGLETON.GOOGLE_CLOUD_PROJECT,
+                location_id=SINGLETON.GOOGLE_CLOUD_LOCATION,
+                data_store_id=data_store_id,
+                engine_data_type=0,  # 0 = unstructured; all TFA datastores are unstructured docs
+                # Suggestion-only: spell corrections are recorded in the response
+                # but the original query is used for retrieval. Prevents
+                # auto-correction from mangling ORS references and other legal
+                # terminology.
+                spell_correction_mode=1,
+            )
+            _retriever_pool[data_store_id] = retriever
+        return retriever
+
+
+def _record_rag_retry(retry_state: RetryCallState) -> None:
+    """Log a Vertex AI Search retry and count it against the current request."""
+    logger.warning(
+        "RAG search retry #%d after %s",
+        retry_state.attempt_number,
+        retry_state.outcome.exception() if retry_state.outcome else None,
+    )
+    count_retry("rag")
+
+
 class RagBuilder:
     """Helper class to construct a RAG retrieval tool from Vertex AI Search.
 
-    Manages GCP credentials, project/location/datastore configuration, and query
-    parameters for the VertexAISearchRetriever. Handles UTF-8 mojibake repair on
-    retrieved passages.
+    Applies per-call query parameters to the datastore's pooled
+    VertexAISearchRetriever, whose credentials and client are reused across
+    calls. Handles UTF-8 mojibake repair on retrieved passages, and consults the
+    optional retrieval result cache.
     """
 
-    __credentials: Credentials | service_account.Credentials
-    """GCP credentials loaded from SINGLETON."""
     rag: VertexAISearchRetriever
-    """Configured Vertex AI Search retriever."""
+    """Vertex AI Search retriever configured for this call."""
+    __cache_key: Callable[[str], str]
+    """Builds the result-cache key for a query under this builder's parameters."""
+    __data_store_id: str
+    """Datastore ID, recorded with cached results for invalidation."""
+    __name: str
+    """Tool name, labelling this builder's search spans."""
 
     def __init__(
         self,
@@ -111,57 +188,99 @@ class RagBuilder:
             max_extractive_answer_count: Max extractive answers per document.
             max_extractive_segment_count: Max extractive segments per document.
         """
-        if SINGLETON.GOOGLE_APPLICATION_CREDENTIALS is None:
-            raise ValueError("GOOGLE_APPLICATION_CREDENTIALS is not set")
-
-        self.__credentials = load_gcp_credentials(
-            SINGLETON.GOOGLE_APPLICATION_CREDENTIALS
-        )
-
-        self.rag = VertexAISearchRetriever(
-            beta=True,  # required for this implementation
-            credentials=self.__credentials,
-            project_id=SINGLETON.GOOGLE_CLOUD_PROJECT,
-            location_id=SINGLETON.GOOGLE_CLOUD_LOCATION,
-            data_store_id=data_store_id,
-            engine_data_type=0,  # 0 = unstructured; all TFA datastores are unstructured docs
-            # Default to extractive segments rather than answers. Extractive answers
-            # are short, individually selected sentences that, for statutory queries,
-            # tend to surface annotation/case-note lines that lexically match the
-            # query (e.g. "duty to mitigate damages" from NOTES OF DECISIONS) while
-            # the operative statutory text — which lives in longer segments — is
-            # never returned. Segments return the surrounding block, so the citable
-            # subsection text (e.g. ORS 90.410(3), ORS 90.302(2)(e)) comes through.
+        self.__cache_key = partial(
+            rag_cache_key,
+            data_store_id,
+            filter,
+            max_documents=max_documents,
+            max_extractive_segment_count=max_extractive_segment_count,
             get_extractive_answers=get_extractive_answers,
             max_extractive_answer_count=max_extractive_answer_count,
-            max_extractive_segment_count=max_extractive_segment_count,
-            # Suggestion-only: spell corrections are recorded in the response but the
-            # original query is used for retrieval. Prevents auto-correction from
-            # mangling ORS references and other legal terminology.
-            spell_correction_mode=1,
-            name=name,
-            max_documents=max_documents,
-            filter=filter,
         )
+        self.__data_store_id = data_store_id
+        self.__name = name or "tfa-retriever"
+
+        # A shallow copy of the pooled retriever: it shares the credentials and
+        # the gRPC client, and only the per-call fields below differ.
+        self.rag = _pooled_retriever(data_store_id).model_copy(
+            update={
+                # Default to extractive segments rather than answers. Extractive
+                # answers are short, individually selected sentences that, for
+                # statutory queries, tend to surface annotation/case-note lines that
+                # lexically match the query (e.g. "duty to mitigate damages" from
+                # NOTES OF DECISIONS) while the operative statutory text — which
+                # lives in longer segments — is never returned. Segments return the
+                # surrounding block, so the citable subsection text (e.g. ORS
+                # 90.410(3), ORS 90.302(2)(e)) comes through.
+                "get_extractive_answers": get_extractive_answers,
+                "max_extractive_answer_count": max_extractive_answer_count,
+                "max_extractive_segment_count": max_extractive_segment_count,
+                "name": name,
+                "max_documents": max_documents,
+                "filter": filter,
+            }
+        )
+
+    def search(self, query: str) -> str:
+        """Execute a RAG search, answering from the result cache when enabled.
+
+        When ``RAG_CACHE`` is set, results are looked up in the
+        [retrieval cache](`~rag_cache.get_rag_cache`) under the datastore, filter,
+        normalized query and retrieval parameters; misses query Vertex AI Search
+        and non-empty results are stored. Searches go through the shared
+        Vertex AI Search [circuit breaker](`~circuit_breaker.get_breaker`), so
+        cached results are still served while it is open. The whole lookup is
+        timed as a ``rag_search`` span of the current request (see
+        [`span`](`~request_timing.span`)).
+
+        Args:
+            query: Legal search query.
+
+        Returns:
+            Newline-joined concatenation of retrieved document passages.
+
+        Raises:
+            CircuitOpenError: If the search was needed but the breaker is open.
+        """
+        with span("rag_search", self.__name):
+            return self.__search(query)
+
+    def __search(self, query: str) -> str:
+        """Body of [`search`](`~langchain_tools.RagBuilder.search`), outside its span."""
+        cache = get_rag_cache()
+        breaker = get_breaker(VERTEX_SEARCH)
+        if cache is None:
+            return breaker.call(partial(self._search, query))
+        key = self.__cache_key(query)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug("RAG cache hit for query %.120r", query)
+            return cached
+        result = breaker.call(partial(self._search, query))
+        if result:
+            cache.put(key, self.__data_store_id, result)
+        return result
 
     @retry(
         retry=retry_if_exception_type(
             (httpx.ReadError, google_exceptions.ServiceUnavailable)
         ),
-        stop=stop_after_attempt(3),
+        # Give up early rather than sleep past the deadline: a retry that only
+        # succeeds after several seconds of backoff costs the user more than it saves.
+        stop=stop_after_attempt(3) | stop_before_delay(RAG_RETRY_DEADLINE_SECONDS),
         wait=wait_exponential(multiplier=0.5, max=4),
         reraise=True,
-        before_sleep=lambda rs: logger.warning(
-            "RAG search retry #%d after %s",
-            rs.attempt_number,
-            rs.outcome.exception() if rs.outcome else None,
-        ),
+        before_sleep=_record_rag_retry,
     )
-    def search(self, query: str) -> str:
-        """Execute a RAG search with automatic retry on transient errors.
+    def _search(self, query: str) -> str:
+        """Execute an uncached RAG search with automatic retry on transient errors.
 
         Queries the Vertex AI Search retriever with mojibake repair applied to each
-        retrieved passage. Retries up to 3 times on read errors or service unavailability.
+        retrieved passage. A slow search is hedged with a duplicate when
+        ``RAG_HEDGE_PERCENTILE`` is set (see
+        [`hedged_call`](`~rag_hedging.hedged_call`)). Retries up to 3 times on
+        read errors or service unavailability, but not past
+        ``RAG_RETRY_DEADLINE_SECONDS``.
 
         Args:
             query: Legal search query.
@@ -169,9 +288,7 @@ class RagBuilder:
         Returns:
             Newline-joined concatenation of retrieved document passages.
         """
-        docs = self.rag.invoke(
-            input=query,
-        )
+        docs = hedged_call(self.__data_store_id, partial(self.rag.invoke, input=query))
 
         return "\n".join([repair_mojibake(doc.page_content) for doc in docs])
 
@@ -260,6 +377,130 @@ def get_legal_aid_referrals() -> str:
     return _LEGAL_AID_REFERRALS_JSON
 
 
+class StatuteSearchInputSchema(BaseModel):
+    """Input schema for the local ORS chapter 90 keyword search."""
+
+    query: str = Field(
+        description="""Keywords or ORS section numbers to look up in ORS chapter 90
+                       (e.g. 'security deposit interest' or 'ORS 90.427')."""
+    )
+    """Keywords or section numbers."""
+    max_sections: int = Field(
+        default=3,
+        ge=1,
+        le=5,
+        description="Number of statute sections to return (1–5).",
+    )
+    """Maximum sections to return."""
+
+
+_STATUTE_EXCERPT_PARAGRAPHS = 4
+"""Matching paragraphs returned per section, after its opening paragraph."""
+
+
+def _statute_excerpt(text: str, query_terms: set[str]) -> str:
+    """Return a section's opening paragraph and its paragraphs best matching the query.
+
+    Like Vertex AI Search's extractive segments, this keeps the citable subsection
+    text without returning whole multi-page sections.
+
+    Args:
+        text: Full section text, one subsection per line.
+        query_terms: Terms from :func:`~statute_index.tokenize` of the query.
+
+    Returns:
+        The selected paragraphs in their original order.
+    """
+    paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
+    hits = {
+        i: len(query_terms.intersection(tokenize(paragraphs[i])))
+        for i in range(1, len(paragraphs))
+    }
+    ranked = sorted(hits, key=hits.__getitem__, reverse=True)
+    matching = [i for i in ranked[:_STATUTE_EXCERPT_PARAGRAPHS] if hits[i]]
+    return "\n".join(paragraphs[i] for i in sorted([0, *matching]))
+
+
+@tool(args_schema=StatuteSearchInputSchema)
+def search_oregon_statutes(query: str, max_sections: int = 3) -> str:
+    """Search the text of ORS chapter 90 (Oregon residential landlord-tenant law) by keyword or section number.
+
+    Answers locally in well under a millisecond, so use it freely to find or
+    quote the exact statutory text of a chapter 90 section. It does not cover
+    city ordinances or other chapters; use retrieve_city_state_laws for those.
+
+    Args:
+        query: Keywords or ORS section numbers.
+        max_sections: Maximum sections to return.
+
+    Returns:
+        Matching sections, each headed by its ORS number and title.
+    """
+    return _search_statute_text(query, max_sections) or (
+        "No ORS chapter 90 section matched the query."
+    )
+
+
+def _search_statute_text(query: str, max_sections: int) -> Optional[str]:
+    """Return excerpts of the ORS chapter 90 sections best matching a query.
+
+    Args:
+        query: Keywords or ORS section numbers.
+        max_sections: Maximum sections to return.
+
+    Returns:
+        Matching sections, each headed by its ORS number, or None if none match.
+    """
+    index = get_statute_index()
+    hits = index.search(query, k=max_sections)
+    if not hits:
+        return None
+    terms = set(tokenize(query))
+    return "\n\n".join(
+        f"ORS {hit.section}\n{_statute_excerpt(index.section(hit.section) or '', terms)}"
+        for hit in hits
+    )
+
+
+class StatuteSectionInputSchema(BaseModel):
+    """Input schema for looking up cited ORS sections verbatim."""
+
+    citation: str = Field(
+        description="""One or more ORS citations, optionally down to a subsection
+                       (e.g. 'ORS 90.394', 'ORS 90.302(2)(e)' or
+                       'ORS 90.394 and 90.395(2)')."""
+    )
+    """ORS citations."""
+
+
+@tool(args_schema=StatuteSectionInputSchema)
+def get_statute_section(citation: str) -> str:
+    """Return the exact text of cited ORS chapter 90 sections or subsections.
+
+    Use this whenever you know the citation, e.g. to quote or verify
+    ORS 90.302(2)(e) before citing it. It reads the statute directly instead of
+    searching, so the operative subsection is never missed. Enclosing lead-in
+    text is included for context.
+
+    Args:
+        citation: ORS citations, optionally with subsection paths.
+
+    Returns:
+        The text of each citation, or a note for each one not found.
+    """
+    # The model may omit the leading "ORS" ("90.394(1)"); the parser needs one.
+    if not citation.lstrip().upper().startswith("ORS"):
+        citation = f"ORS {citation}"
+    citations = parse_citations(citation)
+    if not citations:
+        return f"Could not read an ORS citation from {citation!r}; use e.g. 'ORS 90.394(1)'."
+    return "\n\n".join(
+        resolve_citation(c)
+        or f"{c} is not in the local ORS chapter 90 text; use retrieve_city_state_laws."
+        for c in citations
+    )
+
+
 class QueryOnlyInputSchema(BaseModel):
     """Input schema for RAG retrieval without location filtering.
 
@@ -361,6 +602,7 @@ def _make_rag_tool(
     *,
     args_schema: Type[BaseModel],
     filter_builder: Optional[Callable[..., str]] = None,
+    citation_fallback: bool = False,
 ) -> BaseTool:
     """Factory that creates a RAG retrieval tool for a specific Vertex AI datastore.
 
@@ -370,11 +612,42 @@ def _make_rag_tool(
         description: Tool description for the model.
         args_schema: Pydantic model defining tool parameters and validation.
         filter_builder: Optional function to build filter strings from kwargs.
+        citation_fallback: Read the ORS sections a query cites from the local
+            statute text (see
+            [`resolve_query_citations`](`~citations.resolve_query_citations`)).
+            A query that is nothing but citations, and names no city, is
+            answered with that text alone; otherwise the text is put ahead of
+            the datastore's results.
 
     Returns:
         A LangChain BaseTool wrapping the RAG query logic.
     """
 
+    def _search_datastore(validated: Dict[str, Any]) -> str:
+        """Search the datastore (or claim the request's prefetch) for a validated call."""
+        params = _retrieval_params(validated, filter_builder)
+        prefetch = ensure_config().get("configurable", {}).get(PREFETCH_CONFIG_KEY)
+        if isinstance(prefetch, RagPrefetch):
+            prefetched = prefetch.claim(tool_name, validated["query"], params)
+            if prefetched is not None:
+                logger.debug(
+                    "%s answered by prefetch: %.120r", tool_name, validated["query"]
+                )
+                return prefetched
+        helper = RagBuilder(
+            data_store_id=SINGLETON.VERTEX_AI_DATASTORES[datastore_key],
+            name=tool_name,
+            **params,
+        )
+        try:
+            return helper.search(query=validated["query"])
+        except CircuitOpenError:
+            logger.warning(
+                "%s answered from local statute text: search is down", tool_name
+            )
+            mark_degraded()
+            return _statute_fallback(validated["query"], validated["max_documents"])
+
     @tool(
         tool_name,
         description=description,
@@ -386,37 +659,105 @@ def _make_rag_tool(
         # validate to populate Field defaults for any omitted optional fields.
         schema_data = {k: v for k, v in kwargs.items() if k in args_schema.model_fields}
         validated = args_schema.model_validate(schema_data).model_dump()
-        rag_filter = filter_builder(**validated) if filter_builder is not None else None
-        # Forward extractive-count knobs when the schema exposes them. These were
-        # previously validated but silently dropped, so the model's documented
-        # "increase on retry" guidance had no effect. RagBuilder defaults cover
-        # schemas that omit them (e.g. QueryOnlyInputSchema).
-        extractive_kwargs = {
-            k: validated[k]
-            for k in ("max_extractive_answer_count", "max_extractive_segment_count")
-            if k in validated
-        }
-        helper = RagBuilder(
-            data_store_id=SINGLETON.VERTEX_AI_DATASTORES[datastore_key],
-            name=tool_name,
-            filter=rag_filter,
-            max_documents=validated["max_documents"],
-            **extractive_kwargs,
-        )
-        return helper.search(query=validated["query"])
+        query = validated["query"]
+        cited = resolve_query_citations(query) if citation_fallback else None
+        # Topical terms beside the citations need the datastore's passages, and
+        # with a city set it also holds that city's ordinances, which the local
+        # ORS text cannot stand in for.
+        if cited is not None and validated.get("city") is None and cites_only(query):
+            logger.debug(
+                "%s answered from local statute text: %.120r", tool_name, query
+            )
+            return cited
+        found = _search_datastore(validated)
+        return found if cited is None else f"{cited}\n\n{found}"
 
     return _retrieve
 
 
+_FALLBACK_NOTE: str = (
+    "Search is temporarily unavailable, so city ordinances and other sources could "
+    "not be searched. The closest sections of the local ORS chapter 90 text follow; "
+    "tell the user that local rules may also apply."
+)
+"""Lead-in for retrieval results served from the local statute text while the
+Vertex AI Search circuit breaker is open."""
+
+
+def _statute_fallback(query: str, max_sections: int) -> str:
+    """Answer a retrieval from the local statute text while search is down.
+
+    Args:
+        query: The model's retrieval query.
+        max_sections: Most sections to return.
+
+    Returns:
+        A note that search is unavailable, followed by the best-matching ORS
+        chapter 90 excerpts, if any.
+    """
+    excerpts = _search_statute_text(query, max_sections)
+    if excerpts is None:
+        return f"{_FALLBACK_NOTE}\n\nNo ORS chapter 90 section matched the query."
+    return f"{_FALLBACK_NOTE}\n\n{excerpts}"
+
+
+class _RetrievalParams(TypedDict):
+    """RagBuilder keyword arguments for one retrieval, besides its datastore and name."""
+
+    filter: Optional[str]
+    """Filter string from the tool's ``filter_builder``, if any."""
+    max_documents: int
+    """Maximum documents retrieved."""
+    max_extractive_answer_count: NotRequired[int]
+    """Extractive answers per document, when the schema exposes it."""
+    max_extractive_segment_count: NotRequired[int]
+    """Extractive segments per document, when the schema exposes it."""
+
+
+def _retrieval_params(
+    validated: Dict[str, object], filter_builder: Optional[Callable[..., str]]
+) -> _RetrievalParams:
+    """Return the RagBuilder keyword arguments for a validated tool call.
+
+    Args:
+        validated: Tool arguments after schema validation, with defaults filled.
+        filter_builder: Optional function to build filter strings from kwargs.
+
+    Returns:
+        ``filter``, ``max_documents`` and any extractive counts the schema has.
+    """
+    rag_filter = filter_builder(**validated) if filter_builder is not None else None
+    params: _RetrievalParams = {
+        "filter": rag_filter,
+        "max_documents": cast(int, validated["max_documents"]),
+    }
+    # Forward extractive-count knobs when the schema exposes them. These were
+    # previously validated but silently dropped, so the model's documented
+    # "increase on retry" guidance had no effect. RagBuilder defaults cover
+    # schemas that omit them (e.g. QueryOnlyInputSchema).
+    if "max_extractive_answer_count" in validated:
+        params["max_extractive_answer_count"] = cast(
+            int, validated["max_extractive_answer_count"]
+        )
+    if "max_extractive_segment_count" in validated:
+        params["max_extractive_segment_count"] = cast(
+            int, validated["max_extractive_segment_count"]
+        )
+    return params
+
+
 retrieve_city_state_laws: BaseTool = _make_rag_tool(
     DatastoreKey.LAWS,
     "retrieve_city_state_laws",
     "Retrieve relevant state (and when specified, city) specific housing laws from the RAG corpus.",
     args_schema=CityStateLawsInputSchema,
     filter_builder=_default_filter_from_city_state,
+    citation_fallback=True,
 )
 """RAG retrieval tool for the Laws datastore, with state/city filtering and extractive segment support.
-   This is the primary RAG tool used in production for housing law queries."""
+   This is the primary RAG tool used in production for housing law queries. Queries
+   that only cite ORS chapter 90 sections, with no city set, are answered from the
+   local statute text; in other queries the cited text precedes the search results."""
 
 # Defined here for testability; inactive until added to RAG_TOOL_REGISTRY and
 # VERTEX_AI_DATASTORE_OREGON_LAW_HELP is configured.
@@ -433,6 +774,52 @@ retrieve_oregon_law_help: BaseTool = _make_rag_tool(
 """RAG retrieval tool for the OregonLawHelp datastore, with query-only input schema.
    This is an optional RAG tool that can be added to the agent when VERTEX_AI_DATASTORE_OREGON_LAW_HELP is configured. It provides plain-language guidance from OregonLawHelp.org alongside the statutory retrieval from retrieve_city_state_laws."""
 
+
+def prefetch_city_state_laws(
+    question: str, state: UsaState, city: Optional[OregonCity] = None
+) -> Optional[RagPrefetch]:
+    """Start retrieving laws for a raw user question, ahead of the model's own call.
+
+    Uses the request's city/state filter and the tool's default counts, so a
+    ``retrieve_city_state_laws`` call with default counts can use the result (see
+    :mod:`~tenantfirstaid.rag_prefetch`).
+
+    Args:
+        question: The user's message, as typed.
+        state: User's [state](`~location.UsaState`).
+        city: User's [city](`~location.OregonCity`), optional.
+
+    Returns:
+        The running prefetch, or None if the Laws datastore is not configured,
+        search is failing (its circuit breaker is not closed), the question is
+        only ORS citations the tool answers locally (with no city), or the
+        prefetch cap is reached.
+    """
+    if DatastoreKey.LAWS not in SINGLETON.VERTEX_AI_DATASTORES:
+        return None
+    if get_breaker(VERTEX_SEARCH).state != "closed":
+        return None
+    if (
+        city is None
+        and cites_only(question)
+        and resolve_query_citations(question) is not None
+    ):
+        return None
+    validated = CityStateLawsInputSchema(
+        query=question, state=state, city=city
+    ).model_dump()
+    params = _retrieval_params(validated, _default_filter_from_city_state)
+
+    def search() -> str:
+        return RagBuilder(
+            data_store_id=SINGLETON.VERTEX_AI_DATASTORES[DatastoreKey.LAWS],
+            name=retrieve_city_state_laws.name,
+            **params,
+        ).search(query=question)
+
+    return start_prefetch(retrieve_city_state_laws.name, question, params, search)
+
+
 RAG_TOOL_REGISTRY: list[tuple[DatastoreKey, BaseTool]] = [
     (DatastoreKey.LAWS, retrieve_city_state_laws),
     # Uncomment when VERTEX_AI_DATASTORE_OREGON_LAW_HELP is configured and needed for new tooling.
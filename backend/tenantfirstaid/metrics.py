@@ -0,0 +1,451 @@
+"""Process-wide metrics in the Prometheus text exposition format.
+
+A small stdlib registry of counters, gauges and histograms, so the backend can
+report its own health without an extra dependency. Metrics are created once at
+module level with :func:`counter`, :func:`gauge` or :func:`histogram` (calling
+one again with the same name returns the existing metric) and updated with label
+values as keyword arguments::
+
+    searches = counter("rag_searches", "Searches made.", ("datastore",))
+    searches.inc(datastore="laws")
+
+:func:`render` formats every registered metric for a Prometheus scrape, as served
+at ``/metrics``. Under gunicorn each worker process has its own registry, and a
+scrape reaches only one of them. With ``METRICS_DIR`` set,
+:func:`share_across_processes` has each worker write a snapshot of its metrics to
+that directory every few seconds. :func:`render` then adds up the snapshots of
+every worker: counters and histograms are summed, including those of workers
+that have exited, and gauges are combined across live workers only.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Final,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+logger = logging.getLogger(__name__)
+
+PREFIX: Final = "tenantfirstaid_"
+"""Prefix added to every metric name."""
+
+DEFAULT_BUCKETS: Final = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+"""Histogram upper bounds in seconds, spanning a local lookup to a long answer."""
+
+_SHARE_INTERVAL_SECONDS: Final = 5.0
+"""How often a worker writes its snapshot for the other workers' scrapes."""
+
+_LabelValues = Tuple[str, ...]
+_Values = Dict[_LabelValues, Any]
+
+M = TypeVar("M", bound="_Metric")
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the exposition format."""
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value, writing whole numbers without a decimal point."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Format ``{name="value",...}``, or nothing if there are no labels."""
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    """A named metric family whose samples are keyed by label values."""
+
+    kind: str = ""
+    """Prometheus metric type written in the ``# TYPE`` line."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        """Initialize an empty metric.
+
+        Args:
+            name: Metric name, without :data:`PREFIX`.
+            help: One-line description written in the ``# HELP`` line.
+            labelnames: Names of the labels every sample must set.
+        """
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: _Values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> _LabelValues:
+        """Return the label values in declaration order, checking the names."""
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def snapshot(self) -> _Values:
+        """Return a copy of this process's values, keyed by label values."""
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, snapshots: List[_Values]) -> _Values:
+        """Combine per-process snapshots into the values to render (summed)."""
+        merged: _Values = {}
+        for values in snapshots:
+            for key, value in values.items():
+                merged[key] = merged.get(key, 0.0) + value
+        return merged
+
+    def _samples(self, values: _Values) -> Iterator[Tuple[str, str, float]]:
+        """Yield ``(suffix, labels, value)`` for every sample."""
+        for key, value in sorted(values.items()):
+            yield "", _labels(self.labelnames, key), value
+
+    def render(self, values: Optional[_Values] = None) -> str:
+        """Return the metric's ``# HELP``, ``# TYPE`` and sample lines.
+
+        Args:
+            values: Values to render, e.g. merged across processes; this
+                process's own by default.
+        """
+        if values is None:
+            values = self.snapshot()
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [
+            f"{self.name}{suffix}{labels} {_format_value(value)}"
+            for suffix, labels, value in self._samples(values)
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. of requests or retries.
+
+    Samples are written with a ``_total`` suffix, so register names without one.
+    """
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add ``amount`` to the count for the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Return the count for the given label values."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self, values: _Values) -> Iterator[Tuple[str, str, float]]:
+        for key, value in sorted(values.items()):
+            yield "_total", _labels(self.labelnames, key), value
+
+
+GaugeMode = Literal["sum", "max"]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. streams in flight or a breaker's state."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        mode: GaugeMode = "sum",
+    ) -> None:
+        """Initialize an empty gauge.
+
+        Args:
+            name: Metric name, without :data:`PREFIX`.
+            help: One-line description written in the ``# HELP`` line.
+            labelnames: Names of the labels every sample must set.
+            mode: How live worker processes' values combine: ``sum`` (e.g.
+                streams in flight) or ``max`` (e.g. the worst breaker state).
+        """
+        super().__init__(name, help, labelnames)
+        self.mode = mode
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the value for the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add ``amount`` (which may be negative) to the value."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Return the value for the given label values."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def merge(self, snapshots: List[_Values]) -> _Values:
+        if self.mode == "sum":
+            return super().merge(snapshots)
+        merged: _Values = {}
+        for values in snapshots:
+            for key, value in values.items():
+                merged[key] = max(merged.get(key, value), value)
+        return merged
+
+
+class Histogram(_Metric):
+    """Distribution of observed values, e.g. durations, in cumulative buckets.
+
+    Each label set's value is its per-bucket counts followed by the sum.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        """Initialize an empty histogram.
+
+        Args:
+            name: Metric name, without :data:`PREFIX`.
+            help: One-line description written in the ``# HELP`` line.
+            labelnames: Names of the labels every sample must set.
+            buckets: Increasing upper bounds; ``+Inf`` is always added.
+        """
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation for the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 1)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-1] += value
+
+    def count(self, **labels: str) -> int:
+        """Return how many values were observed for the given label values."""
+        with self._lock:
+            row = self._values.get(self._key(labels))
+            return int(sum(row[:-1])) if row else 0
+
+    def snapshot(self) -> _Values:
+        with self._lock:
+            return {key: list(row) for key, row in self._values.items()}
+
+    def merge(self, snapshots: List[_Values]) -> _Values:
+        merged: _Values = {}
+        for values in snapshots:
+            for key, row in values.items():
+                total = merged.setdefault(key, [0.0] * len(row))
+                for i, n in enumerate(row):
+                    total[i] += n
+        return merged
+
+    def _samples(self, values: _Values) -> Iterator[Tuple[str, str, float]]:
+        names = (*self.labelnames, "le")
+        for key, row in sorted(values.items()):
+            cumulative = 0.0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                yield (
+                    "_bucket",
+                    _labels(names, (*key, _format_value(bound))),
+                    cumulative,
+                )
+            yield "_sum", _labels(self.labelnames, key), row[-1]
+            yield "_count", _labels(self.labelnames, key), cumulative
+
+
+_metrics: Dict[str, _Metric] = {}
+"""Registered metrics by unprefixed name, in registration order."""
+_metrics_lock = threading.Lock()
+"""Lock for thread-safe registration."""
+
+
+def _register(cls: Type[M], name: str, create: Callable[[], M]) -> M:
+    """Return the metric registered under ``name``, calling ``create`` on first call."""
+    with _metrics_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = create()
+        if not isinstance(metric, cls):
+            raise ValueError(f"{name} is already registered as a {metric.kind}")
+        return metric
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Return the counter ``name`` (rendered as ``<name>_total``), creating it on first call."""
+    return _register(Counter, name, lambda: Counter(name, help, labelnames))
+
+
+def gauge(
+    name: str, help: str, labelnames: Sequence[str] = (), mode: GaugeMode = "sum"
+) -> Gauge:
+    """Return the gauge ``name``, creating it on first call."""
+    return _register(Gauge, name, lambda: Gauge(name, help, labelnames, mode=mode))
+
+
+def histogram(
+    name: str,
+    help: str,
+    labelnames: Sequence[str] = (),
+    buckets: Optional[Sequence[float]] = None,
+) -> Histogram:
+    """Return the histogram ``name``, creating it on first call."""
+    return _register(
+        Histogram,
+        name,
+        lambda: Histogram(name, help, labelnames, buckets=buckets or DEFAULT_BUCKETS),
+    )
+
+
+# ── sharing across worker processes ────────────────────────────────────────────
+
+_share_dir: Optional[Path] = None
+"""Directory worker snapshots are written to, once sharing has started."""
+_share_stop = threading.Event()
+"""Set to stop this process's snapshot writer."""
+
+
+def _snapshot_path(directory: Path, pid: int) -> Path:
+    return directory / f"{pid}.json"
+
+
+def _write_snapshot() -> None:
+    """Write this process's metrics to the share directory, atomically."""
+    if _share_dir is None:
+        return
+    with _metrics_lock:
+        metrics = list(_metrics.values())
+    data = {m.name: [[list(k), v] for k, v in m.snapshot().items()] for m in metrics}
+    path = _snapshot_path(_share_dir, os.getpid())
+    tmp = path.with_suffix(".tmp")
+    try:
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, path)
+    except OSError:
+        logger.warning("Could not write metrics snapshot %s", path, exc_info=True)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _other_snapshots() -> List[Tuple[bool, Dict[str, _Values]]]:
+    """Return ``(alive, values by metric name)`` for every other worker's snapshot."""
+    if _share_dir is None:
+        return []
+    snapshots = []
+    for path in _share_dir.glob("*.json"):
+        if not path.stem.isdigit() or int(path.stem) == os.getpid():
+            continue
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # Being replaced, or a worker died mid-write.
+        values = {
+            name: {tuple(k): v for k, v in samples} for name, samples in data.items()
+        }
+        snapshots.append((_alive(int(path.stem)), values))
+    return snapshots
+
+
+def _share_loop(stop: threading.Event) -> None:
+    while not stop.wait(_SHARE_INTERVAL_SECONDS):
+        _write_snapshot()
+
+
+def share_across_processes(directory: Path) -> None:
+    """Publish this process's metrics to ``directory`` for the other workers.
+
+    Writes a snapshot now, then every few seconds from a daemon thread and once
+    more at exit. Safe to call again, and restarted in a forked child (e.g. a
+    gunicorn worker forked from a preloading master).
+
+    Args:
+        directory: Directory shared by every worker on the node.
+    """
+    global _share_dir
+    directory.mkdir(parents=True, exist_ok=True)
+    if _share_dir is not None:
+        return
+    _share_dir = directory
+    _share_stop.clear()
+    _write_snapshot()
+    threading.Thread(
+        target=_share_loop, args=(_share_stop,), name="metrics-share", daemon=True
+    ).start()
+
+
+def _restart_sharing_after_fork() -> None:
+    """Give a forked child its own snapshot file and writer thread."""
+    global _share_dir, _share_stop
+    directory, _share_dir = _share_dir, None
+    # The parent's writer thread does not exist in the child.
+    _share_stop = threading.Event()
+    if directory is not None:
+        share_across_processes(directory)
+
+
+os.register_at_fork(after_in_child=_restart_sharing_after_fork)
+atexit.register(_write_snapshot)
+
+
+def render() -> str:
+    """Return every registered metric in the Prometheus text exposition format.
+
+    When sharing across processes, each metric combines this process's live
+    values with the other workers' latest snapshots.
+    """
+    with _metrics_lock:
+        metrics = list(_metrics.values())
+    others = _other_snapshots()
+    parts = []
+    for m in metrics:
+        snapshots = [m.snapshot()]
+        for alive, values in others:
+            if m.name in values and (alive or not isinstance(m, Gauge)):
+                snapshots.append(values[m.name])
+        parts.append(m.render(m.merge(snapshots) if others else snapshots[0]))
+    return "".join(parts)
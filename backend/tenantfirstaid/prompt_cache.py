@@ -0,0 +1,236 @@
+"""Opt-in Gemini context caching for the invariant prompt prefix.
+
+The system instructions and the tool schemas are identical on every model call;
+only the trailing location line (and any abridged history) differs. When
+``PROMPT_CACHE_TTL_SECONDS`` is set, that invariant prefix is registered once
+with Gemini's context caching, keyed by a content hash of the model, prompt and
+tool schemas, and each request then references the cache by name instead of
+resending it. The cache's TTL is extended shortly before it would expire, so a
+busy worker never falls back to the full prompt; if caching fails, requests are
+sent uncached and creation is retried later.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Final, Optional, Set
+
+from google.genai import types
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import SystemMessage
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_google_genai import ChatGoogleGenerativeAI, create_context_cache
+
+from .constants import PROMPT_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_REFRESH_MARGIN_SECONDS: Final = 300
+"""Extend a cache once less than this many seconds (or a quarter of the TTL) remain."""
+
+
+def prefix_cache_key(model_name: str, system_prompt: str, tools: Sequence[Any]) -> str:
+    """Return a content hash identifying a cacheable prompt prefix.
+
+    Tool schemas are serialized with sorted keys, so the key depends only on what
+    is sent to the model, never on dict ordering or object identity.
+
+    Args:
+        model_name: Model the cache is created for; caches are per model.
+        system_prompt: The invariant system instructions.
+        tools: Tools bound to the model, in the order they are offered.
+
+    Returns:
+        Hex SHA-256 digest of the model name, prompt and tool schemas.
+    """
+    schemas = [t if isinstance(t, dict) else convert_to_openai_tool(t) for t in tools]
+    payload = json.dumps(
+        {"model": model_name, "system": system_prompt, "tools": schemas},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _create_gemini_cache(
+    model: ChatGoogleGenerativeAI,
+    system_prompt: str,
+    tools: Sequence[BaseTool | Dict[str, Any]],
+    ttl_seconds: int,
+) -> str:
+    """Register the prompt and tools with Gemini context caching.
+
+    Returns:
+        The cache name to pass as ``cached_content``.
+    """
+    return create_context_cache(
+        model,
+        [SystemMessage(system_prompt)],
+        ttl=f"{ttl_seconds}s",
+        tools=list(tools),
+    )
+
+
+def _extend_gemini_cache(
+    model: ChatGoogleGenerativeAI, name: str, ttl_seconds: int
+) -> None:
+    """Reset the TTL of an existing Gemini cache to ``ttl_seconds`` from now."""
+    if model.client is None:
+        raise RuntimeError("Gemini client is not initialized")
+    model.client.caches.update(
+        name=name, config=types.UpdateCachedContentConfig(ttl=f"{ttl_seconds}s")
+    )
+
+
+@dataclass
+class _Entry:
+    """A registered cache and when it expires (on the local monotonic clock)."""
+
+    name: Optional[str]
+    """Cache name, or None while creation is backing off after a failure."""
+    expires_at: float
+    """Monotonic time the cache expires, or the back-off ends."""
+
+
+class PromptPrefixCache:
+    """Registry of Gemini context caches for invariant prompt prefixes.
+
+    Thread-safe. Each distinct (model, prompt, tools) prefix gets one cache,
+    created on first use and extended before it expires. Failures are logged and
+    answered with None, so the caller sends the request uncached; creation is not
+    retried for one refresh margin.
+
+    The remote create and extend calls run outside the registry's lock, so a slow
+    cache API never holds up model calls for other prefixes. While one thread is
+    creating or extending a prefix's cache, other requests for that prefix use
+    the current cache if it has not expired, or are sent uncached.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int,
+        *,
+        create: Callable[..., str] = _create_gemini_cache,
+        extend: Callable[..., None] = _extend_gemini_cache,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize an empty registry.
+
+        Args:
+            ttl_seconds: Lifetime requested for each cache, in seconds.
+            create: ``(model, system_prompt, tools, ttl_seconds) -> name``
+                registering a new cache (Gemini by default).
+            extend: ``(model, name, ttl_seconds)`` resetting a cache's TTL.
+            clock: Monotonic clock, injectable for tests.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = min(_REFRESH_MARGIN_SECONDS, ttl_seconds // 4)
+        self._create = create
+        self._extend = extend
+        self._clock = clock
+        self._entries: Dict[str, _Entry] = {}
+        self._in_flight: Set[str] = set()
+        """Keys whose cache one thread is currently creating or extending."""
+        self._lock = threading.Lock()
+
+    def lookup(
+        self,
+        model: BaseChatModel,
+        system_prompt: str,
+        tools: Sequence[BaseTool | Dict[str, Any]],
+    ) -> Optional[str]:
+        """Return the cache name for this prefix, creating or extending it if due.
+
+        Args:
+            model: Model the request will be sent to.
+            system_prompt: The invariant system instructions.
+            tools: Tools the request offers the model.
+
+        Returns:
+            Name to pass as ``cached_content``, or None to send the prefix inline.
+        """
+        key = prefix_cache_key(getattr(model, "model", ""), system_prompt, tools)
+        with self._lock:
+            now = self._clock()
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at - now > self.refresh_margin:
+                return entry.name
+            if entry is not None and entry.name is None and entry.expires_at > now:
+                return None
+            if key in self._in_flight:
+                # Another thread is refreshing this cache; don't wait for it.
+                if entry is not None and entry.expires_at > now:
+                    return entry.name
+                return None
+            self._in_flight.add(key)
+            current = entry.name if entry is not None else None
+
+        try:
+            return self._refresh(key, model, system_prompt, tools, current)
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    def _refresh(
+        self,
+        key: str,
+        model: BaseChatModel,
+        system_prompt: str,
+        tools: Sequence[BaseTool | Dict[str, Any]],
+        current: Optional[str],
+    ) -> Optional[str]:
+        """Extend ``current`` or create a new cache, then record the result.
+
+        Called without the lock held, by the one thread marked in flight for
+        ``key``.
+        """
+        if current is not None:
+            try:
+                self._extend(model, current, self.ttl_seconds)
+            except Exception:
+                logger.warning(
+                    f"Could not extend prompt cache {current}; recreating",
+                    exc_info=True,
+                )
+            else:
+                self._record(key, _Entry(current, self._clock() + self.ttl_seconds))
+                return current
+        try:
+            name = self._create(model, system_prompt, tools, self.ttl_seconds)
+        except Exception:
+            logger.warning(
+                "Could not create prompt cache; sending the prompt uncached",
+                exc_info=True,
+            )
+            self._record(key, _Entry(None, self._clock() + self.refresh_margin))
+            return None
+        logger.info(f"Created prompt cache {name} for prefix {key[:12]}")
+        self._record(key, _Entry(name, self._clock() + self.ttl_seconds))
+        return name
+
+    def _record(self, key: str, entry: _Entry) -> None:
+        """Store ``entry`` as the current state of ``key``'s cache."""
+        with self._lock:
+            self._entries[key] = entry
+
+
+_prompt_cache: Optional[PromptPrefixCache] = None
+"""Lazily-created process-wide prompt cache registry."""
+_prompt_cache_lock = threading.Lock()
+"""Lock for thread-safe registry creation."""
+
+
+def get_prompt_cache() -> Optional[PromptPrefixCache]:
+    """Return the process-wide registry, or None if prompt caching is disabled."""
+    global _prompt_cache
+    if PROMPT_CACHE_TTL_SECONDS <= 0:
+        return None
+    with _prompt_cache_lock:
+        if _prompt_cache is None:
+            _prompt_cache = PromptPrefixCache(PROMPT_CACHE_TTL_SECONDS)
+        return _prompt_cache
@@ -0,0 +1,332 @@
+"""Opt-in result cache in front of Vertex AI Search retrieval.
+
+Tenants ask the same handful of questions, so the agent issues near-identical
+``retrieve_city_state_laws`` queries, each a paid Vertex AI Search round trip.
+When ``RAG_CACHE`` is enabled, :meth:`~tenantfirstaid.langchain_tools.RagBuilder.search`
+first looks its result up here, keyed by :func:`rag_cache_key` on the datastore,
+the filter, the normalized query text and the retrieval parameters.
+
+Two backends are provided, both bounded by an LRU entry cap and a TTL:
+
+- :class:`InMemoryRagCache` — per-process.
+- :class:`SqliteRagCache` — a file shared by every worker on one node, so a hit
+  in one gunicorn worker serves the others.
+
+After a corpus reindex, call :func:`invalidate_rag_cache` (or run
+``mise run clear-rag-cache``) so stale passages are not served until they expire.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from .constants import (
+    RAG_CACHE,
+    RAG_CACHE_MAX_ENTRIES,
+    RAG_CACHE_SQLITE_PATH,
+    RAG_CACHE_TTL_SECONDS,
+)
+from .metrics import counter
+from .sqlite_store import open_shared_sqlite
+
+_lookups = counter(
+    "rag_cache_lookups", "RAG cache lookups, by result: hit or miss.", ("result",)
+)
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold ``query`` and collapse its whitespace."""
+    return " ".join(query.casefold().split())
+
+
+def rag_cache_key(
+    data_store_id: str,
+    rag_filter: Optional[str],
+    query: str,
+    max_documents: int,
+    max_extractive_segment_count: int,
+    *,
+    get_extractive_answers: bool = False,
+    max_extractive_answer_count: int = 1,
+) -> str:
+    """Return the cache key for one retrieval.
+
+    Every parameter that changes what Vertex AI Search returns is part of the
+    key; the query is normalized first, so differences in case or spacing share
+    one entry.
+
+    Args:
+        data_store_id: Vertex AI Search datastore ID.
+        rag_filter: Filter string from the tool's ``filter_builder``, if any.
+        query: Search query as issued by the model.
+        max_documents: Maximum documents retrieved.
+        max_extractive_segment_count: Extractive segments per document.
+        get_extractive_answers: Whether extractive answers replace segments.
+        max_extractive_answer_count: Extractive answers per document.
+
+    Returns:
+        Hex SHA-256 digest identifying the retrieval.
+    """
+    payload = json.dumps(
+        [
+            data_store_id,
+            rag_filter,
+            normalize_query(query),
+            max_documents,
+            max_extractive_segment_count,
+            get_extractive_answers,
+            max_extractive_answer_count,
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RagCache(ABC):
+    """Base class for bounded, thread-safe retrieval result caches.
+
+    Subclasses implement ``_get``, ``_put`` and ``_invalidate``; this class keeps
+    the hit/miss counters, which are per process whichever backend is used. Every
+    lookup is also counted in the ``rag_cache_lookups`` metric.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            max_entries: Entries kept before the least recently used is evicted.
+            ttl_seconds: Seconds after which an entry expires.
+            clock: Wall clock, injectable for tests.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        """Lookups answered from the cache."""
+        self.misses = 0
+        """Lookups that had to query Vertex AI Search."""
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached result for ``key``, or None if absent or expired."""
+        with self._lock:
+            value = self._get(key, self._clock())
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        _lookups.inc(result="miss" if value is None else "hit")
+        return value
+
+    def put(self, key: str, data_store_id: str, value: str) -> None:
+        """Store ``value`` under ``key``, evicting the oldest entries if full.
+
+        Args:
+            key: Key from :func:`rag_cache_key`.
+            data_store_id: Datastore the result came from, for invalidation.
+            value: Retrieved passages.
+        """
+        with self._lock:
+            self._put(key, data_store_id, value, self._clock())
+
+    def invalidate(self, data_store_id: Optional[str] = None) -> int:
+        """Drop cached results, e.g. after a corpus reindex.
+
+        Args:
+            data_store_id: Only drop results from this datastore; all if None.
+
+        Returns:
+            Number of entries removed.
+        """
+        with self._lock:
+            return self._invalidate(data_store_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Return this process's hit and miss counts."""
+        return {"hits": self.hits, "misses": self.misses}
+
+    @abstractmethod
+    def _get(self, key: str, now: float) -> Optional[str]:
+        """Return the live value for ``key``, marking it recently used."""
+
+    @abstractmethod
+    def _put(self, key: str, data_store_id: str, value: str, now: float) -> None:
+        """Store ``value``, then evict expired and least recently used entries."""
+
+    @abstractmethod
+    def _invalidate(self, data_store_id: Optional[str]) -> int:
+        """Drop the entries of ``data_store_id`` (all if None); return the count."""
+
+
+class InMemoryRagCache(RagCache):
+    """Per-process retrieval cache bounded by an LRU entry cap and a TTL."""
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            max_entries: Entries kept before the least recently used is evicted.
+            ttl_seconds: Seconds after which an entry expires.
+            clock: Wall clock, injectable for tests.
+        """
+        super().__init__(max_entries=max_entries, ttl_seconds=ttl_seconds, clock=clock)
+        # key -> (data_store_id, value, expires_at), least recently used first
+        self._entries: OrderedDict[str, Tuple[str, str, float]] = OrderedDict()
+
+    def _get(self, key: str, now: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _put(self, key: str, data_store_id: str, value: str, now: float) -> None:
+        self._entries[key] = (data_store_id, value, now + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _invalidate(self, data_store_id: Optional[str]) -> int:
+        doomed = [
+            k
+            for k, (ds, _, _) in self._entries.items()
+            if data_store_id is None or ds == data_store_id
+        ]
+        for k in doomed:
+            del self._entries[k]
+        return len(doomed)
+
+
+class SqliteRagCache(RagCache):
+    """SQLite-file retrieval cache bounded by an LRU entry cap and a TTL.
+
+    The file is opened with :func:`~tenantfirstaid.sqlite_store.open_shared_sqlite`,
+    so every worker process on a node shares its entries, and an invalidation
+    from any process (or ``mise run clear-rag-cache``) applies to all of them.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY,
+            data_store_id TEXT NOT NULL,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+    """
+    """Table of cached results with their expiry and recency."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_entries: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Open (creating if needed) the SQLite file at ``path``.
+
+        Args:
+            path: Database file location.
+            max_entries: Entries kept before the least recently used is evicted.
+            ttl_seconds: Seconds after which an entry expires.
+            clock: Wall clock, injectable for tests.
+        """
+        super().__init__(max_entries=max_entries, ttl_seconds=ttl_seconds, clock=clock)
+        self._conn = open_shared_sqlite(path, self._SCHEMA)
+
+    def _get(self, key: str, now: float) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT value FROM results WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def _put(self, key: str, data_store_id: str, value: str, now: float) -> None:
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, data_store_id, value, now + self.ttl_seconds, now),
+            )
+            self._conn.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results"
+                " ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def _invalidate(self, data_store_id: Optional[str]) -> int:
+        if data_store_id is None:
+            cursor = self._conn.execute("DELETE FROM results")
+        else:
+            cursor = self._conn.execute(
+                "DELETE FROM results WHERE data_store_id = ?", (data_store_id,)
+            )
+        return cursor.rowcount
+
+
+_rag_cache: Optional[RagCache] = None
+"""Lazily-created process-wide retrieval cache for ``RAG_CACHE``."""
+_rag_cache_lock = threading.Lock()
+"""Lock for thread-safe cache creation."""
+
+
+def get_rag_cache() -> Optional[RagCache]:
+    """Return the process-wide retrieval cache, or None if ``RAG_CACHE`` is ``none``."""
+    global _rag_cache
+    if RAG_CACHE == "none":
+        return None
+    with _rag_cache_lock:
+        if _rag_cache is None:
+            if RAG_CACHE == "sqlite":
+                _rag_cache = SqliteRagCache(
+                    RAG_CACHE_SQLITE_PATH,
+                    max_entries=RAG_CACHE_MAX_ENTRIES,
+                    ttl_seconds=RAG_CACHE_TTL_SECONDS,
+                )
+            else:
+                _rag_cache = InMemoryRagCache(
+                    max_entries=RAG_CACHE_MAX_ENTRIES,
+                    ttl_seconds=RAG_CACHE_TTL_SECONDS,
+                )
+        return _rag_cache
+
+
+def invalidate_rag_cache(data_store_id: Optional[str] = None) -> int:
+    """Drop cached retrieval results, e.g. after a corpus reindex.
+
+    With the ``sqlite`` backend this clears the entries of every worker on the
+    node; with ``memory`` it clears only the calling process.
+
+    Args:
+        data_store_id: Only drop results from this datastore; all if None.
+
+    Returns:
+        Number of entries removed (0 if the cache is disabled).
+    """
+    cache = get_rag_cache()
+    return 0 if cache is None else cache.invalidate(data_store_id)
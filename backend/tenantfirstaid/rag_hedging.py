@@ -0,0 +1,229 @@
+"""Hedged Vertex AI Search requests, driven by each datastore's recent latency.
+
+A Vertex AI Search round trip is usually fast, but its tail is long, and one slow
+search sets the latency of the whole answer. When ``RAG_HEDGE_PERCENTILE`` is
+set, :func:`hedged_call` tracks a rolling latency window per datastore. Once a
+search has taken longer than that percentile of recent searches, it sends a
+duplicate and uses whichever finishes first.
+
+A process-wide :class:`HedgeBudget` caps duplicates at ``RAG_HEDGE_BUDGET`` of
+all searches, so hedging cannot more than marginally raise load on the
+datastore, even when the whole service slows down at once. :func:`hedge_stats`
+reports how often hedges were sent and won.
+"""
+
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Final, Optional, TypeVar
+
+from .constants import RAG_HEDGE_BUDGET, RAG_HEDGE_PERCENTILE
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_WINDOW_SIZE: Final = 500
+"""Recent search latencies kept per datastore."""
+
+_MIN_SAMPLES: Final = 20
+"""Searches a datastore must have completed before its percentile is trusted."""
+
+_MIN_HEDGE_DELAY_SECONDS: Final = 0.05
+"""Shortest wait before hedging, so a fast datastore is never searched twice."""
+
+_BUDGET_BURST: Final = 10.0
+"""Hedges the budget can bank for a burst of slow searches."""
+
+_SEARCH_WORKERS: Final = 32
+"""Threads running hedged searches per process."""
+
+
+class LatencyWindow:
+    """Thread-safe rolling window of one datastore's recent search latencies."""
+
+    def __init__(self, size: int = _WINDOW_SIZE) -> None:
+        """Initialize an empty window.
+
+        Args:
+            size: Latencies kept; older ones are dropped.
+        """
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Add one search's latency."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the ``p``-th percentile latency (nearest rank), in seconds.
+
+        Args:
+            p: Percentile in (0, 100).
+
+        Returns:
+            The latency, or None before :data:`_MIN_SAMPLES` searches.
+        """
+        with self._lock:
+            if len(self._samples) < _MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        rank = min(len(ordered), math.ceil(p / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+
+class HedgeBudget:
+    """Token bucket limiting hedges to a fraction of all searches.
+
+    Every search deposits ``ratio`` of a token, up to a small burst; every hedge
+    spends a whole one.
+    """
+
+    def __init__(self, ratio: float, burst: float = _BUDGET_BURST) -> None:
+        """Initialize an empty budget.
+
+        Args:
+            ratio: Hedges allowed per search.
+            burst: Most tokens the bucket holds.
+        """
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        """Credit one search."""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one hedge from the budget if there is one."""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class _HedgeStats:
+    """Thread-safe per-process hedging counters."""
+
+    def __init__(self) -> None:
+        self.searches = 0
+        """Searches made through :func:`hedged_call`."""
+        self.hedges = 0
+        """Duplicate searches sent."""
+        self.hedge_wins = 0
+        """Searches answered by the duplicate."""
+        self.over_budget = 0
+        """Slow searches not hedged because the budget was spent."""
+        self._lock = threading.Lock()
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "searches": self.searches,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "over_budget": self.over_budget,
+                "extra_load": self.hedges / self.searches if self.searches else 0.0,
+            }
+
+
+_windows: Dict[str, LatencyWindow] = {}
+"""Latency window per datastore ID."""
+_windows_lock = threading.Lock()
+"""Lock for thread-safe window creation."""
+_budget = HedgeBudget(RAG_HEDGE_BUDGET)
+"""Process-wide hedge budget."""
+_stats = _HedgeStats()
+"""Process-wide hedging counters."""
+_executor = ThreadPoolExecutor(
+    max_workers=_SEARCH_WORKERS, thread_name_prefix="rag-hedge"
+)
+"""Threads running primary and duplicate searches."""
+
+
+def latency_window(data_store_id: str) -> LatencyWindow:
+    """Return the latency window for a datastore, creating it on first use."""
+    with _windows_lock:
+        window = _windows.get(data_store_id)
+        if window is None:
+            window = _windows[data_store_id] = LatencyWindow()
+        return window
+
+
+def hedge_stats() -> Dict[str, float]:
+    """Return this process's search, hedge and hedge-win counts and extra load."""
+    return _stats.snapshot()
+
+
+def _submit(fn: Callable[[], T], window: LatencyWindow) -> Future:
+    """Run ``fn`` on a search thread, recording its latency if it succeeds."""
+    context = contextvars.copy_context()
+
+    def timed() -> T:
+        start = time.perf_counter()
+        result = context.run(fn)
+        window.record(time.perf_counter() - start)
+        return result
+
+    return _executor.submit(timed)
+
+
+def hedged_call(data_store_id: str, fn: Callable[[], T]) -> T:
+    """Call ``fn``, sending a duplicate if it runs past the datastore's percentile.
+
+    Without ``RAG_HEDGE_PERCENTILE`` this just calls ``fn``, recording nothing.
+    Otherwise both calls run on search threads (in a copy of the caller's
+    context, so tracing still applies). The first to succeed is returned. If one
+    fails, the other is awaited, and the error is raised only if both fail. A
+    losing call is left to finish, and its latency still counts towards the
+    window, so slow searches are not hidden from the percentile.
+
+    Args:
+        data_store_id: Datastore searched, whose latencies set the hedge delay.
+        fn: Performs the search; must be safe to call twice at once.
+
+    Returns:
+        The result of whichever call succeeded first.
+    """
+    if not RAG_HEDGE_PERCENTILE:
+        return fn()
+    window = latency_window(data_store_id)
+    _budget.deposit()
+    _stats.add(searches=1)
+    delay = window.percentile(RAG_HEDGE_PERCENTILE)
+    primary = _submit(fn, window)
+    if delay is None:
+        return primary.result()
+    done, _ = wait([primary], timeout=max(delay, _MIN_HEDGE_DELAY_SECONDS))
+    if done:
+        return primary.result()
+    if not _budget.try_spend():
+        _stats.add(over_budget=1)
+        return primary.result()
+    logger.debug("Hedging %s search after %.3fs", data_store_id, delay)
+    _stats.add(hedges=1)
+    hedge = _submit(fn, window)
+    pending = {primary, hedge}
+    while True:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    _stats.add(hedge_wins=1)
+                return future.result()
+        if not pending:
+            # Both failed: raise the primary's error, as an unhedged call would.
+            return primary.result()
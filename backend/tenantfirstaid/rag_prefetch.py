@@ -0,0 +1,260 @@
+"""Speculative retrieval overlapped with the first model call of a conversation.
+
+On a first-turn legal question the agent almost always starts by calling
+``retrieve_city_state_laws`` with a rephrasing of the user's message, so a
+Vertex AI Search round trip only begins after a full model round trip. When
+``RAG_PREFETCH`` is enabled,
+:class:`~tenantfirstaid.langchain_chat_manager.LangChainChatManager` starts a
+retrieval for the raw question (with the request's city/state filter) as the
+request arrives, and hands the resulting :class:`RagPrefetch` to the tools
+through the run's ``configurable`` under :data:`PREFETCH_CONFIG_KEY`.
+
+When the model's retrieval uses the same parameters and its query is similar
+enough to the question (:func:`query_similarity`), the prefetched passages answer
+it. Otherwise the tool searches as usual and the prefetch is counted as wasted.
+New prefetches stop while more than ``RAG_PREFETCH_MAX_WASTED_PER_MINUTE`` have
+been wasted in the last minute, or when every prefetch worker is busy.
+:func:`prefetch_stats` reports the hit rate and latency saved.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Final, Optional
+
+from .constants import (
+    RAG_PREFETCH_MAX_WASTED_PER_MINUTE,
+    RAG_PREFETCH_MIN_SIMILARITY,
+)
+from .statute_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_CONFIG_KEY: Final = "rag_prefetch"
+"""``configurable`` key under which a run's :class:`RagPrefetch` is passed to tools."""
+
+_PREFETCH_WORKERS: Final = 8
+"""Speculative retrievals in flight at once per process."""
+
+_WASTE_WINDOW_SECONDS: Final = 60.0
+"""Window over which wasted prefetches are counted against the cap."""
+
+_FILLER_TERMS: Final = frozenset(
+    "am can could do doe how i me my ors should there they what when where who why "
+    "will would you".split()
+)
+"""Terms that say nothing about the topic: the user's question phrasing, and the
+``ORS`` prefix of the model's citations."""
+
+
+def _query_terms(text: str) -> frozenset[str]:
+    """Return the distinct content terms of a question or retrieval query."""
+    return frozenset(tokenize(text)) - _FILLER_TERMS
+
+
+def query_similarity(question: str, query: str) -> float:
+    """Return the cosine similarity (0–1) of the term sets of two queries.
+
+    Terms come from :func:`~tenantfirstaid.statute_index.tokenize`, without
+    filler such as the question words of a user's phrasing ("what can I do").
+
+    Args:
+        question: The user's raw question.
+        query: The retrieval query issued by the model.
+
+    Returns:
+        Shared terms over the geometric mean of both term counts; 0 if either
+        has no terms.
+    """
+    a, b = _query_terms(question), _query_terms(query)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / math.sqrt(len(a) * len(b))
+
+
+class _PrefetchStats:
+    """Thread-safe per-process prefetch counters and the recent-waste window."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self.issued = 0
+        """Prefetches started."""
+        self.hits = 0
+        """Prefetches that answered the model's retrieval."""
+        self.wasted = 0
+        """Prefetches no retrieval used, or that failed."""
+        self.skipped = 0
+        """Prefetches not started because of the waste cap or busy workers."""
+        self.saved_seconds = 0.0
+        """Retrieval time taken off the critical path, summed over hits."""
+        self._recent_waste: Deque[float] = deque()
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def try_issue(self) -> bool:
+        """Count a new prefetch, or a skipped one if the waste cap is reached."""
+        with self._lock:
+            cutoff = self._clock() - _WASTE_WINDOW_SECONDS
+            while self._recent_waste and self._recent_waste[0] < cutoff:
+                self._recent_waste.popleft()
+            if len(self._recent_waste) >= RAG_PREFETCH_MAX_WASTED_PER_MINUTE:
+                self.skipped += 1
+                return False
+            self.issued += 1
+            return True
+
+    def record_skip(self) -> None:
+        with self._lock:
+            self.issued -= 1
+            self.skipped += 1
+
+    def record_hit(self, saved_seconds: float) -> None:
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += saved_seconds
+
+    def record_waste(self) -> None:
+        with self._lock:
+            self.wasted += 1
+            self._recent_waste.append(self._clock())
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            decided = self.hits + self.wasted
+            return {
+                "issued": self.issued,
+                "hits": self.hits,
+                "wasted": self.wasted,
+                "skipped": self.skipped,
+                "hit_rate": self.hits / decided if decided else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
+
+
+_stats = _PrefetchStats()
+"""Process-wide prefetch counters."""
+_executor = ThreadPoolExecutor(
+    max_workers=_PREFETCH_WORKERS, thread_name_prefix="rag-prefetch"
+)
+"""Threads running speculative retrievals, off the request's own thread or loop."""
+_slots = threading.BoundedSemaphore(_PREFETCH_WORKERS)
+"""Free prefetch workers; a prefetch is skipped rather than queued when none is."""
+
+
+def prefetch_stats() -> Dict[str, Any]:
+    """Return this process's prefetch counts, hit rate and total latency saved."""
+    return _stats.snapshot()
+
+
+class RagPrefetch:
+    """A speculative retrieval for one request, usable by at most one tool call."""
+
+    tool_name: str
+    """Tool whose retrieval was prefetched."""
+    question: str
+    """The raw user question that was searched."""
+    params: Mapping[str, Any]
+    """Retrieval parameters (filter, counts) the tool call must match."""
+
+    def __init__(
+        self, tool_name: str, question: str, params: Mapping[str, Any], future: Future
+    ) -> None:
+        self.tool_name = tool_name
+        self.question = question
+        self.params = params
+        self._future = future
+        self._started = time.monotonic()
+        self._finished: Optional[float] = None
+        self._settled = False
+        self._lock = threading.Lock()
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, _future: Future) -> None:
+        self._finished = time.monotonic()
+
+    def claim(
+        self, tool_name: str, query: str, params: Mapping[str, Any]
+    ) -> Optional[str]:
+        """Return the prefetched passages if they answer this retrieval.
+
+        Waits for the prefetch if it is still running. A prefetch is claimed at
+        most once; a failed prefetch answers nothing.
+
+        Args:
+            tool_name: Name of the calling retrieval tool.
+            query: The model's retrieval query.
+            params: The call's retrieval parameters, built as for the prefetch.
+
+        Returns:
+            The passages, or None if the call must search itself.
+        """
+        if tool_name != self.tool_name or params != self.params:
+            return None
+        similarity = query_similarity(self.question, query)
+        if similarity < RAG_PREFETCH_MIN_SIMILARITY:
+            logger.debug(
+                "Prefetch not used (similarity %.2f) for query %.120r",
+                similarity,
+                query,
+            )
+            return None
+        with self._lock:
+            if self._settled:
+                return None
+            self._settled = True
+        claimed = time.monotonic()
+        try:
+            result = self._future.result()
+        except Exception:
+            logger.warning("Prefetched retrieval failed", exc_info=True)
+            _stats.record_waste()
+            return None
+        # Without the prefetch the search would have started at the claim; with
+        # it, the call only waited for what was left of it.
+        finished = self._finished or time.monotonic()
+        _stats.record_hit(min(finished - self._started, claimed - self._started))
+        return result
+
+    def finish(self) -> None:
+        """Record the prefetch as wasted if the request ended without using it."""
+        with self._lock:
+            if self._settled:
+                return
+            self._settled = True
+        _stats.record_waste()
+
+
+def start_prefetch(
+    tool_name: str,
+    question: str,
+    params: Mapping[str, Any],
+    search: Callable[[], str],
+) -> Optional[RagPrefetch]:
+    """Start a speculative retrieval on a prefetch worker.
+
+    Args:
+        tool_name: Retrieval tool whose call this anticipates.
+        question: The raw user question being searched.
+        params: Retrieval parameters a call must match to use the result.
+        search: Runs the retrieval and returns its passages.
+
+    Returns:
+        The running prefetch, or None if the waste cap is reached or no worker
+        is free.
+    """
+    if not _stats.try_issue():
+        return None
+    if not _slots.acquire(blocking=False):
+        _stats.record_skip()
+        return None
+
+    def run() -> str:
+        try:
+            return search()
+        finally:
+            _slots.release()
+
+    return RagPrefetch(tool_name, question, params, _executor.submit(run))
@@ -0,0 +1,281 @@
+"""Per-request latency breakdown of ``/api/query``.
+
+A slow answer can be spent in model thinking, retrieval, tool retries or the
+response itself. The chat views create a :class:`RequestTiming` per request and
+mark when the first response byte and the first answer text went out.
+:class:`~tenantfirstaid.langchain_chat_manager.LangChainChatManager` hands it to
+the run's tools and middleware through the run's ``configurable`` under
+:data:`TIMING_CONFIG_KEY`. There, :func:`span` times each model call, tool call
+and Vertex AI Search request, and :func:`count_retry` counts the retries of both
+retry layers, and :func:`count_tokens` adds up the tokens each model call used.
+:func:`mark_degraded` flags a request that a circuit-breaker fallback answered.
+
+When the response ends, :meth:`RequestTiming.finish` writes one structured
+``request_timing`` log line with the breakdown. Every measurement is also a
+histogram sample in :mod:`~tenantfirstaid.metrics`. A span outside any request
+(e.g. an evaluation run) still feeds the histograms.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Callable,
+    DefaultDict,
+    Dict,
+    Final,
+    Generator,
+    List,
+    Optional,
+    Sequence,
+)
+
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.runnables.config import var_child_runnable_config
+
+from .metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+TIMING_CONFIG_KEY: Final = "request_timing"
+"""``configurable`` key under which a run's :class:`RequestTiming` is passed to tools."""
+
+_ttfb = histogram(
+    "request_first_byte_seconds",
+    "Time from receiving a request to sending the first response chunk.",
+    ("route",),
+)
+_first_text = histogram(
+    "request_first_text_seconds",
+    "Time from receiving a request to sending the first answer text.",
+    ("route",),
+)
+_duration = histogram(
+    "request_duration_seconds",
+    "Time from receiving a request to the end of its response stream.",
+    ("route",),
+)
+_spans = histogram(
+    "span_duration_seconds",
+    "Duration of model calls, tool calls and searches.",
+    ("kind", "name"),
+)
+_retries = counter(
+    "retries",
+    "Retries after transient errors, by retry layer.",
+    ("layer",),
+)
+_tokens = counter(
+    "model_tokens",
+    "Model tokens used: input (including cached), cached, output (including "
+    "thinking) and thinking.",
+    ("kind",),
+)
+_request_tokens = histogram(
+    "request_tokens",
+    "Model tokens used per request, by kind.",
+    ("kind",),
+    buckets=(1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000),
+)
+
+TOKEN_KINDS: Final = ("input", "cached", "output", "thinking")
+"""Token counts kept per model call: ``input`` includes ``cached`` prompt tokens
+and ``output`` includes ``thinking`` tokens, as Gemini bills them."""
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class RequestTiming:
+    """Thread-safe latency breakdown of one request.
+
+    Tool calls of one model turn run concurrently, so spans may be recorded from
+    several threads at once.
+    """
+
+    route: str
+    """Route served, used as the histogram label."""
+
+    def __init__(
+        self, route: str, clock: Callable[[], float] = time.perf_counter
+    ) -> None:
+        """Start timing a request.
+
+        Args:
+            route: Route served, e.g. ``/api/query``.
+            clock: Monotonic time source.
+        """
+        self.route = route
+        self._clock = clock
+        self._start = clock()
+        self._first_byte: Optional[float] = None
+        self._first_text: Optional[float] = None
+        self._total: Optional[float] = None
+        self._spans: DefaultDict[str, List[float]] = defaultdict(list)
+        self._retries: DefaultDict[str, int] = defaultdict(int)
+        self._tokens = dict.fromkeys(TOKEN_KINDS, 0)
+        self._degraded = False
+        self._lock = threading.Lock()
+
+    def mark_first_byte(self) -> None:
+        """Record that a response chunk was sent; only the first one counts."""
+        if self._first_byte is None:
+            self._first_byte = self._clock() - self._start
+            _ttfb.observe(self._first_byte, route=self.route)
+
+    def mark_first_text(self) -> None:
+        """Record that answer text was sent; only the first one counts."""
+        if self._first_text is None:
+            self._first_text = self._clock() - self._start
+            _first_text.observe(self._first_text, route=self.route)
+
+    def add_span(self, kind: str, name: str, seconds: float) -> None:
+        """Record a finished span, e.g. a model call or one tool call."""
+        key = kind if kind == "model" else f"{kind}:{name}"
+        with self._lock:
+            self._spans[key].append(seconds)
+
+    def add_retry(self, layer: str) -> None:
+        """Count a retry in the given retry layer (``stream`` or ``rag``)."""
+        with self._lock:
+            self._retries[layer] += 1
+
+    def add_tokens(self, tokens: Dict[str, int]) -> None:
+        """Add one model call's token counts, keyed by :data:`TOKEN_KINDS`."""
+        with self._lock:
+            for kind, n in tokens.items():
+                self._tokens[kind] += n
+
+    def mark_degraded(self) -> None:
+        """Record that a circuit-breaker fallback answered part of the request."""
+        self._degraded = True
+
+    @property
+    def degraded(self) -> bool:
+        """Whether a circuit-breaker fallback answered part of the request."""
+        return self._degraded
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the breakdown so far, with durations in milliseconds.
+
+        Returns:
+            ``route``; ``first_byte_ms``, ``first_text_ms`` and ``total_ms``
+            (None until reached); ``spans``, each span's durations keyed by
+            ``model``, ``tool:<name>`` or ``rag_search:<name>``; ``retries``
+            per retry layer; and ``tokens``, the model tokens used by kind.
+        """
+        with self._lock:
+            spans = {k: [_ms(s) for s in v] for k, v in self._spans.items()}
+            retries = dict(self._retries)
+            tokens = dict(self._tokens)
+        return {
+            "route": self.route,
+            "first_byte_ms": _ms(self._first_byte),
+            "first_text_ms": _ms(self._first_text),
+            "total_ms": _ms(self._total),
+            "spans": spans,
+            "retries": retries,
+            "tokens": tokens,
+        }
+
+    def finish(self) -> Dict[str, Any]:
+        """End the request, logging its breakdown once.
+
+        Returns:
+            The final :meth:`summary`.
+        """
+        if self._total is None:
+            self._total = self._clock() - self._start
+            _duration.observe(self._total, route=self.route)
+            summary = self.summary()
+            for kind, n in summary["tokens"].items():
+                _request_tokens.observe(n, kind=kind)
+            logger.info("request_timing %s", json.dumps(summary))
+            return summary
+        return self.summary()
+
+
+def current_timing() -> Optional[RequestTiming]:
+    """Return the timing of the request whose run is executing, if any."""
+    # Read the run's config directly: ensure_config() copies it on every call,
+    # which would dominate the cost of a span.
+    config = var_child_runnable_config.get() or {}
+    timing = config.get("configurable", {}).get(TIMING_CONFIG_KEY)
+    return timing if isinstance(timing, RequestTiming) else None
+
+
+@contextmanager
+def span(kind: str, name: str) -> Generator[None, None, None]:
+    """Time the enclosed block as a span of the current request.
+
+    The duration is recorded whether or not the block raises.
+
+    Args:
+        kind: What is timed: ``model``, ``tool`` or ``rag_search``.
+        name: Which one, e.g. the tool name.
+    """
+    timing = current_timing()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _spans.observe(seconds, kind=kind, name=name)
+        if timing is not None:
+            timing.add_span(kind, name, seconds)
+
+
+def count_retry(layer: str, timing: Optional[RequestTiming] = None) -> None:
+    """Count a retry against the current (or given) request.
+
+    Args:
+        layer: Retry layer, ``stream`` for the chat manager's reconnects or
+            ``rag`` for Vertex AI Search retries.
+        timing: The request's timing; defaults to :func:`current_timing`.
+    """
+    _retries.inc(layer=layer)
+    timing = timing or current_timing()
+    if timing is not None:
+        timing.add_retry(layer)
+
+
+def mark_degraded(timing: Optional[RequestTiming] = None) -> None:
+    """Flag the current (or given) request as answered by a breaker fallback.
+
+    Args:
+        timing: The request's timing; defaults to :func:`current_timing`.
+    """
+    timing = timing or current_timing()
+    if timing is not None:
+        timing.mark_degraded()
+
+
+def count_tokens(
+    messages: Sequence[BaseMessage], timing: Optional[RequestTiming] = None
+) -> None:
+    """Count the tokens one model call reports in its messages' ``usage_metadata``.
+
+    Args:
+        messages: Messages returned by the model call.
+        timing: The request's timing; defaults to :func:`current_timing`.
+    """
+    timing = timing or current_timing()
+    for message in messages:
+        usage = message.usage_metadata if isinstance(message, AIMessage) else None
+        if not usage:
+            continue
+        tokens = {
+            "input": usage.get("input_tokens", 0),
+            "cached": usage.get("input_token_details", {}).get("cache_read") or 0,
+            "output": usage.get("output_tokens", 0),
+            "thinking": usage.get("output_token_details", {}).get("reasoning") or 0,
+        }
+        for kind, n in tokens.items():
+            _tokens.inc(n, kind=kind)
+        if timing is not None:
+            timing.add_tokens(tokens)
@@ -0,0 +1,40 @@
+"""SQLite files shared by every worker process on one node.
+
+The conversation store, the RAG and answer caches and the token buckets each
+have a ``sqlite`` backend built on :func:`open_shared_sqlite`, which uses only
+the standard library. Each file is opened in WAL mode, so readers in one worker
+never block the writer in another, and writes that read first start with
+``BEGIN IMMEDIATE`` so they are atomic across processes.
+"""
+
+import sqlite3
+from pathlib import Path
+
+_BUSY_TIMEOUT_SECONDS = 30
+"""How long a write waits for another process to release the file's lock."""
+
+
+def open_shared_sqlite(path: Path, schema: str) -> sqlite3.Connection:
+    """Open (creating if needed) the SQLite file at ``path`` and apply ``schema``.
+
+    The connection is in autocommit mode, so callers begin their own
+    transactions, and may be used from any thread; callers serialize its use
+    with their own lock.
+
+    Args:
+        path: Database file location; missing parent directories are created.
+        schema: ``CREATE ... IF NOT EXISTS`` statements run on every open.
+
+    Returns:
+        The open connection.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(
+        path,
+        check_same_thread=False,
+        isolation_level=None,
+        timeout=_BUSY_TIMEOUT_SECONDS,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(schema)
+    return conn
@@ -0,0 +1,386 @@
+"""Local lexical index over the ORS chapter 90 sections shipped in ``sections.json``.
+
+``sections.json`` holds the full text of every ORS chapter 90 section keyed by
+section number. :func:`build_index` compiles it into one compact binary file
+(written at image build time by :func:`write_statute_index`, or
+``mise run build-statute-index``) holding:
+
+- a header with the corpus statistics and the SHA-256 of the source JSON,
+- a section table pointing at each section's number, title and text,
+- a sorted term dictionary pointing at each term's postings,
+- the postings themselves, ``(section, term frequency)`` pairs of ``uint32``,
+- the UTF-8 strings.
+
+:class:`StatuteIndex` memory-maps that file and answers BM25-ranked lookups by
+binary search over the term dictionary, so a query costs microseconds, makes no
+network call, and the pages are shared by every worker on the node. If the file
+is missing or was built from a different ``sections.json``, the index is built
+in memory instead.
+"""
+
+import hashlib
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+from collections import Counter
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Final, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+SECTIONS_PATH: Final = Path(__file__).parent / "sections.json"
+"""ORS chapter 90 section texts, keyed by section number."""
+
+DEFAULT_INDEX_PATH: Final = Path(__file__).parent / "sections.idx"
+"""Where the image build writes the compiled index."""
+
+_MAGIC: Final = b"TFASIX01"
+"""File signature and format version."""
+
+_HEADER: Final = struct.Struct("<8s32sIIdIIII")
+"""magic, source digest, sections, terms, average length, then the offsets of the
+section table, term table, postings and strings."""
+
+_SECTION: Final = struct.Struct("<IIIIII")
+"""Section table row: number offset/length, text offset/length, title length and
+length in tokens."""
+
+_TERM: Final = struct.Struct("<IIII")
+"""Term table row: term offset/length, postings offset and postings count."""
+
+_POSTING: Final = struct.Struct("<II")
+"""Postings entry: section id and term frequency."""
+
+BM25_K1: Final = 1.2
+"""BM25 term-frequency saturation."""
+
+BM25_B: Final = 0.75
+"""BM25 document-length normalization."""
+
+_TOKEN_RE: Final = re.compile(r"\d+\.\d+|[a-z0-9]+")
+"""Words, plus section numbers such as ``90.427`` kept whole."""
+
+_STOPWORDS: Final = frozenset(
+    "a an and any are as at be by for from has if in is it its may not of on or "
+    "that the this to under which with".split()
+)
+"""Words too common in statute text to help rank sections."""
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into index terms.
+
+    Text is case-folded, stopwords are dropped and a trailing plural ``s`` is
+    removed, so "Tenants" and "tenant" match. Section numbers stay one term.
+
+    Args:
+        text: Statute text or a search query.
+
+    Returns:
+        Terms in the order they occur.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.casefold()):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def _section_title(text: str) -> str:
+    """Return a section's catchline, the sentence before its first ``". "``."""
+    title, sep, _ = text.partition(". ")
+    return title if sep else ""
+
+
+def build_index(sections: Mapping[str, str], source_digest: bytes = b"") -> bytes:
+    """Compile section texts into the binary index format.
+
+    Args:
+        sections: Section text keyed by section number, e.g. ``"90.100"``.
+        source_digest: SHA-256 of the source file, recorded to detect staleness.
+
+    Returns:
+        The index file contents.
+    """
+    strings = bytearray()
+
+    def intern(value: str) -> Tuple[int, int]:
+        data = value.encode("utf-8")
+        offset = len(strings)
+        strings.extend(data)
+        return offset, len(data)
+
+    section_rows = bytearray()
+    postings_by_term: Dict[str, List[Tuple[int, int]]] = {}
+    total_length = 0
+    for doc_id, (number, text) in enumerate(sections.items()):
+        # The section's own number is indexed, so "ORS 90.427" finds it.
+        terms = tokenize(f"{number} {text}")
+        total_length += len(terms)
+        for term, tf in Counter(terms).items():
+            postings_by_term.setdefault(term, []).append((doc_id, tf))
+        number_ref = intern(number)
+        text_ref = intern(text)
+        title_length = len(_section_title(text).encode("utf-8"))
+        section_rows += _SECTION.pack(*number_ref, *text_ref, title_length, len(terms))
+
+    term_rows = bytearray()
+    postings = bytearray()
+    for term in sorted(postings_by_term, key=lambda t: t.encode("utf-8")):
+        entries = postings_by_term[term]
+        term_rows += _TERM.pack(*intern(term), len(postings), len(entries))
+        for entry in entries:
+            postings += _POSTING.pack(*entry)
+
+    sections_offset = _HEADER.size
+    terms_offset = sections_offset + len(section_rows)
+    postings_offset = terms_offset + len(term_rows)
+    strings_offset = postings_offset + len(postings)
+    header = _HEADER.pack(
+        _MAGIC,
+        source_digest.ljust(32, b"\0"),
+        len(sections),
+        len(postings_by_term),
+        total_length / len(sections) if sections else 0.0,
+        sections_offset,
+        terms_offset,
+        postings_offset,
+        strings_offset,
+    )
+    return b"".join((header, section_rows, term_rows, postings, strings))
+
+
+def _source_digest(source: Path) -> bytes:
+    """Return the SHA-256 of the source JSON file."""
+    return hashlib.sha256(source.read_bytes()).digest()
+
+
+def write_statute_index(
+    path: Path = DEFAULT_INDEX_PATH, source: Path = SECTIONS_PATH
+) -> Path:
+    """Build the index from ``source`` and atomically write it to ``path``.
+
+    Args:
+        path: Index file to write.
+        source: Section texts as JSON.
+
+    Returns:
+        The path written.
+    """
+    data = build_index(
+        json.loads(source.read_text(encoding="utf-8")), _source_digest(source)
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    # mkstemp creates the file 0600; the image builds it as root for the
+    # unprivileged workers to read.
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+    return path
+
+
+@dataclass(frozen=True)
+class StatuteHit:
+    """One ranked section returned by :meth:`StatuteIndex.search`."""
+
+    section: str
+    """Section number, e.g. ``"90.427"``."""
+    title: str
+    """Section catchline."""
+    score: float
+    """BM25 score; higher is more relevant."""
+
+
+class StatuteIndex:
+    """Read-only BM25 index over a compiled statute index buffer.
+
+    Thread-safe: all state is immutable after construction.
+    """
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap]) -> None:
+        """Wrap a compiled index.
+
+        Args:
+            buffer: Output of :func:`build_index`, in memory or memory-mapped.
+
+        Raises:
+            ValueError: If ``buffer`` is not a statute index of this version.
+        """
+        if len(buffer) < _HEADER.size or buffer[: len(_MAGIC)] != _MAGIC:
+            raise ValueError("Not a statute index (bad signature)")
+        self._buffer = buffer
+        (
+            _,
+            self.source_digest,
+            self.section_count,
+            self.term_count,
+            self._avg_length,
+            self._sections_offset,
+            self._terms_offset,
+            self._postings_offset,
+            self._strings_offset,
+        ) = _HEADER.unpack_from(buffer)
+        self._numbers: Dict[str, int] = {
+            self._number(doc_id): doc_id for doc_id in range(self.section_count)
+        }
+        # BM25 length normalization per section: one float each, so scoring
+        # never unpacks the section table.
+        self._norms: List[float] = [
+            BM25_K1
+            * (1 - BM25_B + BM25_B * self._section_row(doc_id)[5] / self._avg_length)
+            for doc_id in range(self.section_count)
+        ]
+
+    @classmethod
+    def open(cls, path: Path) -> "StatuteIndex":
+        """Memory-map a compiled index file read-only."""
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return self._buffer[start : start + length].decode("utf-8")
+
+    def _section_row(self, doc_id: int) -> Tuple[int, int, int, int, int, int]:
+        return _SECTION.unpack_from(
+            self._buffer, self._sections_offset + doc_id * _SECTION.size
+        )
+
+    def _number(self, doc_id: int) -> str:
+        number_offset, number_length, *_ = self._section_row(doc_id)
+        return self._string(number_offset, number_length)
+
+    def _title(self, doc_id: int) -> str:
+        _, _, text_offset, _, title_length, _ = self._section_row(doc_id)
+        return self._string(text_offset, title_length)
+
+    def _find_term(self, term: bytes) -> Optional[Tuple[int, int]]:
+        """Binary-search the term table; return (postings offset, count) if present."""
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            term_offset, term_length, postings, count = _TERM.unpack_from(
+                self._buffer, self._terms_offset + mid * _TERM.size
+            )
+            start = self._strings_offset + term_offset
+            candidate = self._buffer[start : start + term_length]
+            if candidate == term:
+                return postings, count
+            if candidate < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _postings(self, offset: int, count: int) -> Iterator[Tuple[int, int]]:
+        start = self._postings_offset + offset
+        return _POSTING.iter_unpack(self._buffer[start : start + count * _POSTING.size])
+
+    def search(self, query: str, k: int = 3) -> List[StatuteHit]:
+        """Return the ``k`` sections ranking highest for ``query`` under BM25.
+
+        Args:
+            query: Free text, section numbers, or both.
+            k: Maximum number of sections to return.
+
+        Returns:
+            Hits in descending score order; empty if no query term is indexed.
+        """
+        scores: Dict[int, float] = {}
+        terms = set(tokenize(query))
+        for term in terms:
+            found = self._find_term(term.encode("utf-8"))
+            if found is None:
+                continue
+            postings, count = found
+            idf = math.log(1 + (self.section_count - count + 0.5) / (count + 0.5))
+            for doc_id, tf in self._postings(postings, count):
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (
+                    tf + self._norms[doc_id]
+                )
+        # A section cited by number outranks the sections that merely cross-reference it.
+        if scores:
+            best = max(scores.values())
+            for term in terms:
+                doc_id = self._numbers.get(term)
+                if doc_id is not None:
+                    scores[doc_id] += best
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [
+            StatuteHit(self._number(doc_id), self._title(doc_id), score)
+            for doc_id, score in top
+        ]
+
+    def section(self, number: str) -> Optional[str]:
+        """Return the full text of a section by number, or None if not indexed."""
+        doc_id = self._numbers.get(number)
+        if doc_id is None:
+            return None
+        _, _, text_offset, text_length, _, _ = self._section_row(doc_id)
+        return self._string(text_offset, text_length)
+
+    def title(self, number: str) -> Optional[str]:
+        """Return a section's catchline by number, or None if not indexed."""
+        doc_id = self._numbers.get(number)
+        return None if doc_id is None else self._title(doc_id)
+
+    def sections(self) -> List[str]:
+        """Return every indexed section number, in source order."""
+        return list(self._numbers)
+
+
+def load_statute_index(path: Path, source: Path = SECTIONS_PATH) -> StatuteIndex:
+    """Memory-map the compiled index, or build it in memory if missing or stale.
+
+    Args:
+        path: Compiled index file.
+        source: Section texts the index must have been built from.
+
+    Returns:
+        An index over the current ``source``.
+    """
+    digest = _source_digest(source)
+    try:
+        index = StatuteIndex.open(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Statute index {path} unusable ({e}); building in memory")
+    else:
+        if index.source_digest == digest:
+            return index
+        logger.warning(f"Statute index {path} is stale; building in memory")
+    return StatuteIndex(
+        build_index(json.loads(source.read_text(encoding="utf-8")), digest)
+    )
+
+
+_statute_index: Optional[StatuteIndex] = None
+"""Lazily-loaded process-wide statute index."""
+_statute_index_lock = threading.Lock()
+"""Lock for thread-safe index loading."""
+
+
+def get_statute_index() -> StatuteIndex:
+    """Return the process-wide statute index, loading it on first call."""
+    # Imported here rather than at module level: constants validates the whole
+    # server environment, which the image build step compiling the index lacks.
+    from .constants import STATUTE_INDEX_PATH
+
+    global _statute_index
+    with _statute_index_lock:
+        if _statute_index is None:
+            _statute_index = load_statute_index(STATUTE_INDEX_PATH)
+        return _statute_index
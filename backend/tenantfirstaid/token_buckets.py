@@ -0,0 +1,242 @@
+"""Per-client token budgets for ``/api/query``.
+
+What a chat request costs depends on the model tokens it uses, not on the
+request count: one client re-sending a long history can use more than many
+ordinary users together. When ``TOKEN_BUCKETS`` is enabled, each client address
+gets a token bucket holding up to ``TOKEN_BUCKET_CAPACITY`` model tokens and
+refilling at ``TOKEN_BUCKET_REFILL_PER_MINUTE``. The chat views
+check :meth:`TokenBucketStore.retry_after` before admitting a request and answer
+a 429 while the client's bucket is empty. When the stream ends they
+:meth:`~TokenBucketStore.debit` the input and output tokens the model actually
+reported (see :mod:`~tenantfirstaid.request_timing`). A request's cost is only
+known afterwards, so a bucket can go below zero and the client then waits until
+it has refilled past zero.
+
+Two stores are provided:
+
+- :class:`InMemoryTokenBuckets` — per-process, so every worker keeps its own
+  budget. Suitable for development only.
+- :class:`SqliteTokenBuckets` — a file shared by every worker on one node.
+
+To share budgets across nodes, subclass :class:`TokenBucketStore` over a
+networked store; only ``_level`` and ``_debit`` need implementing.
+"""
+
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from .constants import (
+    TOKEN_BUCKET_CAPACITY,
+    TOKEN_BUCKET_REFILL_PER_MINUTE,
+    TOKEN_BUCKETS,
+    TOKEN_BUCKETS_SQLITE_PATH,
+)
+from .metrics import counter
+from .sqlite_store import open_shared_sqlite
+
+_rejections = counter(
+    "token_bucket_rejections",
+    "Requests to /api/query turned away because the client's token bucket was empty.",
+)
+
+
+def billed_tokens(tokens: Dict[str, int]) -> int:
+    """Return the tokens to debit for one request's :data:`~tenantfirstaid.request_timing.TOKEN_KINDS` counts.
+
+    ``input`` already includes ``cached`` and ``output`` already includes
+    ``thinking``, so only those two are added.
+    """
+    return tokens.get("input", 0) + tokens.get("output", 0)
+
+
+class TokenBucketStore(ABC):
+    """Base class for thread-safe stores of per-client token buckets.
+
+    A bucket is stored only as the time it will be full again, from which its
+    level at any moment follows; a client without a stored bucket has a full
+    one. Subclasses implement ``_level`` and ``_debit``, which must be atomic
+    across every process sharing the store.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: float,
+        refill_per_minute: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Initialize the store.
+
+        Args:
+            capacity: Most tokens a bucket holds.
+            refill_per_minute: Tokens added back to a bucket per minute.
+            clock: Wall clock, injectable for tests.
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_minute / 60
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def _refilled(self, full_at: float, now: float) -> float:
+        """Level at ``now`` of a bucket that will be full at ``full_at``."""
+        return self.capacity - max(0.0, full_at - now) * self.refill_per_second
+
+    def _full_time(self, level: float, now: float) -> float:
+        """Time at which a bucket at ``level`` now will be full again."""
+        return now + (self.capacity - level) / self.refill_per_second
+
+    def retry_after(self, client: str) -> int:
+        """Return the seconds ``client`` must wait before its next request.
+
+        Returns:
+            0 if the client's bucket has tokens left, otherwise the whole
+            seconds until it has refilled past zero.
+        """
+        with self._lock:
+            level = self._level(client, self._clock())
+        if level > 0:
+            return 0
+        _rejections.inc()
+        return math.floor(-level / self.refill_per_second) + 1
+
+    def debit(self, client: str, tokens: int) -> float:
+        """Take ``tokens`` from ``client``'s bucket, which may go below zero.
+
+        Returns:
+            The bucket's level afterwards.
+        """
+        with self._lock:
+            return self._debit(client, tokens, self._clock())
+
+    @abstractmethod
+    def _level(self, client: str, now: float) -> float:
+        """Return ``client``'s bucket level at ``now``."""
+
+    @abstractmethod
+    def _debit(self, client: str, tokens: int, now: float) -> float:
+        """Take ``tokens`` from ``client``'s bucket; return its level afterwards."""
+
+
+class InMemoryTokenBuckets(TokenBucketStore):
+    """Per-process token buckets, forgotten once full again."""
+
+    def __init__(
+        self,
+        *,
+        capacity: float,
+        refill_per_minute: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Initialize with every bucket full.
+
+        Args:
+            capacity: Most tokens a bucket holds.
+            refill_per_minute: Tokens added back to a bucket per minute.
+            clock: Wall clock, injectable for tests.
+        """
+        super().__init__(
+            capacity=capacity, refill_per_minute=refill_per_minute, clock=clock
+        )
+        # client -> time its bucket is full again
+        self._buckets: Dict[str, float] = {}
+
+    def _level(self, client: str, now: float) -> float:
+        return self._refilled(self._buckets.get(client, now), now)
+
+    def _debit(self, client: str, tokens: int, now: float) -> float:
+        level = self._level(client, now) - tokens
+        for full in [c for c, at in self._buckets.items() if at <= now]:
+            del self._buckets[full]
+        self._buckets[client] = self._full_time(level, now)
+        return level
+
+
+class SqliteTokenBuckets(TokenBucketStore):
+    """SQLite-file token buckets shared by every worker on a node.
+
+    The file is opened with :func:`~tenantfirstaid.sqlite_store.open_shared_sqlite`
+    and each debit is a read-modify-write in one ``BEGIN IMMEDIATE`` transaction,
+    so concurrent requests from one client in different workers are all counted.
+    Buckets that are full again are deleted.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS buckets (
+            client TEXT PRIMARY KEY,
+            full_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS buckets_full_at ON buckets (full_at);
+    """
+    """Table of non-full buckets with the time each is full again."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        capacity: float,
+        refill_per_minute: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Open (creating if needed) the SQLite file at ``path``.
+
+        Args:
+            path: Database file location.
+            capacity: Most tokens a bucket holds.
+            refill_per_minute: Tokens added back to a bucket per minute.
+            clock: Wall clock, injectable for tests.
+        """
+        super().__init__(
+            capacity=capacity, refill_per_minute=refill_per_minute, clock=clock
+        )
+        self._conn = open_shared_sqlite(path, self._SCHEMA)
+
+    def _stored_full_at(self, client: str, now: float) -> float:
+        row: Optional[Tuple[float]] = self._conn.execute(
+            "SELECT full_at FROM buckets WHERE client = ?", (client,)
+        ).fetchone()
+        return now if row is None else row[0]
+
+    def _level(self, client: str, now: float) -> float:
+        return self._refilled(self._stored_full_at(client, now), now)
+
+    def _debit(self, client: str, tokens: int, now: float) -> float:
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            level = self._refilled(self._stored_full_at(client, now), now) - tokens
+            self._conn.execute(
+                "INSERT OR REPLACE INTO buckets VALUES (?, ?)",
+                (client, self._full_time(level, now)),
+            )
+            self._conn.execute("DELETE FROM buckets WHERE full_at <= ?", (now,))
+        return level
+
+
+_token_buckets: Optional[TokenBucketStore] = None
+"""Lazily-created process-wide bucket store for ``TOKEN_BUCKETS``."""
+_token_buckets_lock = threading.Lock()
+"""Lock for thread-safe store creation."""
+
+
+def get_token_buckets() -> Optional[TokenBucketStore]:
+    """Return the process-wide bucket store, or None if ``TOKEN_BUCKETS`` is ``none``."""
+    global _token_buckets
+    if TOKEN_BUCKETS == "none":
+        return None
+    with _token_buckets_lock:
+        if _token_buckets is None:
+            if TOKEN_BUCKETS == "sqlite":
+                _token_buckets = SqliteTokenBuckets(
+                    TOKEN_BUCKETS_SQLITE_PATH,
+                    capacity=TOKEN_BUCKET_CAPACITY,
+                    refill_per_minute=TOKEN_BUCKET_REFILL_PER_MINUTE,
+                )
+            else:
+                _token_buckets = InMemoryTokenBuckets(
+                    capacity=TOKEN_BUCKET_CAPACITY,
+                    refill_per_minute=TOKEN_BUCKET_REFILL_PER_MINUTE,
+                )
+        return _token_buckets
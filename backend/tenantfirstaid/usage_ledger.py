@@ -0,0 +1,176 @@
+"""Opt-in, append-only ledger of model token usage per request.
+
+Gemini's thinking budget is dynamic, so what a conversation costs is only known
+after the fact. When ``USAGE_LEDGER_DIR`` is set, the chat views append one JSON
+line per ``/api/query`` request to that directory when its stream ends: the
+tokens every model call of the request used (see
+:func:`~tenantfirstaid.request_timing.count_tokens`), with the model, the user's
+location and the server-side thread, if any.
+
+Files rotate daily (``usage-YYYY-MM-DD.jsonl``, UTC) and files older than
+``USAGE_LEDGER_RETENTION_DAYS`` are deleted when a new one is started. Each line
+is written with a single append, so every worker on a node can share the
+directory. ``mise run usage-report`` turns the ledger into cost per day and per
+location and flags outlier conversations.
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .constants import SINGLETON, USAGE_LEDGER_DIR, USAGE_LEDGER_RETENTION_DAYS
+from .location import OregonCity, UsaState
+
+logger = logging.getLogger(__name__)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class UsageLedger:
+    """Daily-rotating JSONL files of per-request usage records."""
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        retention_days: int = USAGE_LEDGER_RETENTION_DAYS,
+        clock: Callable[[], datetime] = _now,
+    ) -> None:
+        """Open (creating if needed) the ledger directory.
+
+        Args:
+            directory: Directory holding the daily files.
+            retention_days: Days of files kept; ``0`` keeps every file.
+            clock: UTC wall clock, injectable for tests.
+        """
+        self.directory = directory
+        self.retention_days = retention_days
+        self._clock = clock
+        self._day: Optional[date] = None
+        self._lock = threading.Lock()
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, day: date) -> Path:
+        """Return the file holding ``day``'s records."""
+        return self.directory / f"usage-{day.isoformat()}.jsonl"
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Append ``record`` as one line of today's file, stamped with ``ts``."""
+        now = self._clock()
+        line = json.dumps({"ts": now.isoformat(timespec="seconds"), **record}) + "\n"
+        today = now.date()
+        with self._lock:
+            if today != self._day:
+                self._day = today
+                self._prune(today)
+            # One write() to an O_APPEND file, so lines from other workers
+            # never interleave with this one.
+            fd = os.open(
+                self.path_for(today), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644
+            )
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+
+    def _prune(self, today: date) -> None:
+        """Delete the files of days older than the retention period."""
+        if self.retention_days <= 0:
+            return
+        oldest = today - timedelta(days=self.retention_days - 1)
+        for path in self.directory.glob("usage-*.jsonl"):
+            try:
+                day = date.fromisoformat(path.stem.removeprefix("usage-"))
+            except ValueError:
+                continue
+            if day < oldest:
+                path.unlink(missing_ok=True)
+
+    def records(
+        self, since: Optional[date] = None, until: Optional[date] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield the records of each day in ``[since, until]``, oldest first.
+
+        Lines that cannot be parsed (e.g. cut short by a full disk) are skipped.
+
+        Args:
+            since: First day included; the oldest file if None.
+            until: Last day included; the newest file if None.
+        """
+        for path in sorted(self.directory.glob("usage-*.jsonl")):
+            try:
+                day = date.fromisoformat(path.stem.removeprefix("usage-"))
+            except ValueError:
+                continue
+            if (since and day < since) or (until and day > until):
+                continue
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        logger.warning("Skipping malformed line in %s", path)
+
+
+_usage_ledger: Optional[UsageLedger] = None
+"""Lazily-created process-wide ledger for ``USAGE_LEDGER_DIR``."""
+_usage_ledger_lock = threading.Lock()
+"""Lock for thread-safe ledger creation."""
+
+
+def get_usage_ledger() -> Optional[UsageLedger]:
+    """Return the process-wide ledger, or None if ``USAGE_LEDGER_DIR`` is unset."""
+    global _usage_ledger
+    if not USAGE_LEDGER_DIR:
+        return None
+    with _usage_ledger_lock:
+        if _usage_ledger is None:
+            _usage_ledger = UsageLedger(Path(USAGE_LEDGER_DIR))
+        return _usage_ledger
+
+
+def record_usage(
+    summary: Dict[str, Any],
+    *,
+    city: Optional[OregonCity],
+    state: UsaState,
+    thread_id: Optional[str],
+) -> None:
+    """Append a finished request's token usage to the ledger, if enabled.
+
+    Requests that made no model call (e.g. rejected by an open circuit breaker)
+    are not recorded. A failed write is logged, never raised, so the ledger
+    cannot break a response.
+
+    Args:
+        summary: The request's
+            [`RequestTiming.finish`](`~request_timing.RequestTiming.finish`) summary.
+        city: The user's city, if recognized.
+        state: The user's state.
+        thread_id: Server-side thread of the conversation, if any.
+    """
+    ledger = get_usage_ledger()
+    model_calls = len(summary["spans"].get("model", []))
+    if ledger is None or model_calls == 0:
+        return
+    try:
+        ledger.append(
+            {
+                "route": summary["route"],
+                "thread": thread_id,
+                "state": state.value,
+                "city": city.value if city else None,
+                "model": SINGLETON.MODEL_NAME,
+                "model_calls": model_calls,
+                **summary["tokens"],
+                "total_ms": summary["total_ms"],
+            }
+        )
+    except OSError:
+        logger.warning("Could not append to the usage ledger", exc_info=True)
@@ -0,0 +1,133 @@
+"""Worker warm-up at boot, and the readiness it reports at ``/healthz/ready``.
+
+Everything expensive about serving a query is built lazily on first use: the
+shared LLM (including parsing the service-account credentials), a Vertex AI
+Search client per datastore, the statute index and the compiled agent graphs.
+Without warm-up, the first tenant to reach a new worker pays for all of it, and
+so does the first tenant after gunicorn replaces a worker killed by
+``--timeout``. When ``WARMUP`` is enabled, :func:`warm_up` builds them as the
+worker starts. Under gunicorn it runs from the ``post_worker_init`` hook in
+``gunicorn.conf.py``; under uvicorn it runs from the ASGI app's startup. Both run
+before the worker accepts a connection. With ``WARMUP_PRIME``, it also makes one
+free token-count call to Gemini, so the access token is fetched and the
+connection opened too.
+
+:func:`readiness` reports whether this worker is ready to serve. A worker is
+ready once warm-up has built everything (or at once when ``WARMUP`` is off). A
+step that fails, e.g. unreadable credentials, keeps the worker not ready, since
+every query it serves would fail the same way. A failed primer call is only
+logged: the worker can still serve.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from .constants import CONVERSATION_STORE, SINGLETON, WARMUP, WARMUP_PRIME
+from .graph import _get_llm, get_agent_graph
+from .langchain_tools import _pooled_retriever
+from .metrics import gauge, histogram
+from .statute_index import get_statute_index
+
+logger = logging.getLogger(__name__)
+
+_step_seconds = histogram(
+    "warmup_step_seconds",
+    "Time each warm-up step took when a worker started.",
+    ("step",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0),
+)
+_workers_ready = gauge(
+    "workers_ready", "Worker processes that have warmed up and are ready to serve."
+)
+
+_warmed = threading.Event()
+"""Set once every warm-up step has succeeded in this process."""
+_failed: List[str] = []
+"""Names of the warm-up steps that failed in this process; the errors are logged."""
+
+
+def _build_retrievers() -> None:
+    """Build the pooled retriever for every configured datastore."""
+    for data_store_id in SINGLETON.VERTEX_AI_DATASTORES.values():
+        _pooled_retriever(data_store_id)
+
+
+def _build_graphs() -> None:
+    """Compile the shared agent graph, and the threaded one if threads are on."""
+    get_agent_graph()
+    if CONVERSATION_STORE != "none":
+        get_agent_graph(threaded=True)
+
+
+def _prime_model() -> None:
+    """Count the tokens of a short text, which Gemini does not bill."""
+    _get_llm().get_num_tokens("Tenant First Aid")
+
+
+_STEPS: List[Tuple[str, Callable[[], Any]]] = [
+    ("llm", _get_llm),
+    ("retrievers", _build_retrievers),
+    ("statute_index", get_statute_index),
+    ("graphs", _build_graphs),
+]
+"""Warm-up steps in order; each must succeed for the worker to be ready."""
+
+
+def _timed(step: str, build: Callable[[], Any]) -> bool:
+    """Run one warm-up step, logging and recording how long it took.
+
+    Returns:
+        Whether the step succeeded.
+    """
+    started = time.perf_counter()
+    try:
+        build()
+    except Exception:
+        logger.exception("Warm-up step %s failed", step)
+        _failed.append(step)
+        return False
+    finally:
+        elapsed = time.perf_counter() - started
+        _step_seconds.observe(elapsed, step=step)
+    logger.info("Warm-up step %s took %.2fs", step, elapsed)
+    return True
+
+
+def warm_up(prime: bool = WARMUP_PRIME) -> bool:
+    """Build everything a first query needs, so this worker serves it at full speed.
+
+    Does nothing when ``WARMUP`` is off. Safe to call more than once: every step
+    reuses what an earlier call (or request) built.
+
+    Args:
+        prime: Also make one free call to Gemini after the other steps.
+
+    Returns:
+        Whether the worker is ready to serve.
+    """
+    if not WARMUP:
+        return True
+    _failed.clear()
+    ok = all([_timed(step, build) for step, build in _STEPS])
+    if ok and prime and not _timed("prime", _prime_model):
+        # The model may be briefly unreachable; requests will retry the connection.
+        _failed.remove("prime")
+    if ok and not _warmed.is_set():
+        _warmed.set()
+        _workers_ready.inc()
+    return ok
+
+
+def readiness() -> Dict[str, Any]:
+    """Return this worker's readiness, as served by ``GET /healthz/ready``.
+
+    Returns:
+        ``ready`` (bool) and ``failed``, the names of the warm-up steps that
+        failed. Errors are only logged, since they may quote configuration.
+    """
+    return {
+        "ready": not WARMUP or _warmed.is_set(),
+        "failed": list(_failed),
+    }
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Generic, TypeVar
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -11,6 +12,18 @@ import evaluate.measure_evaluator_variance  # noqa: F401
 import evaluate.run_langsmith_evaluation  # noqa: F401
 from tenantfirstaid.location import OregonCity, UsaState
 
+T = TypeVar("T")
+
+
+class FakeClock(Generic[T]):
+    """Clock for injecting into code under test; advance it by changing ``now``."""
+
+    def __init__(self, now: T) -> None:
+        self.now = now
+
+    def __call__(self) -> T:
+        return self.now
+
 
 @pytest.fixture(autouse=True)
 def _no_eval_history_writes(request: pytest.FixtureRequest):
@@ -31,6 +44,44 @@ def _no_eval_history_writes(request: pytest.FixtureRequest):
         yield
 
 
+@pytest.fixture(autouse=True)
+def _fresh_retriever_pool():
+    """Keep pooled Vertex AI Search retrievers (possibly mocks) from leaking between tests."""
+    from tenantfirstaid import langchain_tools
+
+    langchain_tools._retriever_pool.clear()
+    yield
+    langchain_tools._retriever_pool.clear()
+
+
+@pytest.fixture(autouse=True)
+def _fresh_circuit_breakers(monkeypatch):
+    """Keep failures counted by one test from opening a shared breaker in another."""
+    from tenantfirstaid import circuit_breaker
+
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+
+
+@pytest.fixture(autouse=True)
+def _fresh_admission(monkeypatch):
+    """Keep stream slots held by one test from turning away requests in another."""
+    from tenantfirstaid import admission
+
+    monkeypatch.setattr(admission, "_admission", None)
+
+
+@pytest.fixture
+def clock() -> FakeClock[float]:
+    """Fake monotonic or wall clock, starting at 1000 seconds."""
+    return FakeClock(1_000.0)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store_backend(request: pytest.FixtureRequest) -> str:
+    """Run a test against both the per-process and the shared SQLite backend."""
+    return request.param
+
+
 @pytest.fixture
 def oregon_state():
     return UsaState.from_maybe_str("or")
@@ -0,0 +1,202 @@
+"""Tests for admission.py — the /api/query stream limit, wait queue and 503s."""
+
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from starlette.testclient import TestClient
+
+from tenantfirstaid import admission
+from tenantfirstaid.admission import AdmissionController
+from tenantfirstaid.app import app
+from tenantfirstaid.asgi import app as asgi_app
+from tenantfirstaid.constants import OREGON_LAW_CENTER_PHONE_NUMBER
+
+_QUERY = {"messages": [], "city": None, "state": "or"}
+
+
+def _controller(max_in_flight=1, max_queue=1, queue_timeout=5.0):
+    controller = AdmissionController(max_in_flight, max_queue, queue_timeout)
+    admission._admission = controller
+    return controller
+
+
+def test_admits_up_to_the_limit_then_queues_then_rejects():
+    controller = _controller(max_in_flight=1, max_queue=1, queue_timeout=5.0)
+    first = controller.acquire()
+    assert first is not None
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(controller.acquire()))
+    waiter.start()
+    while controller.queued == 0:
+        time.sleep(0.001)
+    assert controller.acquire() is None  # queue full: rejected at once
+
+    first.release()
+    waiter.join()
+    assert results[0] is not None
+    assert controller.in_flight == 1
+    results[0].release()
+    assert controller.in_flight == 0
+
+
+def test_waiter_is_rejected_after_the_queue_timeout():
+    controller = _controller(queue_timeout=0.01)
+    held = controller.acquire()
+    assert controller.acquire() is None
+    assert controller.queued == 0
+    held.release()
+    assert controller.in_flight == 0
+
+
+def test_release_is_idempotent():
+    controller = _controller(max_in_flight=2)
+    slot = controller.acquire()
+    controller.acquire()
+    slot.release()
+    slot.release()
+    assert controller.in_flight == 1
+
+
+def test_zero_limit_admits_everything():
+    controller = _controller(max_in_flight=0, max_queue=0)
+    assert all(controller.acquire() is not None for _ in range(50))
+
+
+@pytest.mark.asyncio
+async def test_async_waiter_gets_the_released_slot():
+    controller = _controller()
+    held = await controller.aacquire()
+    waiting = asyncio.create_task(controller.aacquire())
+    await asyncio.sleep(0)
+    assert controller.queued == 1
+
+    held.release()
+    slot = await waiting
+    assert slot is not None
+    assert controller.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_async_waiter_leaves_the_queue():
+    controller = _controller()
+    held = await controller.aacquire()
+    waiting = asyncio.create_task(controller.aacquire())
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    assert controller.queued == 0
+    held.release()
+    assert controller.in_flight == 0
+
+
+# ── chat views ─────────────────────────────────────────────────────────────────
+
+
+def _assert_overloaded(status, headers, body):
+    assert status == 503
+    assert headers["Retry-After"] == "10"
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert [line["type"] for line in lines] == ["text", "end_of_stream"]
+    assert OREGON_LAW_CENTER_PHONE_NUMBER in lines[0]["content"]
+
+
+@patch("tenantfirstaid.chat.LangChainChatManager")
+def test_flask_view_sheds_load_with_503(mock_cm_cls):
+    mock_cm_cls.return_value.generate_streaming_response.return_value = iter([])
+    controller = _controller(max_queue=0)
+    held = controller.acquire()
+
+    with app.test_client() as client:
+        resp = client.post("/api/query", json=_QUERY)
+        _assert_overloaded(resp.status_code, resp.headers, resp.get_data(as_text=True))
+
+        held.release()
+        assert client.post("/api/query", json=_QUERY).get_data()
+    assert controller.in_flight == 0
+
+
+@patch("tenantfirstaid.chat.LangChainChatManager")
+def test_flask_view_frees_the_slot_of_an_unread_stream(mock_cm_cls):
+    mock_cm_cls.return_value.generate_streaming_response.return_value = iter([])
+    controller = _controller()
+
+    with app.test_client() as client:
+        resp = client.post("/api/query", json=_QUERY, buffered=False)
+        assert controller.in_flight == 1
+        resp.close()
+    assert controller.in_flight == 0
+
+
+_MALFORMED = [
+    "{not json",
+    json.dumps({"messages": [], "state": "or"}),
+    json.dumps({"messages": [], "city": None}),
+]
+"""Bodies that fail before streaming: invalid JSON, and missing city or state."""
+
+
+@patch("tenantfirstaid.chat.LangChainChatManager")
+def test_flask_view_frees_the_slot_of_a_failed_request(mock_cm_cls):
+    mock_cm_cls.return_value.generate_streaming_response.return_value = iter([])
+    controller = _controller(max_queue=0)
+
+    with (
+        patch.dict(app.config, {"PROPAGATE_EXCEPTIONS": False}),
+        app.test_client() as client,
+    ):
+        for body in _MALFORMED:
+            resp = client.post("/api/query", data=body, content_type="application/json")
+            assert resp.status_code >= 400
+        with patch("tenantfirstaid.chat._open_thread", side_effect=OSError):
+            assert client.post("/api/query", json=_QUERY).status_code == 500
+        assert controller.in_flight == 0
+        assert client.post("/api/query", json=_QUERY).status_code == 200
+    assert controller.in_flight == 0
+
+
+@patch("tenantfirstaid.asgi.LangChainChatManager")
+def test_asgi_view_frees_the_slot_of_a_failed_request(mock_cm_cls):
+    async def astream(**kwargs):
+        return
+        yield  # pragma: no cover
+
+    mock_cm_cls.return_value.agenerate_streaming_response = astream
+    controller = _controller(max_queue=0)
+
+    with TestClient(asgi_app, raise_server_exceptions=False) as client:
+        for body in _MALFORMED:
+            resp = client.post(
+                "/api/query", content=body, headers={"content-type": "application/json"}
+            )
+            assert resp.status_code >= 400
+        with patch("tenantfirstaid.asgi._open_thread", side_effect=OSError):
+            assert client.post("/api/query", json=_QUERY).status_code == 500
+        assert controller.in_flight == 0
+        assert client.post("/api/query", json=_QUERY).status_code == 200
+    assert controller.in_flight == 0
+
+
+@patch("tenantfirstaid.asgi.LangChainChatManager")
+def test_asgi_view_sheds_load_with_503(mock_cm_cls):
+    async def astream(**kwargs):
+        return
+        yield  # pragma: no cover
+
+    mock_cm_cls.return_value.agenerate_streaming_response = astream
+    controller = _controller(max_queue=0)
+    held = controller.acquire()
+
+    with TestClient(asgi_app) as client:
+        resp = client.post("/api/query", json=_QUERY)
+        _assert_overloaded(resp.status_code, resp.headers, resp.text)
+
+        held.release()
+        assert client.post("/api/query", json=_QUERY).status_code == 200
+    assert controller.in_flight == 0
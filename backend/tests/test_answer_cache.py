@@ -0,0 +1,215 @@
+"""Tests for answer_cache.py — recorded first-turn answers replayed without the model."""
+
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from tenantfirstaid import answer_cache
+from tenantfirstaid.answer_cache import (
+    InMemoryAnswerCache,
+    SqliteAnswerCache,
+    answer_cache_key,
+    answer_cache_version,
+    arecord_answer,
+    first_question,
+    record_answer,
+    replay_answer,
+)
+from tenantfirstaid.app import app
+from tenantfirstaid.location import OregonCity, UsaState
+from tenantfirstaid.request_timing import RequestTiming
+from tenantfirstaid.schema import LetterChunk, ReasoningChunk, TextChunk
+
+_QUESTION = "Can my landlord keep my deposit?"
+
+
+def test_first_question_accepts_a_single_human_message_only():
+    assert first_question([{"role": "user", "content": _QUESTION}]) == _QUESTION
+    assert first_question([HumanMessage(_QUESTION)]) == _QUESTION
+    assert first_question([{"role": "ai", "content": "Hi"}]) is None
+    assert first_question([HumanMessage(_QUESTION), AIMessage("No.")]) is None
+    assert first_question([{"role": "human", "content": "  "}]) is None
+    assert first_question([]) is None
+
+
+def test_key_normalizes_the_question_and_covers_location():
+    key = answer_cache_key(_QUESTION, None, UsaState.OREGON)
+    assert answer_cache_key(f"  {_QUESTION.upper()} ", None, UsaState.OREGON) == key
+    assert answer_cache_key(_QUESTION, OregonCity.PORTLAND, UsaState.OREGON) != key
+
+
+def test_changing_the_prompt_changes_every_key():
+    key = answer_cache_key(_QUESTION, None, UsaState.OREGON)
+    answer_cache_version.cache_clear()
+    try:
+        with patch.object(answer_cache, "DEFAULT_INSTRUCTIONS", "A new prompt."):
+            assert answer_cache_key(_QUESTION, None, UsaState.OREGON) != key
+    finally:
+        answer_cache_version.cache_clear()
+
+
+@pytest.fixture
+def make_cache(store_backend, tmp_path, clock):
+    def make(max_entries=2, ttl_seconds=60, version="v1"):
+        if store_backend == "sqlite":
+            return SqliteAnswerCache(
+                tmp_path / "answers.sqlite3",
+                version=version,
+                max_entries=max_entries,
+                ttl_seconds=ttl_seconds,
+                clock=clock,
+            )
+        return InMemoryAnswerCache(
+            max_entries=max_entries, ttl_seconds=ttl_seconds, clock=clock
+        )
+
+    return make
+
+
+def _recording(text="Yes."):
+    return [(0.0, TextChunk(content=text)), (0.5, LetterChunk(content="Dear..."))]
+
+
+def test_round_trip_eviction_and_expiry(make_cache, clock):
+    cache = make_cache()
+    cache.put("a", _recording("A"))
+    cache.put("b", _recording("B"))
+    clock.now += 1
+    assert cache.get("a") == _recording("A")  # now the most recently used
+    cache.put("c", _recording("C"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    clock.now += 61
+    assert cache.get("a") is None
+    assert cache.get("c") is None
+
+
+def test_sqlite_drops_entries_of_an_older_version(tmp_path):
+    path = tmp_path / "answers.sqlite3"
+    old = SqliteAnswerCache(path, version="v1", max_entries=10, ttl_seconds=60)
+    old.put("a", _recording())
+
+    shared = SqliteAnswerCache(path, version="v1", max_entries=10, ttl_seconds=60)
+    assert shared.get("a") == _recording()
+    new = SqliteAnswerCache(path, version="v2", max_entries=10, ttl_seconds=60)
+    assert new.get("a") is None
+    assert new.invalidate() == 0
+
+
+def _timing(model_calls: int) -> RequestTiming:
+    timing = RequestTiming("/api/query")
+    for _ in range(model_calls):
+        timing.add_span("model", "model", 0.5)
+    return timing
+
+
+def test_record_answer_stores_completed_model_answers_without_reasoning(clock):
+    cache = InMemoryAnswerCache(max_entries=10, ttl_seconds=60)
+
+    def answer():
+        yield ReasoningChunk(content="thinking")
+        clock.now += 2
+        yield TextChunk(content="Yes.")
+        clock.now += 0.5
+        yield LetterChunk(content="Dear...")
+
+    with patch.object(answer_cache, "get_answer_cache", return_value=cache):
+        list(record_answer(answer(), "k", _timing(1), clock=clock))
+        list(record_answer(answer(), "no-model", _timing(0), clock=clock))
+
+    assert cache.get("k") == _recording()
+    assert cache.get("no-model") is None
+
+
+def test_record_answer_skips_answers_of_a_breaker_fallback():
+    cache = InMemoryAnswerCache(max_entries=10, ttl_seconds=60)
+    timing = _timing(1)
+    timing.mark_degraded()
+
+    with patch.object(answer_cache, "get_answer_cache", return_value=cache):
+        list(record_answer(iter([TextChunk(content="Yes.")]), "k", timing))
+    assert cache.get("k") is None
+
+
+def test_record_answer_skips_a_stream_that_fails():
+    cache = InMemoryAnswerCache(max_entries=10, ttl_seconds=60)
+
+    def answer():
+        yield TextChunk(content="Yes.")
+        raise ConnectionError("reset")
+
+    with patch.object(answer_cache, "get_answer_cache", return_value=cache):
+        with pytest.raises(ConnectionError):
+            list(record_answer(answer(), "k", _timing(1)))
+    assert cache.get("k") is None
+
+
+def test_arecord_answer_stores_off_the_event_loop():
+    cache = InMemoryAnswerCache(max_entries=10, ttl_seconds=60)
+    threads = {}
+
+    async def answer():
+        threads["loop"] = threading.get_ident()
+        yield TextChunk(content="Yes.")
+
+    async def consume():
+        return [c async for c in arecord_answer(answer(), "k", _timing(1))]
+
+    def put(key, recording):
+        threads["put"] = threading.get_ident()
+        InMemoryAnswerCache.put(cache, key, recording)
+
+    with (
+        patch.object(answer_cache, "get_answer_cache", return_value=cache),
+        patch.object(cache, "put", side_effect=put),
+    ):
+        asyncio.run(consume())
+    assert cache.get("k") is not None
+    assert threads["put"] != threads["loop"]
+
+
+def test_replay_waits_a_fraction_of_each_gap():
+    slept = []
+    chunks = list(replay_answer(_recording(), pacing=0.25, sleep=slept.append))
+    assert chunks == [chunk for _, chunk in _recording()]
+    assert slept == [0.125]
+
+
+# ── chat view ──────────────────────────────────────────────────────────────────
+
+
+@patch("tenantfirstaid.chat.LangChainChatManager")
+def test_second_identical_first_question_is_replayed(mock_cm_cls):
+    def answer(timing, **kwargs):
+        timing.add_span("model", "model", 0.5)
+        yield {"type": "text", "text": "You may get it back."}
+
+    manager = mock_cm_cls.return_value
+    manager.generate_streaming_response.side_effect = answer
+    cache = InMemoryAnswerCache(max_entries=10, ttl_seconds=60)
+    query = {
+        "messages": [{"role": "human", "content": _QUESTION}],
+        "city": "portland",
+        "state": "or",
+    }
+
+    with patch.object(answer_cache, "get_answer_cache", return_value=cache):
+        with app.test_client() as client:
+            bodies = [
+                client.post("/api/query", json=query).get_data() for _ in range(2)
+            ]
+            follow_up = {**query, "messages": query["messages"] * 2}
+            client.post("/api/query", json=follow_up).get_data()
+
+    assert bodies[0] == bodies[1]
+    assert [json.loads(line)["type"] for line in bodies[1].splitlines()] == [
+        "text",
+        "end_of_stream",
+    ]
+    # Called for the first question and the follow-up, not for the replay.
+    assert manager.generate_streaming_response.call_count == 2
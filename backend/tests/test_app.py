@@ -5,6 +5,7 @@ from unittest.mock import patch
 import pytest
 
 from tenantfirstaid.app import app, limiter
+from tenantfirstaid.conversations import ThreadExpiredError
 
 
 @pytest.fixture
@@ -76,6 +77,109 @@ class TestQueryRoute:
         assert resp.status_code == 404
 
 
+class TestServerSideThreads:
+    @patch("tenantfirstaid.chat.open_thread", return_value=("tid", "signed"))
+    @patch("tenantfirstaid.chat.threads_enabled", return_value=True)
+    @patch("tenantfirstaid.chat.LangChainChatManager")
+    def test_opt_in_returns_thread_token_header(
+        self, mock_cm_cls, _enabled, mock_open_thread, client
+    ):
+        mock_cm_cls.return_value.generate_streaming_response.return_value = iter([])
+        resp = client.post(
+            "/api/query",
+            json={
+                "messages": [{"role": "human", "content": "Hi"}],
+                "city": None,
+                "state": "or",
+                "thread_token": "previous",
+            },
+            headers={"Origin": "https://tenantfirstaid.com"},
+        )
+        resp.get_data()
+        assert resp.headers["X-Thread-Token"] == "signed"
+        assert "X-Thread-Token" in resp.headers["Access-Control-Expose-Headers"]
+        mock_open_thread.assert_called_once_with("previous")
+        kwargs = mock_cm_cls.return_value.generate_streaming_response.call_args.kwargs
+        assert kwargs["thread_id"] == "tid"
+
+    @patch("tenantfirstaid.chat.threads_enabled", return_value=True)
+    @patch("tenantfirstaid.chat.LangChainChatManager")
+    def test_without_thread_token_key_stays_stateless(
+        self, mock_cm_cls, _enabled, client
+    ):
+        mock_cm_cls.return_value.generate_streaming_response.return_value = iter([])
+        resp = client.post(
+            "/api/query", json={"messages": [], "city": None, "state": "or"}
+        )
+        resp.get_data()
+        assert "X-Thread-Token" not in resp.headers
+        kwargs = mock_cm_cls.return_value.generate_streaming_response.call_args.kwargs
+        assert kwargs["thread_id"] is None
+
+    @patch("tenantfirstaid.chat.open_thread", side_effect=ThreadExpiredError)
+    @patch("tenantfirstaid.chat.threads_enabled", return_value=True)
+    def test_expired_thread_returns_410(self, _enabled, _open_thread, client):
+        resp = client.post(
+            "/api/query",
+            json={"messages": [], "city": None, "state": "or", "thread_token": "x"},
+        )
+        assert resp.status_code == 410
+        assert resp.get_json()["error"] == "thread_expired"
+
+    @pytest.mark.parametrize("token", [123, {}])
+    @patch("tenantfirstaid.chat.threads_enabled", return_value=True)
+    def test_non_string_thread_token_returns_410(self, _enabled, token, client):
+        resp = client.post(
+            "/api/query",
+            json={"messages": [], "city": None, "state": "or", "thread_token": token},
+        )
+        assert resp.status_code == 410
+        assert resp.get_json()["error"] == "thread_expired"
+
+    @patch("tenantfirstaid.chat.LangChainChatManager")
+    def test_thread_token_ignored_when_store_disabled(self, mock_cm_cls, client):
+        mock_cm_cls.return_value.generate_streaming_response.return_value = iter([])
+        resp = client.post(
+            "/api/query",
+            json={"messages": [], "city": None, "state": "or", "thread_token": None},
+        )
+        resp.get_data()
+        assert "X-Thread-Token" not in resp.headers
+
+
+class TestMetricsRoute:
+    @patch("tenantfirstaid.chat.LangChainChatManager")
+    def test_scrape_reports_requests_and_stream_chunks(self, mock_cm_cls, client):
+        mock_cm_cls.return_value.generate_streaming_response.return_value = iter(
+            [{"type": "text", "text": "Hi"}]
+        )
+        client.get("/metrics")
+        client.post(
+            "/api/query", json={"messages": [], "city": None, "state": "or"}
+        ).get_data()
+
+        resp = client.get("/metrics")
+        text = resp.get_data(as_text=True)
+
+        assert resp.status_code == 200
+        assert resp.content_type.startswith("text/plain; version=0.0.4")
+        assert 'http_requests_total{route="/metrics",status="200"}' in text
+        assert 'http_requests_total{route="/api/query",status="200"}' in text
+        assert 'response_chunks_total{type="end_of_stream"}' in text
+        assert 'response_bytes_total{type="text"}' in text
+        assert 'streams_in_flight{route="/api/query"} 0' in text
+
+    def test_no_cors_headers_even_for_allowed_origin(self, client):
+        resp = client.get("/metrics", headers={"Origin": "https://tenantfirstaid.com"})
+        assert "Access-Control-Allow-Origin" not in resp.headers
+
+    @patch("tenantfirstaid.app.METRICS_TOKEN", "s3cret")
+    def test_token_is_required_when_configured(self, client):
+        assert client.get("/metrics").status_code == 401
+        resp = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+        assert resp.status_code == 200
+
+
 class TestFeedbackRoute:
     @patch("tenantfirstaid.feedback.EmailMessage")
     @patch.dict("os.environ", {"SENDER_EMAIL": "s@t.com", "RECIPIENT_EMAIL": "r@t.com"})
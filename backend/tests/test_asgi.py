@@ -0,0 +1,167 @@
+"""Tests for the ASGI app: async /api/query streaming and Flask fallthrough."""
+
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+from starlette.testclient import TestClient
+
+from tenantfirstaid.app import limiter
+from tenantfirstaid.asgi import app
+from tenantfirstaid.conversations import ThreadExpiredError
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limiter():
+    """Reset rate limiter between tests."""
+    limiter.reset()
+    yield
+
+
+def _astream_of(*blocks):
+    async def _agen(**_kwargs):
+        for block in blocks:
+            yield block
+
+    return _agen
+
+
+_QUERY = {
+    "messages": [{"role": "human", "content": "Help me"}],
+    "city": "Portland",
+    "state": "or",
+}
+
+
+class TestAsyncQueryRoute:
+    @patch("tenantfirstaid.asgi.LangChainChatManager")
+    def test_streams_ndjson_chunks_then_done(self, mock_cm_cls, client):
+        mock_cm_cls.return_value.agenerate_streaming_response = _astream_of(
+            {"type": "reasoning", "reasoning": "Thinking"},
+            {"type": "text", "text": "Hello"},
+            {"type": "image", "image": "..."},
+            {"type": "non_standard", "value": {"type": "letter", "content": "Dear"}},
+        )
+        resp = client.post("/api/query", json=_QUERY)
+
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain")
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        assert [line["type"] for line in lines] == [
+            "reasoning",
+            "text",
+            "letter",
+            "end_of_stream",
+        ]
+        assert lines[1]["content"] == "Hello"
+
+    @patch("tenantfirstaid.asgi.LangChainChatManager")
+    def test_passes_location_to_manager(self, mock_cm_cls, client):
+        received = {}
+
+        async def _agen(**kwargs):
+            received.update(kwargs)
+            yield {"type": "text", "text": "ok"}
+
+        mock_cm_cls.return_value.agenerate_streaming_response = _agen
+        client.post("/api/query", json=_QUERY)
+
+        assert received["city"] == "portland"
+        assert received["state"] == "or"
+        assert received["messages"] == _QUERY["messages"]
+
+    @patch("tenantfirstaid.asgi.LangChainChatManager")
+    def test_allowed_origin_gets_cors_headers(self, mock_cm_cls, client):
+        mock_cm_cls.return_value.agenerate_streaming_response = _astream_of()
+        resp = client.post(
+            "/api/query",
+            json=_QUERY,
+            headers={"Origin": "https://tenantfirstaid.com"},
+        )
+        assert (
+            resp.headers.get("access-control-allow-origin")
+            == "https://tenantfirstaid.com"
+        )
+
+    @patch("tenantfirstaid.asgi.LangChainChatManager")
+    def test_disallowed_origin_no_cors_headers(self, mock_cm_cls, client):
+        mock_cm_cls.return_value.agenerate_streaming_response = _astream_of()
+        resp = client.post(
+            "/api/query", json=_QUERY, headers={"Origin": "https://evil.com"}
+        )
+        assert "access-control-allow-origin" not in resp.headers
+
+    @patch("tenantfirstaid.chat.open_thread", return_value=("tid", "signed"))
+    @patch("tenantfirstaid.chat.threads_enabled", return_value=True)
+    @patch("tenantfirstaid.asgi.LangChainChatManager")
+    def test_opt_in_returns_thread_token_header(
+        self, mock_cm_cls, _enabled, _open_thread, client
+    ):
+        received = {}
+
+        async def _agen(**kwargs):
+            received.update(kwargs)
+            yield {"type": "text", "text": "ok"}
+
+        mock_cm_cls.return_value.agenerate_streaming_response = _agen
+        resp = client.post(
+            "/api/query",
+            json={**_QUERY, "thread_token": None},
+            headers={"Origin": "https://tenantfirstaid.com"},
+        )
+        assert resp.headers["x-thread-token"] == "signed"
+        assert "x-thread-token" in resp.headers["access-control-expose-headers"].lower()
+        assert received["thread_id"] == "tid"
+
+    @patch("tenantfirstaid.chat.open_thread", side_effect=ThreadExpiredError)
+    @patch("tenantfirstaid.chat.threads_enabled", return_value=True)
+    def test_expired_thread_returns_410(self, _enabled, _open_thread, client):
+        resp = client.post("/api/query", json={**_QUERY, "thread_token": "x"})
+        assert resp.status_code == 410
+        assert resp.json()["error"] == "thread_expired"
+
+    @patch("tenantfirstaid.asgi._finish")
+    @patch("tenantfirstaid.asgi.LangChainChatManager")
+    def test_stream_is_accounted_for_off_the_event_loop(
+        self, mock_cm_cls, mock_finish, client
+    ):
+        threads = {}
+
+        async def _agen(**_kwargs):
+            threads["loop"] = threading.get_ident()
+            yield {"type": "text", "text": "ok"}
+
+        mock_cm_cls.return_value.agenerate_streaming_response = _agen
+        mock_finish.side_effect = lambda *_args: threads.update(
+            finish=threading.get_ident()
+        )
+        client.post("/api/query", json=_QUERY)
+
+        mock_finish.assert_called_once()
+        assert threads["finish"] != threads["loop"]
+
+    def test_get_query_returns_405(self, client):
+        resp = client.get("/api/query")
+        assert resp.status_code == 405
+
+
+class TestFlaskFallthrough:
+    @patch("tenantfirstaid.feedback.EmailMessage")
+    @patch.dict("os.environ", {"SENDER_EMAIL": "s@t.com", "RECIPIENT_EMAIL": "r@t.com"})
+    def test_feedback_served_by_flask_app(self, mock_email_cls, client):
+        resp = client.post(
+            "/api/feedback",
+            data={"name": "Jane", "subject": "Bug", "feedback": "Broken"},
+        )
+        assert resp.status_code == 200
+
+    def test_unknown_route_returns_404(self, client):
+        resp = client.get("/api/nonexistent")
+        assert resp.status_code == 404
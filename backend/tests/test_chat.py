@@ -1,7 +1,18 @@
+import asyncio
 import json
+import threading
+import time
 
-from tenantfirstaid.chat import ChatView, _classify_blocks
-from tenantfirstaid.schema import EndOfStreamChunk
+import pytest
+
+from tenantfirstaid.chat import (
+    ChatView,
+    _acoalesce,
+    _classify_blocks,
+    _coalesce,
+    _to_ndjson,
+)
+from tenantfirstaid.schema import EndOfStreamChunk, LetterChunk, TextChunk
 
 
 def text_block(text: str) -> dict:
@@ -127,3 +138,92 @@ class TestDispatchRequest:
         assert response.status_code == 200
         lines = [line for line in response.data.decode().strip().split("\n") if line]
         assert json.loads(lines[-1]) == {"type": "end_of_stream"}
+
+
+def test_ndjson_line_matches_model_dump_json():
+    chunk = TextChunk(content="Notice — “30 days”\n")
+    assert _to_ndjson(chunk) == (chunk.model_dump_json() + "\n").encode()
+
+
+def _paced(items):
+    """Yield chunks, sleeping wherever the list holds a number of seconds."""
+    for item in items:
+        if isinstance(item, float):
+            time.sleep(item)
+        else:
+            yield item
+
+
+def _texts(batch):
+    return [getattr(chunk, "content", chunk.type) for chunk in batch]
+
+
+_PACED = [
+    TextChunk(content="a"),
+    TextChunk(content="b"),
+    LetterChunk(content="letter"),
+    TextChunk(content="c"),
+    0.2,
+    TextChunk(content="d"),
+    EndOfStreamChunk(),
+]
+
+
+class TestCoalesce:
+    def test_zero_window_writes_each_chunk(self):
+        batches = list(_coalesce(_paced(_PACED), window=0))
+        assert [_texts(b) for b in batches] == [
+            ["a"],
+            ["b"],
+            ["letter"],
+            ["c"],
+            ["d"],
+            ["end_of_stream"],
+        ]
+
+    def test_merges_text_and_flushes_on_letter_end_and_window(self):
+        batches = list(_coalesce(_paced(_PACED), window=0.05))
+        assert [_texts(b) for b in batches] == [
+            ["a", "b", "letter"],
+            ["c"],
+            ["d", "end_of_stream"],
+        ]
+
+    def test_pending_text_is_sent_before_an_error(self):
+        def failing():
+            yield TextChunk(content="a")
+            raise ConnectionError("reset")
+
+        batches = _coalesce(failing(), window=5)
+        assert _texts(next(batches)) == ["a"]
+        with pytest.raises(ConnectionError):
+            next(batches)
+
+    def test_close_waits_for_the_chunk_in_flight(self):
+        """A disconnect returns only once the model's current step has ended."""
+        finished = threading.Event()
+
+        def model():
+            try:
+                yield TextChunk(content="a")
+                time.sleep(0.1)
+                yield TextChunk(content="b")
+            finally:
+                finished.set()
+
+        batches = _coalesce(model(), window=0.01)
+        assert _texts(next(batches)) == ["a"]
+        batches.close()
+        assert finished.is_set()
+
+    @pytest.mark.asyncio
+    async def test_async_twin_batches_the_same_way(self):
+        async def paced():
+            for item in _PACED:
+                if isinstance(item, float):
+                    await asyncio.sleep(item)
+                else:
+                    yield item
+
+        batches = [_texts(b) async for b in _acoalesce(paced(), window=0.05)]
+        assert batches == [["a", "b", "letter"], ["c"], ["d", "end_of_stream"]]
@@ -0,0 +1,305 @@
+"""Tests for circuit_breaker.py — failing fast around Vertex AI Search and Gemini."""
+
+from typing import Callable
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from google.api_core.exceptions import (
+    DeadlineExceeded,
+    InternalServerError,
+    InvalidArgument,
+    ResourceExhausted,
+    ServiceUnavailable,
+)
+from google.genai import errors as genai_errors
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import HumanMessage
+
+from tenantfirstaid import circuit_breaker, metrics
+from tenantfirstaid.circuit_breaker import (
+    GEMINI,
+    VERTEX_SEARCH,
+    CircuitBreaker,
+    CircuitOpenError,
+    breaker_states,
+    get_breaker,
+    is_transient_failure,
+)
+from tenantfirstaid.constants import OREGON_LAW_CENTER_PHONE_NUMBER
+from tenantfirstaid.graph import create_graph
+from tenantfirstaid.langchain_chat_manager import LangChainChatManager
+from tenantfirstaid.langchain_tools import (
+    RagBuilder,
+    prefetch_city_state_laws,
+    retrieve_city_state_laws,
+)
+from tenantfirstaid.location import UsaState
+from tenantfirstaid.request_timing import TIMING_CONFIG_KEY, RequestTiming
+
+
+def _breaker(
+    clock: Callable[[], float], name: str = "test", threshold: int = 3
+) -> CircuitBreaker:
+    breaker = CircuitBreaker(name, threshold, reset_seconds=30, clock=clock)
+    circuit_breaker._breakers[name] = breaker
+    return breaker
+
+
+def _fail() -> None:
+    raise ServiceUnavailable("unavailable")
+
+
+def _reject() -> None:
+    raise InvalidArgument("request is too large")
+
+
+def _fail_times(breaker: CircuitBreaker, n: int) -> None:
+    for _ in range(n):
+        with pytest.raises(ServiceUnavailable):
+            breaker.call(_fail)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = _breaker(clock)
+    _fail_times(breaker, 2)
+    assert breaker.call(lambda: "ok") == "ok"
+    _fail_times(breaker, 2)
+    assert breaker.state == "closed"
+    _fail_times(breaker, 1)
+    assert breaker.state == "open"
+
+    fn = MagicMock()
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.call(fn)
+    fn.assert_not_called()
+    assert exc.value.dependency == "test"
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = _breaker(clock)
+    _fail_times(breaker, 3)
+    clock.now += 30
+    assert breaker.state == "half_open"
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_for_another_period(clock):
+    breaker = _breaker(clock)
+    _fail_times(breaker, 3)
+    clock.now += 30
+    _fail_times(breaker, 1)
+    assert breaker.state == "open"
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_abandoned_probe_is_replaced(clock):
+    breaker = _breaker(clock)
+    _fail_times(breaker, 3)
+    clock.now += 30
+    assert breaker.allow()
+    clock.now += 10
+    assert not breaker.allow()
+    clock.now += 20
+    assert breaker.allow()
+
+
+def test_client_errors_do_not_trip_the_breaker(clock):
+    breaker = _breaker(clock, threshold=1)
+    for _ in range(5):
+        with pytest.raises(InvalidArgument):
+            breaker.call(_reject)
+    with pytest.raises(ValueError):
+        breaker.call(lambda: int("not a number"))
+    assert breaker.state == "closed"
+
+
+def test_request_error_frees_the_probe(clock):
+    breaker = _breaker(clock, threshold=1)
+    _fail_times(breaker, 1)
+    clock.now += 30
+
+    with pytest.raises(InvalidArgument):
+        breaker.call(_reject)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+@pytest.mark.parametrize(
+    ("error", "counted"),
+    [
+        (ServiceUnavailable("down"), True),
+        (ResourceExhausted("quota"), True),
+        (DeadlineExceeded("slow"), True),
+        (InternalServerError("oops"), True),
+        (httpx.ConnectError("refused"), True),
+        (TimeoutError(), True),
+        (genai_errors.ServerError(503, {}), True),
+        (genai_errors.ClientError(429, {}), True),
+        (genai_errors.ClientError(400, {}), False),
+        (InvalidArgument("bad"), False),
+        (ValueError("bug"), False),
+    ],
+)
+def test_only_transient_upstream_failures_count(error, counted):
+    assert is_transient_failure(error) is counted
+
+
+def test_zero_threshold_never_opens(clock):
+    breaker = _breaker(clock, threshold=0)
+    _fail_times(breaker, 20)
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_async_calls_are_counted(clock):
+    breaker = _breaker(clock, threshold=1)
+
+    async def fail() -> None:
+        raise ServiceUnavailable("unavailable")
+
+    with pytest.raises(ServiceUnavailable):
+        await breaker.acall(fail)
+    with pytest.raises(CircuitOpenError):
+        await breaker.acall(fail)
+
+
+def test_state_is_exported_as_metrics(clock):
+    breaker = _breaker(clock, name="exported", threshold=1)
+    _fail_times(breaker, 1)
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: None)
+
+    text = metrics.render()
+    assert 'tenantfirstaid_circuit_breaker_state{dependency="exported"} 2' in text
+    assert (
+        'tenantfirstaid_circuit_breaker_rejected_calls_total{dependency="exported"} 1'
+        in text
+    )
+    assert breaker_states() == {"exported": "open"}
+
+
+# ── retrieval fallback ─────────────────────────────────────────────────────────
+
+
+@patch("tenantfirstaid.langchain_tools.get_gcp_credentials")
+@patch("tenantfirstaid.langchain_tools.VertexAISearchRetriever")
+def test_open_search_breaker_falls_back_to_statutes(
+    mock_retriever_class, _creds, clock, oregon_state
+):
+    _breaker(clock, name=VERTEX_SEARCH, threshold=1)
+    mock_instance = mock_retriever_class.return_value.model_copy.return_value
+    mock_instance.invoke.side_effect = ServiceUnavailable("Vertex unavailable")
+    with pytest.raises(ServiceUnavailable):
+        RagBuilder(data_store_id="fake-datastore-id").search("q")
+    searches = mock_instance.invoke.call_count
+    timing = RequestTiming("/api/query")
+
+    result = retrieve_city_state_laws.invoke(  # type: ignore[union-attr]
+        {"query": "security deposit returned after move out", "state": oregon_state},
+        config={"configurable": {TIMING_CONFIG_KEY: timing}},
+    )
+
+    assert mock_instance.invoke.call_count == searches
+    assert result.startswith("Search is temporarily unavailable")
+    assert "ORS 90.300" in result
+    assert timing.degraded
+
+
+def test_no_prefetch_while_search_is_failing(clock, oregon_state):
+    breaker = _breaker(clock, name=VERTEX_SEARCH, threshold=1)
+    _fail_times(breaker, 1)
+    with patch("tenantfirstaid.langchain_tools.start_prefetch") as start:
+        assert prefetch_city_state_laws("security deposit", oregon_state) is None
+    start.assert_not_called()
+
+
+# ── model fallback ─────────────────────────────────────────────────────────────
+
+
+class _FailingModel(GenericFakeChatModel):
+    """Fake model whose every call fails, counting the calls."""
+
+    calls: int = 0
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, *args, **kwargs):
+        self.calls += 1
+        raise ServiceUnavailable("Gemini unavailable")
+
+
+def test_open_model_breaker_fails_graph_runs_fast(clock):
+    _breaker(clock, name=GEMINI, threshold=2)
+    model = _FailingModel(messages=iter([]))
+    with patch("tenantfirstaid.graph._get_llm", return_value=model):
+        graph = create_graph()
+    run = {"messages": [HumanMessage("Hi")], "state": UsaState.OREGON, "city": None}
+
+    for _ in range(2):
+        with pytest.raises(ServiceUnavailable, match="Gemini unavailable"):
+            graph.invoke(run)
+    with pytest.raises(CircuitOpenError):
+        graph.invoke(run)
+    assert model.calls == 2
+    assert get_breaker(GEMINI).state == "open"
+
+
+def test_manager_answers_with_busy_message():
+    agent = MagicMock()
+    agent.stream.side_effect = CircuitOpenError(GEMINI)
+    timing = RequestTiming("/api/query")
+    with patch(
+        "tenantfirstaid.langchain_chat_manager.get_agent_graph", return_value=agent
+    ):
+        blocks = list(
+            LangChainChatManager().generate_streaming_response(
+                messages=[{"role": "human", "content": "Hi"}],
+                city=None,
+                state=UsaState.OREGON,
+                thread_id=None,
+                timing=timing,
+            )
+        )
+
+    assert len(blocks) == 1
+    assert blocks[0]["type"] == "text"
+    assert OREGON_LAW_CENTER_PHONE_NUMBER in blocks[0]["text"]  # type: ignore[typeddict-item]
+    agent.stream.assert_called_once()
+    assert timing.degraded
+
+
+@pytest.mark.asyncio
+async def test_async_manager_answers_with_busy_message():
+    async def astream(**kwargs):
+        raise CircuitOpenError(GEMINI)
+        yield  # pragma: no cover
+
+    agent = MagicMock()
+    agent.astream = astream
+    timing = RequestTiming("/api/query")
+    with patch(
+        "tenantfirstaid.langchain_chat_manager.get_agent_graph", return_value=agent
+    ):
+        blocks = [
+            b
+            async for b in LangChainChatManager().agenerate_streaming_response(
+                messages=[{"role": "human", "content": "Hi"}],
+                city=None,
+                state=UsaState.OREGON,
+                thread_id=None,
+                timing=timing,
+            )
+        ]
+
+    assert [b["type"] for b in blocks] == ["text"]
+    assert timing.degraded
@@ -0,0 +1,180 @@
+"""Tests for citations.py — ORS citation parsing, resolution and the retrieval fallback."""
+
+from unittest.mock import patch
+
+import pytest
+
+from tenantfirstaid.citations import (
+    OrsCitation,
+    cites_only,
+    parse_citations,
+    resolve_citation,
+    resolve_query_citations,
+)
+from tenantfirstaid.langchain_tools import get_statute_section, retrieve_city_state_laws
+from tenantfirstaid.location import OregonCity, UsaState
+from tenantfirstaid.statute_index import StatuteIndex, build_index
+
+_SECTIONS = {
+    "90.302": (
+        "Fees allowed. (1) A landlord may not charge a fee except as provided.\n"
+        "      (2) A landlord may charge a tenant a fee for each of the following:\n"
+        "      (a) A late rent payment.\n"
+        "      (b) A dishonored check.\n"
+        "      (A) Up to the bank charge; and\n"
+        "      (B) No more.\n"
+        "      (i) Roman one.\n"
+        "      (ii) Roman two.\n"
+        "      (3)(a) A landlord may charge a noncompliance fee.\n"
+        "      (b) Paragraph b."
+    ),
+    "90.320": (
+        "Habitability. (1) A dwelling is unhabitable if it lacks:\n"
+        "      (h) Floors.\n"
+        "      (i) Ventilation.\n"
+        "      (k) A carbon monoxide alarm.\n"
+        "      (L) Working locks."
+    ),
+}
+
+
+@pytest.fixture
+def index() -> StatuteIndex:
+    return StatuteIndex(build_index(_SECTIONS))
+
+
+def test_parse_citations_with_subsections_and_lists():
+    text = (
+        "See ORS 90.302(2)(e), ors 90.453 (2), 90.472 or 90.475 and ORS 90.302(2)(e)."
+    )
+    assert parse_citations(text) == [
+        OrsCitation("90.302", ("2", "e")),
+        OrsCitation("90.453", ("2",)),
+        OrsCitation("90.472"),
+        OrsCitation("90.475"),
+    ]
+    assert str(OrsCitation("90.302", ("2", "e"))) == "ORS 90.302(2)(e)"
+    assert parse_citations("chapter 90 of the statutes") == []
+
+
+def test_resolves_whole_section(index):
+    text = resolve_citation(OrsCitation("90.302"), index)
+    assert text is not None
+    assert text.splitlines()[0] == "ORS 90.302 — Fees allowed"
+    assert "(3)(a) A landlord may charge a noncompliance fee." in text
+
+
+def test_resolves_subsection_with_enclosing_lead_in(index):
+    text = resolve_citation(OrsCitation("90.302", ("2", "b", "A")), index)
+    assert text is not None
+    assert text.splitlines() == [
+        "ORS 90.302(2)(b)(A) — Fees allowed",
+        "(2) A landlord may charge a tenant a fee for each of the following:",
+        "(b) A dishonored check.",
+        "(A) Up to the bank charge; and",
+    ]
+
+
+def test_roman_numerals_nest_under_subparagraphs(index):
+    paragraph = resolve_citation(OrsCitation("90.302", ("2", "b")), index)
+    assert paragraph is not None
+    assert "(ii) Roman two." in paragraph
+    roman = resolve_citation(OrsCitation("90.302", ("2", "b", "B", "ii")), index)
+    assert roman is not None
+    assert roman.splitlines()[-1] == "(ii) Roman two."
+
+
+def test_combined_labels_open_both_levels(index):
+    text = resolve_citation(OrsCitation("90.302", ("3", "a")), index)
+    assert text is not None
+    assert text.splitlines()[1:] == [
+        "(3)(a) A landlord may charge a noncompliance fee."
+    ]
+
+
+def test_letter_i_after_h_and_paragraph_l(index):
+    letter = resolve_citation(OrsCitation("90.320", ("1", "i")), index)
+    paragraph = resolve_citation(OrsCitation("90.320", ("1", "l")), index)
+    assert letter is not None and letter.endswith("(i) Ventilation.")
+    assert paragraph is not None and paragraph.endswith("(L) Working locks.")
+
+
+def test_unknown_section_or_subsection_is_none(index):
+    assert resolve_citation(OrsCitation("90.999"), index) is None
+    assert resolve_citation(OrsCitation("90.302", ("9",)), index) is None
+
+
+def test_query_fallback_requires_every_citation_to_resolve(index):
+    assert resolve_query_citations("late fee ORS 90.302(2)(a)", index) is not None
+    assert resolve_query_citations("late fee ORS 90.302 and 105.136", index) is None
+    assert resolve_query_citations("late rent fee", index) is None
+
+
+def test_shipped_text_resolves_cited_subsection():
+    text = resolve_citation(OrsCitation("90.394", ("1",)))
+    assert text is not None
+    assert text.startswith(
+        "ORS 90.394(1) — Termination of tenancy for failure to pay rent"
+    )
+    assert "72 hours" in text
+
+
+def test_get_statute_section_tool():
+    result = get_statute_section.invoke({"citation": "90.394(1) and ORS 105.136"})
+    first, second = result.split("\n\n")
+    assert first.startswith("ORS 90.394(1)")
+    assert second.startswith("ORS 105.136 is not in the local")
+
+
+def test_cites_only_ignores_wording_that_asks_for_the_text():
+    assert cites_only("ORS 90.394(1)")
+    assert cites_only("What does ORS 90.394(1) say?")
+    assert cites_only("full text of ORS 90.302 and 90.394")
+    assert not cites_only("ORS 90.427 termination notice for month-to-month")
+    assert not cites_only("late rent fee")
+
+
+@patch("tenantfirstaid.langchain_tools.RagBuilder")
+def test_retrieval_of_citations_only_skips_vertex(mock_rag_class):
+    result = retrieve_city_state_laws.invoke(
+        input={"query": "What does ORS 90.394(1) say?", "state": UsaState("or")},
+    )
+    assert result.startswith("ORS 90.394(1)")
+    mock_rag_class.assert_not_called()
+
+
+@patch("tenantfirstaid.langchain_tools.RagBuilder")
+def test_retrieval_with_citation_and_topic_adds_vertex_passages(mock_rag_class):
+    mock_rag_class.return_value.search.return_value = "Vertex passages"
+    result = retrieve_city_state_laws.invoke(
+        input={
+            "query": "week-to-week nonpayment notice timing ORS 90.394(1)",
+            "state": UsaState("or"),
+        },
+    )
+    assert result.startswith("ORS 90.394(1)")
+    assert result.endswith("\n\nVertex passages")
+
+
+@patch("tenantfirstaid.langchain_tools.RagBuilder")
+def test_retrieval_with_citation_and_city_uses_vertex(mock_rag_class):
+    """The local statute text has no city ordinances, so a city is searched."""
+    mock_rag_class.return_value.search.return_value = "Vertex passages"
+    result = retrieve_city_state_laws.invoke(
+        input={
+            "query": "ORS 90.394(1)",
+            "city": OregonCity("portland"),
+            "state": UsaState("or"),
+        },
+    )
+    assert result.startswith("ORS 90.394(1)")
+    assert result.endswith("\n\nVertex passages")
+
+
+@patch("tenantfirstaid.langchain_tools.RagBuilder")
+def test_retrieval_with_unresolvable_citation_uses_vertex(mock_rag_class):
+    mock_rag_class.return_value.search.return_value = "Vertex passages"
+    result = retrieve_city_state_laws.invoke(  # type: ignore[union-attr]
+        input={"query": "eviction complaint ORS 105.136", "state": UsaState("or")},
+    )
+    assert result == "Vertex passages"
@@ -0,0 +1,125 @@
+"""Tests for compression.py — gzip /api/query streams that decode chunk by chunk."""
+
+import gzip
+import json
+import zlib
+from unittest.mock import patch
+
+import pytest
+from starlette.testclient import TestClient
+
+from tenantfirstaid.app import app
+from tenantfirstaid.asgi import app as asgi_app
+from tenantfirstaid.compression import accepts_gzip, agzip_stream, gzip_stream
+
+_QUERY = {"messages": [], "city": None, "state": "or"}
+_LINK = "[ORS 90.427](https://oregon.public.law/statutes/ors_90.427)"
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate, br, zstd", True),
+        ("br;q=1.0, gzip;q=0.8", True),
+        ("identity", False),
+        (None, False),
+        ("*", True),
+        ("*, gzip;q=0", False),
+        ("gzip;q=0", False),
+        ("GZIP;Q=0.5", True),
+    ],
+)
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+def test_every_write_decodes_as_soon_as_it_arrives():
+    writes = [f'{{"type":"text","content":"See {_LINK}."}}\n'.encode()] * 3
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    sizes = []
+    for sent, out in zip(writes, gzip_stream(iter(writes))):
+        assert decoder.decompress(out) == sent
+        sizes.append(len(out))
+    # The shared window makes a repeated chunk far smaller than the first.
+    assert sizes[2] < sizes[0] / 3
+
+
+def test_closing_the_stream_closes_the_body():
+    closed = []
+
+    def body():
+        try:
+            yield b"a"
+            yield b"b"
+        finally:
+            closed.append(True)
+
+    stream = gzip_stream(body())
+    next(stream)
+    stream.close()
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+async def test_async_twin_produces_a_valid_gzip_body():
+    async def body():
+        yield b"one\n"
+        yield b"two\n"
+
+    out = b"".join([part async for part in agzip_stream(body())])
+    assert gzip.decompress(out) == b"one\ntwo\n"
+
+
+# ── chat views ─────────────────────────────────────────────────────────────────
+
+
+def _answer(**kwargs):
+    yield {"type": "text", "text": f"See {_LINK}."}
+
+
+@patch("tenantfirstaid.compression.STREAM_COMPRESSION", True)
+@patch("tenantfirstaid.chat.LangChainChatManager")
+def test_flask_view_gzips_when_the_client_accepts_it(mock_cm_cls):
+    mock_cm_cls.return_value.generate_streaming_response.side_effect = _answer
+    with app.test_client() as client:
+        resp = client.post(
+            "/api/query", json=_QUERY, headers={"Accept-Encoding": "gzip"}
+        )
+        lines = gzip.decompress(resp.get_data()).decode().splitlines()
+        plain = client.post("/api/query", json=_QUERY)
+        assert plain.get_data(as_text=True).splitlines() == lines
+
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers.get_all("Vary")
+    assert [json.loads(line)["type"] for line in lines] == ["text", "end_of_stream"]
+    assert "Content-Encoding" not in plain.headers
+
+
+@patch("tenantfirstaid.chat.LangChainChatManager")
+def test_flask_view_does_not_gzip_when_disabled(mock_cm_cls):
+    mock_cm_cls.return_value.generate_streaming_response.side_effect = _answer
+    with app.test_client() as client:
+        resp = client.post(
+            "/api/query", json=_QUERY, headers={"Accept-Encoding": "gzip"}
+        )
+        resp.get_data()
+    assert "Content-Encoding" not in resp.headers
+    assert "Accept-Encoding" not in resp.headers.get_all("Vary")
+
+
+@patch("tenantfirstaid.compression.STREAM_COMPRESSION", True)
+@patch("tenantfirstaid.asgi.LangChainChatManager")
+def test_asgi_view_gzips_when_the_client_accepts_it(mock_cm_cls):
+    async def astream(**kwargs):
+        yield {"type": "text", "text": f"See {_LINK}."}
+
+    mock_cm_cls.return_value.agenerate_streaming_response = astream
+    with TestClient(asgi_app) as client:
+        resp = client.post(
+            "/api/query", json=_QUERY, headers={"Accept-Encoding": "gzip"}
+        )
+
+    assert resp.headers["Content-Encoding"] == "gzip"
+    # httpx decodes the body itself.
+    lines = resp.text.splitlines()
+    assert [json.loads(line)["type"] for line in lines] == ["text", "end_of_stream"]
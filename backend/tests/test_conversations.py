@@ -0,0 +1,217 @@
+"""Tests for server-side conversation threads: checkpointers and thread tokens."""
+
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import START, MessagesState, StateGraph
+
+from tenantfirstaid import conversations
+from tenantfirstaid.conversations import (
+    EvictingInMemorySaver,
+    SqliteCheckpointSaver,
+    ThreadExpiredError,
+    open_thread,
+)
+
+
+def _echo_graph(checkpointer):
+    """A one-node graph that replies with the number of messages it has seen."""
+
+    def reply(state: MessagesState) -> dict:
+        return {"messages": [AIMessage(content=f"seen {len(state['messages'])}")]}
+
+    builder = StateGraph(MessagesState)  # ty: ignore[invalid-argument-type]
+    builder.add_node("reply", reply)
+    builder.add_edge(START, "reply")
+    return builder.compile(checkpointer=checkpointer)
+
+
+def _turn(graph, thread_id: str, text: str) -> list:
+    result = graph.invoke(
+        {"messages": [HumanMessage(content=text)]},
+        config={"configurable": {"thread_id": thread_id}},
+    )
+    return result["messages"]
+
+
+@pytest.fixture
+def memory_saver():
+    return EvictingInMemorySaver(max_threads=2, ttl_seconds=60)
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return tmp_path / "threads.sqlite3"
+
+
+@pytest.fixture
+def sqlite_saver(sqlite_path):
+    return SqliteCheckpointSaver(sqlite_path, max_threads=2, ttl_seconds=60)
+
+
+@pytest.fixture
+def saver(store_backend, memory_saver, sqlite_saver):
+    return memory_saver if store_backend == "memory" else sqlite_saver
+
+
+class TestCheckpointers:
+    def test_history_accumulates_across_turns(self, saver):
+        graph = _echo_graph(saver)
+        _turn(graph, "t1", "first")
+        messages = _turn(graph, "t1", "second")
+        assert [m.content for m in messages] == ["first", "seen 1", "second", "seen 3"]
+        assert saver.has_thread("t1")
+
+    def test_threads_are_isolated(self, saver):
+        graph = _echo_graph(saver)
+        _turn(graph, "t1", "first")
+        assert [m.content for m in _turn(graph, "t2", "other")] == ["other", "seen 1"]
+
+    def test_unknown_thread_has_no_checkpoint(self, saver):
+        assert not saver.has_thread("missing")
+        assert saver.get_tuple({"configurable": {"thread_id": "missing"}}) is None
+
+    def test_only_latest_checkpoint_is_kept(self, saver):
+        graph = _echo_graph(saver)
+        for text in ("one", "two", "three"):
+            _turn(graph, "t1", text)
+        assert len(list(saver.list({"configurable": {"thread_id": "t1"}}))) == 1
+
+    def test_least_recently_used_thread_is_evicted(self, saver):
+        graph = _echo_graph(saver)
+        _turn(graph, "t1", "a")
+        _turn(graph, "t2", "b")
+        _turn(graph, "t1", "c")  # t2 is now least recently used
+        _turn(graph, "t3", "d")
+        assert saver.has_thread("t1")
+        assert not saver.has_thread("t2")
+        assert saver.has_thread("t3")
+
+    def test_delete_thread(self, saver):
+        graph = _echo_graph(saver)
+        _turn(graph, "t1", "a")
+        saver.delete_thread("t1")
+        assert not saver.has_thread("t1")
+        assert [m.content for m in _turn(graph, "t1", "b")] == ["b", "seen 1"]
+
+    @pytest.mark.asyncio
+    async def test_async_turns_share_history(self, saver):
+        graph = _echo_graph(saver)
+        config = {"configurable": {"thread_id": "t1"}}
+        await graph.ainvoke({"messages": [HumanMessage(content="a")]}, config=config)
+        result = await graph.ainvoke(
+            {"messages": [HumanMessage(content="b")]}, config=config
+        )
+        assert result["messages"][-1].content == "seen 3"
+
+
+def test_memory_saver_expires_idle_threads(memory_saver):
+    graph = _echo_graph(memory_saver)
+    with patch("tenantfirstaid.conversations.time.monotonic", return_value=1000.0):
+        _turn(graph, "t1", "a")
+    with patch("tenantfirstaid.conversations.time.monotonic", return_value=1061.0):
+        assert not memory_saver.has_thread("t1")
+        assert memory_saver.storage == {}
+
+
+def test_memory_saver_drops_superseded_blobs(memory_saver):
+    graph = _echo_graph(memory_saver)
+    for text in ("one", "two", "three"):
+        _turn(graph, "t1", text)
+    (latest,) = memory_saver.list({"configurable": {"thread_id": "t1"}})
+    live = latest.checkpoint["channel_versions"]
+    assert all(
+        live.get(channel) == version for _, _, channel, version in memory_saver.blobs
+    )
+
+
+def test_sqlite_saver_expires_idle_threads(sqlite_saver):
+    graph = _echo_graph(sqlite_saver)
+    with patch("tenantfirstaid.conversations.time.time", return_value=1000.0):
+        _turn(graph, "t1", "a")
+    with patch("tenantfirstaid.conversations.time.time", return_value=1061.0):
+        assert not sqlite_saver.has_thread("t1")
+        assert sqlite_saver.get_tuple({"configurable": {"thread_id": "t1"}}) is None
+
+
+def test_sqlite_saver_survives_reopen(sqlite_path, sqlite_saver):
+    """A second worker (or a restart) opening the same file sees the thread."""
+    _turn(_echo_graph(sqlite_saver), "t1", "first")
+    reopened = SqliteCheckpointSaver(sqlite_path, max_threads=2, ttl_seconds=60)
+    messages = _turn(_echo_graph(reopened), "t1", "second")
+    assert messages[-1].content == "seen 3"
+
+
+class TestThreadTokens:
+    @pytest.fixture(autouse=True)
+    def _enabled(self, memory_saver):
+        with (
+            patch.object(conversations, "CONVERSATION_STORE", "memory"),
+            patch.object(conversations, "CONVERSATION_TOKEN_SECRET", "test-secret"),
+            patch.object(conversations, "_checkpointer", memory_saver),
+        ):
+            yield
+
+    def test_null_token_starts_new_thread(self):
+        first_id, first_token = open_thread(None)
+        second_id, _ = open_thread(None)
+        assert first_id != second_id
+        assert first_token != first_id
+
+    def test_token_resumes_stored_thread(self, memory_saver):
+        thread_id, token = open_thread(None)
+        _turn(_echo_graph(memory_saver), thread_id, "hi")
+        resumed_id, refreshed = open_thread(token)
+        assert resumed_id == thread_id
+        assert refreshed
+
+    def test_token_for_evicted_thread_raises(self):
+        _, token = open_thread(None)  # never checkpointed
+        with pytest.raises(ThreadExpiredError):
+            open_thread(token)
+
+    def test_tampered_token_raises(self, memory_saver):
+        thread_id, token = open_thread(None)
+        _turn(_echo_graph(memory_saver), thread_id, "hi")
+        with pytest.raises(ThreadExpiredError):
+            open_thread(token[:-2] + ("AA" if token[-2:] != "AA" else "BB"))
+
+    @pytest.mark.parametrize("token", [123, {}, ["x"], True])
+    def test_non_string_token_raises(self, token):
+        with pytest.raises(ThreadExpiredError):
+            open_thread(token)
+
+    def test_token_signed_with_other_secret_raises(self, memory_saver):
+        thread_id, token = open_thread(None)
+        _turn(_echo_graph(memory_saver), thread_id, "hi")
+        with patch.object(conversations, "CONVERSATION_TOKEN_SECRET", "other"):
+            with pytest.raises(ThreadExpiredError):
+                open_thread(token)
+
+    def test_expired_token_raises(self, memory_saver):
+        thread_id, token = open_thread(None)
+        _turn(_echo_graph(memory_saver), thread_id, "hi")
+        with patch.object(conversations, "CONVERSATION_TTL_SECONDS", -1):
+            with pytest.raises(ThreadExpiredError):
+                open_thread(token)
+
+
+def test_get_checkpointer_disabled_raises():
+    with (
+        patch.object(conversations, "CONVERSATION_STORE", "none"),
+        patch.object(conversations, "_checkpointer", None),
+    ):
+        with pytest.raises(RuntimeError):
+            conversations.get_checkpointer()
+
+
+def test_get_checkpointer_builds_configured_store(sqlite_path):
+    with (
+        patch.object(conversations, "CONVERSATION_STORE", "sqlite"),
+        patch.object(conversations, "CONVERSATION_SQLITE_PATH", sqlite_path),
+        patch.object(conversations, "_checkpointer", None),
+    ):
+        first = conversations.get_checkpointer()
+        assert isinstance(first, SqliteCheckpointSaver)
+        assert conversations.get_checkpointer() is first
@@ -25,20 +25,20 @@ def feedback_app():
 
 
 class TestConvertHtmlToPdf:
-    @patch("tenantfirstaid.feedback.pisa")
-    def test_valid_html_returns_bytes(self, mock_pisa):
+    @patch("xhtml2pdf.pisa.CreatePDF")
+    def test_valid_html_returns_bytes(self, mock_create_pdf):
         mock_status = MagicMock()
         mock_status.err = 0
-        mock_pisa.CreatePDF.return_value = mock_status
+        mock_create_pdf.return_value = mock_status
 
         result = convert_html_to_pdf("<html><body>Hello</body></html>")
         assert isinstance(result, bytes)
 
-    @patch("tenantfirstaid.feedback.pisa")
-    def test_pisa_error_returns_none(self, mock_pisa):
+    @patch("xhtml2pdf.pisa.CreatePDF")
+    def test_pisa_error_returns_none(self, mock_create_pdf):
         mock_status = MagicMock(spec=pisaContext)
         mock_status.err = 1
-        mock_pisa.CreatePDF.return_value = mock_status
+        mock_create_pdf.return_value = mock_status
 
         result = convert_html_to_pdf("<html><body>Bad</body></html>")
         assert result is None
@@ -0,0 +1,136 @@
+"""Tests for google_auth.py — the shared credentials and their background refresh."""
+
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from tenantfirstaid import google_auth
+from tenantfirstaid.google_auth import SharedCredentials, get_gcp_credentials
+
+_NOW = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class _FakeCredentials:
+    """Credentials whose refresh hands out a one-hour token, or raises ``error``."""
+
+    def __init__(self, error=None):
+        self.token = None
+        self.expiry = None
+        self.error = error
+        self.refreshed = threading.Event()
+
+    def refresh(self, request):
+        self.refreshed.set()
+        if self.error is not None:
+            raise self.error
+        self.token = "token"
+        # google-auth keeps expiry as a naive UTC datetime.
+        self.expiry = (_NOW + timedelta(hours=1)).replace(tzinfo=None)
+
+
+def _shared(credentials, margin=600):
+    return SharedCredentials(
+        credentials,
+        refresh_margin=margin,
+        request=MagicMock,
+        clock=_NOW.timestamp,
+    )
+
+
+def test_refresh_is_due_at_once_without_a_token():
+    assert _shared(_FakeCredentials()).seconds_until_refresh() == 0
+
+
+def test_refresh_is_due_the_margin_before_expiry():
+    shared = _shared(_FakeCredentials())
+    assert shared.refresh() is True
+    assert shared.seconds_until_refresh() == 3600 - 600
+
+
+def test_refresh_waits_at_least_the_retry_interval():
+    shared = _shared(_FakeCredentials(), margin=3590)
+    shared.refresh()
+    assert shared.seconds_until_refresh() == google_auth._RETRY_SECONDS
+
+
+def test_refreshes_are_counted_and_timed():
+    successes = google_auth._refreshes.value(result="success")
+    timed = google_auth._refresh_seconds.count()
+    _shared(_FakeCredentials()).refresh()
+    assert google_auth._refreshes.value(result="success") == successes + 1
+    assert google_auth._refresh_seconds.count() == timed + 1
+
+
+def test_failed_refresh_is_counted_and_keeps_the_current_token():
+    credentials = _FakeCredentials(error=OSError("token endpoint unreachable"))
+    credentials.token = "still-valid"
+    failures = google_auth._refreshes.value(result="failure")
+
+    assert _shared(credentials).refresh() is False
+    assert credentials.token == "still-valid"
+    assert google_auth._refreshes.value(result="failure") == failures + 1
+
+
+def test_failed_refreshes_back_off_up_to_the_cap():
+    credentials = _FakeCredentials(error=OSError("token endpoint unreachable"))
+    shared = _shared(credentials)
+
+    delays = []
+    for _ in range(7):
+        shared.refresh()
+        delays.append(shared.seconds_until_retry())
+
+    assert delays == [30, 60, 120, 240, 480, 600, 600]
+    credentials.error = None
+    assert shared.refresh() is True
+    assert shared.seconds_until_retry() == google_auth._RETRY_SECONDS
+
+
+def test_only_the_first_failure_in_a_row_logs_a_traceback(caplog):
+    shared = _shared(_FakeCredentials(error=OSError("token endpoint unreachable")))
+
+    with caplog.at_level("WARNING", logger=google_auth.__name__):
+        for _ in range(3):
+            shared.refresh()
+
+    assert [r.levelname for r in caplog.records] == ["ERROR", "WARNING", "WARNING"]
+    assert [r.exc_info is not None for r in caplog.records] == [True, False, False]
+    assert "3 in a row" in caplog.records[-1].getMessage()
+
+
+def test_started_refresher_fetches_the_first_token_in_the_background():
+    credentials = _FakeCredentials()
+    shared = _shared(credentials)
+    shared.start()
+    try:
+        assert credentials.refreshed.wait(5)
+    finally:
+        shared.stop()
+
+
+@pytest.fixture
+def _no_shared_credentials(monkeypatch):
+    monkeypatch.setattr(google_auth, "_shared", None)
+
+
+@pytest.mark.usefixtures("_no_shared_credentials")
+def test_process_shares_one_credentials_object():
+    with (
+        patch.object(google_auth, "load_gcp_credentials") as load,
+        patch.object(SharedCredentials, "start") as start,
+    ):
+        first = get_gcp_credentials()
+        second = get_gcp_credentials()
+
+    assert first is second is load.return_value
+    load.assert_called_once()
+    start.assert_called_once()
+
+
+@pytest.mark.usefixtures("_no_shared_credentials")
+def test_missing_credentials_setting_raises():
+    with patch.object(google_auth.SINGLETON, "GOOGLE_APPLICATION_CREDENTIALS", None):
+        with pytest.raises(ValueError, match="not set"):
+            get_gcp_credentials()
@@ -1,9 +1,14 @@
 """Tests for graph.py — agent graph factory and middleware."""
 
+import threading
+import time
 from unittest.mock import MagicMock, patch
 
 import pytest
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import tool
 
 from tenantfirstaid.graph import (
     TFAContext,
@@ -11,6 +16,7 @@ from tenantfirstaid.graph import (
     _DatasetInput,
     _SystemPromptFromContext,
     create_graph,
+    get_agent_graph,
     prepare_system_prompt,
 )
 from tenantfirstaid.location import OregonCity, UsaState
@@ -55,6 +61,77 @@ def test_graph_factory(mock_llm):
     assert result is not None
 
 
+@patch("tenantfirstaid.graph._get_llm")
+def test_get_agent_graph_compiles_once(mock_llm):
+    """The web app's graph is compiled on first use and then reused."""
+    mock_llm.return_value = MagicMock()
+    with (
+        patch("tenantfirstaid.graph._agent_graph", None),
+        patch("tenantfirstaid.graph.create_graph", wraps=create_graph) as spy,
+    ):
+        first = get_agent_graph()
+        second = get_agent_graph()
+    assert first is second
+    spy.assert_called_once_with()
+
+
+@patch("tenantfirstaid.graph._get_llm")
+def test_shared_graph_builds_location_prompt_per_run(mock_get_llm):
+    """One compiled graph serves different locations: the prompt follows the input."""
+    from langchain_core.messages import AIMessage
+
+    mock_llm = MagicMock()
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.return_value = AIMessage(content="You have rights.")
+    mock_get_llm.return_value = mock_llm
+
+    with patch("tenantfirstaid.graph._agent_graph", None):
+        g = get_agent_graph()
+        for city in ("portland", "eugene"):
+            g.invoke(
+                {"messages": [HumanMessage(content="Hi")], "state": "or", "city": city}
+            )
+
+    prompts = [call.args[0][0].content for call in mock_llm.invoke.call_args_list]
+    assert len(prompts) == 2
+    assert "The user is in Portland OR." in prompts[0]
+    assert "The user is in Eugene OR." in prompts[1]
+
+
+@patch("tenantfirstaid.graph._get_llm")
+def test_threaded_graph_resumes_history_from_checkpointer(mock_get_llm):
+    """The threaded graph keeps each thread's history, so a turn sends only new messages."""
+    from langchain_core.messages import AIMessage
+
+    from tenantfirstaid.conversations import EvictingInMemorySaver
+
+    mock_llm = MagicMock()
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.return_value = AIMessage(content="You have rights.")
+    mock_get_llm.return_value = mock_llm
+    saver = EvictingInMemorySaver(max_threads=10, ttl_seconds=60)
+
+    with (
+        patch("tenantfirstaid.graph._threaded_agent_graph", None),
+        patch("tenantfirstaid.graph.get_checkpointer", return_value=saver),
+    ):
+        g = get_agent_graph(threaded=True)
+        assert g is not get_agent_graph()
+        config: RunnableConfig = {"configurable": {"thread_id": "t1"}}
+        for text in ("First question", "Follow-up"):
+            g.invoke(
+                {"messages": [HumanMessage(content=text)], "state": "or"},
+                config=config,
+            )
+
+    second_call_messages = mock_llm.invoke.call_args_list[1].args[0]
+    assert [m.content for m in second_call_messages[1:]] == [
+        "First question",
+        "You have rights.",
+        "Follow-up",
+    ]
+
+
 def test_adapt_query_converts_query_to_human_message():
     """_adapt_query wraps a bare query string in a HumanMessage."""
     state: _DatasetInput = {
@@ -140,6 +217,23 @@ def test_middleware_without_city():
     assert "The user is in OR." in injected.content
 
 
+def test_middleware_without_context_uses_default_instructions():
+    """The web app's shared graph runs without Studio context."""
+    from tenantfirstaid.constants import DEFAULT_INSTRUCTIONS
+
+    middleware = _SystemPromptFromContext()
+    request = _make_middleware_request("ignored", city="Portland", state="OR")
+    request.runtime.context = None
+
+    forwarded = []
+    handler = MagicMock(side_effect=lambda r: forwarded.append(r) or MagicMock())
+    middleware.wrap_model_call(request, handler)
+
+    injected = forwarded[0].system_message.content
+    assert injected.startswith(DEFAULT_INSTRUCTIONS)
+    assert "Portland OR" in injected
+
+
 def test_middleware_uses_custom_prompt_from_context():
     """Middleware uses the prompt from Studio context, not the default."""
     middleware = _SystemPromptFromContext()
@@ -205,3 +299,308 @@ def test_graph_adapter_converts_query_to_human_message(mock_get_llm):
     ]
     assert len(human_messages) == 1
     assert human_messages[0].content == "Can my landlord enter without notice?"
+
+
+# ── history compaction ─────────────────────────────────────────────────────────
+
+
+def _letter_turn(n: int, letter: str) -> list:
+    """One turn in which the agent fetches the template and drafts a letter."""
+    from langchain_core.messages import AIMessage, ToolMessage
+
+    return [
+        HumanMessage(f"Please draft letter {n}", id=f"h{n}"),
+        AIMessage(
+            "",
+            tool_calls=[{"name": "get_letter_template", "args": {}, "id": f"t{n}"}],
+        ),
+        ToolMessage(
+            "TEMPLATE " * 200, tool_call_id=f"t{n}", name="get_letter_template"
+        ),
+        AIMessage(
+            "",
+            tool_calls=[
+                {"name": "generate_letter", "args": {"letter": letter}, "id": f"g{n}"}
+            ],
+        ),
+        ToolMessage("Letter generated successfully.", tool_call_id=f"g{n}"),
+        AIMessage(f"Here is draft {n}."),
+    ]
+
+
+def _qa_turn(n: int) -> list:
+    """One question/answer turn with a long retrieval result."""
+    from langchain_core.messages import AIMessage, ToolMessage
+
+    return [
+        HumanMessage(f"Question {n} about my lease?"),
+        AIMessage(
+            "",
+            tool_calls=[
+                {"name": "retrieve_city_state_laws", "args": {}, "id": f"r{n}"}
+            ],
+        ),
+        ToolMessage("ORS 90.100 " * 400, tool_call_id=f"r{n}"),
+        AIMessage(f"Answer {n}: you have rights under ORS 90."),
+    ]
+
+
+def _compaction_request(messages: list) -> MagicMock:
+    request = _make_middleware_request("Base prompt.", state="OR")
+    request.messages = messages
+    request.system_message = SystemMessage("Base prompt.")
+    override = request.override
+
+    def _override(**kwargs):
+        child = override(**kwargs)
+        if "system_message" not in kwargs:
+            child.system_message = None  # marks "left unchanged"
+        return child
+
+    request.override = _override
+    return request
+
+
+def _run_compaction(middleware, request):
+    forwarded = []
+    middleware.wrap_model_call(
+        request, MagicMock(side_effect=lambda r: forwarded.append(r) or MagicMock())
+    )
+    return forwarded[0]
+
+
+def test_compaction_passes_through_under_budget():
+    from tenantfirstaid.graph import _HistoryCompaction
+
+    request = _compaction_request(_qa_turn(1) + [HumanMessage("Thanks")])
+    assert _run_compaction(_HistoryCompaction(100_000), request) is request
+
+
+def test_compaction_disabled_with_zero_budget():
+    from tenantfirstaid.graph import _HistoryCompaction
+
+    request = _compaction_request([_qa_turn(i) for i in range(20)][0])
+    assert _run_compaction(_HistoryCompaction(0), request) is request
+
+
+def test_compaction_collapses_superseded_letter_drafts():
+    """Older drafts and templates shrink to notes; the latest draft is kept verbatim."""
+    from langchain_core.messages import ToolMessage
+
+    from tenantfirstaid.graph import (
+        _SUPERSEDED_LETTER,
+        _SUPERSEDED_TEMPLATE,
+        _HistoryCompaction,
+        count_tokens_approximately,
+    )
+
+    history = (
+        _letter_turn(1, "Dear Landlord, v1 " * 300)
+        + _letter_turn(2, "Dear Landlord, v2 " * 300)
+        + [HumanMessage("Can you make it shorter?")]
+    )
+    budget = count_tokens_approximately(history) - 100
+    forwarded = _run_compaction(
+        _HistoryCompaction(budget), _compaction_request(history)
+    )
+
+    letters = [
+        c["args"]["letter"]
+        for m in forwarded.messages
+        for c in getattr(m, "tool_calls", [])
+        if c["name"] == "generate_letter"
+    ]
+    assert letters[0] == _SUPERSEDED_LETTER
+    assert letters[1].startswith("Dear Landlord, v2")
+    templates = [
+        m.content
+        for m in forwarded.messages
+        if isinstance(m, ToolMessage) and m.name == "get_letter_template"
+    ]
+    # Both templates precede the latest letter, which already holds the filled-in text.
+    assert templates == [_SUPERSEDED_TEMPLATE, _SUPERSEDED_TEMPLATE]
+    # No turns dropped, so the system prompt is untouched and state is not mutated.
+    assert len(forwarded.messages) == len(history)
+    assert forwarded.system_message is None
+    assert history[3].tool_calls[0]["args"]["letter"].startswith("Dear Landlord, v1")
+
+
+def test_compaction_abridges_older_turns_into_system_message():
+    """Recent turns stay verbatim, older ones are abridged, and tool pairs stay intact."""
+    from langchain_core.messages import AIMessage, ToolMessage
+
+    from tenantfirstaid.graph import (
+        _SUMMARY_HEADER,
+        _HistoryCompaction,
+        count_tokens_approximately,
+    )
+
+    history = [m for i in range(30) for m in _qa_turn(i)] + [
+        HumanMessage("Latest question?")
+    ]
+    budget = 8_000
+    forwarded = _run_compaction(
+        _HistoryCompaction(budget), _compaction_request(history)
+    )
+
+    kept = forwarded.messages
+    assert count_tokens_approximately(kept) <= budget
+    assert isinstance(kept[0], HumanMessage)
+    assert kept[-1].content == "Latest question?"
+    call_ids = {c["id"] for m in kept if isinstance(m, AIMessage) for c in m.tool_calls}
+    result_ids = {m.tool_call_id for m in kept if isinstance(m, ToolMessage)}
+    assert call_ids == result_ids
+
+    system = forwarded.system_message.content
+    assert system.startswith("Base prompt." + _SUMMARY_HEADER)
+    first_kept = int(kept[0].content.split()[1])
+    newest_abridged = f"Answer {first_kept - 1}: you have rights"
+    assert system.rstrip().endswith(newest_abridged + " under ORS 90.")
+    assert "ORS 90.100 ORS 90.100" not in system
+    assert count_tokens_approximately(kept) + count_tokens_approximately(
+        [HumanMessage(system)]
+    ) < count_tokens_approximately(history)
+
+
+def test_compaction_keeps_oversized_current_turn_whole():
+    """A current turn larger than the budget is still sent whole, never split."""
+    from tenantfirstaid.graph import _HistoryCompaction
+
+    current = [HumanMessage("Big question")] + _qa_turn(99)[1:]
+    history = _qa_turn(1) + current
+    forwarded = _run_compaction(_HistoryCompaction(50), _compaction_request(history))
+    assert forwarded.messages == current
+
+
+@patch("tenantfirstaid.graph.HISTORY_TOKEN_BUDGET", 2_000)
+@patch("tenantfirstaid.graph._get_llm")
+def test_compaction_runs_after_location_prompt_in_graph(mock_get_llm):
+    """In the agent graph, the abridged turns are appended after the location prompt."""
+    from langchain_core.messages import AIMessage
+
+    from tenantfirstaid.graph import _SUMMARY_HEADER
+
+    mock_llm = MagicMock()
+    mock_llm.bind_tools.return_value = mock_llm
+    mock_llm.invoke.return_value = AIMessage(content="You have rights.")
+    mock_get_llm.return_value = mock_llm
+
+    history = [m for i in range(10) for m in _qa_turn(i)]
+    create_graph().invoke(
+        {
+            "messages": history + [HumanMessage("Latest?")],
+            "state": "or",
+            "city": "eugene",
+        }
+    )
+
+    sent = mock_llm.invoke.call_args.args[0]
+    assert "The user is in Eugene OR." in sent[0].content
+    assert _SUMMARY_HEADER in sent[0].content
+    assert sent[-1].content == "Latest?"
+
+
+# --- Concurrent tool calls ---
+
+
+class _ToolCallingFakeModel(GenericFakeChatModel):
+    """Fake model that accepts ``bind_tools`` so it can drive create_graph."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+class _SlowLookup:
+    """Tool body that tracks how many calls overlap; earlier calls finish last."""
+
+    def __init__(self) -> None:
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, n: int) -> str:
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05 * (5 - n))
+        with self.lock:
+            self.active -= 1
+        return f"result {n}"
+
+
+def _multi_tool_call_graph(lookup: _SlowLookup):
+    """Compile create_graph with one slow tool and a model that calls it 4 times."""
+
+    @tool
+    def slow_lookup(n: int) -> str:
+        """Look up passage ``n``."""
+        return lookup(n)
+
+    calls = [
+        {"name": "slow_lookup", "args": {"n": n}, "id": f"call-{n}"}
+        for n in range(1, 5)
+    ]
+    model = _ToolCallingFakeModel(
+        messages=iter([AIMessage("", tool_calls=calls), AIMessage("Done.")])
+    )
+    with (
+        patch("tenantfirstaid.graph._get_llm", return_value=model),
+        patch("tenantfirstaid.graph.tools", [slow_lookup]),
+    ):
+        return create_graph()
+
+
+def _tool_results(result) -> list[tuple[str, str]]:
+    return [
+        (m.tool_call_id, m.content)
+        for m in result["messages"]
+        if isinstance(m, ToolMessage)
+    ]
+
+
+_EXPECTED_RESULTS = [(f"call-{n}", f"result {n}") for n in range(1, 5)]
+
+
+def test_tool_calls_in_one_turn_run_concurrently_in_order():
+    """Calls overlap up to the cap, and results keep the model's call order."""
+    lookup = _SlowLookup()
+    agent = _multi_tool_call_graph(lookup)
+
+    start = time.perf_counter()
+    result = agent.invoke(
+        {"messages": [HumanMessage("Q")], "state": UsaState.OREGON},
+        config={"max_concurrency": 4},
+    )
+    elapsed = time.perf_counter() - start
+
+    assert lookup.peak == 4
+    # Serial execution would take 0.5 s; concurrent is bounded by the slowest call.
+    assert elapsed < 0.4
+    assert _tool_results(result) == _EXPECTED_RESULTS
+
+
+def test_tool_call_concurrency_is_capped_per_request():
+    lookup = _SlowLookup()
+    agent = _multi_tool_call_graph(lookup)
+
+    result = agent.invoke(
+        {"messages": [HumanMessage("Q")], "state": UsaState.OREGON},
+        config={"max_concurrency": 2},
+    )
+
+    assert lookup.peak == 2
+    assert _tool_results(result) == _EXPECTED_RESULTS
+
+
+@pytest.mark.asyncio
+async def test_async_tool_calls_run_concurrently_in_order():
+    lookup = _SlowLookup()
+    agent = _multi_tool_call_graph(lookup)
+
+    result = await agent.ainvoke(
+        {"messages": [HumanMessage("Q")], "state": UsaState.OREGON},
+        config={"max_concurrency": 3},
+    )
+
+    assert lookup.peak == 3
+    assert _tool_results(result) == _EXPECTED_RESULTS
@@ -1,5 +1,24 @@
+import subprocess
+import sys
+
+
 def test_flask_app_startup():
     from tenantfirstaid.app import app
 
     assert app is not None
     assert app.name == "tenantfirstaid.app"
+
+
+def test_pdf_stack_is_not_imported_with_the_app():
+    # A fresh interpreter: this test session may already have imported it.
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, tenantfirstaid.app; print('xhtml2pdf' in sys.modules)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "False"
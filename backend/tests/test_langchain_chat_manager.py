@@ -1,12 +1,19 @@
 """Tests for LangChain-based chat manager."""
 
+import json
+import re
+from typing import Any, Iterator
 from unittest.mock import MagicMock, patch
 
 import httpcore
 import httpx
 import pytest
-from langchain_core.messages import AIMessage
+from langchain_core.language_models.chat_models import generate_from_stream
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
 
+from tenantfirstaid.constants import TOOL_CALL_CONCURRENCY
 from tenantfirstaid.graph import prepare_system_prompt, tools
 from tenantfirstaid.langchain_chat_manager import LangChainChatManager
 from tenantfirstaid.location import OregonCity, UsaState
@@ -46,9 +53,11 @@ def test_prepare_system_prompt_includes_city_state(oregon_state, portland_city):
 
 def test_tools_include_rag_retrieval():
     """Test that tools list includes RAG retrieval and letter template tools."""
-    assert len(tools) == 4
+    assert len(tools) == 6
     tool_names = [tool.name for tool in tools]
     assert "retrieve_city_state_laws" in tool_names
+    assert "search_oregon_statutes" in tool_names
+    assert "get_statute_section" in tool_names
     assert "generate_letter" in tool_names
     assert "get_letter_template" in tool_names
     assert "get_legal_aid_referrals" in tool_names
@@ -67,14 +76,14 @@ def test_system_prompt_state_only():
     assert "OTHER" in prompt.content
 
 
-@patch.object(LangChainChatManager, "_LangChainChatManager__create_agent_for_session")
-def test_streaming_text_response(mock_create_agent, oregon_state, portland_city):
+@patch("tenantfirstaid.langchain_chat_manager.get_agent_graph")
+def test_streaming_text_response(mock_get_agent_graph, oregon_state, portland_city):
     mock_agent = MagicMock()
     ai_msg = AIMessage(content=[{"type": "text", "text": "You have rights."}])
     mock_agent.stream.return_value = iter(
         [("updates", {"agent": {"messages": [ai_msg]}})]
     )
-    mock_create_agent.return_value = mock_agent
+    mock_get_agent_graph.return_value = mock_agent
 
     cm = LangChainChatManager()
     blocks = list(
@@ -88,16 +97,16 @@ def test_streaming_text_response(mock_create_agent, oregon_state, portland_city)
     assert any(b["type"] == "text" for b in blocks)
 
 
-@patch.object(LangChainChatManager, "_LangChainChatManager__create_agent_for_session")
+@patch("tenantfirstaid.langchain_chat_manager.get_agent_graph")
 def test_streaming_custom_chunk_yields_non_standard_block(
-    mock_create_agent, oregon_state
+    mock_get_agent_graph, oregon_state
 ):
     """Custom-mode chunks (e.g. from generate_letter) are wrapped in NonStandardContentBlock so _classify_blocks can distinguish tool chunks from LLM chunks."""
     mock_agent = MagicMock()
     mock_agent.stream.return_value = iter(
         [("custom", {"type": "letter", "content": "Dear Landlord,"})]
     )
-    mock_create_agent.return_value = mock_agent
+    mock_get_agent_graph.return_value = mock_agent
 
     cm = LangChainChatManager()
     blocks = list(
@@ -113,11 +122,11 @@ def test_streaming_custom_chunk_yields_non_standard_block(
     assert block["value"]["content"] == "Dear Landlord,"
 
 
-@patch.object(LangChainChatManager, "_LangChainChatManager__create_agent_for_session")
-def test_streaming_empty_chunk_skipped(mock_create_agent, oregon_state):
+@patch("tenantfirstaid.langchain_chat_manager.get_agent_graph")
+def test_streaming_empty_chunk_skipped(mock_get_agent_graph, oregon_state):
     mock_agent = MagicMock()
     mock_agent.stream.return_value = iter([("updates", {})])
-    mock_create_agent.return_value = mock_agent
+    mock_get_agent_graph.return_value = mock_agent
 
     cm = LangChainChatManager()
     blocks = list(
@@ -130,7 +139,7 @@ def test_streaming_empty_chunk_skipped(mock_create_agent, oregon_state):
 
 # ── stream retry logic ─────────────────────────────────────────────────────────
 
-_CREATE_AGENT = "_LangChainChatManager__create_agent_for_session"
+_GET_AGENT_GRAPH = "tenantfirstaid.langchain_chat_manager.get_agent_graph"
 _STREAM_ONCE = "_LangChainChatManager__stream_once"
 _GOOD_CHUNK: dict = {"type": "text", "text": "ok"}
 
@@ -141,7 +150,7 @@ def _good_stream(*_args, **_kwargs):
 
 @patch("tenantfirstaid.langchain_chat_manager.time.sleep")
 @patch.object(LangChainChatManager, _STREAM_ONCE)
-@patch.object(LangChainChatManager, _CREATE_AGENT)
+@patch(_GET_AGENT_GRAPH)
 def test_retry_succeeds_on_second_attempt(
     _mock_create, mock_stream_once, mock_sleep, oregon_state
 ):
@@ -163,7 +172,7 @@ def test_retry_succeeds_on_second_attempt(
 
 @patch("tenantfirstaid.langchain_chat_manager.time.sleep")
 @patch.object(LangChainChatManager, _STREAM_ONCE)
-@patch.object(LangChainChatManager, _CREATE_AGENT)
+@patch(_GET_AGENT_GRAPH)
 def test_no_retry_after_partial_yield(
     _mock_create, mock_stream_once, mock_sleep, oregon_state
 ):
@@ -187,7 +196,7 @@ def test_no_retry_after_partial_yield(
 
 @patch("tenantfirstaid.langchain_chat_manager.time.sleep")
 @patch.object(LangChainChatManager, _STREAM_ONCE)
-@patch.object(LangChainChatManager, _CREATE_AGENT)
+@patch(_GET_AGENT_GRAPH)
 def test_raises_after_max_retries_exhausted(
     _mock_create, mock_stream_once, _mock_sleep, oregon_state
 ):
@@ -205,7 +214,7 @@ def test_raises_after_max_retries_exhausted(
 
 
 @patch.object(LangChainChatManager, _STREAM_ONCE)
-@patch.object(LangChainChatManager, _CREATE_AGENT)
+@patch(_GET_AGENT_GRAPH)
 def test_non_retryable_exception_propagates_immediately(
     _mock_create, mock_stream_once, oregon_state
 ):
@@ -223,7 +232,7 @@ def test_non_retryable_exception_propagates_immediately(
 
 @patch("tenantfirstaid.langchain_chat_manager.time.sleep")
 @patch.object(LangChainChatManager, _STREAM_ONCE)
-@patch.object(LangChainChatManager, _CREATE_AGENT)
+@patch(_GET_AGENT_GRAPH)
 def test_retry_restores_messages(
     _mock_create, mock_stream_once, _mock_sleep, oregon_state
 ):
@@ -242,7 +251,7 @@ def test_retry_restores_messages(
 
 
 @patch.object(LangChainChatManager, _STREAM_ONCE)
-@patch.object(LangChainChatManager, _CREATE_AGENT)
+@patch(_GET_AGENT_GRAPH)
 def test_all_transient_error_types_trigger_retry(
     _mock_create, mock_stream_once, oregon_state
 ):
@@ -259,19 +268,285 @@ def test_all_transient_error_types_trigger_retry(
         assert blocks == [_GOOD_CHUNK], f"{exc_type} did not trigger a retry"
 
 
-@patch("tenantfirstaid.graph._get_llm")
-def test_agent_creation_with_thread_id(mock_get_llm, oregon_state, portland_city):
-    mock_get_llm.return_value = MagicMock()
-    cm = LangChainChatManager()
-    create = getattr(cm, "_LangChainChatManager__create_agent_for_session")
-    agent = create(portland_city, oregon_state, "test-thread")
-    assert agent is not None
+@patch(_GET_AGENT_GRAPH)
+def test_thread_id_selects_checkpointed_graph_and_stabilizes_ids(
+    mock_get_agent_graph, oregon_state
+):
+    """A threaded turn runs the checkpointed graph with ID'd messages, so retries dedupe."""
+    mock_agent = MagicMock()
+    mock_agent.stream.return_value = iter([])
+    mock_get_agent_graph.return_value = mock_agent
+    msgs: list = [{"role": "human", "content": "Follow-up"}]
+
+    list(
+        LangChainChatManager().generate_streaming_response(
+            messages=msgs, city=None, state=oregon_state, thread_id="t1"
+        )
+    )
+
+    mock_get_agent_graph.assert_called_once_with(threaded=True)
+    assert msgs[0]["id"]
+    config = mock_agent.stream.call_args.kwargs["config"]
+    assert config["configurable"]["thread_id"] == "t1"
+    assert config["max_concurrency"] == TOOL_CALL_CONCURRENCY
 
 
 @patch("tenantfirstaid.graph._get_llm")
-def test_agent_creation_without_thread_id(mock_get_llm, oregon_state, portland_city):
+def test_managers_share_one_compiled_graph(mock_get_llm, oregon_state):
+    """Every manager (one per request) runs the same process-wide graph."""
     mock_get_llm.return_value = MagicMock()
-    cm = LangChainChatManager()
-    create = getattr(cm, "_LangChainChatManager__create_agent_for_session")
-    agent = create(portland_city, oregon_state, None)
-    assert agent is not None
+    with patch("tenantfirstaid.graph._agent_graph", None):
+        first, second = LangChainChatManager(), LangChainChatManager()
+        with pytest.raises(NotImplementedError):
+            first.generate_response([], None, oregon_state, None)
+        with pytest.raises(NotImplementedError):
+            second.generate_response([], None, oregon_state, None)
+    assert first.agent is not None
+    assert first.agent is second.agent
+
+
+# ── async streaming ────────────────────────────────────────────────────────────
+
+_ASTREAM_ONCE = "_LangChainChatManager__astream_once"
+
+
+async def _collect(agen) -> list:
+    return [block async for block in agen]
+
+
+def _astream_of(*parts):
+    async def _astream(*_args, **_kwargs):
+        for part in parts:
+            yield part
+
+    return _astream
+
+
+@pytest.mark.asyncio
+@patch(_GET_AGENT_GRAPH)
+async def test_async_streaming_matches_sync_blocks(mock_get_agent_graph, oregon_state):
+    """The async path yields the same blocks as the sync path for the same stream."""
+    ai_msg = AIMessage(content=[{"type": "text", "text": "You have rights."}])
+    parts = [
+        ("updates", {"agent": {"messages": [ai_msg]}}),
+        ("custom", {"type": "letter", "content": "Dear Landlord,"}),
+        ("updates", {}),
+    ]
+    mock_agent = MagicMock()
+    mock_agent.stream.return_value = iter(parts)
+    mock_agent.astream = _astream_of(*parts)
+    mock_get_agent_graph.return_value = mock_agent
+
+    sync_blocks = list(
+        LangChainChatManager().generate_streaming_response(
+            messages=[], city=None, state=oregon_state, thread_id=None
+        )
+    )
+    async_blocks = await _collect(
+        LangChainChatManager().agenerate_streaming_response(
+            messages=[], city=None, state=oregon_state, thread_id=None
+        )
+    )
+    assert async_blocks == sync_blocks
+    assert [b["type"] for b in async_blocks] == ["text", "non_standard"]
+
+
+@pytest.mark.asyncio
+@patch("tenantfirstaid.langchain_chat_manager.asyncio.sleep")
+@patch.object(LangChainChatManager, _ASTREAM_ONCE)
+@patch(_GET_AGENT_GRAPH)
+async def test_async_retry_succeeds_on_second_attempt(
+    _mock_create, mock_astream_once, mock_sleep, oregon_state
+):
+    """The async path retries a transient error before any output, like the sync path."""
+    mock_astream_once.side_effect = [
+        httpcore.ReadError("reset"),
+        _astream_of(_GOOD_CHUNK)(),
+    ]
+    blocks = await _collect(
+        LangChainChatManager().agenerate_streaming_response(
+            messages=[], city=None, state=oregon_state, thread_id=None
+        )
+    )
+    assert blocks == [_GOOD_CHUNK]
+    assert mock_astream_once.call_count == 2
+    mock_sleep.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch("tenantfirstaid.langchain_chat_manager.asyncio.sleep")
+@patch.object(LangChainChatManager, _ASTREAM_ONCE)
+@patch(_GET_AGENT_GRAPH)
+async def test_async_no_retry_after_partial_yield(
+    _mock_create, mock_astream_once, mock_sleep, oregon_state
+):
+    """If output was already sent, the async path re-raises without retrying."""
+
+    async def _partial_then_error(*_args, **_kwargs):
+        yield _GOOD_CHUNK
+        raise httpx.ReadError("mid-stream reset")
+
+    mock_astream_once.return_value = _partial_then_error()
+    with pytest.raises(httpx.ReadError):
+        await _collect(
+            LangChainChatManager().agenerate_streaming_response(
+                messages=[], city=None, state=oregon_state, thread_id=None
+            )
+        )
+    assert mock_astream_once.call_count == 1
+    mock_sleep.assert_not_called()
+
+
+# ── token streaming ────────────────────────────────────────────────────────────
+
+
+class _TokenStreamingModel(GenericFakeChatModel):
+    """Fake model that streams words, then its tool calls as tool-call chunks."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator:
+        reply = next(self.messages)
+        assert isinstance(reply, AIMessage)
+        for token in re.findall(r"\S+\s*", reply.text):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        for i, call in enumerate(reply.tool_calls):
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"]),
+                            "id": call["id"],
+                            "index": i,
+                        }
+                    ],
+                )
+            )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop, run_manager))
+
+
+def _stream_with_model(replies: list[AIMessage], stream_tokens: bool, state) -> list:
+    model = _TokenStreamingModel(messages=iter(replies))
+    with (
+        patch("tenantfirstaid.graph._get_llm", return_value=model),
+        patch("tenantfirstaid.graph._agent_graph", None),
+    ):
+        return list(
+            LangChainChatManager(
+                stream_tokens=stream_tokens
+            ).generate_streaming_response(
+                messages=[{"role": "human", "content": "Help"}],
+                city=None,
+                state=state,
+                thread_id=None,
+            )
+        )
+
+
+def test_stream_tokens_forwards_text_as_it_is_generated(oregon_state):
+    """Each token is its own block, and the completed message is not re-sent."""
+    blocks = _stream_with_model(
+        [AIMessage("You have rights.")], stream_tokens=True, state=oregon_state
+    )
+    assert [b["text"] for b in blocks] == ["You ", "have ", "rights."]
+
+
+def test_stream_tokens_suppresses_tool_call_fragments(oregon_state):
+    """Tool-call chunks and tool results never reach the client; text after them does."""
+    calls = [
+        {"name": "get_statute_section", "args": {"citation": "ORS 90.394"}, "id": "c1"}
+    ]
+    blocks = _stream_with_model(
+        [AIMessage("Checking", tool_calls=calls), AIMessage("Pay within 72 hours.")],
+        stream_tokens=True,
+        state=oregon_state,
+    )
+    assert all(b["type"] == "text" for b in blocks)
+    assert [b["text"] for b in blocks] == [
+        "Checking",
+        "Pay ",
+        "within ",
+        "72 ",
+        "hours.",
+    ]
+
+
+def test_without_stream_tokens_sends_whole_messages(oregon_state):
+    blocks = _stream_with_model(
+        [AIMessage("You have rights.")], stream_tokens=False, state=oregon_state
+    )
+    assert blocks == [{"type": "text", "text": "You have rights."}]
+
+
+@patch(_GET_AGENT_GRAPH)
+def test_stream_tokens_requests_messages_mode_and_filters_nodes(
+    mock_get_agent_graph, oregon_state
+):
+    """Only the model node's deltas are forwarded; reasoning deltas pass through."""
+    mock_agent = MagicMock()
+    model_node: dict[str, Any] = {"langgraph_node": "model"}
+    mock_agent.stream.return_value = iter(
+        [
+            (
+                "messages",
+                (
+                    AIMessageChunk(
+                        content=[{"type": "reasoning", "reasoning": "Think"}]
+                    ),
+                    model_node,
+                ),
+            ),
+            ("messages", (AIMessageChunk(content="Hi"), model_node)),
+            ("messages", (AIMessageChunk(content=""), model_node)),
+            ("messages", (AIMessageChunk(content="x"), {"langgraph_node": "tools"})),
+        ]
+    )
+    mock_get_agent_graph.return_value = mock_agent
+
+    blocks = list(
+        LangChainChatManager(stream_tokens=True).generate_streaming_response(
+            messages=[], city=None, state=oregon_state, thread_id=None
+        )
+    )
+    assert mock_agent.stream.call_args.kwargs["stream_mode"] == [
+        "updates",
+        "custom",
+        "messages",
+    ]
+    assert [b["type"] for b in blocks] == ["reasoning", "text"]
+
+
+@pytest.mark.asyncio
+@patch("tenantfirstaid.langchain_chat_manager.asyncio.sleep")
+@patch(_GET_AGENT_GRAPH)
+async def test_async_stream_tokens_no_retry_after_first_token(
+    mock_get_agent_graph, mock_sleep, oregon_state
+):
+    """A reset after the first token re-raises rather than replaying the answer."""
+    mock_agent = MagicMock()
+
+    async def _token_then_reset(*_args, **_kwargs):
+        yield ("messages", (AIMessageChunk(content="You"), {"langgraph_node": "model"}))
+        raise httpx.ReadError("mid-stream reset")
+
+    mock_agent.astream = _token_then_reset
+    mock_get_agent_graph.return_value = mock_agent
+
+    blocks: list = []
+    with pytest.raises(httpx.ReadError):
+        async for block in LangChainChatManager(
+            stream_tokens=True
+        ).agenerate_streaming_response(
+            messages=[], city=None, state=oregon_state, thread_id=None
+        ):
+            blocks.append(block)
+    assert blocks == [{"type": "text", "text": "You"}]
+    mock_sleep.assert_not_called()
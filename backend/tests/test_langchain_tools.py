@@ -8,6 +8,7 @@ from unittest.mock import MagicMock, patch
 
 import httpx
 import pytest
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2 import service_account
 from google.oauth2.credentials import Credentials
 from hypothesis import given
@@ -360,7 +361,7 @@ def test_generate_letter_empty_string(mock_get_stream_writer):
 # --- RagBuilder.search retry tests ---
 
 
-@patch("tenantfirstaid.langchain_tools.load_gcp_credentials")
+@patch("tenantfirstaid.langchain_tools.get_gcp_credentials")
 @patch("tenantfirstaid.langchain_tools.VertexAISearchRetriever")
 def test_rag_search_retries_on_httpx_read_error(mock_retriever_class, mock_creds):
     """Transient httpx.ReadError is retried and succeeds on second attempt."""
@@ -368,7 +369,7 @@ def test_rag_search_retries_on_httpx_read_error(mock_retriever_class, mock_creds
     mock_doc = MagicMock()
     mock_doc.page_content = "result text"
 
-    mock_instance = mock_retriever_class.return_value
+    mock_instance = mock_retriever_class.return_value.model_copy.return_value
     mock_instance.invoke.side_effect = [
         httpx.ReadError("Connection reset by peer"),
         [mock_doc],
@@ -384,13 +385,13 @@ def test_rag_search_retries_on_httpx_read_error(mock_retriever_class, mock_creds
     assert mock_instance.invoke.call_count == 2
 
 
-@patch("tenantfirstaid.langchain_tools.load_gcp_credentials")
+@patch("tenantfirstaid.langchain_tools.get_gcp_credentials")
 @patch("tenantfirstaid.langchain_tools.VertexAISearchRetriever")
 def test_rag_search_gives_up_after_three_attempts(mock_retriever_class, mock_creds):
     """After 3 failed attempts the error is reraised."""
     mock_creds.return_value = MagicMock()
 
-    mock_instance = mock_retriever_class.return_value
+    mock_instance = mock_retriever_class.return_value.model_copy.return_value
     mock_instance.invoke.side_effect = httpx.ReadError("Connection reset by peer")
 
     builder = RagBuilder(
@@ -401,3 +402,44 @@ def test_rag_search_gives_up_after_three_attempts(mock_retriever_class, mock_cre
         builder.search("test query")
 
     assert mock_instance.invoke.call_count == 3
+
+
+# --- Retriever pool tests ---
+
+
+@patch("tenantfirstaid.langchain_tools.get_gcp_credentials")
+def test_rag_builders_share_pooled_client_and_credentials(mock_creds):
+    """Builders for one datastore reuse its retriever's client; per-call fields differ."""
+    mock_creds.return_value = AnonymousCredentials()
+
+    portland = RagBuilder(
+        data_store_id="fake-datastore-id",
+        filter='city: ANY("portland", "null") AND state: ANY("or")',
+        max_documents=5,
+        max_extractive_segment_count=6,
+    )
+    statewide = RagBuilder(
+        data_store_id="fake-datastore-id",
+        filter='city: ANY("null") AND state: ANY("or")',
+    )
+
+    mock_creds.assert_called_once()
+    assert portland.rag._client is statewide.rag._client
+    assert portland.rag.filter == 'city: ANY("portland", "null") AND state: ANY("or")'
+    assert statewide.rag.filter == 'city: ANY("null") AND state: ANY("or")'
+    assert (portland.rag.max_documents, statewide.rag.max_documents) == (5, 3)
+    assert portland.rag.max_extractive_segment_count == 6
+    assert portland.rag.spell_correction_mode == 1
+
+
+@patch("tenantfirstaid.langchain_tools.get_gcp_credentials")
+def test_rag_builder_pools_one_retriever_per_datastore(mock_creds):
+    mock_creds.return_value = AnonymousCredentials()
+
+    laws = RagBuilder(data_store_id="laws-id")
+    help_ = RagBuilder(data_store_id="help-id")
+
+    assert mock_creds.call_count == 2
+    assert laws.rag._client is not help_.rag._client
+    assert laws.rag.data_store_id == "laws-id"
+    assert help_.rag.data_store_id == "help-id"
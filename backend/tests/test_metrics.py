@@ -0,0 +1,133 @@
+"""Tests for metrics.py — the stdlib Prometheus-format metrics registry."""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from tenantfirstaid import metrics
+from tenantfirstaid.metrics import counter, gauge, histogram, render
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """Register each test's metrics in a fresh, empty registry."""
+    monkeypatch.setattr(metrics, "_metrics", {})
+
+
+def test_counter_renders_with_total_suffix_and_labels():
+    requests = counter("requests", "Requests served.", ("route",))
+    requests.inc(route="/api/query")
+    requests.inc(2, route="/api/query")
+
+    assert requests.value(route="/api/query") == 3
+    assert render() == (
+        "# HELP tenantfirstaid_requests Requests served.\n"
+        "# TYPE tenantfirstaid_requests counter\n"
+        'tenantfirstaid_requests_total{route="/api/query"} 3\n'
+    )
+
+
+def test_registering_twice_returns_the_same_metric():
+    assert gauge("streams", "Streams.") is gauge("streams", "Streams.")
+    with pytest.raises(ValueError, match="already registered"):
+        counter("streams", "Streams.")
+
+
+def test_labels_must_match_and_are_escaped():
+    g = gauge("state", "State.", ("name",))
+    with pytest.raises(ValueError):
+        g.set(1)
+    g.set(1.5, name='a "quoted"\nname')
+    assert 'tenantfirstaid_state{name="a \\"quoted\\"\\nname"} 1.5' in render()
+
+
+def test_histogram_buckets_are_cumulative():
+    h = histogram("duration_seconds", "Duration.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        h.observe(value)
+
+    assert h.count() == 4
+    lines = render().splitlines()[2:]
+    assert lines == [
+        'tenantfirstaid_duration_seconds_bucket{le="0.1"} 1',
+        'tenantfirstaid_duration_seconds_bucket{le="1"} 3',
+        'tenantfirstaid_duration_seconds_bucket{le="+Inf"} 4',
+        "tenantfirstaid_duration_seconds_sum 4.25",
+        "tenantfirstaid_duration_seconds_count 4",
+    ]
+
+
+def test_gauge_modes_combine_snapshots():
+    assert gauge("in_flight", "In flight.").merge([{(): 2}, {(): 3}]) == {(): 5}
+    worst = gauge("worst", "Worst state.", mode="max")
+    assert worst.merge([{(): 2}, {(): 0}]) == {(): 2}
+
+
+# ── sharing across worker processes ────────────────────────────────────────────
+
+
+@pytest.fixture
+def share_dir(tmp_path, monkeypatch):
+    """Share metrics through a temporary directory without starting the writer."""
+    monkeypatch.setattr(metrics, "_share_dir", tmp_path)
+    return tmp_path
+
+
+def _dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_render_adds_other_workers_snapshots(share_dir):
+    requests = counter("requests", "Requests served.", ("route",))
+    streams = gauge("streams", "Open streams.")
+    durations = histogram("duration_seconds", "Duration.", buckets=(1.0,))
+    requests.inc(route="/api/query")
+    streams.set(2)
+    durations.observe(0.5)
+    metrics._write_snapshot()
+    own = share_dir / f"{os.getpid()}.json"
+    shutil.copy(own, share_dir / f"{os.getppid()}.json")
+    own.rename(share_dir / f"{_dead_pid()}.json")
+
+    text = render()
+
+    # Counters and histograms include the exited worker; gauges only live ones.
+    assert 'tenantfirstaid_requests_total{route="/api/query"} 3' in text
+    assert "tenantfirstaid_streams 4" in text
+    assert 'tenantfirstaid_duration_seconds_bucket{le="1"} 3' in text
+    assert "tenantfirstaid_duration_seconds_sum 1.5" in text
+
+
+def test_unreadable_snapshots_are_skipped(share_dir):
+    counter("requests", "Requests served.").inc()
+    (share_dir / f"{os.getppid()}.json").write_text("{trunc")
+    (share_dir / "notes.json").write_text("{}")
+
+    assert "tenantfirstaid_requests_total 1" in render()
+
+
+@pytest.mark.filterwarnings("ignore:This process .* is multi-threaded")
+def test_forked_worker_writes_its_own_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "_share_dir", None)
+    counter("requests", "Requests served.").inc()
+    metrics.share_across_processes(tmp_path)
+    try:
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - child
+            counter("requests", "Requests served.").inc(5)
+            metrics._write_snapshot()
+            os._exit(0)
+        os.waitpid(pid, 0)
+    finally:
+        metrics._share_stop.set()
+
+    assert json.loads((tmp_path / f"{pid}.json").read_text()) == {
+        "tenantfirstaid_requests": [[[], 6.0]]
+    }
+    assert "tenantfirstaid_requests_total 7" in render()
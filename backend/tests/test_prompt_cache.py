@@ -0,0 +1,280 @@
+"""Tests for prompt_cache.py and the prompt-prefix caching middleware."""
+
+import threading
+from typing import Any, Callable
+
+import pytest
+from langchain.agents import create_agent
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatResult
+from langchain_core.tools import tool
+from pydantic import Field
+
+from tenantfirstaid.constants import DEFAULT_INSTRUCTIONS
+from tenantfirstaid.graph import (
+    _HistoryCompaction,
+    _PromptPrefixCaching,
+    _SystemPromptFromContext,
+    tools,
+)
+from tenantfirstaid.location import OregonCity, TFAAgentStateSchema, UsaState
+from tenantfirstaid.prompt_cache import PromptPrefixCache, prefix_cache_key
+
+pytestmark = pytest.mark.langchain
+
+
+class _RecordingChatModel(GenericFakeChatModel):
+    """Fake model recording the messages, bound tools and settings of each call."""
+
+    model: str = "fake-gemini"
+    calls: list = Field(default_factory=list)
+    bound_tools: list = Field(default_factory=list)
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "_RecordingChatModel":
+        self.bound_tools.append(list(tools))
+        return self
+
+    def _generate(
+        self, messages: list[BaseMessage], *args: Any, **kwargs: Any
+    ) -> ChatResult:
+        self.calls.append((list(messages), kwargs))
+        return super()._generate(messages, *args, **kwargs)
+
+
+class _FakeGemini:
+    """Stand-in for Gemini's cache API, recording what it was asked to store."""
+
+    def __init__(self) -> None:
+        self.created: list[tuple[str, list]] = []
+        self.extended: list[str] = []
+        self.fail_create = False
+        self.fail_extend = False
+
+    def create(self, model, system_prompt, tools, ttl_seconds) -> str:
+        if self.fail_create:
+            raise RuntimeError("cache API unavailable")
+        self.created.append((system_prompt, list(tools)))
+        return f"cachedContents/{len(self.created)}"
+
+    def extend(self, model, name, ttl_seconds) -> None:
+        if self.fail_extend:
+            raise RuntimeError("cache expired")
+        self.extended.append(name)
+
+
+def _registry(gemini: _FakeGemini, clock: Callable[[], float], ttl: int = 3600):
+    return PromptPrefixCache(
+        ttl, create=gemini.create, extend=gemini.extend, clock=clock
+    )
+
+
+@tool
+def _lookup(query: str) -> str:
+    """Look something up."""
+    return query
+
+
+def test_prefix_cache_key_is_stable_and_content_addressed():
+    """The key depends only on model, prompt text and tool schemas."""
+    key = prefix_cache_key("m", DEFAULT_INSTRUCTIONS, tools)
+    assert key == prefix_cache_key("m", DEFAULT_INSTRUCTIONS, list(tools))
+    assert key != prefix_cache_key("m", DEFAULT_INSTRUCTIONS + " ", tools)
+    assert key != prefix_cache_key("m", DEFAULT_INSTRUCTIONS, tools[:-1])
+    assert key != prefix_cache_key("other", DEFAULT_INSTRUCTIONS, tools)
+
+
+def test_registry_creates_once_then_reuses(clock):
+    gemini = _FakeGemini()
+    registry = _registry(gemini, clock)
+    model = _RecordingChatModel(messages=iter([]))
+
+    first = registry.lookup(model, "Prompt.", [_lookup])
+    clock.now += 60
+    assert registry.lookup(model, "Prompt.", [_lookup]) == first
+    assert len(gemini.created) == 1
+    assert gemini.extended == []
+
+
+def test_registry_extends_cache_before_expiry(clock):
+    gemini = _FakeGemini()
+    registry = _registry(gemini, clock, ttl=3600)
+    model = _RecordingChatModel(messages=iter([]))
+
+    name = registry.lookup(model, "Prompt.", [_lookup])
+    clock.now += 3600 - registry.refresh_margin + 1
+    assert registry.lookup(model, "Prompt.", [_lookup]) == name
+    assert gemini.extended == [name]
+    assert len(gemini.created) == 1
+
+
+def test_registry_recreates_when_extend_fails(clock):
+    gemini = _FakeGemini()
+    registry = _registry(gemini, clock)
+    model = _RecordingChatModel(messages=iter([]))
+
+    registry.lookup(model, "Prompt.", [_lookup])
+    gemini.fail_extend = True
+    clock.now += 3600
+    assert registry.lookup(model, "Prompt.", [_lookup]) == "cachedContents/2"
+
+
+def test_registry_backs_off_after_create_failure(clock):
+    """A failed creation answers None and is not retried until the margin passes."""
+    gemini = _FakeGemini()
+    registry = _registry(gemini, clock)
+    model = _RecordingChatModel(messages=iter([]))
+
+    gemini.fail_create = True
+    assert registry.lookup(model, "Prompt.", [_lookup]) is None
+    gemini.fail_create = False
+    assert registry.lookup(model, "Prompt.", [_lookup]) is None
+    clock.now += registry.refresh_margin + 1
+    assert registry.lookup(model, "Prompt.", [_lookup]) == "cachedContents/1"
+
+
+def test_slow_create_does_not_block_other_lookups(clock):
+    """The remote call runs outside the lock; concurrent lookups don't wait on it."""
+    gemini = _FakeGemini()
+    registry = _registry(gemini, clock)
+    model = _RecordingChatModel(messages=iter([]))
+    cached = registry.lookup(model, "Cached.", [_lookup])
+
+    started, release = threading.Event(), threading.Event()
+    create = gemini.create
+
+    def slow_create(*args):
+        started.set()
+        release.wait(5)
+        return create(*args)
+
+    registry._create = slow_create
+    creator = threading.Thread(
+        target=registry.lookup, args=(model, "Prompt.", [_lookup])
+    )
+    creator.start()
+    try:
+        assert started.wait(5)
+        # Another prefix is served, and the same prefix goes uncached, at once.
+        assert registry.lookup(model, "Cached.", [_lookup]) == cached
+        assert registry.lookup(model, "Prompt.", [_lookup]) is None
+    finally:
+        release.set()
+        creator.join(5)
+
+    assert registry.lookup(model, "Prompt.", [_lookup]) == "cachedContents/2"
+    assert len(gemini.created) == 2
+
+
+def _run_agent(model, registry, city, state=UsaState.OREGON, history_budget=0):
+    middleware: list[AgentMiddleware[Any, Any]] = [
+        _SystemPromptFromContext(),
+        _HistoryCompaction(history_budget),
+        _PromptPrefixCaching(registry),
+    ]
+    agent = create_agent(
+        model,
+        tools,
+        middleware=middleware,
+        state_schema=TFAAgentStateSchema,
+    )
+    agent.invoke(
+        {
+            "messages": [HumanMessage("Can my landlord enter?")],
+            "city": city,
+            "state": state,
+        }
+    )
+
+
+def test_prefix_is_byte_identical_across_locations(clock):
+    """Every location reuses one cache whose prefix is exactly the base prompt."""
+    gemini = _FakeGemini()
+    registry = _registry(gemini, clock)
+    model = _RecordingChatModel(messages=iter(lambda: AIMessage("Answer."), None))
+
+    for city in (OregonCity.PORTLAND, OregonCity.EUGENE, None):
+        _run_agent(model, registry, city)
+
+    assert len(gemini.created) == 1
+    prefix, cached_tools = gemini.created[0]
+    assert prefix.encode() == DEFAULT_INSTRUCTIONS.encode()
+    assert [t.name for t in cached_tools] == [t.name for t in tools]
+    # Nothing is bound or sent inline: prompt and tools live in the cache.
+    assert model.bound_tools == []
+    locations = []
+    for messages, kwargs in model.calls:
+        assert kwargs["cached_content"] == "cachedContents/1"
+        assert not any(isinstance(m, SystemMessage) for m in messages)
+        locations.append(messages[0].content)
+        assert messages[1].content == "Can my landlord enter?"
+    assert locations == [
+        "The user is in Portland OR.",
+        "The user is in Eugene OR.",
+        "The user is in OR.",
+    ]
+
+
+def test_uncached_request_is_unchanged_when_cache_unavailable(clock):
+    """On a cache miss the system prompt and tools are sent inline as before."""
+    gemini = _FakeGemini()
+    gemini.fail_create = True
+    registry = _registry(gemini, clock)
+    model = _RecordingChatModel(messages=iter(lambda: AIMessage("Answer."), None))
+
+    _run_agent(model, registry, OregonCity.PORTLAND)
+
+    messages, kwargs = model.calls[0]
+    assert "cached_content" not in kwargs
+    assert isinstance(messages[0], SystemMessage)
+    assert messages[0].content.startswith(DEFAULT_INSTRUCTIONS)
+    assert len(model.bound_tools) == 1
+
+
+def test_fixed_prompt_is_not_cached(clock):
+    """A system message that does not start with the base prompt is left alone."""
+    gemini = _FakeGemini()
+    registry = _registry(gemini, clock)
+    model = _RecordingChatModel(messages=iter(lambda: AIMessage("Answer."), None))
+    agent = create_agent(
+        model,
+        tools,
+        system_prompt=SystemMessage("Some other prompt."),
+        middleware=[_PromptPrefixCaching(registry)],
+        state_schema=TFAAgentStateSchema,
+    )
+    agent.invoke(
+        {"messages": [HumanMessage("Hi")], "city": None, "state": UsaState.OREGON}
+    )
+
+    assert gemini.created == []
+    assert "cached_content" not in model.calls[0][1]
+
+
+@pytest.mark.asyncio
+async def test_async_path_uses_cache(clock):
+    gemini = _FakeGemini()
+    registry = _registry(gemini, clock)
+    model = _RecordingChatModel(messages=iter(lambda: AIMessage("Answer."), None))
+    middleware: list[AgentMiddleware[Any, Any]] = [
+        _SystemPromptFromContext(),
+        _PromptPrefixCaching(registry),
+    ]
+    agent = create_agent(
+        model,
+        tools,
+        middleware=middleware,
+        state_schema=TFAAgentStateSchema,
+    )
+    await agent.ainvoke(
+        {
+            "messages": [HumanMessage("Hi")],
+            "city": OregonCity.EUGENE,
+            "state": UsaState.OREGON,
+        }
+    )
+
+    messages, kwargs = model.calls[0]
+    assert kwargs["cached_content"] == "cachedContents/1"
+    assert messages[0].content == "The user is in Eugene OR."
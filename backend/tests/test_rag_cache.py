@@ -0,0 +1,162 @@
+"""Tests for rag_cache.py — retrieval result cache backends and RagBuilder wiring."""
+
+from typing import Any, Dict
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from tenantfirstaid.langchain_tools import RagBuilder
+from tenantfirstaid.rag_cache import (
+    InMemoryRagCache,
+    SqliteRagCache,
+    _lookups,
+    rag_cache_key,
+)
+
+
+def _key(query: str = "nonpayment notice", **overrides) -> str:
+    args: Dict[str, Any] = {
+        "data_store_id": "laws",
+        "rag_filter": 'state: ANY("or")',
+        "query": query,
+        "max_documents": 3,
+        "max_extractive_segment_count": 3,
+    }
+    args.update(overrides)
+    return rag_cache_key(**args)
+
+
+def test_key_normalizes_query_case_and_whitespace():
+    assert _key("Nonpayment  notice\n") == _key("nonpayment notice")
+
+
+@pytest.mark.parametrize(
+    "override",
+    [
+        {"data_store_id": "other"},
+        {"rag_filter": 'city: ANY("portland", "null") AND state: ANY("or")'},
+        {"rag_filter": None},
+        {"max_documents": 5},
+        {"max_extractive_segment_count": 6},
+        {"get_extractive_answers": True},
+    ],
+)
+def test_key_changes_with_retrieval_parameters(override):
+    assert _key(**override) != _key()
+
+
+@pytest.fixture
+def make_cache(store_backend, tmp_path, clock):
+    """Factory for either backend; sqlite instances share one file."""
+
+    def _make(max_entries=10, ttl_seconds=60.0):
+        kwargs = {
+            "max_entries": max_entries,
+            "ttl_seconds": ttl_seconds,
+            "clock": clock,
+        }
+        if store_backend == "memory":
+            return InMemoryRagCache(**kwargs)
+        return SqliteRagCache(tmp_path / "rag.sqlite3", **kwargs)
+
+    return _make
+
+
+def test_hit_and_miss_counters(make_cache):
+    cache = make_cache()
+    assert cache.get("k") is None
+    cache.put("k", "laws", "passages")
+    assert cache.get("k") == "passages"
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_lookups_are_exported_as_metrics(make_cache):
+    cache = make_cache()
+    hits = _lookups.value(result="hit")
+    cache.put("k", "laws", "passages")
+    cache.get("k")
+    cache.get("k")
+    assert _lookups.value(result="hit") == hits + 2
+
+
+def test_entries_expire_after_ttl(make_cache, clock):
+    cache = make_cache(ttl_seconds=60)
+    cache.put("k", "laws", "passages")
+    clock.now += 59
+    assert cache.get("k") == "passages"
+    clock.now += 2
+    assert cache.get("k") is None
+
+
+def test_least_recently_used_entry_is_evicted(make_cache, clock):
+    cache = make_cache(max_entries=2)
+    cache.put("a", "laws", "A")
+    clock.now += 1
+    cache.put("b", "laws", "B")
+    clock.now += 1
+    assert cache.get("a") == "A"  # refreshes "a"
+    clock.now += 1
+    cache.put("c", "laws", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+
+
+def test_invalidate_by_datastore_and_all(make_cache):
+    cache = make_cache()
+    cache.put("a", "laws", "A")
+    cache.put("b", "help", "B")
+    assert cache.invalidate("laws") == 1
+    assert cache.get("a") is None
+    assert cache.get("b") == "B"
+    assert cache.invalidate() == 1
+    assert cache.get("b") is None
+
+
+def test_sqlite_entries_are_shared_between_instances(tmp_path):
+    """Two workers opening the same file see each other's results and invalidations."""
+    path = tmp_path / "rag.sqlite3"
+    worker_a = SqliteRagCache(path, max_entries=10, ttl_seconds=60)
+    worker_b = SqliteRagCache(path, max_entries=10, ttl_seconds=60)
+    worker_a.put("k", "laws", "passages")
+    assert worker_b.get("k") == "passages"
+    worker_b.invalidate()
+    assert worker_a.get("k") is None
+
+
+@patch("tenantfirstaid.langchain_tools.get_gcp_credentials")
+@patch("tenantfirstaid.langchain_tools.VertexAISearchRetriever")
+def test_rag_search_answers_repeat_queries_from_cache(mock_retriever_class, _creds):
+    retriever = mock_retriever_class.return_value.model_copy.return_value
+    mock_doc = MagicMock()
+    mock_doc.page_content = "ORS 90.394 text"
+    retriever.invoke.return_value = [mock_doc]
+    cache = InMemoryRagCache(max_entries=10, ttl_seconds=60)
+
+    with patch("tenantfirstaid.langchain_tools.get_rag_cache", return_value=cache):
+        first = RagBuilder(data_store_id="laws", filter='state: ANY("or")')
+        second = RagBuilder(data_store_id="laws", filter='state: ANY("or")')
+        other_city = RagBuilder(
+            data_store_id="laws", filter='city: ANY("eugene", "null")'
+        )
+        assert first.search("Nonpayment notice") == "ORS 90.394 text"
+        assert second.search("nonpayment  notice") == "ORS 90.394 text"
+        other_city.search("nonpayment notice")
+
+    assert retriever.invoke.call_count == 2
+    assert cache.stats() == {"hits": 1, "misses": 2}
+
+
+@patch("tenantfirstaid.langchain_tools.get_gcp_credentials")
+@patch("tenantfirstaid.langchain_tools.VertexAISearchRetriever")
+def test_rag_search_does_not_cache_empty_results(mock_retriever_class, _creds):
+    retriever = mock_retriever_class.return_value.model_copy.return_value
+    retriever.invoke.return_value = []
+    cache = InMemoryRagCache(max_entries=10, ttl_seconds=60)
+
+    with patch("tenantfirstaid.langchain_tools.get_rag_cache", return_value=cache):
+        builder = RagBuilder(data_store_id="laws")
+        builder.search("q")
+        builder.search("q")
+
+    assert retriever.invoke.call_count == 2
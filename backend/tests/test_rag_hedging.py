@@ -0,0 +1,174 @@
+"""Tests for rag_hedging.py — latency-driven hedging of Vertex AI Search requests."""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from tenantfirstaid import rag_hedging
+from tenantfirstaid.langchain_tools import RagBuilder
+from tenantfirstaid.rag_hedging import (
+    HedgeBudget,
+    LatencyWindow,
+    hedge_stats,
+    hedged_call,
+    latency_window,
+)
+
+
+@pytest.fixture(autouse=True)
+def hedging(monkeypatch):
+    """Hedge at p90 with an ample budget, on fresh per-test state."""
+    monkeypatch.setattr(rag_hedging, "RAG_HEDGE_PERCENTILE", 90.0)
+    monkeypatch.setattr(rag_hedging, "_windows", {})
+    monkeypatch.setattr(rag_hedging, "_budget", HedgeBudget(1.0))
+    monkeypatch.setattr(rag_hedging, "_stats", rag_hedging._HedgeStats())
+
+
+def _warm(data_store_id: str = "laws", seconds: float = 0.01) -> None:
+    window = latency_window(data_store_id)
+    for _ in range(rag_hedging._MIN_SAMPLES):
+        window.record(seconds)
+
+
+class _SlowFirstCall:
+    """Search whose first call stalls until released; later calls are fast."""
+
+    def __init__(self, first_error: Exception | None = None) -> None:
+        self.calls = 0
+        self.release = threading.Event()
+        self.first_error = first_error
+        self._lock = threading.Lock()
+
+    def __call__(self) -> str:
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if call == 1:
+            self.release.wait(5)
+            if self.first_error is not None:
+                raise self.first_error
+            return "primary"
+        return "hedge"
+
+
+def test_percentile_needs_enough_samples():
+    window = LatencyWindow()
+    for ms in range(1, rag_hedging._MIN_SAMPLES):
+        window.record(ms / 1000)
+    assert window.percentile(90) is None
+    window.record(0.02)
+    assert window.percentile(90) == pytest.approx(0.018)
+    assert window.percentile(50) == pytest.approx(0.010)
+
+
+def test_budget_allows_a_fraction_of_searches():
+    budget = HedgeBudget(0.25)
+    spent = 0
+    for _ in range(100):
+        budget.deposit()
+        spent += budget.try_spend()
+    assert spent == 25
+
+
+def test_disabled_hedging_calls_directly(monkeypatch):
+    monkeypatch.setattr(rag_hedging, "RAG_HEDGE_PERCENTILE", 0.0)
+    assert hedged_call("laws", lambda: threading.current_thread().name) == (
+        threading.current_thread().name
+    )
+    assert hedge_stats()["searches"] == 0
+
+
+def test_no_hedge_before_latency_is_known():
+    search = _SlowFirstCall()
+    threading.Timer(0.1, search.release.set).start()
+    assert hedged_call("laws", search) == "primary"
+    assert search.calls == 1
+
+
+def test_slow_primary_is_hedged_and_first_result_wins():
+    _warm()
+    search = _SlowFirstCall()
+    try:
+        assert hedged_call("laws", search) == "hedge"
+    finally:
+        search.release.set()
+    stats = hedge_stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 1)
+
+
+def test_failed_primary_falls_back_to_hedge():
+    _warm()
+    search = _SlowFirstCall(first_error=httpx.ReadError("reset"))
+    threading.Timer(0.1, search.release.set).start()
+    assert hedged_call("laws", search) == "hedge"
+
+
+def test_error_raised_only_when_both_fail():
+    _warm()
+
+    def fail() -> str:
+        time.sleep(0.1)
+        raise httpx.ReadError("reset")
+
+    with pytest.raises(httpx.ReadError):
+        hedged_call("laws", fail)
+    assert hedge_stats()["hedges"] == 1
+
+
+def test_spent_budget_waits_for_primary(monkeypatch):
+    monkeypatch.setattr(rag_hedging, "_budget", HedgeBudget(0.0))
+    _warm()
+    search = _SlowFirstCall()
+    threading.Timer(0.1, search.release.set).start()
+    assert hedged_call("laws", search) == "primary"
+    assert search.calls == 1
+    assert hedge_stats()["over_budget"] == 1
+
+
+def test_losing_call_latency_still_counts():
+    _warm(seconds=0.01)
+    search = _SlowFirstCall()
+    hedged_call("laws", search)
+    search.release.set()
+    deadline = time.monotonic() + 5
+    while (latency_window("laws").percentile(100) or 0.0) < 0.05:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@patch("tenantfirstaid.langchain_tools.get_gcp_credentials")
+@patch("tenantfirstaid.langchain_tools.VertexAISearchRetriever")
+def test_rag_search_is_hedged_per_datastore(mock_retriever_class, _creds):
+    _warm("fake-datastore-id")
+    primary_doc, hedge_doc = MagicMock(), MagicMock()
+    primary_doc.page_content, hedge_doc.page_content = "primary", "hedge"
+    release = threading.Event()
+    calls = []
+
+    def invoke(input: str):
+        calls.append(input)
+        if len(calls) == 1:
+            release.wait(5)
+            return [primary_doc]
+        return [hedge_doc]
+
+    mock_instance = mock_retriever_class.return_value.model_copy.return_value
+    mock_instance.invoke.side_effect = invoke
+    try:
+        assert RagBuilder(data_store_id="fake-datastore-id").search("q") == "hedge"
+    finally:
+        release.set()
+    assert calls == ["q", "q"]
+
+
+def test_rag_search_stops_retrying_at_deadline():
+    """A retry whose backoff would end past the deadline is not attempted."""
+    stop = RagBuilder._search.retry.stop  # ty: ignore[unresolved-attribute]
+
+    state = MagicMock(attempt_number=2, seconds_since_start=3.0, upcoming_sleep=1.0)
+    assert stop(state)
+    state = MagicMock(attempt_number=2, seconds_since_start=0.5, upcoming_sleep=1.0)
+    assert not stop(state)
@@ -0,0 +1,215 @@
+"""Tests for rag_prefetch.py — speculative first-turn retrieval and its wiring."""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from tenantfirstaid import rag_prefetch
+from tenantfirstaid.langchain_chat_manager import LangChainChatManager
+from tenantfirstaid.langchain_tools import (
+    prefetch_city_state_laws,
+    retrieve_city_state_laws,
+)
+from tenantfirstaid.location import OregonCity, UsaState
+from tenantfirstaid.rag_prefetch import (
+    PREFETCH_CONFIG_KEY,
+    prefetch_stats,
+    query_similarity,
+    start_prefetch,
+)
+
+_QUESTION = "My landlord won't give back my security deposit after I moved out"
+_PARAMS = {"filter": 'state: ANY("or")', "max_documents": 3}
+
+
+@pytest.fixture(autouse=True)
+def _fresh_stats(monkeypatch, clock):
+    """Fresh process counters for each test, on a controllable clock."""
+    monkeypatch.setattr(rag_prefetch, "_stats", rag_prefetch._PrefetchStats(clock))
+
+
+def _prefetch(result="passages"):
+    def search() -> str:
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    prefetch = start_prefetch("retrieve_city_state_laws", _QUESTION, _PARAMS, search)
+    assert prefetch is not None
+    return prefetch
+
+
+def test_similarity_ignores_question_phrasing():
+    assert query_similarity("What can I do with my deposit?", "deposit") == 1.0
+    assert query_similarity(_QUESTION, "landlord return security deposit") > 0.4
+    assert query_similarity(_QUESTION, "rent increase notice ORS 90.323") == 0.0
+    assert query_similarity("what can I do", "deposit") == 0.0
+
+
+def test_similar_query_is_answered_once_and_counted():
+    prefetch = _prefetch()
+    query = "landlord must return security deposit after tenant moves out"
+
+    assert prefetch.claim("retrieve_city_state_laws", query, _PARAMS) == "passages"
+    assert prefetch.claim("retrieve_city_state_laws", query, _PARAMS) is None
+    prefetch.finish()
+
+    stats = prefetch_stats()
+    assert stats["issued"] == stats["hits"] == 1
+    assert stats["wasted"] == 0
+    assert stats["hit_rate"] == 1.0
+    assert stats["saved_seconds"] >= 0
+
+
+@pytest.mark.parametrize(
+    ("tool_name", "query", "params"),
+    [
+        ("retrieve_oregon_law_help", "security deposit returned", _PARAMS),
+        ("retrieve_city_state_laws", "rent increase notice", _PARAMS),
+        (
+            "retrieve_city_state_laws",
+            "security deposit",
+            {**_PARAMS, "max_documents": 6},
+        ),
+    ],
+)
+def test_mismatched_call_is_not_answered(tool_name, query, params):
+    prefetch = _prefetch()
+    assert prefetch.claim(tool_name, query, params) is None
+    prefetch.finish()
+    assert prefetch_stats()["wasted"] == 1
+    assert prefetch_stats()["hit_rate"] == 0.0
+
+
+def test_failed_prefetch_falls_back_and_counts_as_wasted():
+    prefetch = _prefetch(RuntimeError("Vertex unavailable"))
+    assert (
+        prefetch.claim("retrieve_city_state_laws", "security deposit", _PARAMS) is None
+    )
+    assert prefetch_stats()["wasted"] == 1
+
+
+def test_waste_cap_pauses_prefetching_for_a_minute(clock):
+    with patch.object(rag_prefetch, "RAG_PREFETCH_MAX_WASTED_PER_MINUTE", 2):
+        for _ in range(2):
+            _prefetch().finish()
+        assert start_prefetch("t", _QUESTION, _PARAMS, lambda: "") is None
+        clock.now += 61
+        assert start_prefetch("t", _QUESTION, _PARAMS, lambda: "") is not None
+    assert prefetch_stats()["skipped"] == 1
+
+
+def test_busy_workers_skip_rather_than_queue():
+    release = threading.Event()
+    held = [_prefetch_blocking(release) for _ in range(rag_prefetch._PREFETCH_WORKERS)]
+    try:
+        assert start_prefetch("t", _QUESTION, _PARAMS, lambda: "") is None
+        assert prefetch_stats()["skipped"] == 1
+    finally:
+        release.set()
+        for prefetch in held:
+            prefetch.finish()
+
+
+def _prefetch_blocking(release: threading.Event):
+    def search() -> str:
+        release.wait(5)
+        return ""
+
+    return start_prefetch("t", _QUESTION, _PARAMS, search)
+
+
+@patch("tenantfirstaid.langchain_tools.RagBuilder")
+def test_retrieval_tool_uses_matching_prefetch(mock_rag_class, oregon_state):
+    mock_rag_class.return_value.search.return_value = "Vertex passages"
+    prefetch = prefetch_city_state_laws(_QUESTION, oregon_state)
+    assert prefetch is not None
+
+    result = retrieve_city_state_laws.invoke(  # type: ignore[union-attr]
+        {"query": "landlord return security deposit", "state": oregon_state},
+        config={"configurable": {PREFETCH_CONFIG_KEY: prefetch}},
+    )
+
+    assert result == "Vertex passages"
+    # The only search is the prefetch, for the raw question.
+    mock_rag_class.return_value.search.assert_called_once_with(query=_QUESTION)
+    assert prefetch_stats()["hits"] == 1
+
+
+@patch("tenantfirstaid.langchain_tools.RagBuilder")
+def test_no_prefetch_for_locally_resolved_citations(mock_rag_class, oregon_state):
+    assert (
+        prefetch_city_state_laws("What does ORS 90.394(1) say?", oregon_state) is None
+    )
+    mock_rag_class.assert_not_called()
+
+
+@patch("tenantfirstaid.langchain_tools.RagBuilder")
+def test_topical_questions_with_citations_are_prefetched(mock_rag_class, oregon_state):
+    mock_rag_class.return_value.search.return_value = "Vertex passages"
+    prefetch = prefetch_city_state_laws(
+        "Is 72 hours enough notice for unpaid rent under ORS 90.394(1)?", oregon_state
+    )
+    assert prefetch is not None
+    prefetch.finish()
+
+
+@patch("tenantfirstaid.langchain_tools.RagBuilder")
+def test_citations_with_a_city_are_prefetched(mock_rag_class, oregon_state):
+    mock_rag_class.return_value.search.return_value = "Vertex passages"
+    prefetch = prefetch_city_state_laws(
+        "What does ORS 90.394(1) say?", oregon_state, OregonCity.PORTLAND
+    )
+    assert prefetch is not None
+    prefetch.finish()
+
+
+# ── manager wiring ─────────────────────────────────────────────────────────────
+
+_MANAGER = "tenantfirstaid.langchain_chat_manager"
+
+
+def _run_manager(messages, thread_id=None):
+    agent = MagicMock()
+    agent.stream.return_value = iter([])
+    prefetch = MagicMock()
+    with (
+        patch(f"{_MANAGER}.RAG_PREFETCH", True),
+        patch(f"{_MANAGER}.get_agent_graph", return_value=agent),
+        patch(f"{_MANAGER}.prefetch_city_state_laws", return_value=prefetch) as start,
+    ):
+        list(
+            LangChainChatManager().generate_streaming_response(
+                messages=messages, city=None, state=UsaState.OREGON, thread_id=thread_id
+            )
+        )
+    return start, prefetch, agent.stream.call_args.kwargs["config"]
+
+
+def test_manager_prefetches_first_turn_and_settles_it():
+    start, prefetch, config = _run_manager([{"role": "human", "content": _QUESTION}])
+    start.assert_called_once_with(_QUESTION, UsaState.OREGON, None)
+    assert config["configurable"][PREFETCH_CONFIG_KEY] is prefetch
+    prefetch.finish.assert_called_once()
+
+
+def test_manager_skips_follow_up_turns():
+    start, _, config = _run_manager(
+        [
+            {"role": "human", "content": _QUESTION},
+            {"role": "ai", "content": "ORS 90.300 requires..."},
+            {"role": "human", "content": "And interest?"},
+        ]
+    )
+    start.assert_not_called()
+    assert PREFETCH_CONFIG_KEY not in config.get("configurable", {})
+
+
+def test_manager_skips_resumed_threads():
+    with patch(f"{_MANAGER}.get_checkpointer") as get_checkpointer:
+        get_checkpointer.return_value.has_thread.return_value = True
+        start, _, _ = _run_manager(
+            [{"role": "human", "content": "And interest?"}], "t1"
+        )
+    start.assert_not_called()
@@ -0,0 +1,225 @@
+"""Tests for request_timing.py — per-request latency breakdown and its wiring."""
+
+import json
+import logging
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import tool
+
+from tenantfirstaid.chat import ChatView
+from tenantfirstaid.graph import create_graph
+from tenantfirstaid.langchain_chat_manager import LangChainChatManager
+from tenantfirstaid.langchain_tools import RagBuilder
+from tenantfirstaid.location import UsaState
+from tenantfirstaid.metrics import render
+from tenantfirstaid.request_timing import (
+    TIMING_CONFIG_KEY,
+    RequestTiming,
+    _tokens,
+    count_retry,
+    count_tokens,
+    span,
+)
+
+
+class _ToolCallingFakeModel(GenericFakeChatModel):
+    """Fake model that accepts ``bind_tools`` so it can drive create_graph."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def _config(timing: RequestTiming) -> RunnableConfig:
+    return {"configurable": {TIMING_CONFIG_KEY: timing}}
+
+
+def test_summary_records_first_marks_only(clock):
+    timing = RequestTiming("/api/query", clock=clock)
+    clock.now += 0.25
+    timing.mark_first_byte()
+    clock.now += 0.5
+    timing.mark_first_byte()
+    timing.mark_first_text()
+    timing.add_span("model", "model", 0.6)
+    timing.add_span("tool", "search_oregon_statutes", 0.001)
+    timing.add_retry("rag")
+    timing.add_tokens({"input": 900, "cached": 0, "output": 100, "thinking": 40})
+    timing.add_tokens({"input": 1200, "cached": 800, "output": 50, "thinking": 0})
+    clock.now += 1
+
+    summary = timing.finish()
+
+    assert summary == {
+        "route": "/api/query",
+        "first_byte_ms": 250.0,
+        "first_text_ms": 750.0,
+        "total_ms": 1750.0,
+        "spans": {"model": [600.0], "tool:search_oregon_statutes": [1.0]},
+        "retries": {"rag": 1},
+        "tokens": {"input": 2100, "cached": 800, "output": 150, "thinking": 40},
+    }
+
+
+def test_finish_logs_one_structured_line(caplog):
+    timing = RequestTiming("/api/query")
+    with caplog.at_level(logging.INFO, logger="tenantfirstaid.request_timing"):
+        timing.finish()
+        timing.finish()
+    lines = [r.getMessage() for r in caplog.records]
+    assert len(lines) == 1
+    assert json.loads(lines[0].removeprefix("request_timing "))["route"] == (
+        "/api/query"
+    )
+
+
+def test_span_outside_a_request_only_feeds_histograms():
+    with span("tool", "orphan_tool"):
+        pass
+    count_retry("rag")
+    assert 'span_duration_seconds_count{kind="tool",name="orphan_tool"} 1' in render()
+
+
+def test_span_records_even_when_the_block_raises():
+    with pytest.raises(RuntimeError):
+        with span("tool", "broken"):
+            raise RuntimeError("boom")
+    assert 'span_duration_seconds_count{kind="tool",name="broken"} 1' in render()
+
+
+def test_count_tokens_reads_usage_metadata():
+    kinds = ("input", "output", "cached", "thinking")
+    before = {kind: _tokens.value(kind=kind) for kind in kinds}
+    timing = RequestTiming("/api/query")
+    count_tokens(
+        [
+            HumanMessage("Hi"),
+            AIMessage("No usage."),
+            AIMessage(
+                "Answer.",
+                usage_metadata={
+                    "input_tokens": 1200,
+                    "output_tokens": 300,
+                    "total_tokens": 1500,
+                    "input_token_details": {"cache_read": 1000},
+                    "output_token_details": {"reasoning": 200},
+                },
+            ),
+        ],
+        timing,
+    )
+
+    used = {kind: _tokens.value(kind=kind) - before[kind] for kind in kinds}
+    assert used == {"input": 1200, "output": 300, "cached": 1000, "thinking": 200}
+    assert timing.summary()["tokens"] == {
+        "input": 1200,
+        "cached": 1000,
+        "output": 300,
+        "thinking": 200,
+    }
+
+
+# ── graph and tool wiring ──────────────────────────────────────────────────────
+
+
+def test_graph_times_model_and_tool_calls():
+    @tool
+    def lookup(n: int) -> str:
+        """Look up passage ``n``."""
+        return f"result {n}"
+
+    model = _ToolCallingFakeModel(
+        messages=iter(
+            [
+                AIMessage(
+                    "", tool_calls=[{"name": "lookup", "args": {"n": 1}, "id": "c1"}]
+                ),
+                AIMessage("Done."),
+            ]
+        )
+    )
+    with (
+        patch("tenantfirstaid.graph._get_llm", return_value=model),
+        patch("tenantfirstaid.graph.tools", [lookup]),
+    ):
+        graph = create_graph()
+    timing = RequestTiming("/api/query")
+
+    graph.invoke(
+        {"messages": [HumanMessage("Hi")], "state": UsaState.OREGON, "city": None},
+        config=_config(timing),
+    )
+
+    spans = timing.summary()["spans"]
+    assert len(spans["model"]) == 2
+    assert len(spans["tool:lookup"]) == 1
+
+
+@patch("tenantfirstaid.langchain_tools.get_gcp_credentials")
+@patch("tenantfirstaid.langchain_tools.VertexAISearchRetriever")
+@patch("tenantfirstaid.request_timing.var_child_runnable_config")
+def test_rag_search_is_timed_and_retries_counted(
+    mock_config, mock_retriever_class, _creds
+):
+    timing = RequestTiming("/api/query")
+    mock_config.get.return_value = _config(timing)
+    doc = MagicMock(page_content="passage")
+    mock_instance = mock_retriever_class.return_value.model_copy.return_value
+    mock_instance.invoke.side_effect = [httpx.ReadError("reset"), [doc]]
+
+    assert RagBuilder("fake-datastore-id", name="laws").search("q") == "passage"
+
+    summary = timing.summary()
+    assert len(summary["spans"]["rag_search:laws"]) == 1
+    assert summary["retries"] == {"rag": 1}
+
+
+def test_manager_passes_timing_and_counts_stream_retries():
+    agent = MagicMock()
+    agent.stream.side_effect = [httpx.ReadError("reset"), iter([])]
+    timing = RequestTiming("/api/query")
+    with (
+        patch(
+            "tenantfirstaid.langchain_chat_manager.get_agent_graph", return_value=agent
+        ),
+        patch("tenantfirstaid.langchain_chat_manager.time.sleep"),
+    ):
+        list(
+            LangChainChatManager().generate_streaming_response(
+                messages=[{"role": "human", "content": "Hi"}],
+                city=None,
+                state=UsaState.OREGON,
+                thread_id=None,
+                timing=timing,
+            )
+        )
+
+    config = agent.stream.call_args.kwargs["config"]
+    assert config["configurable"][TIMING_CONFIG_KEY] is timing
+    assert timing.summary()["retries"] == {"stream": 1}
+
+
+def test_chat_view_marks_first_byte_and_text(app, mock_chat_manager, caplog):
+    app.add_url_rule("/api/query", view_func=ChatView.as_view("chat"), methods=["POST"])
+
+    with caplog.at_level(logging.INFO, logger="tenantfirstaid.request_timing"):
+        with app.test_client() as client:
+            client.post(
+                "/api/query",
+                json={
+                    "messages": [{"role": "human", "content": "Hi"}],
+                    "city": None,
+                    "state": "or",
+                },
+            )
+
+    timing = mock_chat_manager.generate_streaming_response.call_args.kwargs["timing"]
+    summary = timing.summary()
+    assert summary["first_byte_ms"] is not None
+    assert summary["first_text_ms"] >= summary["first_byte_ms"]
+    assert summary["total_ms"] is not None
+    assert any(r.getMessage().startswith("request_timing ") for r in caplog.records)
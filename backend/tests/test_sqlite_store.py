@@ -0,0 +1,22 @@
+"""Tests for sqlite_store.py — opening SQLite files shared across workers."""
+
+from tenantfirstaid.sqlite_store import open_shared_sqlite
+
+_SCHEMA = "CREATE TABLE IF NOT EXISTS kv (k TEXT PRIMARY KEY, v TEXT NOT NULL);"
+
+
+def test_opens_in_wal_mode_creating_parent_directories(tmp_path):
+    path = tmp_path / "nested" / "store.sqlite3"
+    conn = open_shared_sqlite(path, _SCHEMA)
+
+    assert path.exists()
+    assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+
+def test_connections_share_committed_writes(tmp_path):
+    path = tmp_path / "store.sqlite3"
+    writer, reader = (open_shared_sqlite(path, _SCHEMA) for _ in range(2))
+
+    writer.execute("INSERT INTO kv VALUES ('a', '1')")
+
+    assert reader.execute("SELECT v FROM kv WHERE k = 'a'").fetchone() == ("1",)
@@ -0,0 +1,114 @@
+"""Tests for statute_index.py — the compiled ORS chapter 90 lexical index."""
+
+import json
+import stat
+
+import pytest
+
+from tenantfirstaid.langchain_tools import search_oregon_statutes
+from tenantfirstaid.statute_index import (
+    SECTIONS_PATH,
+    StatuteIndex,
+    build_index,
+    load_statute_index,
+    tokenize,
+    write_statute_index,
+)
+
+_SECTIONS = {
+    "90.100": "Definitions. As used in this chapter:\n(1) “Tenant” means a person.",
+    "90.300": (
+        "Security deposits; prepaid rent. (1) A landlord may require a security"
+        " deposit.\n(2) The landlord shall return the security deposit."
+    ),
+    "90.394": (
+        "Termination of tenancy for failure to pay rent. (1) The landlord may"
+        " terminate the tenancy for nonpayment of rent. See ORS 90.300."
+    ),
+}
+
+
+@pytest.fixture
+def index() -> StatuteIndex:
+    return StatuteIndex(build_index(_SECTIONS))
+
+
+def test_tokenize_folds_case_plurals_and_keeps_section_numbers():
+    assert tokenize("Tenants' deposits under ORS 90.300") == [
+        "tenant",
+        "deposit",
+        "ors",
+        "90.300",
+    ]
+
+
+def test_search_ranks_by_bm25(index):
+    hits = index.search("security deposit", k=3)
+    assert [h.section for h in hits] == ["90.300"]
+    assert hits[0].title == "Security deposits; prepaid rent"
+    assert hits[0].score > 0
+
+
+def test_section_number_outranks_cross_references(index):
+    """90.394 mentions 90.300, but a query for 90.300 returns 90.300 first."""
+    hits = index.search("ORS 90.300", k=3)
+    assert [h.section for h in hits] == ["90.300", "90.394"]
+
+
+def test_search_without_indexed_terms_is_empty(index):
+    assert index.search("zzz qqq") == []
+    assert index.search("") == []
+
+
+def test_section_lookup(index):
+    assert index.section("90.394").startswith("Termination of tenancy")
+    assert index.section("90.999") is None
+    assert index.sections() == list(_SECTIONS)
+
+
+def test_memory_mapped_file_matches_in_memory_build(tmp_path, index):
+    source = tmp_path / "sections.json"
+    source.write_text(json.dumps(_SECTIONS))
+    path = write_statute_index(tmp_path / "sections.idx", source)
+
+    mapped = load_statute_index(path, source)
+    assert mapped.search("landlord rent", k=3) == index.search("landlord rent", k=3)
+    assert mapped.section("90.100") == _SECTIONS["90.100"]
+
+
+def test_written_index_is_world_readable(tmp_path):
+    """Workers run as another user than the image build that writes the file."""
+    source = tmp_path / "sections.json"
+    source.write_text(json.dumps(_SECTIONS))
+    path = write_statute_index(tmp_path / "sections.idx", source)
+
+    assert stat.S_IMODE(path.stat().st_mode) == 0o644
+
+
+def test_stale_or_missing_index_is_rebuilt_in_memory(tmp_path):
+    source = tmp_path / "sections.json"
+    source.write_text(json.dumps(_SECTIONS))
+    path = write_statute_index(tmp_path / "sections.idx", source)
+    source.write_text(json.dumps({"90.105": "Short title. This chapter."}))
+
+    assert load_statute_index(path, source).sections() == ["90.105"]
+    assert load_statute_index(tmp_path / "missing.idx", source).sections() == ["90.105"]
+
+
+def test_rejects_foreign_file():
+    with pytest.raises(ValueError, match="Not a statute index"):
+        StatuteIndex(b"not an index at all, just some bytes" * 4)
+
+
+def test_shipped_sections_are_all_indexed():
+    sections = json.loads(SECTIONS_PATH.read_text(encoding="utf-8"))
+    index = StatuteIndex(build_index(sections))
+    assert index.sections() == list(sections)
+    assert index.search("security deposit", k=1)[0].section == "90.300"
+
+
+def test_search_tool_returns_excerpts_headed_by_section():
+    result = search_oregon_statutes.invoke(
+        {"query": "ORS 90.394 nonpayment of rent", "max_sections": 1}
+    )
+    assert result.startswith("ORS 90.394\nTermination of tenancy for failure to pay")
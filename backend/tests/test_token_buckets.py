@@ -0,0 +1,152 @@
+"""Tests for token_buckets.py — per-client token budgets for /api/query."""
+
+import json
+from unittest.mock import patch
+
+import pytest
+from starlette.testclient import TestClient
+
+from tenantfirstaid import asgi
+from tenantfirstaid.app import app
+from tenantfirstaid.asgi import app as asgi_app
+from tenantfirstaid.constants import OREGON_LAW_CENTER_PHONE_NUMBER
+from tenantfirstaid.token_buckets import (
+    InMemoryTokenBuckets,
+    SqliteTokenBuckets,
+    billed_tokens,
+)
+
+_QUERY = {"messages": [], "city": None, "state": "or"}
+
+
+@pytest.fixture
+def make_buckets(store_backend, tmp_path, clock):
+    def make(capacity=1000, refill_per_minute=600):
+        if store_backend == "sqlite":
+            return SqliteTokenBuckets(
+                tmp_path / "buckets.sqlite3",
+                capacity=capacity,
+                refill_per_minute=refill_per_minute,
+                clock=clock,
+            )
+        return InMemoryTokenBuckets(
+            capacity=capacity, refill_per_minute=refill_per_minute, clock=clock
+        )
+
+    return make
+
+
+def test_bucket_goes_into_debt_then_refills(make_buckets, clock):
+    buckets = make_buckets()  # 1000 tokens, refilling 10 per second
+    assert buckets.retry_after("a") == 0
+
+    assert buckets.debit("a", 1250) == pytest.approx(-250)
+    assert buckets.retry_after("a") == 26
+    assert buckets.retry_after("b") == 0
+
+    clock.now += 24.5
+    assert buckets.retry_after("a") == 1
+    clock.now += 1
+    assert buckets.retry_after("a") == 0
+
+
+def test_refill_stops_at_capacity(make_buckets, clock):
+    buckets = make_buckets()
+    buckets.debit("a", 500)
+    clock.now += 3600
+    assert buckets.debit("a", 1000) == pytest.approx(0)
+
+
+def test_sqlite_buckets_are_shared_and_full_ones_dropped(tmp_path, clock):
+    path = tmp_path / "buckets.sqlite3"
+    worker_a, worker_b = (
+        SqliteTokenBuckets(path, capacity=1000, refill_per_minute=600, clock=clock)
+        for _ in range(2)
+    )
+
+    worker_a.debit("client", 600)
+    worker_b.debit("client", 600)
+    assert worker_a.retry_after("client") == 21
+
+    worker_b.debit("other", 10)
+    clock.now += 200
+    worker_a.debit("other", 10)
+    rows = worker_b._conn.execute("SELECT client FROM buckets").fetchall()
+    assert rows == [("other",)]
+
+
+def test_billed_tokens_counts_input_and_output():
+    tokens = {"input": 900, "cached": 600, "output": 80, "thinking": 30}
+    assert billed_tokens(tokens) == 980
+
+
+# ── chat views ─────────────────────────────────────────────────────────────────
+
+
+def _stream(timing, **kwargs):
+    timing.add_tokens({"input": 1200, "cached": 0, "output": 100, "thinking": 0})
+    yield {"type": "text", "text": "Answer."}
+
+
+def _assert_budget_exceeded(status, headers, body):
+    assert status == 429
+    assert headers["Retry-After"] == "31"
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert [line["type"] for line in lines] == ["text", "end_of_stream"]
+    assert OREGON_LAW_CENTER_PHONE_NUMBER in lines[0]["content"]
+
+
+@patch("tenantfirstaid.chat.LangChainChatManager")
+def test_flask_view_debits_tokens_then_returns_429(mock_cm_cls, clock):
+    mock_cm_cls.return_value.generate_streaming_response.side_effect = _stream
+    buckets = InMemoryTokenBuckets(capacity=1000, refill_per_minute=600, clock=clock)
+
+    with patch("tenantfirstaid.chat.get_token_buckets", return_value=buckets):
+        with app.test_client() as client:
+            assert client.post("/api/query", json=_QUERY).status_code == 200
+            resp = client.post("/api/query", json=_QUERY)
+            _assert_budget_exceeded(
+                resp.status_code, resp.headers, resp.get_data(as_text=True)
+            )
+            other = client.post(
+                "/api/query", json=_QUERY, environ_base={"REMOTE_ADDR": "10.0.0.2"}
+            )
+            assert other.status_code == 200
+
+    assert mock_cm_cls.return_value.generate_streaming_response.call_count == 2
+
+
+@patch("tenantfirstaid.asgi.LangChainChatManager")
+def test_asgi_view_returns_429_when_the_budget_is_spent(mock_cm_cls, clock):
+    buckets = InMemoryTokenBuckets(capacity=1000, refill_per_minute=600, clock=clock)
+    buckets.debit("testclient", 1300)
+
+    with patch("tenantfirstaid.chat.get_token_buckets", return_value=buckets):
+        with TestClient(asgi_app) as client:
+            resp = client.post("/api/query", json=_QUERY)
+
+    _assert_budget_exceeded(resp.status_code, resp.headers, resp.text)
+    mock_cm_cls.return_value.agenerate_streaming_response.assert_not_called()
+
+
+@patch("tenantfirstaid.asgi.LangChainChatManager")
+def test_asgi_view_charges_the_forwarded_client_behind_a_proxy(mock_cm_cls, clock):
+    async def astream(**kwargs):
+        return
+        yield  # pragma: no cover
+
+    mock_cm_cls.return_value.agenerate_streaming_response = astream
+    buckets = InMemoryTokenBuckets(capacity=1000, refill_per_minute=600, clock=clock)
+    buckets.debit("203.0.113.7", 1300)
+    spent = {"X-Forwarded-For": "198.51.100.1, 203.0.113.7"}
+
+    with (
+        patch("tenantfirstaid.chat.get_token_buckets", return_value=buckets),
+        patch.object(asgi, "TRUSTED_PROXY_COUNT", 1),
+        TestClient(asgi_app) as client,
+    ):
+        resp = client.post("/api/query", json=_QUERY, headers=spent)
+        assert resp.status_code == 429
+        # Another client behind the same proxy has its own budget.
+        other = {"X-Forwarded-For": "198.51.100.1, 203.0.113.8"}
+        assert client.post("/api/query", json=_QUERY, headers=other).status_code == 200
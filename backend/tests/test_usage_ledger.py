@@ -0,0 +1,151 @@
+"""Tests for usage_ledger.py and scripts/usage_report.py — per-request token cost."""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from conftest import FakeClock
+
+from scripts.usage_report import Prices, find_outliers, request_cost, summarize
+from tenantfirstaid.chat import ChatView
+from tenantfirstaid.location import OregonCity, UsaState
+from tenantfirstaid.request_timing import RequestTiming
+from tenantfirstaid.usage_ledger import UsageLedger, record_usage
+
+
+@pytest.fixture
+def clock() -> FakeClock[datetime]:
+    """Fake wall clock a minute before midnight UTC."""
+    return FakeClock(datetime(2026, 3, 1, 23, 59, tzinfo=timezone.utc))
+
+
+def _record(thread=None, city="portland", input=1000, cached=0, output=100):
+    return {
+        "ts": "2026-03-01T12:00:00+00:00",
+        "thread": thread,
+        "state": "or",
+        "city": city,
+        "input": input,
+        "cached": cached,
+        "output": output,
+        "thinking": output // 2,
+    }
+
+
+def test_ledger_rotates_daily_and_reads_back(tmp_path, clock):
+    ledger = UsageLedger(tmp_path, clock=clock)
+    ledger.append({"input": 1})
+    clock.now += timedelta(minutes=2)
+    ledger.append({"input": 2})
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "usage-2026-03-01.jsonl",
+        "usage-2026-03-02.jsonl",
+    ]
+    assert [r["input"] for r in ledger.records()] == [1, 2]
+    assert [r["input"] for r in ledger.records(since=clock.now.date())] == [2]
+    assert next(ledger.records())["ts"] == "2026-03-01T23:59:00+00:00"
+
+
+def test_ledger_prunes_files_past_retention(tmp_path, clock):
+    (tmp_path / "usage-2026-02-20.jsonl").write_text("{}\n")
+    (tmp_path / "usage-2026-02-27.jsonl").write_text("{}\n")
+    (tmp_path / "notes.txt").write_text("kept")
+
+    UsageLedger(tmp_path, retention_days=3, clock=clock).append({"input": 1})
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "notes.txt",
+        "usage-2026-02-27.jsonl",
+        "usage-2026-03-01.jsonl",
+    ]
+
+
+def test_malformed_lines_are_skipped(tmp_path):
+    (tmp_path / "usage-2026-03-01.jsonl").write_text('{"input": 1}\n{"inp\n')
+    assert list(UsageLedger(tmp_path).records()) == [{"input": 1}]
+
+
+def _summary(model_calls: int) -> dict:
+    timing = RequestTiming("/api/query")
+    for _ in range(model_calls):
+        timing.add_span("model", "model", 0.5)
+    timing.add_tokens({"input": 900, "cached": 600, "output": 80, "thinking": 30})
+    return timing.finish()
+
+
+def test_record_usage_appends_request_totals(tmp_path):
+    ledger = UsageLedger(tmp_path)
+    with patch("tenantfirstaid.usage_ledger.get_usage_ledger", return_value=ledger):
+        record_usage(
+            _summary(2),
+            city=OregonCity.EUGENE,
+            state=UsaState.OREGON,
+            thread_id="t1",
+        )
+        record_usage(_summary(0), city=None, state=UsaState.OREGON, thread_id=None)
+
+    [record] = ledger.records()
+    assert record["thread"] == "t1"
+    assert (record["state"], record["city"]) == ("or", "eugene")
+    assert record["model_calls"] == 2
+    assert (record["input"], record["cached"], record["thinking"]) == (900, 600, 30)
+
+
+def test_chat_view_records_usage_when_the_stream_ends(app, mock_chat_manager):
+    app.add_url_rule("/api/query", view_func=ChatView.as_view("chat"), methods=["POST"])
+    with patch("tenantfirstaid.chat.record_usage") as record:
+        with app.test_client() as client:
+            client.post(
+                "/api/query",
+                json={"messages": [], "city": "portland", "state": "or"},
+            ).get_data()
+
+    record.assert_called_once()
+    assert record.call_args.kwargs == {
+        "city": OregonCity.PORTLAND,
+        "state": UsaState.OREGON,
+        "thread_id": None,
+    }
+    assert "tokens" in record.call_args.args[0]
+
+
+# ── usage report ───────────────────────────────────────────────────────────────
+
+
+def test_cost_prices_cached_input_separately():
+    prices = Prices(input=1.0, cached=0.25, output=10.0)
+    record = _record(input=1_000_000, cached=400_000, output=100_000)
+    assert request_cost(record, prices) == pytest.approx(0.6 + 0.1 + 1.0)
+
+
+def test_summarize_groups_by_day_location_and_conversation():
+    prices = Prices(1.0, 0.25, 10.0)
+    records = [
+        _record(thread="t1"),
+        _record(thread="t1"),
+        _record(city=None),
+        {**_record(), "ts": "2026-03-02T01:00:00+00:00"},
+    ]
+
+    groups = summarize(records, prices)
+
+    assert {k: v["requests"] for k, v in groups["day"].items()} == {
+        "2026-03-01": 3,
+        "2026-03-02": 1,
+    }
+    assert {k: v["requests"] for k, v in groups["location"].items()} == {
+        "or/portland": 3,
+        "or": 1,
+    }
+    assert groups["conversation"]["t1"]["requests"] == 2
+    assert len(groups["conversation"]) == 3
+
+
+def test_outliers_use_median_absolute_deviation():
+    conversations = {
+        f"c{i}": {"cost": cost}
+        for i, cost in enumerate([0.10, 0.12, 0.09, 0.11, 0.10, 0.13, 0.95, 0.30])
+    }
+    assert find_outliers(conversations) == ["c6", "c7"]
+    assert find_outliers({"a": {"cost": 1.0}, "b": {"cost": 9.0}}) == []
@@ -0,0 +1,113 @@
+"""Tests for warmup.py — worker warm-up at boot and /healthz/ready."""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from starlette.testclient import TestClient
+
+from tenantfirstaid import warmup
+from tenantfirstaid.app import app
+from tenantfirstaid.asgi import app as asgi_app
+from tenantfirstaid.warmup import readiness, warm_up
+
+
+@pytest.fixture(autouse=True)
+def _fresh_warmup(monkeypatch):
+    """Start every test with a worker that has not warmed up, with WARMUP on."""
+    monkeypatch.setattr(warmup, "WARMUP", True)
+    monkeypatch.setattr(warmup, "_warmed", threading.Event())
+    monkeypatch.setattr(warmup, "_failed", [])
+
+
+def _steps(monkeypatch, **failing):
+    """Replace the warm-up steps with mocks; ``failing`` maps step name -> error."""
+    steps = {
+        name: MagicMock(side_effect=failing.get(name))
+        for name in ("llm", "retrievers", "statute_index", "graphs")
+    }
+    monkeypatch.setattr(warmup, "_STEPS", list(steps.items()))
+    return steps
+
+
+def test_builds_every_step_and_becomes_ready(monkeypatch):
+    steps = _steps(monkeypatch)
+    assert readiness()["ready"] is False
+
+    assert warm_up(prime=False) is True
+    assert all(step.call_count == 1 for step in steps.values())
+    assert readiness() == {"ready": True, "failed": []}
+
+
+def test_ready_without_warm_up_when_disabled(monkeypatch):
+    steps = _steps(monkeypatch)
+    monkeypatch.setattr(warmup, "WARMUP", False)
+
+    assert readiness()["ready"] is True
+    assert warm_up() is True
+    assert not any(step.called for step in steps.values())
+
+
+def test_failed_step_keeps_the_worker_not_ready(monkeypatch):
+    steps = _steps(monkeypatch, llm=ValueError("bad credentials"))
+
+    assert warm_up(prime=False) is False
+    # Later steps still run, so every problem is reported at once.
+    assert steps["graphs"].called
+    assert readiness() == {"ready": False, "failed": ["llm"]}
+
+
+def test_failed_primer_call_is_only_logged(monkeypatch):
+    _steps(monkeypatch)
+    monkeypatch.setattr(warmup, "_prime_model", MagicMock(side_effect=OSError))
+
+    assert warm_up(prime=True) is True
+    assert readiness() == {"ready": True, "failed": []}
+
+
+def test_ready_workers_are_counted_once(monkeypatch):
+    _steps(monkeypatch)
+    before = warmup._workers_ready.value()
+    warm_up(prime=False)
+    warm_up(prime=False)
+    assert warmup._workers_ready.value() == before + 1
+
+
+def test_builds_a_retriever_per_datastore_and_the_threaded_graph(monkeypatch):
+    monkeypatch.setattr(warmup, "CONVERSATION_STORE", "memory")
+    with (
+        patch.object(
+            warmup.SINGLETON, "VERTEX_AI_DATASTORES", {"laws": "a", "city": "b"}
+        ),
+        patch.object(warmup, "_pooled_retriever") as pooled,
+        patch.object(warmup, "get_agent_graph") as get_graph,
+    ):
+        warmup._build_retrievers()
+        warmup._build_graphs()
+
+    assert [c.args for c in pooled.call_args_list] == [("a",), ("b",)]
+    assert [c.kwargs for c in get_graph.call_args_list] == [{}, {"threaded": True}]
+
+
+# ── /healthz/ready ─────────────────────────────────────────────────────────────
+
+
+def test_flask_ready_route_reports_503_until_warmed_up(monkeypatch):
+    _steps(monkeypatch)
+    with app.test_client() as client:
+        resp = client.get("/healthz/ready")
+        assert resp.status_code == 503
+        assert resp.get_json()["ready"] is False
+
+        warm_up(prime=False)
+        resp = client.get("/healthz/ready")
+        assert resp.status_code == 200
+        assert resp.get_json() == {"ready": True, "failed": []}
+
+
+def test_asgi_app_warms_up_at_startup(monkeypatch):
+    _steps(monkeypatch)
+    with TestClient(asgi_app) as client:
+        resp = client.get("/healthz/ready")
+    assert resp.status_code == 200
+    assert resp.json()["ready"] is True